@@ -5,6 +5,14 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+
+Die öffentlichen Dealroom-Endpunkte (Landingpage, Passwortabfrage,
+generated_pages) sind asynchron implementiert; Admin und Dashboard laufen
+weiterhin synchron im Thread-Pool. Der Live-Stream des Analytics-Dashboards
+(Server-Sent Events) setzt ASGI voraus - unter WSGI würde er gepuffert.
+Start in Produktion z.B. mit:
+
+    gunicorn dealroom_dashboard.asgi:application -k uvicorn.workers.UvicornWorker
 """
 
 import os
@@ -50,6 +50,11 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Lasttest-Modus: DB-Queries pro Anfrage im Header X-DB-Queries ausgeben
+DEALROOM_LOADTEST = config('DEALROOM_LOADTEST', default=False, cast=bool)
+if DEALROOM_LOADTEST:
+    MIDDLEWARE.insert(0, 'loadtest.middleware.query_count_middleware')
+
 ROOT_URLCONF = 'dealroom_dashboard.urls'
 
 TEMPLATES = [
@@ -85,6 +90,78 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='dealroom-cache'),
+    }
+}
+
+# Render-Cache für Landingpages (Sekunden)
+DEALROOM_RENDER_CACHE_TIMEOUT = config('DEALROOM_RENDER_CACHE_TIMEOUT', default=3600, cast=int)
+
+# Cache für die Kennzahlen des Admin-Analytics-Dashboards (Sekunden)
+DEALROOM_ADMIN_DASHBOARD_CACHE_TIMEOUT = config('DEALROOM_ADMIN_DASHBOARD_CACHE_TIMEOUT', default=60, cast=int)
+
+# Cache für Funnel-Auswertungen (Sekunden; abgeschlossene Zeiträume 12x so lange)
+DEALROOM_FUNNEL_CACHE_TIMEOUT = config('DEALROOM_FUNNEL_CACHE_TIMEOUT', default=300, cast=int)
+
+# Heatmaps: Abstand, ab dem der Abruf neue Klicks selbst einrechnet (Sekunden;
+# regulär per ``manage.py build_heatmaps``)
+DEALROOM_HEATMAP_REFRESH_INTERVAL = config('DEALROOM_HEATMAP_REFRESH_INTERVAL', default=300, cast=int)
+
+# Vorwärmen der Dealroom-Caches beim Start eines Workers
+DEALROOM_WARMUP_ON_STARTUP = config('DEALROOM_WARMUP_ON_STARTUP', default=False, cast=bool)
+DEALROOM_WARMUP_BUDGET = config('DEALROOM_WARMUP_BUDGET', default=60, cast=int)
+DEALROOM_WARMUP_WORKERS = config('DEALROOM_WARMUP_WORKERS', default=4, cast=int)
+
+# Gültigkeit der signierten Zugriffstoken für passwortgeschützte Dealrooms (Sekunden)
+DEALROOM_ACCESS_TOKEN_MAX_AGE = config('DEALROOM_ACCESS_TOKEN_MAX_AGE', default=43200, cast=int)
+
+# Audit-Log der Passwortversuche: Flush nach N Einträgen oder spätestens nach N Sekunden
+# (0 = kein Hintergrund-Thread, Flush im Request sobald der Puffer voll ist)
+DEALROOM_AUDIT_BUFFER_SIZE = config('DEALROOM_AUDIT_BUFFER_SIZE', default=100, cast=int)
+DEALROOM_AUDIT_FLUSH_INTERVAL = config('DEALROOM_AUDIT_FLUSH_INTERVAL', default=5.0, cast=float)
+
+# Analytics-Beacons der generierten Seiten: Obergrenzen pro Request
+DEALROOM_ANALYTICS_MAX_BEACON_BYTES = config('DEALROOM_ANALYTICS_MAX_BEACON_BYTES', default=65536, cast=int)
+DEALROOM_ANALYTICS_MAX_BATCH_EVENTS = config('DEALROOM_ANALYTICS_MAX_BATCH_EVENTS', default=200, cast=int)
+
+# Salt für den pseudonymen Besucher-Hash (leer = SECRET_KEY); ein Wechsel beginnt die Besucherzählung neu
+DEALROOM_VISITOR_SALT = config('DEALROOM_VISITOR_SALT', default='')
+
+# Schreibpuffer für Analytics-Events (pro Worker): Flush nach N Events oder spätestens nach M ms,
+# darüber hinaus (Kapazität) werden Events in Spill-Dateien ausgelagert
+DEALROOM_ANALYTICS_BUFFER_SIZE = config('DEALROOM_ANALYTICS_BUFFER_SIZE', default=500, cast=int)
+DEALROOM_ANALYTICS_FLUSH_INTERVAL_MS = config('DEALROOM_ANALYTICS_FLUSH_INTERVAL_MS', default=1000, cast=int)
+DEALROOM_ANALYTICS_BUFFER_CAPACITY = config('DEALROOM_ANALYTICS_BUFFER_CAPACITY', default=10000, cast=int)
+DEALROOM_ANALYTICS_SPILL_DIR = config('DEALROOM_ANALYTICS_SPILL_DIR', default=str(BASE_DIR / 'analytics_spill'))
+
+# Adaptives Sampling von Klick- und Scroll-Events: höchstens so viele Events pro Minute,
+# Dealroom und Event-Typ speichert ein Worker, darüber mit Gewicht (0 = kein Sampling)
+DEALROOM_ANALYTICS_SAMPLING_BUDGET = config('DEALROOM_ANALYTICS_SAMPLING_BUDGET', default=600, cast=int)
+
+# Downloads von Dateien: Übertragung an den Webserver abgeben ('' = selbst streamen,
+# 'nginx' = X-Accel-Redirect auf eine internal-Location für MEDIA_ROOT, 'sendfile' = X-Sendfile)
+DEALROOM_DOWNLOAD_OFFLOAD = config('DEALROOM_DOWNLOAD_OFFLOAD', default='')
+DEALROOM_DOWNLOAD_ACCEL_PREFIX = config('DEALROOM_DOWNLOAD_ACCEL_PREFIX', default='/protected-media/')
+
+# Chunked Uploads (files.uploads): maximale Chunk- und Dateigröße in Bytes, Ablage der
+# unvollständigen Dateien und Ablauf nicht abgeschlossener Uploads (Stunden)
+DEALROOM_UPLOAD_CHUNK_SIZE = config('DEALROOM_UPLOAD_CHUNK_SIZE', default=8 * 1024 * 1024, cast=int)
+DEALROOM_UPLOAD_MAX_SIZE = config('DEALROOM_UPLOAD_MAX_SIZE', default=2 * 1024 * 1024 * 1024, cast=int)
+DEALROOM_UPLOAD_DIR = config('DEALROOM_UPLOAD_DIR', default=str(BASE_DIR / 'upload_parts'))
+DEALROOM_UPLOAD_EXPIRY_HOURS = config('DEALROOM_UPLOAD_EXPIRY_HOURS', default=24, cast=int)
+
+# Aufbewahrung der Analytics-Events in der Datenbank (Tage, 0 = unbegrenzt); ältere Events
+# verschiebt ``archive_analytics`` in komprimierte Monatsarchive, die Tages-Rollups bleiben erhalten
+DEALROOM_ANALYTICS_RETENTION_DAYS = config('DEALROOM_ANALYTICS_RETENTION_DAYS', default=90, cast=int)
+DEALROOM_ANALYTICS_ARCHIVE_DIR = config('DEALROOM_ANALYTICS_ARCHIVE_DIR', default=str(BASE_DIR / 'analytics_archive'))
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
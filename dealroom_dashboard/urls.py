@@ -5,9 +5,8 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
-from django.views.static import serve
 from django.urls import re_path
-import os
+from deals.views import GeneratedPageView
 
 urlpatterns = [
     # Admin
@@ -25,10 +24,8 @@ urlpatterns = [
     # Files-App
     path('files/', include('files.urls')),
     
-    # Generierte Webseiten
-    re_path(r'^generated_pages/(?P<path>.*)$', serve, {
-        'document_root': os.path.join(settings.BASE_DIR, 'generated_pages'),
-    }),
+    # Generierte Webseiten (asynchron ausgeliefert)
+    re_path(r'^generated_pages/(?P<path>.*)$', GeneratedPageView.as_view(), name='generated_website'),
 ]
 
 # Media-Dateien im Development
@@ -39,17 +36,3 @@ if settings.DEBUG:
 admin.site.site_header = "DealShare Administration"
 admin.site.site_title = "DealShare"
 admin.site.index_title = "Willkommen bei DealShare"
-
-# URL-Patterns für generierte Websites
-urlpatterns += [
-    # Generierte Websites hosten
-    re_path(
-        r'^generated_pages/dealroom-(?P<dealroom_id>\d+)/(?P<path>.*)$',
-        serve,
-        {
-            'document_root': os.path.join(settings.BASE_DIR, 'generated_pages'),
-            'show_indexes': False,
-        },
-        name='generated_website'
-    ),
-]
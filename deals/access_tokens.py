@@ -0,0 +1,127 @@
+"""
+Signierte Zugriffstoken für passwortgeschützte Dealrooms
+========================================================
+
+Nach erfolgreicher Passworteingabe wird ein HMAC-signiertes, ablaufendes
+Token ausgestellt (``django.core.signing.TimestampSigner``) und als Cookie
+gesetzt; alternativ kann es als URL-Parameter ``?access=`` übergeben werden.
+
+Die Prüfung braucht weder Datenbank noch Session: In die Signatur fließt ein
+Fingerabdruck des Passwort-Hashes ein, den LandingpageView vom geladenen Deal
+und die generated_pages-Route aus der beim Generieren geschriebenen
+``_variants/access.json`` kennt. Ein Passwortwechsel macht alle Token ungültig.
+"""
+
+from django.conf import settings
+from django.core import signing
+
+ACCESS_TOKEN_SALT = 'deals.access-token'
+ACCESS_COOKIE_PREFIX = 'dealroom_access_'
+ACCESS_QUERY_PARAM = 'access'
+
+
+def _get_signer(fingerprint: str) -> signing.TimestampSigner:
+    """Gibt den Signer für einen Passwort-Fingerabdruck zurück"""
+    return signing.TimestampSigner(salt=f'{ACCESS_TOKEN_SALT}:{fingerprint}')
+
+
+def get_access_cookie_name(deal_id: int) -> str:
+    """
+    Gibt den Cookie-Namen für das Zugriffstoken eines Dealrooms zurück
+
+    Args:
+        deal_id: ID des Dealrooms
+
+    Returns:
+        str: Cookie-Name
+    """
+    return f'{ACCESS_COOKIE_PREFIX}{deal_id}'
+
+
+def create_access_token(deal) -> str:
+    """
+    Stellt ein Zugriffstoken für einen Dealroom aus
+
+    Args:
+        deal: Dealroom-Objekt
+
+    Returns:
+        str: Signiertes Token
+    """
+    return _get_signer(deal.get_access_token_fingerprint()).sign(str(deal.id))
+
+
+def verify_access_token(token: str, deal_id: int, fingerprint: str) -> bool:
+    """
+    Prüft ein Zugriffstoken (Signatur, Ablauf, Dealroom)
+
+    Args:
+        token: Signiertes Token
+        deal_id: ID des Dealrooms
+        fingerprint: Aktueller Passwort-Fingerabdruck des Dealrooms
+
+    Returns:
+        bool: True wenn das Token gültig ist
+    """
+    if not token or not fingerprint:
+        return False
+    try:
+        value = _get_signer(fingerprint).unsign(token, max_age=settings.DEALROOM_ACCESS_TOKEN_MAX_AGE)
+    except signing.BadSignature:
+        return False
+    return value == str(deal_id)
+
+
+def get_request_token(request, deal_id: int):
+    """
+    Gibt das Token aus URL-Parameter oder Cookie zurück
+
+    Args:
+        request: HTTP-Request
+        deal_id: ID des Dealrooms
+
+    Returns:
+        str oder None: Token
+    """
+    return request.GET.get(ACCESS_QUERY_PARAM) or request.COOKIES.get(get_access_cookie_name(deal_id))
+
+
+def has_valid_access_token(request, deal) -> bool:
+    """
+    Prüft ob der Request ein gültiges Token für den Dealroom mitbringt
+
+    Args:
+        request: HTTP-Request
+        deal: Dealroom-Objekt
+
+    Returns:
+        bool: True wenn Zugriff gewährt ist
+    """
+    return verify_access_token(
+        get_request_token(request, deal.id), deal.id, deal.get_access_token_fingerprint()
+    )
+
+
+def set_access_cookie(response, deal_id: int, token: str):
+    """
+    Setzt das Zugriffstoken als Cookie
+
+    Das Cookie gilt für die Landingpage und generated_pages (Pfad ``/``).
+
+    Args:
+        response: HTTP-Response
+        deal_id: ID des Dealrooms
+        token: Ausgestelltes Token
+
+    Returns:
+        HttpResponse: Die Response
+    """
+    response.set_cookie(
+        get_access_cookie_name(deal_id),
+        token,
+        max_age=settings.DEALROOM_ACCESS_TOKEN_MAX_AGE,
+        httponly=True,
+        samesite='Lax',
+        secure=settings.SESSION_COOKIE_SECURE,
+    )
+    return response
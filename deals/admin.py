@@ -7,13 +7,12 @@ from django.urls import reverse
 from django.utils.html import format_html, mark_safe
 from django.http import HttpResponseRedirect
 from django.contrib import messages
-from .models import Deal, DealFile, DealFileAssignment, DealChangeLog, ContentBlock, MediaLibrary, LayoutTemplate, DealAnalyticsEvent
+from .models import Deal, DealFile, DealFileAssignment, DealChangeLog, ContentBlock, MediaLibrary, LayoutTemplate, DealAnalyticsEvent, PasswordAttempt
 from django.contrib.admin.views.main import ChangeList
 from django.utils.html import format_html
 from django.urls import path
 from django.template.response import TemplateResponse
-from django.db.models import Count
-from django.utils import timezone
+from .admin_dashboard import get_admin_dashboard_context
 
 
 class DealFileInline(admin.TabularInline):
@@ -415,35 +414,33 @@ class LayoutTemplateAdmin(admin.ModelAdmin):
         super().save_model(request, obj, form, change)
 
 
+@admin.register(PasswordAttempt)
+class PasswordAttemptAdmin(admin.ModelAdmin):
+    """
+    Admin-Ansicht für das Audit-Log der Passwortversuche (nur lesend)
+    """
+    list_display = ('timestamp', 'deal', 'success', 'ip_address')
+    list_filter = ('success', 'timestamp')
+    search_fields = ('ip_address', 'deal__title')
+    date_hierarchy = 'timestamp'
+    list_select_related = ('deal',)
+    ordering = ('-timestamp',)
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
 class DealAnalyticsAdmin(admin.ModelAdmin):
     change_list_template = 'admin/deals/analytics_dashboard.html'
     model = DealAnalyticsEvent
     
     def changelist_view(self, request, extra_context=None):
-        # Gesamtzahl Deals
-        total_deals = Deal.objects.count()
-        # Deals pro Tag (letzte 30 Tage)
-        today = timezone.now().date()
-        last_30 = [today - timezone.timedelta(days=i) for i in range(29, -1, -1)]
-        deals_per_day = [
-            Deal.objects.filter(created_at__date=day).count() for day in last_30
-        ]
-        # Top-User
-        top_users = Deal.objects.values('created_by__username').annotate(
-            count=Count('id')).order_by('-count')[:5]
-        # Events gesamt
-        total_events = DealAnalyticsEvent.objects.count()
-        # Events pro Typ
-        events_by_type = DealAnalyticsEvent.objects.values('event_type').annotate(
-            count=Count('id')).order_by('-count')
+        # Kennzahlen mit konstanter Query-Anzahl, kurz gecacht
         extra_context = extra_context or {}
-        extra_context.update({
-            'total_deals': total_deals,
-            'deals_per_day': list(zip(last_30, deals_per_day)),
-            'top_users': top_users,
-            'total_events': total_events,
-            'events_by_type': events_by_type,
-        })
+        extra_context.update(get_admin_dashboard_context())
         return super().changelist_view(request, extra_context=extra_context)
 
 admin.site.register(DealAnalyticsEvent, DealAnalyticsAdmin)
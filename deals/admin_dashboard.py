@@ -0,0 +1,102 @@
+"""
+Kennzahlen für das Analytics-Dashboard im Admin
+===============================================
+
+Der Kontext wird mit einer festen Anzahl Queries berechnet, unabhängig von
+der Anzahl Tage oder Datensätze: die Deals pro Tag kommen aus einer einzigen
+nach ``TruncDate`` gruppierten Query, die Events-Summe aus der Aufteilung
+nach Typ. Gesampelte Events (``deals.sampling``) zählen mit ihrem
+``sample_weight``, damit die Summen erwartungstreu bleiben.
+
+Das Ergebnis liegt für ``DEALROOM_ADMIN_DASHBOARD_CACHE_TIMEOUT`` Sekunden
+im Cache und wird bei neuen oder gelöschten Deals verworfen. Neue oder
+archivierte Events verwerfen ihn nicht (das wäre pro Flush bzw. pro Zeile);
+die Event-Summen sind höchstens eine Cache-Dauer alt.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+ADMIN_DASHBOARD_CACHE_KEY = 'deals:admin_dashboard'
+
+CHART_DAYS = 30
+
+
+def _deals_per_day(today, days=CHART_DAYS):
+    """
+    Zählt die angelegten Deals pro Tag
+
+    Args:
+        today: Letzter Tag des Zeitraums
+        days: Anzahl Tage
+
+    Returns:
+        list: (Tag, Anzahl) je Tag, ältester zuerst, ohne Lücken
+    """
+    from .models import Deal
+
+    first_day = today - timedelta(days=days - 1)
+    counts = dict(
+        Deal.objects.annotate(day=TruncDate('created_at'))
+        .filter(day__gte=first_day, day__lte=today)
+        .values('day')
+        .annotate(count=Count('id'))
+        .values_list('day', 'count')
+    )
+    return [
+        (day, counts.get(day, 0))
+        for day in (first_day + timedelta(days=offset) for offset in range(days))
+    ]
+
+
+def build_admin_dashboard_context():
+    """
+    Berechnet die Kennzahlen des Admin-Dashboards
+
+    Returns:
+        dict: Template-Kontext
+    """
+    from .models import Deal, DealAnalyticsEvent
+
+    events_by_type = list(
+        DealAnalyticsEvent.objects.order_by().values('event_type')
+        .annotate(count=Sum('sample_weight')).order_by('-count')
+    )
+    return {
+        'total_deals': Deal.objects.count(),
+        'deals_per_day': _deals_per_day(timezone.localdate()),
+        'top_users': list(
+            Deal.objects.values('created_by__username')
+            .annotate(count=Count('id')).order_by('-count')[:5]
+        ),
+        'total_events': sum(row['count'] for row in events_by_type),
+        'events_by_type': events_by_type,
+    }
+
+
+def get_admin_dashboard_context():
+    """
+    Gibt die Kennzahlen des Admin-Dashboards aus dem Cache oder frisch zurück
+
+    Returns:
+        dict: Template-Kontext
+    """
+    context = cache.get(ADMIN_DASHBOARD_CACHE_KEY)
+    if context is None:
+        context = build_admin_dashboard_context()
+        cache.set(
+            ADMIN_DASHBOARD_CACHE_KEY,
+            context,
+            settings.DEALROOM_ADMIN_DASHBOARD_CACHE_TIMEOUT
+        )
+    return context
+
+
+def invalidate_admin_dashboard() -> None:
+    """Verwirft die gecachten Kennzahlen des Admin-Dashboards"""
+    cache.delete(ADMIN_DASHBOARD_CACHE_KEY)
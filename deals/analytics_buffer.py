@@ -0,0 +1,425 @@
+"""
+Schreibpuffer für Analytics-Events
+==================================
+
+Der Collect-Endpunkt schreibt nicht selbst in die Datenbank, sondern hängt
+die Events an einen begrenzten Puffer dieses Worker-Prozesses. Ein
+Hintergrund-Thread schreibt ihn per ``bulk_create``, sobald
+``DEALROOM_ANALYTICS_BUFFER_SIZE`` Events anliegen oder spätestens nach
+``DEALROOM_ANALYTICS_FLUSH_INTERVAL_MS`` Millisekunden, sowie beim Beenden
+des Prozesses. So konkurriert Analytics höchstens einmal pro Flush-Fenster
+mit dem Ausliefern der Dealrooms um den SQLite-Schreib-Lock.
+
+Ist der Puffer voll (``DEALROOM_ANALYTICS_BUFFER_CAPACITY``, z.B. weil die
+DB gesperrt ist), werden weitere Events als JSON-Zeilen in eine Spill-Datei
+unter ``DEALROOM_ANALYTICS_SPILL_DIR`` geschrieben und beim nächsten
+erfolgreichen Flush nachgetragen (oder mit ``flush_analytics``). Jede
+Spill-Datei trägt die PID ihres Workers; nachgetragen werden nur eigene
+Dateien und die beendeter Prozesse, nie die eines laufenden Workers.
+Unlesbare Zeilen landen in einer ``.corrupt``-Datei daneben.
+
+Scheitert ein Schreibvorgang, werden Events inzwischen gelöschter Dealrooms
+verworfen und der Rest erneut geschrieben. Eine Spill-Datei, die auch dann
+noch die Integrität verletzt, wird ganz nach ``.corrupt`` verschoben, statt
+das Nachtragen aller folgenden Dateien zu blockieren.
+
+Angenommene Events werden sofort an die Live-Zähler (``deals.live``)
+gemeldet. User-Agents und Referrer werden erst beim Flush (im ``bulk_create``) auf
+ihre Dictionary-Einträge abgebildet (``deals.interning``).
+
+Verlust bei einem Absturz: höchstens die Events eines Flush-Fensters.
+"""
+
+import atexit
+import json
+import os
+import re
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import IntegrityError
+
+from .buffers import BackgroundFlushBuffer
+from .live import live_hub
+
+SPILL_SUFFIX = '.jsonl'
+REPLAY_SUFFIX = '.replaying'
+CORRUPT_SUFFIX = '.corrupt'
+
+_SPILL_NAME_RE = re.compile(r'^spill-(\d+)-')
+
+# Felder, die in Spill-Dateien geschrieben werden
+_SPILL_FIELDS = (
+    'deal_id', 'event_type', 'timestamp', 'meta', 'visitor_ip', 'visitor_hash', 'time_spent',
+    'referrer', 'user_agent', 'element_id', 'position_x', 'position_y',
+    'consent_given', 'anonymized', 'session_id', 'sample_weight',
+)
+
+
+def event_to_dict(event):
+    """Serialisiert ein ungespeichertes DealAnalyticsEvent für die Spill-Datei"""
+    data = {name: getattr(event, name) for name in _SPILL_FIELDS}
+    data['timestamp'] = data['timestamp'].isoformat()
+    if data['time_spent'] is not None:
+        data['time_spent'] = data['time_spent'].total_seconds()
+    return data
+
+
+def event_from_dict(data):
+    """Baut ein DealAnalyticsEvent aus einer Zeile der Spill-Datei"""
+    from .models import DealAnalyticsEvent
+
+    data = dict(data)
+    data['timestamp'] = datetime.fromisoformat(data['timestamp'])
+    if data.get('time_spent') is not None:
+        data['time_spent'] = timedelta(seconds=data['time_spent'])
+    return DealAnalyticsEvent(**data)
+
+
+class AnalyticsEventBuffer(BackgroundFlushBuffer):
+    """
+    Begrenzter Puffer mit Flush nach Anzahl oder Zeit und Spill-Datei
+    """
+
+    thread_name = 'analytics-flush'
+    error_subject = 'der Analytics-Events'
+
+    def __init__(self, flush_size=None, flush_interval_ms=None, capacity=None, spill_dir=None):
+        """
+        Initialisiert den Puffer
+
+        Args:
+            flush_size: Events bis zum Flush (Standard: DEALROOM_ANALYTICS_BUFFER_SIZE)
+            flush_interval_ms: Millisekunden bis zum Flush, 0 = kein Thread
+                (Standard: DEALROOM_ANALYTICS_FLUSH_INTERVAL_MS)
+            capacity: Maximale Events im Speicher (Standard: DEALROOM_ANALYTICS_BUFFER_CAPACITY)
+            spill_dir: Verzeichnis für Spill-Dateien (Standard: DEALROOM_ANALYTICS_SPILL_DIR)
+        """
+        super().__init__()
+        self._flush_size = flush_size
+        self._flush_interval_ms = flush_interval_ms
+        self._capacity = capacity
+        self._spill_dir = spill_dir
+        self._events = deque()
+        self._spill_path = None
+        self._started = time.monotonic()
+        self._stats = {
+            'ingested': 0,
+            'flushed': 0,
+            'spilled': 0,
+            'replayed': 0,
+            'flushes': 0,
+            'failed_flushes': 0,
+            'flush_ms_total': 0.0,
+            'flush_ms_max': 0.0,
+            'flush_ms_last': 0.0,
+        }
+
+    @property
+    def flush_size(self):
+        return self._flush_size if self._flush_size is not None else settings.DEALROOM_ANALYTICS_BUFFER_SIZE
+
+    @property
+    def flush_interval_ms(self):
+        if self._flush_interval_ms is not None:
+            return self._flush_interval_ms
+        return settings.DEALROOM_ANALYTICS_FLUSH_INTERVAL_MS
+
+    @property
+    def flush_wait(self):
+        return self.flush_interval_ms / 1000
+
+    @property
+    def capacity(self):
+        return self._capacity if self._capacity is not None else settings.DEALROOM_ANALYTICS_BUFFER_CAPACITY
+
+    @property
+    def spill_dir(self):
+        return str(self._spill_dir or settings.DEALROOM_ANALYTICS_SPILL_DIR)
+
+    def extend(self, events):
+        """
+        Hängt ungespeicherte Events an (Hot Path, keine DB)
+
+        Args:
+            events: Liste von DealAnalyticsEvent-Objekten
+        """
+        if not events:
+            return
+
+        # Live-Zähler der Dashboards (nur Speicher)
+        live_hub.publish(events)
+
+        with self._lock:
+            free = max(0, self.capacity - len(self._events))
+            self._events.extend(events[:free])
+            overflow = events[free:]
+            pending = len(self._events)
+            self._stats['ingested'] += len(events)
+
+        if overflow:
+            self._spill(overflow)
+
+        self._request_flush(pending, self.flush_size)
+
+    def pending(self) -> int:
+        """Gibt die Anzahl noch nicht geschriebener Events im Speicher zurück"""
+        with self._lock:
+            return len(self._events)
+
+    def flush(self, replay=True) -> int:
+        """
+        Schreibt alle Events im Speicher per bulk_create
+
+        Events gelöschter Dealrooms werden verworfen (siehe ``write_events``);
+        schlägt das Schreiben trotzdem fehl, kommen die Events in die
+        Spill-Datei. Nach einem erfolgreichen Flush werden vorhandene
+        Spill-Dateien nachgetragen.
+
+        Args:
+            replay: Spill-Dateien nach dem Flush nachtragen
+
+        Returns:
+            int: Anzahl geschriebener Events (inkl. nachgetragener)
+        """
+        with self._flush_lock:
+            with self._lock:
+                events = list(self._events)
+                self._events.clear()
+
+            written = 0
+            if events:
+                started = time.monotonic()
+                try:
+                    events = write_events(events)
+                except Exception:
+                    self._stats['failed_flushes'] += 1
+                    self._spill(events)
+                    raise
+                self._record_flush(len(events), (time.monotonic() - started) * 1000)
+                written = len(events)
+                _after_write(events)
+
+            if replay:
+                written += self._replay_spill_files()
+            return written
+
+    def stats(self) -> dict:
+        """
+        Gibt Durchsatz und Flush-Latenz dieses Workers zurück
+
+        Returns:
+            dict: Zähler, Events pro Sekunde und Flush-Dauer in ms
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats['pending'] = len(self._events)
+        uptime = max(time.monotonic() - self._started, 1e-9)
+        stats['uptime'] = round(uptime, 3)
+        stats['ingest_rate'] = round(stats['ingested'] / uptime, 1)
+        stats['flush_rate'] = round(stats['flushed'] / uptime, 1)
+        stats['flush_ms_avg'] = round(stats['flush_ms_total'] / stats['flushes'], 2) if stats['flushes'] else 0.0
+        return stats
+
+    def _record_flush(self, count, duration_ms):
+        with self._lock:
+            self._stats['flushed'] += count
+            self._stats['flushes'] += 1
+            self._stats['flush_ms_total'] += duration_ms
+            self._stats['flush_ms_last'] = round(duration_ms, 2)
+            self._stats['flush_ms_max'] = round(max(self._stats['flush_ms_max'], duration_ms), 2)
+
+    def _spill(self, events):
+        """Schreibt Events als JSON-Zeilen in die Spill-Datei dieses Workers"""
+        lines = ''.join(json.dumps(event_to_dict(event)) + '\n' for event in events)
+        with self._lock:
+            if self._spill_path is None:
+                os.makedirs(self.spill_dir, exist_ok=True)
+                self._spill_path = os.path.join(
+                    self.spill_dir, f'spill-{os.getpid()}-{uuid.uuid4().hex[:8]}{SPILL_SUFFIX}'
+                )
+            with open(self._spill_path, 'a', encoding='utf-8') as spill_file:
+                spill_file.write(lines)
+            self._stats['spilled'] += len(events)
+
+    def _replay_spill_files(self) -> int:
+        """Trägt Spill-Dateien nach (eigene und die beendeter Worker)"""
+        with self._lock:
+            self._spill_path = None
+        replayed = replay_spill_files(self.spill_dir)
+        if replayed:
+            with self._lock:
+                self._stats['replayed'] += replayed
+        return replayed
+
+
+def replay_spill_files(spill_dir, batch_size=500) -> int:
+    """
+    Schreibt alle Spill-Dateien eines Verzeichnisses in die Datenbank
+
+    Übersprungen werden Dateien laufender Worker (außer diesem Prozess),
+    in die noch geschrieben wird. Jede Datei wird vorher atomar umbenannt,
+    damit sie bei mehreren Workern nur einmal nachgetragen wird. Schlägt das
+    Schreiben fehl (z.B. DB gesperrt), bleibt sie für den nächsten Versuch
+    liegen. Unlesbare Zeilen werden in ``<Datei>.corrupt`` abgelegt, ebenso
+    die ganze Datei, wenn sie trotz ``write_events`` die Integrität verletzt;
+    die übrigen Dateien werden weiter nachgetragen.
+
+    Args:
+        spill_dir: Verzeichnis der Spill-Dateien
+        batch_size: Events pro INSERT
+
+    Returns:
+        int: Anzahl nachgetragener Events
+    """
+    if not os.path.isdir(spill_dir):
+        return 0
+
+    replayed = 0
+    for name in sorted(os.listdir(spill_dir)):
+        if not name.endswith(SPILL_SUFFIX) or _owner_alive(name):
+            continue
+        path = os.path.join(spill_dir, name)
+        claimed = path + REPLAY_SUFFIX
+        try:
+            os.rename(path, claimed)
+        except OSError:
+            # Von einem anderen Worker übernommen
+            continue
+
+        try:
+            events, corrupt = _read_spill_file(claimed)
+            events = write_events(events, batch_size=batch_size)
+        except IntegrityError as e:
+            _quarantine_spill_file(claimed, path + CORRUPT_SUFFIX)
+            print(f"❌ Spill-Datei {path} verletzt die Integrität ({e}), nach {path}{CORRUPT_SUFFIX} verschoben")
+            continue
+        except Exception:
+            os.rename(claimed, path)
+            raise
+        if corrupt:
+            with open(path + CORRUPT_SUFFIX, 'a', encoding='utf-8') as corrupt_file:
+                corrupt_file.writelines(corrupt)
+            print(f"⚠️ {len(corrupt)} unlesbare Analytics-Events nach {path}{CORRUPT_SUFFIX} verschoben")
+        os.remove(claimed)
+        replayed += len(events)
+        _after_write(events)
+    return replayed
+
+
+def write_events(events, batch_size=500):
+    """
+    Schreibt Events per bulk_create
+
+    Schlägt das Schreiben fehl (z.B. Fremdschlüssel eines inzwischen
+    gelöschten Dealrooms), werden die Events gelöschter Dealrooms verworfen
+    und der Rest erneut geschrieben. Gibt es nichts zu verwerfen, wird der
+    ursprüngliche Fehler weitergereicht.
+
+    Returns:
+        list: Tatsächlich geschriebene Events
+    """
+    from .models import Deal, DealAnalyticsEvent
+
+    try:
+        DealAnalyticsEvent.objects.bulk_create(events, batch_size=batch_size)
+        return events
+    except Exception:
+        existing = set(
+            Deal.objects.filter(pk__in={event.deal_id for event in events}).values_list('pk', flat=True)
+        )
+        kept = [event for event in events if event.deal_id in existing]
+        if len(kept) == len(events):
+            raise
+
+    # Der fehlgeschlagene INSERT wurde zurückgerollt, vergebene IDs gelten nicht
+    for event in kept:
+        event.pk = None
+        event._state.adding = True
+    DealAnalyticsEvent.objects.bulk_create(kept, batch_size=batch_size)
+    print(f"⚠️ {len(events) - len(kept)} Analytics-Events gelöschter Dealrooms verworfen")
+    return kept
+
+
+def _quarantine_spill_file(claimed, corrupt_path):
+    """Hängt eine nicht nachtragbare Spill-Datei an ``<Datei>.corrupt`` an"""
+    with open(claimed, encoding='utf-8', errors='replace') as spill_file:
+        lines = spill_file.read()
+    with open(corrupt_path, 'a', encoding='utf-8') as corrupt_file:
+        corrupt_file.write(lines)
+    os.remove(claimed)
+
+
+def _owner_alive(name) -> bool:
+    """Prüft, ob der Worker einer Spill-Datei noch läuft (dieser Prozess zählt nicht)"""
+    match = _SPILL_NAME_RE.match(name)
+    if not match:
+        return False
+    pid = int(match.group(1))
+    if pid == os.getpid():
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Prozess existiert, gehört aber einem anderen Benutzer
+        return True
+    return True
+
+
+def _read_spill_file(path):
+    """
+    Liest eine Spill-Datei
+
+    Returns:
+        tuple: (Events, unlesbare Zeilen)
+    """
+    events, corrupt = [], []
+    with open(path, encoding='utf-8', errors='replace') as spill_file:
+        for line in spill_file:
+            if not line.strip():
+                continue
+            try:
+                events.append(event_from_dict(json.loads(line)))
+            except (ValueError, TypeError, KeyError, AttributeError):
+                corrupt.append(line if line.endswith('\n') else line + '\n')
+    return events, corrupt
+
+
+def _after_write(events):
+    """
+    Aktualisiert abgeleitete Daten nach dem Schreiben von Events
+
+    Korrigiert Tages-Rollups vergangener Tage. Fehler verwerfen keine
+    Events.
+    """
+    from .rollups import rollup_late_events
+
+    try:
+        rollup_late_events(events)
+    except Exception as e:
+        print(f"❌ Fehler beim Aktualisieren der Analytics-Rollups: {e}")
+
+
+analytics_buffer = AnalyticsEventBuffer()
+
+
+def _flush_at_exit():
+    """Schreibt den Rest des Puffers beim Beenden des Prozesses"""
+    if not analytics_buffer.stats()['ingested']:
+        return
+    try:
+        analytics_buffer.flush(replay=False)
+    except Exception as e:
+        print(f"❌ Analytics-Events konnten beim Beenden nicht geschrieben werden (Spill-Datei): {e}")
+    stats = analytics_buffer.stats()
+    print(f"📊 Analytics-Puffer: {stats['flushed']} Events in {stats['flushes']} Flushes, "
+          f"{stats['ingest_rate']} Events/s, Flush Ø {stats['flush_ms_avg']} ms / max {stats['flush_ms_max']} ms, "
+          f"{stats['spilled']} ausgelagert")
+
+
+atexit.register(_flush_at_exit)
@@ -21,3 +21,9 @@ class DealsConfig(AppConfig):
     def ready(self):
         from .models import Deal
         post_save.connect(create_deal_analytics_event, sender=Deal)
+
+        # Caches optional beim Start vorwärmen (läuft im Hintergrund)
+        from django.conf import settings
+        if settings.DEALROOM_WARMUP_ON_STARTUP:
+            from .warmup import start_background_warmup
+            start_background_warmup()
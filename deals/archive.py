@@ -0,0 +1,300 @@
+"""
+Archiv für alte Analytics-Events
+================================
+
+Hält die Tabelle ``DealAnalyticsEvent`` klein: Events vor dem
+Aufbewahrungsfenster (``DEALROOM_ANALYTICS_RETENTION_DAYS``) werden in
+komprimierte, spaltenweise Monatsdateien unter
+``DEALROOM_ANALYTICS_ARCHIVE_DIR`` verschoben (Command ``archive_analytics``).
+
+Vor dem Verschieben werden Tages-Rollups, Sessions und Heatmaps
+aktualisiert; die Dashboards lesen danach nur noch die Rollups. Sessions
+archivierter Tage werden gelöscht. Archivierte Tage rechnet
+``rollup_days`` nicht mehr neu.
+
+Dateiformat: ``<JJJJ-MM>/events-<erste ID>-<letzte ID>.npz``
+(``numpy.savez_compressed``, ohne Pickle). Zahlen liegen als eigene Arrays
+vor (fehlende Werte: -1 bzw. NaN), Textspalten dictionary-codiert als
+``<spalte>__codes`` (int32, -1 = NULL) und ``<spalte>__values``.
+
+Die Spalte ``referrer`` enthält seit der Dictionary-Codierung
+(``deals.interning``) nur noch den Host.
+
+Ablauf pro Block: Datei schreiben, dann in einer Transaktion
+``AnalyticsArchive``-Eintrag anlegen und die Events löschen. Bricht der
+Prozess dazwischen ab, bleibt höchstens eine nicht eingetragene Datei
+liegen, die beim Lesen ignoriert wird.
+"""
+
+import json
+import os
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+ARCHIVE_SUFFIX = '.npz'
+
+CHUNK_SIZE = 50000
+
+# IDs pro DELETE (SQLite begrenzt die Anzahl der Parameter)
+DELETE_BATCH_SIZE = 900
+
+# (Feld, dtype, Wert für NULL)
+_NUMBER_COLUMNS = (
+    ('id', np.int64, None),
+    ('deal_id', np.int64, None),
+    ('user_id', np.int64, -1),
+    ('page_views', np.int64, 0),
+    ('position_x', np.float64, np.nan),
+    ('position_y', np.float64, np.nan),
+    ('consent_given', np.bool_, False),
+    ('anonymized', np.bool_, False),
+    ('sample_weight', np.int64, 1),
+)
+
+_TEXT_COLUMNS = (
+    'event_type', 'visitor_ip', 'visitor_hash', 'referrer', 'user_agent', 'element_id', 'session_id', 'meta',
+)
+
+_FIELDS = (
+    [name for name, _, _ in _NUMBER_COLUMNS]
+    + ['timestamp', 'time_spent']
+    + list(_TEXT_COLUMNS)
+)
+
+_TIMESTAMP_POSITION = _FIELDS.index('timestamp')
+
+
+def get_archive_dir():
+    """Gibt das Archiv-Verzeichnis zurück"""
+    return settings.DEALROOM_ANALYTICS_ARCHIVE_DIR
+
+
+def _encode_text(values):
+    """
+    Codiert eine Textspalte als Dictionary
+
+    Returns:
+        tuple: (codes als int32, eindeutige Werte als Unicode-Array)
+    """
+    index = {}
+    codes = np.fromiter(
+        (-1 if value is None else index.setdefault(value, len(index)) for value in values),
+        dtype=np.int32, count=len(values)
+    )
+    return codes, np.array(list(index) or [''], dtype=np.str_)
+
+
+def _to_columns(rows):
+    """
+    Wandelt Event-Zeilen (Tupel in ``_FIELDS``-Reihenfolge) in Spalten-Arrays
+
+    Returns:
+        dict: Array je Spaltenname
+    """
+    fields = list(zip(*rows))
+    columns = {}
+    for position, (name, dtype, null) in enumerate(_NUMBER_COLUMNS):
+        columns[name] = np.array([null if value is None else value for value in fields[position]], dtype=dtype)
+
+    offset = len(_NUMBER_COLUMNS)
+    columns['timestamp'] = np.array(
+        [int(value.timestamp() * 1_000_000) for value in fields[offset]], dtype=np.int64
+    )
+    columns['time_spent'] = np.array(
+        [np.nan if value is None else value.total_seconds() for value in fields[offset + 1]], dtype=np.float64
+    )
+
+    for position, name in enumerate(_TEXT_COLUMNS, start=offset + 2):
+        values = fields[position]
+        if name == 'meta':
+            values = [None if value is None else json.dumps(value, sort_keys=True) for value in values]
+        columns[f'{name}__codes'], columns[f'{name}__values'] = _encode_text(values)
+    return columns
+
+
+def write_archive(path, rows):
+    """
+    Schreibt Events atomar in eine Archivdatei
+
+    Args:
+        path: Zielpfad (.npz)
+        rows: Event-Zeilen in ``_FIELDS``-Reihenfolge
+
+    Returns:
+        int: Dateigröße in Bytes
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f'{path}.tmp'
+    with open(temp_path, 'wb') as archive_file:
+        np.savez_compressed(archive_file, **_to_columns(rows))
+    os.replace(temp_path, path)
+    return os.path.getsize(path)
+
+
+def read_archive(path):
+    """
+    Liest eine Archivdatei spaltenweise
+
+    Zeitstempel werden als Mikrosekunden seit 1970 (UTC) geliefert,
+    Textspalten als Objekt-Arrays (None = NULL), ``meta`` bereits geparst.
+
+    Args:
+        path: Pfad der Archivdatei
+
+    Returns:
+        dict: Array je Feld
+    """
+    with np.load(path, allow_pickle=False) as data:
+        # Ältere Dateien ohne eine Spalte (z.B. sample_weight) bekommen den NULL-Wert
+        columns = {
+            name: data[name] if name in data.files else np.full(len(data['id']), null, dtype=dtype)
+            for name, dtype, null in _NUMBER_COLUMNS
+        }
+        columns['timestamp'] = data['timestamp']
+        columns['time_spent'] = data['time_spent']
+        for name in _TEXT_COLUMNS:
+            codes = data[f'{name}__codes']
+            values = np.append(data[f'{name}__values'].astype(object), None)
+            # Code -1 zeigt auf das angehängte None
+            columns[name] = values[codes]
+    columns['meta'] = np.array(
+        [None if value is None else json.loads(value) for value in columns['meta']], dtype=object
+    )
+    return columns
+
+
+def iter_archived_events(since=None, until=None, deal_id=None):
+    """
+    Liefert archivierte Events als Dicts, nach Monaten und IDs sortiert
+
+    Args:
+        since: Erster Tag (inklusive) oder None
+        until: Letzter Tag (inklusive) oder None
+        deal_id: Nur Events dieses Dealrooms
+
+    Yields:
+        dict: Feldwerte eines Events (``timestamp`` als aware datetime,
+        ``time_spent`` als timedelta oder None)
+    """
+    from .models import AnalyticsArchive
+    from .rollups import get_day_start
+
+    archives = AnalyticsArchive.objects.all()
+    if since is not None:
+        archives = archives.filter(month__gte=since.replace(day=1))
+    if until is not None:
+        archives = archives.filter(month__lte=until)
+
+    start = int(get_day_start(since).timestamp() * 1_000_000) if since else None
+    end = int(get_day_start(until + timedelta(days=1)).timestamp() * 1_000_000) if until else None
+
+    for archive in archives:
+        columns = read_archive(os.path.join(get_archive_dir(), archive.path))
+        mask = np.ones(len(columns['id']), dtype=bool)
+        if start is not None:
+            mask &= columns['timestamp'] >= start
+        if end is not None:
+            mask &= columns['timestamp'] < end
+        if deal_id is not None:
+            mask &= columns['deal_id'] == deal_id
+
+        for position in np.flatnonzero(mask):
+            yield _event_from_columns(columns, position)
+
+
+def _event_from_columns(columns, position):
+    """Baut ein Event-Dict aus einer Zeile der Spalten-Arrays"""
+    event = {name: columns[name][position] for name in _TEXT_COLUMNS}
+    for name in ('id', 'deal_id', 'page_views', 'sample_weight'):
+        event[name] = int(columns[name][position])
+    for name in ('consent_given', 'anonymized'):
+        event[name] = bool(columns[name][position])
+    user_id = int(columns['user_id'][position])
+    event['user_id'] = user_id if user_id >= 0 else None
+    for name in ('position_x', 'position_y'):
+        value = columns[name][position]
+        event[name] = None if np.isnan(value) else int(value)
+    event['timestamp'] = datetime.fromtimestamp(
+        int(columns['timestamp'][position]) / 1_000_000, tz=dt_timezone.utc
+    )
+    seconds = columns['time_spent'][position]
+    event['time_spent'] = None if np.isnan(seconds) else timedelta(seconds=float(seconds))
+    return event
+
+
+def _month_start(moment):
+    """Gibt den ersten Tag des lokalen Monats eines Zeitpunkts zurück"""
+    return timezone.localtime(moment).date().replace(day=1)
+
+
+def archive_events(before=None, chunk_size=CHUNK_SIZE):
+    """
+    Verschiebt Events vor einem Stichtag in Monatsarchive
+
+    Aktualisiert vorher Rollups und Heatmaps, damit keine Kennzahlen
+    verloren gehen.
+
+    Args:
+        before: Stichtag (Events davor werden archiviert); Standard ist der
+            Beginn des Aufbewahrungsfensters
+        chunk_size: Events pro Archivdatei (höchstens)
+
+    Returns:
+        dict: Anzahl archivierter Events und geschriebener Dateien
+    """
+    from .heatmaps import update_heatmaps
+    from .interning import event_value_fields
+    from .models import AnalyticsArchive, DealAnalyticsEvent, DealAnalyticsSession
+    from .rollups import get_day_start, update_rollups
+
+    if before is None:
+        retention_days = settings.DEALROOM_ANALYTICS_RETENTION_DAYS
+        if retention_days <= 0:
+            return {'events': 0, 'files': 0}
+        before = timezone.localdate() - timedelta(days=retention_days)
+    before = min(before, timezone.localdate())
+
+    update_rollups()
+    old_events = DealAnalyticsEvent.objects.filter(timestamp__lt=get_day_start(before)).order_by('id')
+    for deal_id in old_events.filter(event_type='click').values_list('deal_id', flat=True).distinct().order_by():
+        update_heatmaps(deal_id)
+
+    report = {'events': 0, 'files': 0}
+    while True:
+        rows = list(old_events.values_list(*event_value_fields(_FIELDS))[:chunk_size])
+        if not rows:
+            break
+
+        by_month = {}
+        for row in rows:
+            by_month.setdefault(_month_start(row[_TIMESTAMP_POSITION]), []).append(row)
+
+        for month, month_rows in sorted(by_month.items()):
+            first_id, last_id = month_rows[0][0], month_rows[-1][0]
+            relative_path = os.path.join(f'{month:%Y-%m}', f'events-{first_id}-{last_id}{ARCHIVE_SUFFIX}')
+            size = write_archive(os.path.join(get_archive_dir(), relative_path), month_rows)
+            with transaction.atomic():
+                AnalyticsArchive.objects.create(
+                    month=month,
+                    path=relative_path,
+                    first_event_id=first_id,
+                    last_event_id=last_id,
+                    event_count=len(month_rows),
+                    size_bytes=size,
+                    archived_before=before,
+                )
+                ids = [row[0] for row in month_rows]
+                for offset in range(0, len(ids), DELETE_BATCH_SIZE):
+                    DealAnalyticsEvent.objects.filter(id__in=ids[offset:offset + DELETE_BATCH_SIZE]).delete()
+            report['events'] += len(month_rows)
+            report['files'] += 1
+
+    # Die Tageswerte enthalten die Session-Kennzahlen bereits
+    if report['events']:
+        DealAnalyticsSession.objects.filter(day__lt=before).delete()
+    return report
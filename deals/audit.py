@@ -0,0 +1,175 @@
+"""
+Gepuffertes Audit-Log für Passwortversuche
+==========================================
+
+Ein Versuch wird im Request nur als Tupel an einen Puffer im Prozess
+angehängt (wenige Mikrosekunden, keine DB). Ein Hintergrund-Thread schreibt
+den Puffer per ``bulk_create``, sobald ``DEALROOM_AUDIT_BUFFER_SIZE`` Einträge
+anliegen oder spätestens nach ``DEALROOM_AUDIT_FLUSH_INTERVAL`` Sekunden.
+Beim Beenden des Prozesses wird der Rest geschrieben.
+
+Mit ``DEALROOM_AUDIT_FLUSH_INTERVAL = 0`` läuft kein Thread; dann schreibt
+der anhängende Request, sobald der Puffer voll ist.
+"""
+
+import atexit
+
+from django.conf import settings
+from django.utils import timezone
+
+from .buffers import BackgroundFlushBuffer
+
+
+class PasswordAttemptBuffer(BackgroundFlushBuffer):
+    """
+    Puffer für Passwortversuche mit Flush nach Größe oder Zeit
+    """
+
+    thread_name = 'password-audit-flush'
+    error_subject = 'des Passwort-Audit-Logs'
+
+    def __init__(self, max_size=None, flush_interval=None):
+        """
+        Initialisiert den Puffer
+
+        Args:
+            max_size: Einträge bis zum Flush (Standard: DEALROOM_AUDIT_BUFFER_SIZE)
+            flush_interval: Sekunden bis zum Flush (Standard: DEALROOM_AUDIT_FLUSH_INTERVAL)
+        """
+        super().__init__()
+        self._max_size = max_size
+        self._flush_interval = flush_interval
+        self._entries = []
+        self.flushed_count = 0
+
+    @property
+    def max_size(self):
+        return self._max_size if self._max_size is not None else settings.DEALROOM_AUDIT_BUFFER_SIZE
+
+    @property
+    def flush_interval(self):
+        return self._flush_interval if self._flush_interval is not None else settings.DEALROOM_AUDIT_FLUSH_INTERVAL
+
+    @property
+    def flush_wait(self):
+        return self.flush_interval
+
+    def append(self, deal_id, success, ip_address=None):
+        """
+        Hängt einen Versuch an (Hot Path, keine DB)
+
+        Args:
+            deal_id: ID des Dealrooms
+            success: True bei erfolgreichem Versuch
+            ip_address: IP-Adresse des Clients
+        """
+        entry = (deal_id, success, ip_address or '', timezone.now())
+        with self._lock:
+            self._entries.append(entry)
+            pending = len(self._entries)
+
+        self._request_flush(pending, self.max_size)
+
+    def pending(self) -> int:
+        """Gibt die Anzahl noch nicht geschriebener Einträge zurück"""
+        with self._lock:
+            return len(self._entries)
+
+    def flush(self) -> int:
+        """
+        Schreibt alle gepufferten Einträge per bulk_create
+
+        Schlägt das Schreiben fehl, werden Einträge inzwischen gelöschter
+        Dealrooms verworfen und der Rest erneut geschrieben. Scheitert auch
+        das (z.B. DB gesperrt), kommen die Einträge zurück in den Puffer.
+
+        Returns:
+            int: Anzahl geschriebener Einträge
+        """
+        from .models import Deal
+
+        with self._flush_lock:
+            with self._lock:
+                entries, self._entries = self._entries, []
+            if not entries:
+                return 0
+
+            try:
+                _write_attempts(entries)
+            except Exception:
+                try:
+                    existing = set(
+                        Deal.objects.filter(pk__in={entry[0] for entry in entries}).values_list('pk', flat=True)
+                    )
+                    entries = [entry for entry in entries if entry[0] in existing]
+                    _write_attempts(entries)
+                except Exception:
+                    with self._lock:
+                        self._entries[:0] = entries
+                    raise
+            self.flushed_count += len(entries)
+            return len(entries)
+
+
+def _write_attempts(entries):
+    """Schreibt Einträge als PasswordAttempt-Zeilen (ein INSERT pro 500)"""
+    from .models import PasswordAttempt
+
+    if entries:
+        PasswordAttempt.objects.bulk_create([
+            PasswordAttempt(deal_id=deal_id, success=success, ip_address=ip_address, timestamp=timestamp)
+            for deal_id, success, ip_address, timestamp in entries
+        ], batch_size=500)
+
+
+password_attempt_buffer = PasswordAttemptBuffer()
+
+
+def _flush_at_exit():
+    """Schreibt den Rest des Puffers beim Beenden des Prozesses"""
+    try:
+        password_attempt_buffer.flush()
+    except Exception as e:
+        print(f"❌ Passwort-Audit-Log konnte beim Beenden nicht geschrieben werden: {e}")
+
+
+atexit.register(_flush_at_exit)
+
+
+def log_password_attempt(deal_id, success, ip_address=None):
+    """
+    Protokolliert einen Passwortversuch im gepufferten Audit-Log
+
+    Args:
+        deal_id: ID des Dealrooms
+        success: True bei erfolgreichem Versuch
+        ip_address: IP-Adresse des Clients
+    """
+    password_attempt_buffer.append(deal_id, success, ip_address)
+
+
+def query_password_attempts(deal=None, ip_prefix=None, since=None, until=None, flush=True):
+    """
+    Fragt das Audit-Log nach Dealroom, IP-Bereich und Zeitfenster ab
+
+    Args:
+        deal: Dealroom-Objekt oder ID (optional)
+        ip_prefix: Anfang der IP-Adresse, z.B. '192.168.' (optional)
+        since: Beginn des Zeitfensters (optional)
+        until: Ende des Zeitfensters, exklusiv (optional)
+        flush: Vorher den Puffer dieses Prozesses schreiben
+
+    Returns:
+        QuerySet: Passwortversuche, neueste zuerst
+    """
+    from .models import PasswordAttempt
+
+    if flush:
+        password_attempt_buffer.flush()
+
+    queryset = PasswordAttempt.objects.in_window(since, until)
+    if deal is not None:
+        queryset = queryset.for_deal(deal)
+    if ip_prefix:
+        queryset = queryset.from_ip_prefix(ip_prefix)
+    return queryset
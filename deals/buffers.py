@@ -0,0 +1,101 @@
+"""
+Hintergrund-Flush für Schreibpuffer
+===================================
+
+Gemeinsame Basis von ``AnalyticsEventBuffer`` (``deals.analytics_buffer``)
+und ``PasswordAttemptBuffer`` (``deals.audit``). Ein Daemon-Thread pro
+Prozess ruft ``flush()`` auf, sobald der Puffer voll ist oder spätestens
+nach ``flush_wait`` Sekunden.
+
+Ist das Intervall 0, läuft kein Thread; dann schreibt der anhängende
+Request selbst, sobald der Puffer voll ist - aus einem Event-Loop heraus in
+einem kurzlebigen Thread, da Async-Views nicht synchron auf die DB
+zugreifen dürfen.
+"""
+
+import asyncio
+import threading
+import time
+from abc import ABC, abstractmethod
+
+from django.db import close_old_connections, connection
+
+
+class BackgroundFlushBuffer(ABC):
+    """
+    Basisklasse: Unterklassen implementieren ``flush()`` und ``flush_wait``
+    """
+
+    # Name des Flush-Threads und Objekt der Fehlermeldung
+    thread_name = 'buffer-flush'
+    error_subject = 'des Puffers'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    @property
+    @abstractmethod
+    def flush_wait(self):
+        """Sekunden bis zum Flush, 0 = kein Thread"""
+
+    @abstractmethod
+    def flush(self) -> int:
+        """Schreibt den Puffer und gibt die Anzahl geschriebener Einträge zurück"""
+
+    def _request_flush(self, pending, threshold):
+        """Stößt nach dem Anhängen einen Flush an, wenn ``pending`` die Schwelle erreicht"""
+        if self.flush_wait > 0:
+            if self._thread is None:
+                self._start_thread()
+            if pending >= threshold:
+                self._wakeup.set()
+        elif pending >= threshold:
+            if in_event_loop():
+                threading.Thread(target=self._flush_in_thread, daemon=True).start()
+            else:
+                self.flush()
+
+    def _report_error(self, error):
+        print(f"❌ Fehler beim Schreiben {self.error_subject}: {error}")
+
+    def _flush_in_thread(self):
+        """Einmaliger Flush außerhalb des Event-Loops"""
+        try:
+            self.flush()
+        except Exception as e:
+            self._report_error(e)
+        finally:
+            connection.close()
+
+    def _start_thread(self):
+        """Startet den Flush-Thread (einmal pro Prozess)"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name=self.thread_name)
+            self._thread.daemon = True
+            self._thread.start()
+
+    def _run(self):
+        """Flush-Schleife: wartet auf vollen Puffer oder Ablauf des Intervalls"""
+        while True:
+            self._wakeup.wait(timeout=self.flush_wait)
+            self._wakeup.clear()
+            try:
+                close_old_connections()
+                self.flush()
+            except Exception as e:
+                self._report_error(e)
+                time.sleep(1)
+
+
+def in_event_loop() -> bool:
+    """Prüft ob der aktuelle Thread einen laufenden Event-Loop hat"""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
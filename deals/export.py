@@ -0,0 +1,245 @@
+"""
+Export der Analytics-Rohdaten
+=============================
+
+Streamt die Events eines Dealrooms als CSV oder NDJSON - für den
+Download-Endpunkt (``astream_export``, asynchron für ASGI) und den Command
+``export_analytics``. Gelesen wird mit ``.iterator(chunk_size=...)`` und
+geschrieben in Blöcken von ``WRITE_BATCH_SIZE`` Zeilen; der Speicherbedarf
+hängt also nicht von der Anzahl der Events ab.
+
+Bereits archivierte Events (``deals.archive``) werden vor den Events aus
+der Datenbank ausgegeben, jeweils eine Archivdatei auf einmal.
+
+``sample_weight`` gibt an, für wie viele Events eine gesampelte Zeile steht
+(``deals.sampling``).
+"""
+
+import csv
+import io
+import json
+from datetime import date, timedelta
+
+from asgiref.sync import sync_to_async
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+
+EXPORT_FIELDS = (
+    'id', 'timestamp', 'event_type', 'element_id', 'position_x', 'position_y', 'time_spent',
+    'referrer', 'user_agent', 'visitor_ip', 'visitor_hash', 'session_id', 'meta', 'sample_weight',
+)
+
+READ_CHUNK_SIZE = 2000
+
+# Zeilen pro geschriebenem Block
+WRITE_BATCH_SIZE = 500
+
+
+class ExportError(ValueError):
+    """Ungültige Export-Parameter"""
+
+
+def parse_export_params(params):
+    """
+    Liest Format und Filter aus Request-Parametern
+
+    Args:
+        params: QueryDict mit ``format``, ``event_type`` (mehrfach oder
+            kommagetrennt), ``since`` und ``until`` (YYYY-MM-DD, inklusive)
+
+    Returns:
+        tuple: (Format, dict mit event_types, since, until)
+
+    Raises:
+        ExportError: Bei unbekanntem Format, Event-Typ oder Datum
+    """
+    export_format = params.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        raise ExportError(f'Unbekanntes Format: {export_format}')
+
+    event_types = [
+        event_type.strip()
+        for value in params.getlist('event_type')
+        for event_type in value.split(',')
+        if event_type.strip()
+    ]
+    return export_format, {
+        'event_types': validate_event_types(event_types),
+        'since': parse_export_date(params.get('since'), 'since'),
+        'until': parse_export_date(params.get('until'), 'until'),
+    }
+
+
+def validate_event_types(event_types):
+    """
+    Prüft die Event-Typen eines Filters
+
+    Returns:
+        list oder None: Event-Typen (None = alle)
+
+    Raises:
+        ExportError: Bei unbekanntem Event-Typ
+    """
+    from .models import DealAnalyticsEvent
+
+    known = {choice for choice, _ in DealAnalyticsEvent.EVENT_TYPE_CHOICES}
+    unknown = set(event_types or ()) - known
+    if unknown:
+        raise ExportError(f"Unbekannter Event-Typ: {', '.join(sorted(unknown))}")
+    return list(event_types) or None
+
+
+def parse_export_date(value, name):
+    """Liest ein Datum im Format YYYY-MM-DD (leer = None)"""
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise ExportError(f'{name} erwartet ein Datum im Format YYYY-MM-DD')
+
+
+def iter_events(deal_id, event_types=None, since=None, until=None, chunk_size=READ_CHUNK_SIZE):
+    """
+    Liefert die Events eines Dealrooms als Dicts mit ``EXPORT_FIELDS``
+
+    Archivierte Events zuerst, danach die Datenbank - jeweils nach ID.
+
+    Args:
+        deal_id: ID des Dealrooms
+        event_types: Liste von Event-Typen oder None für alle
+        since: Erster Tag (inklusive) oder None
+        until: Letzter Tag (inklusive) oder None
+        chunk_size: Zeilen pro Datenbank-Abruf
+
+    Yields:
+        dict: Feldwerte eines Events
+    """
+    from .interning import event_value_fields
+    from .models import AnalyticsArchive, DealAnalyticsEvent
+    from .rollups import get_day_start
+
+    archives = AnalyticsArchive.objects.all()
+    if since is not None:
+        archives = archives.filter(month__gte=since.replace(day=1))
+    if until is not None:
+        archives = archives.filter(month__lte=until)
+    if archives.exists():
+        # NumPy wird nur für archivierte Events benötigt
+        from .archive import iter_archived_events
+
+        for event in iter_archived_events(since=since, until=until, deal_id=deal_id):
+            if event_types is None or event['event_type'] in event_types:
+                yield {field: event[field] for field in EXPORT_FIELDS}
+
+    events = DealAnalyticsEvent.objects.filter(deal_id=deal_id)
+    if event_types is not None:
+        events = events.filter(event_type__in=event_types)
+    if since is not None:
+        events = events.filter(timestamp__gte=get_day_start(since))
+    if until is not None:
+        events = events.filter(timestamp__lt=get_day_start(until + timedelta(days=1)))
+
+    fields = event_value_fields(EXPORT_FIELDS)
+    for row in events.order_by('id').values_list(*fields).iterator(chunk_size=chunk_size):
+        yield dict(zip(EXPORT_FIELDS, row))
+
+
+def _to_text(value):
+    """Wandelt einen Feldwert in eine JSON-/CSV-taugliche Form"""
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, timedelta):
+        return value.total_seconds()
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+def stream_csv(events):
+    """
+    Serialisiert Events blockweise als CSV (mit Kopfzeile)
+
+    Args:
+        events: Iterable von Event-Dicts
+
+    Yields:
+        str: CSV-Text für bis zu ``WRITE_BATCH_SIZE`` Zeilen
+    """
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(EXPORT_FIELDS)
+    rows = 0
+    for event in events:
+        writer.writerow([
+            json.dumps(event['meta']) if field == 'meta' and event['meta'] is not None else _to_text(event[field])
+            for field in EXPORT_FIELDS
+        ])
+        rows += 1
+        if rows % WRITE_BATCH_SIZE == 0:
+            yield output.getvalue()
+            output.seek(0)
+            output.truncate()
+    if output.tell():
+        yield output.getvalue()
+
+
+def stream_ndjson(events):
+    """
+    Serialisiert Events blockweise als NDJSON (ein JSON-Objekt pro Zeile)
+
+    Args:
+        events: Iterable von Event-Dicts
+
+    Yields:
+        str: NDJSON-Text für bis zu ``WRITE_BATCH_SIZE`` Zeilen
+    """
+    lines = []
+    for event in events:
+        lines.append(json.dumps({field: _to_text(event[field]) for field in EXPORT_FIELDS}, ensure_ascii=False))
+        if len(lines) == WRITE_BATCH_SIZE:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+def stream_export(deal_id, export_format='csv', **filters):
+    """
+    Streamt den Export eines Dealrooms im gewünschten Format
+
+    Args:
+        deal_id: ID des Dealrooms
+        export_format: 'csv' oder 'ndjson'
+        **filters: event_types, since, until (siehe ``iter_events``)
+
+    Returns:
+        Iterator von Text-Blöcken
+    """
+    serializer = stream_csv if export_format == 'csv' else stream_ndjson
+    return serializer(iter_events(deal_id, **filters))
+
+
+async def astream_export(deal_id, export_format='csv', **filters):
+    """
+    Asynchrone Variante von ``stream_export`` für ``StreamingHttpResponse``
+
+    Unter ASGI liest Django einen synchronen Iterator vorab komplett in eine
+    Liste. Hier wird jeder Block einzeln per ``sync_to_async`` erzeugt (immer
+    im selben Thread, den der Datenbank-Cursor verlangt).
+
+    Yields:
+        str: Text-Blöcke wie ``stream_export``
+    """
+    blocks = stream_export(deal_id, export_format, **filters)
+    try:
+        while True:
+            block = await sync_to_async(next)(blocks, None)
+            if block is None:
+                break
+            yield block
+    finally:
+        await sync_to_async(blocks.close)()
@@ -0,0 +1,315 @@
+"""
+Funnel-Analyse über Sessions
+============================
+
+Berechnet für eine geordnete Liste von Schritten (z.B. ``page_view`` →
+``download`` → ``form_submit``), wie viele Sessions eines Dealrooms jeden
+Schritt erreichen. Ein Schritt ist ein Event-Typ, optional mit Element
+(``click:cta``). Gezählt wird streng geordnet: Schritt k muss nach Schritt
+k-1 derselben Session liegen und höchstens ``window`` Sekunden nach dem
+ersten Schritt.
+
+Ablauf:
+
+- Die Events werden per Cursor blockweise gelesen und in Spalten-Arrays
+  (Session-Code, Zeitstempel in µs, Schritt-Codes) gesammelt.
+- Ein einziges ``lexsort`` nach (Session, Zeit) ordnet alle Events.
+- Pro Schritt ein vektorisierter Durchlauf: erstes passendes Event je
+  Session nach der Position des vorherigen Schritts.
+
+Gesampelte Events (``deals.sampling``) zählen mit ihrem Gewicht. Sessions
+ohne ``session_id`` fallen auf den Besucher-Hash zurück. Ergebnisse
+werden pro Dealroom, Schritte und Zeitraum gecacht; abgeschlossene
+Zeiträume ändern sich nicht mehr und bleiben länger im Cache.
+
+Archivierte Events (``deals.archive``) liegen nicht mehr in der Datenbank.
+Der Zeitraum beginnt daher frühestens am Stichtag des Archivs; das Ergebnis
+meldet den Stichtag (``archived_before``), ein vollständig archivierter
+Zeitraum wird mit ``FunnelError`` abgelehnt.
+"""
+
+import hashlib
+import json
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.utils import timezone
+
+FUNNEL_CACHE_PREFIX = 'dealroom:funnel'
+
+DEFAULT_STEPS = ('page_view', 'download', 'form_submit')
+
+DEFAULT_WINDOW = 24 * 60 * 60
+
+MAX_STEPS = 10
+
+CHUNK_SIZE = 100000
+
+_NOT_REACHED = np.iinfo(np.int64).max
+
+_EPOCH = datetime(1970, 1, 1)
+
+_MICROSECOND = timedelta(microseconds=1)
+
+
+class FunnelError(ValueError):
+    """Ungültige Funnel-Definition"""
+
+
+def parse_steps(steps):
+    """
+    Prüft und zerlegt die Schritte eines Funnels
+
+    Args:
+        steps: Liste von Schritten (``event_type`` oder ``event_type:element_id``)
+
+    Returns:
+        list: (event_type, element_id oder None) je Schritt
+
+    Raises:
+        FunnelError: Bei zu wenigen/vielen Schritten oder unbekanntem Event-Typ
+    """
+    from .models import DealAnalyticsEvent
+
+    if not 2 <= len(steps) <= MAX_STEPS:
+        raise FunnelError(f'Ein Funnel braucht 2 bis {MAX_STEPS} Schritte')
+
+    known = {choice for choice, _ in DealAnalyticsEvent.EVENT_TYPE_CHOICES}
+    parsed = []
+    for step in steps:
+        event_type, _, element_id = step.partition(':')
+        if event_type not in known:
+            raise FunnelError(f'Unbekannter Event-Typ: {event_type}')
+        parsed.append((event_type, element_id or None))
+    return parsed
+
+
+def _to_microseconds(values):
+    """
+    Wandelt Zeitstempel aus dem Cursor in µs seit 1970 (UTC)
+
+    SQLite liefert naive UTC-Datetimes (bzw. ISO-Strings), andere Backends
+    aware Datetimes. Subtrahieren statt ``.timestamp()`` ist um ein
+    Vielfaches schneller und ignoriert die Zeitzone des Prozesses.
+    """
+    if not values:
+        return np.zeros(0, dtype=np.int64)
+    if isinstance(values[0], str):
+        return np.array(values, dtype='datetime64[us]').astype(np.int64)
+    epoch = _EPOCH if values[0].tzinfo is None else _EPOCH.replace(tzinfo=dt_timezone.utc)
+    return np.fromiter(((value - epoch) // _MICROSECOND for value in values), dtype=np.int64, count=len(values))
+
+
+def load_funnel_columns(deal_id, steps, since=None, until=None, chunk_size=CHUNK_SIZE):
+    """
+    Liest die für einen Funnel relevanten Events als Spalten-Arrays
+
+    Args:
+        deal_id: ID des Dealrooms
+        steps: Geparste Schritte (siehe ``parse_steps``)
+        since: Erster Tag (inklusive) oder None
+        until: Letzter Tag (inklusive) oder None
+        chunk_size: Zeilen pro Cursor-Abruf
+
+    Returns:
+        tuple: (Session-Codes, Zeitstempel in µs, Treffer-Matrix Schritte x Events, Gewichte)
+    """
+    from .models import DealAnalyticsEvent
+    from .rollups import get_day_start
+
+    events = DealAnalyticsEvent.objects.filter(
+        deal_id=deal_id, event_type__in={event_type for event_type, _ in steps}
+    )
+    if since is not None:
+        events = events.filter(timestamp__gte=get_day_start(since))
+    if until is not None:
+        events = events.filter(timestamp__lt=get_day_start(until + timedelta(days=1)))
+    sql, params = events.order_by().values_list(
+        'session_id', 'visitor_hash', 'timestamp', 'event_type', 'element_id', 'sample_weight'
+    ).query.sql_with_params()
+
+    session_index = {}
+    label_index = {}
+    sessions, timestamps, type_codes, element_codes, weights = [], [], [], [], []
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            session_ids, visitor_hashes, moments, event_types, element_ids, sample_weights = zip(*rows)
+            count = len(rows)
+            sessions.append(np.fromiter(
+                (session_index.setdefault(session_id or visitor_hash or None, len(session_index))
+                 for session_id, visitor_hash in zip(session_ids, visitor_hashes)),
+                dtype=np.int64, count=count
+            ))
+            timestamps.append(_to_microseconds(moments))
+            type_codes.append(np.fromiter(
+                (label_index.setdefault(value, len(label_index)) for value in event_types), dtype=np.int64, count=count
+            ))
+            element_codes.append(np.fromiter(
+                (label_index.setdefault(value, len(label_index)) for value in element_ids), dtype=np.int64, count=count
+            ))
+            weights.append(np.fromiter(sample_weights, dtype=np.int64, count=count))
+
+    if not sessions:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, np.zeros((len(steps), 0), dtype=bool), empty
+
+    sessions = np.concatenate(sessions)
+    timestamps = np.concatenate(timestamps)
+    type_codes = np.concatenate(type_codes)
+    element_codes = np.concatenate(element_codes)
+    weights = np.concatenate(weights)
+
+    matches = np.zeros((len(steps), len(sessions)), dtype=bool)
+    for position, (event_type, element_id) in enumerate(steps):
+        matches[position] = type_codes == label_index.get(event_type, -1)
+        if element_id is not None:
+            matches[position] &= element_codes == label_index.get(element_id, -1)
+
+    # Events ohne Session und Besucher-Hash lassen sich keinem Ablauf zuordnen
+    anonymous = session_index.get(None)
+    if anonymous is not None:
+        keep = sessions != anonymous
+        sessions, timestamps, matches, weights = sessions[keep], timestamps[keep], matches[:, keep], weights[keep]
+    return sessions, timestamps, matches, weights
+
+
+def compute_funnel(sessions, timestamps, matches, weights=None, window=DEFAULT_WINDOW):
+    """
+    Berechnet die Funnel-Schritte aus Spalten-Arrays
+
+    Args:
+        sessions: Session-Code je Event
+        timestamps: Zeitstempel je Event in µs
+        matches: bool-Matrix (Schritte x Events), ob ein Event einen Schritt erfüllt
+        weights: Sampling-Gewicht je Event oder None (alle 1); eine Session
+            zählt mit dem Gewicht des Events, das den Schritt erfüllt
+        window: Maximale Dauer ab dem ersten Schritt in Sekunden
+
+    Returns:
+        list: je Schritt Anzahl Sessions und Median-Dauer seit dem vorherigen Schritt
+    """
+    steps = matches.shape[0]
+    if not len(sessions):
+        return [{'sessions': 0, 'median_seconds': None} for _ in range(steps)]
+
+    if weights is None:
+        weights = np.ones(len(sessions), dtype=np.int64)
+    order = np.lexsort((timestamps, sessions))
+    sessions, timestamps, matches, weights = sessions[order], timestamps[order], matches[:, order], weights[order]
+    session_count = int(sessions.max()) + 1
+    positions = np.arange(len(sessions), dtype=np.int64)
+
+    # Position und Zeit des zuletzt erreichten Schritts je Session
+    reached_position = np.full(session_count, -1, dtype=np.int64)
+    reached_time = np.zeros(session_count, dtype=np.int64)
+    deadline = np.full(session_count, _NOT_REACHED, dtype=np.int64)
+
+    results = []
+    for step in range(steps):
+        candidates = matches[step]
+        if step:
+            candidates = (
+                candidates
+                & (positions > reached_position[sessions])
+                & (timestamps <= deadline[sessions])
+            )
+        hit_sessions, first = np.unique(sessions[candidates], return_index=True)
+        hit_positions = positions[candidates][first]
+        hit_times = timestamps[candidates][first]
+        hit_weights = weights[candidates][first]
+
+        median_seconds = None
+        if step and len(hit_sessions):
+            median_seconds = float(np.median(hit_times - reached_time[hit_sessions])) / 1_000_000
+        reached = int(hit_weights.sum())
+        if step:
+            # Hochgerechnete Schritte können den vorherigen nicht übersteigen
+            reached = min(reached, results[-1]['sessions'])
+        results.append({'sessions': reached, 'median_seconds': median_seconds})
+
+        # Sessions ohne diesen Schritt scheiden aus
+        reached_position[:] = _NOT_REACHED
+        reached_position[hit_sessions] = hit_positions
+        if step == 0:
+            deadline[hit_sessions] = hit_times + int(window * 1_000_000)
+        reached_time[hit_sessions] = hit_times
+    return results
+
+
+def _get_cache_key(deal_id, steps, window, since, until):
+    """Gibt den Cache-Key eines Funnels zurück"""
+    definition = json.dumps([steps, window, str(since), str(until)])
+    return f'{FUNNEL_CACHE_PREFIX}:{deal_id}:{hashlib.md5(definition.encode()).hexdigest()}'
+
+
+def get_funnel(deal, steps=DEFAULT_STEPS, window=DEFAULT_WINDOW, since=None, until=None):
+    """
+    Gibt die Conversion eines Funnels zurück (gecacht)
+
+    Args:
+        deal: Dealroom-Objekt oder ID
+        steps: Schritte (``event_type`` oder ``event_type:element_id``)
+        window: Maximale Dauer ab dem ersten Schritt in Sekunden
+        since: Erster Tag (inklusive) oder None
+        until: Letzter Tag (inklusive) oder None
+
+    Returns:
+        dict: Schritte mit Sessions, Conversion zum vorherigen und ersten
+        Schritt; ``since`` ist auf den Stichtag des Archivs gekürzt
+
+    Raises:
+        FunnelError: Bei ungültiger Definition oder vollständig archiviertem Zeitraum
+    """
+    from django.db.models import Max
+    from .models import AnalyticsArchive
+
+    deal_id = getattr(deal, 'pk', deal)
+    steps = list(steps)
+    parsed = parse_steps(steps)
+    if window <= 0:
+        raise FunnelError('Das Zeitfenster muss positiv sein')
+
+    # Gecachte Ergebnisse bleiben gültig: sie stammen aus der Zeit vor dem Archivieren
+    cache_key = _get_cache_key(deal_id, steps, window, since, until)
+    funnel = cache.get(cache_key)
+    if funnel is not None:
+        return funnel
+
+    # Archivierte Tage würden als 0 Sessions zählen
+    archived_before = AnalyticsArchive.objects.aggregate(day=Max('archived_before'))['day']
+    if archived_before is not None:
+        if until is not None and until < archived_before:
+            raise FunnelError(f'Events vor dem {archived_before.isoformat()} sind archiviert')
+        if since is None or since < archived_before:
+            since = archived_before
+
+    results = compute_funnel(*load_funnel_columns(deal_id, parsed, since, until), window=window)
+    started = results[0]['sessions']
+    for position, (step, result) in enumerate(zip(steps, results)):
+        previous = results[position - 1]['sessions'] if position else started
+        result['step'] = step
+        result['rate_from_previous'] = round(result['sessions'] / previous * 100, 1) if previous else 0
+        result['rate_from_start'] = round(result['sessions'] / started * 100, 1) if started else 0
+
+    funnel = {
+        'steps': results,
+        'window': window,
+        'since': since.isoformat() if since else None,
+        'until': until.isoformat() if until else None,
+        'archived_before': archived_before.isoformat() if archived_before else None,
+        'conversion_rate': results[-1]['rate_from_start'],
+    }
+
+    # Abgeschlossene Zeiträume ändern sich nur noch durch verspätete Events
+    closed = until is not None and until < timezone.localdate()
+    timeout = settings.DEALROOM_FUNNEL_CACHE_TIMEOUT * (12 if closed else 1)
+    cache.set(cache_key, funnel, timeout)
+    return funnel
@@ -0,0 +1,345 @@
+"""
+Klick-Heatmaps
+==============
+
+Bildet die Klick-Koordinaten (``position_x``/``position_y``, Seitenpixel)
+pro Dealroom, Viewport-Klasse und Element auf feste Raster ab. Die Events
+werden per Cursor in Blöcken gelesen und als 2-D-Histogramm gezählt. Da
+alle Bins gleich breit sind, genügt statt ``numpy.histogram2d`` (binäre
+Suche pro Wert) ein ``numpy.bincount`` über den Zellindex - ein Durchlauf
+für Seite und alle Elemente zusammen, ca. 0,2 s pro Million Klicks.
+
+Die Raster sind additiv: ``update_heatmaps`` liest nur Klicks oberhalb von
+``DealHeatmap.last_event_id`` und addiert sie auf die gespeicherten Werte.
+Kommt ein Element erst später unter die ``MAX_ELEMENTS`` häufigsten, wird
+sein neues Raster aus den bereits verarbeiteten Klicks nachgefüllt (aus der
+Datenbank und den Archiven), damit es dieselbe Zeitspanne zeigt wie die
+Seite. Aktualisierungen eines Dealrooms laufen nacheinander (Sperre auf dem
+Deal; unter SQLite fängt ein zweiter Versuch das parallele Anlegen ab).
+Gespeichert wird ein zlib-komprimiertes uint32-Raster (Zeilen x Spalten),
+leere Zeilen am Seitenende werden abgeschnitten. Gesampelte Klicks
+(``deals.sampling``) zählen mit ihrem Gewicht.
+"""
+
+import json
+import zlib
+
+import numpy as np
+from django.db import IntegrityError, connection, transaction
+
+# Viewport-Klassen der generierten Seiten und ihre maximale Breite in px
+VIEWPORT_WIDTHS = {
+    'mobile': 768,
+    'tablet': 1200,
+    'desktop': 2560,
+}
+
+X_BINS = 48
+BIN_HEIGHT = 50
+MAX_PAGE_HEIGHT = 20000
+
+# Elemente mit eigener Heatmap pro Dealroom und Viewport (die Seite zählt alle)
+MAX_ELEMENTS = 50
+
+CHUNK_SIZE = 100000
+
+PAGE = ''
+
+
+def _grid_shape():
+    """Gibt die Form des vollen Rasters (Zeilen, Spalten) zurück"""
+    return MAX_PAGE_HEIGHT // BIN_HEIGHT, X_BINS
+
+
+def _bin_width(viewport):
+    """Gibt die Spaltenbreite eines Viewports in px zurück"""
+    return VIEWPORT_WIDTHS[viewport] / X_BINS
+
+
+def decode_counts(heatmap):
+    """
+    Liest das Raster einer Heatmap
+
+    Args:
+        heatmap: DealHeatmap-Objekt
+
+    Returns:
+        numpy.ndarray: uint32-Raster der Form (y_bins, x_bins)
+    """
+    if not heatmap.y_bins:
+        return np.zeros((0, heatmap.x_bins), dtype=np.uint32)
+    data = zlib.decompress(bytes(heatmap.counts))
+    return np.frombuffer(data, dtype='<u4').reshape(heatmap.y_bins, heatmap.x_bins)
+
+
+def encode_counts(grid):
+    """
+    Serialisiert ein Raster kompakt
+
+    Args:
+        grid: uint32-Raster der Form (Zeilen, Spalten)
+
+    Returns:
+        tuple: (komprimierte Bytes, Anzahl gespeicherter Zeilen)
+    """
+    filled_rows = np.flatnonzero(grid.any(axis=1))
+    rows = int(filled_rows[-1]) + 1 if filled_rows.size else 0
+    return zlib.compress(np.ascontiguousarray(grid[:rows], dtype='<u4').tobytes()), rows
+
+
+def _iter_click_chunks(deal_id, viewport, after_id, chunk_size, element_codes, element_id=None, until_id=None):
+    """
+    Liest neue Klicks eines Viewports blockweise als Arrays
+
+    Args:
+        element_codes: dict Element-ID -> fortlaufender Code, wird ergänzt
+        element_id: Nur Klicks dieses Elements (optional)
+        until_id: Nur Klicks bis zu dieser ID (optional)
+
+    Yields:
+        tuple: (ids, x, y, element_codes, Gewichte) als numpy-Arrays
+    """
+    from .models import DealAnalyticsEvent
+
+    queryset = DealAnalyticsEvent.objects.filter(
+        deal_id=deal_id,
+        event_type='click',
+        id__gt=after_id,
+        position_x__isnull=False,
+        position_y__isnull=False,
+        meta__viewport=viewport,
+    )
+    if element_id is not None:
+        queryset = queryset.filter(element_id=element_id)
+    if until_id is not None:
+        queryset = queryset.filter(id__lte=until_id)
+    queryset = queryset.order_by().values_list('id', 'position_x', 'position_y', 'element_id', 'sample_weight')
+    sql, params = queryset.query.sql_with_params()
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            ids, xs, ys, elements, weights = zip(*rows)
+            count = len(ids)
+            yield (
+                np.fromiter(ids, dtype=np.int64, count=count),
+                np.fromiter(xs, dtype=np.float64, count=count),
+                np.fromiter(ys, dtype=np.float64, count=count),
+                np.fromiter(
+                    (element_codes.setdefault(element or PAGE, len(element_codes)) for element in elements),
+                    dtype=np.int64, count=count
+                ),
+                np.fromiter(weights, dtype=np.float64, count=count),
+            )
+
+
+def _cell_index(xs, ys, viewport):
+    """
+    Berechnet den Zellindex (Zeile * Spalten + Spalte) jedes Klicks
+
+    Koordinaten außerhalb des Rasters landen in der Randzelle.
+    """
+    rows, columns = _grid_shape()
+    row = np.clip(ys // BIN_HEIGHT, 0, rows - 1).astype(np.int64)
+    column = np.clip(xs // _bin_width(viewport), 0, columns - 1).astype(np.int64)
+    return row * columns + column
+
+
+def _iter_archived_clicks(deal_id, viewport, element_id, until_id):
+    """
+    Liest archivierte Klicks eines Elements (ein Block pro Aufruf)
+
+    Yields:
+        tuple: (x, y, Gewichte) als numpy-Arrays
+    """
+    from .archive import iter_archived_events
+    from .models import AnalyticsArchive
+
+    if not AnalyticsArchive.objects.exists():
+        return
+    xs, ys, weights = [], [], []
+    for event in iter_archived_events(deal_id=deal_id):
+        if (
+            event['event_type'] != 'click'
+            or event['id'] > until_id
+            or (event['element_id'] or PAGE) != element_id
+            or event['position_x'] is None
+            or event['position_y'] is None
+        ):
+            continue
+        try:
+            meta = json.loads(event['meta'] or '{}')
+        except ValueError:
+            continue
+        if isinstance(meta, dict) and meta.get('viewport') == viewport:
+            xs.append(event['position_x'])
+            ys.append(event['position_y'])
+            weights.append(event['sample_weight'])
+    if xs:
+        yield np.array(xs, dtype=np.float64), np.array(ys, dtype=np.float64), np.array(weights, dtype=np.float64)
+
+
+def _backfill_grid(grid, deal_id, viewport, element_id, until_id, chunk_size):
+    """Addiert die bis ``until_id`` bereits verarbeiteten Klicks eines Elements auf sein neues Raster"""
+    shape = grid.shape
+    cells = shape[0] * shape[1]
+    chunks = (
+        (xs, ys, weights)
+        for _, xs, ys, _, weights in _iter_click_chunks(
+            deal_id, viewport, 0, chunk_size, {}, element_id=element_id, until_id=until_id
+        )
+    )
+    for source in (_iter_archived_clicks(deal_id, viewport, element_id, until_id), chunks):
+        for xs, ys, weights in source:
+            cell = _cell_index(xs, ys, viewport)
+            grid += np.bincount(cell, weights=weights, minlength=cells).reshape(shape).astype(np.uint32)
+
+
+def update_heatmaps(deal, chunk_size=CHUNK_SIZE):
+    """
+    Addiert neue Klicks eines Dealrooms auf seine Heatmaps
+
+    Args:
+        deal: Dealroom-Objekt oder ID
+        chunk_size: Klicks pro gelesenem Block
+
+    Returns:
+        int: Anzahl neu verarbeiteter Klicks
+    """
+    deal_id = getattr(deal, 'pk', deal)
+    try:
+        return _update_heatmaps(deal_id, chunk_size)
+    except IntegrityError:
+        # Ein paralleler Aufruf hat die Heatmaps angelegt (SQLite sperrt
+        # keine Zeilen): auf dessen Stand aufsetzen
+        return _update_heatmaps(deal_id, chunk_size)
+
+
+def _update_heatmaps(deal_id, chunk_size):
+    """Sperrt den Dealroom und rechnet seine neuen Klicks ein"""
+    from .models import Deal
+
+    with transaction.atomic():
+        # Aktualisierungen desselben Dealrooms nacheinander ausführen
+        list(Deal.objects.select_for_update().filter(pk=deal_id).values_list('pk', flat=True))
+        return _merge_new_clicks(deal_id, chunk_size)
+
+
+def _merge_new_clicks(deal_id, chunk_size):
+    """Liest die gespeicherten Raster, addiert neue Klicks und speichert sie"""
+    from .models import DealHeatmap
+
+    shape = _grid_shape()
+    cells = shape[0] * shape[1]
+    existing = {
+        (heatmap.viewport, heatmap.element_id): heatmap
+        for heatmap in DealHeatmap.objects.filter(deal_id=deal_id)
+    }
+
+    processed = 0
+    changed = []
+    for viewport in VIEWPORT_WIDTHS:
+        page = existing.get((viewport, PAGE))
+        after_id = page.last_event_id if page else 0
+
+        # Raster der Seite und aller Elemente mit eigener Heatmap
+        grids = {}
+        for (heatmap_viewport, element_id), heatmap in existing.items():
+            if heatmap_viewport == viewport:
+                grid = np.zeros(shape, dtype=np.uint32)
+                stored = decode_counts(heatmap)
+                grid[:stored.shape[0]] = stored
+                grids[element_id] = grid
+        grids.setdefault(PAGE, np.zeros(shape, dtype=np.uint32))
+
+        element_codes = {}
+        last_id = after_id
+        viewport_clicks = 0
+        for ids, xs, ys, codes, weights in _iter_click_chunks(
+            deal_id, viewport, after_id, chunk_size, element_codes
+        ):
+            last_id = max(last_id, int(ids.max()))
+            viewport_clicks += len(ids)
+            cell = _cell_index(xs, ys, viewport)
+
+            grids[PAGE] += np.bincount(cell, weights=weights, minlength=cells).reshape(shape).astype(np.uint32)
+
+            # Neue Elemente nach Häufigkeit aufnehmen, bis das Limit erreicht ist
+            names = list(element_codes)
+            for code in np.argsort(-np.bincount(codes, weights=weights, minlength=len(names))):
+                name = names[code]
+                if name != PAGE and name not in grids and len(grids) <= MAX_ELEMENTS:
+                    grids[name] = np.zeros(shape, dtype=np.uint32)
+
+            tracked = [(code, name) for code, name in enumerate(names) if name != PAGE and name in grids]
+            if not tracked:
+                continue
+            # Codes auf 0..n-1 der verfolgten Elemente abbilden, alle übrigen verwerfen
+            compact = np.full(len(names), -1, dtype=np.int64)
+            for position, (code, _) in enumerate(tracked):
+                compact[code] = position
+            element_index = compact[codes]
+            keep = element_index >= 0
+            per_element = np.bincount(
+                element_index[keep] * cells + cell[keep], weights=weights[keep], minlength=len(tracked) * cells
+            ).reshape(len(tracked), *shape)
+            for position, (_, name) in enumerate(tracked):
+                grids[name] += per_element[position].astype(np.uint32)
+
+        if not viewport_clicks:
+            continue
+        processed += viewport_clicks
+
+        if after_id:
+            for element_id, grid in grids.items():
+                if element_id != PAGE and (viewport, element_id) not in existing:
+                    _backfill_grid(grid, deal_id, viewport, element_id, after_id, chunk_size)
+
+        for element_id, grid in grids.items():
+            counts, rows = encode_counts(grid)
+            heatmap = existing.get((viewport, element_id)) or DealHeatmap(
+                deal_id=deal_id, viewport=viewport, element_id=element_id
+            )
+            heatmap.x_bins = shape[1]
+            heatmap.y_bins = rows
+            heatmap.bin_width = _bin_width(viewport)
+            heatmap.bin_height = float(BIN_HEIGHT)
+            heatmap.counts = counts
+            heatmap.total_clicks = int(grid.sum())
+            heatmap.last_event_id = last_id
+            changed.append(heatmap)
+
+    for heatmap in changed:
+        heatmap.save()
+    return processed
+
+
+def heatmap_to_dict(heatmap):
+    """
+    Bereitet eine Heatmap als JSON für ein Overlay auf
+
+    Zellen werden dünn als ``[zeile, spalte, anzahl]`` geliefert.
+
+    Args:
+        heatmap: DealHeatmap-Objekt
+
+    Returns:
+        dict: Raster-Geometrie, Summen und belegte Zellen
+    """
+    grid = decode_counts(heatmap)
+    rows, columns = np.nonzero(grid)
+    return {
+        'viewport': heatmap.viewport,
+        'element_id': heatmap.element_id or None,
+        'viewport_width': VIEWPORT_WIDTHS.get(heatmap.viewport),
+        'bin_width': heatmap.bin_width,
+        'bin_height': heatmap.bin_height,
+        'columns': heatmap.x_bins,
+        'rows': heatmap.y_bins,
+        'total': heatmap.total_clicks,
+        'max': int(grid.max()) if grid.size else 0,
+        'cells': np.column_stack((rows, columns, grid[rows, columns])).tolist(),
+    }
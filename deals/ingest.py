@@ -0,0 +1,230 @@
+"""
+Ingest von Analytics-Events aus generierten Landingpages
+========================================================
+
+Die generierten Seiten sammeln Events im Browser und schicken sie gebündelt
+per ``navigator.sendBeacon`` an ``deals:analytics_collect`` - typischerweise
+ein Request pro Seitenbesuch beim Verlassen der Seite.
+
+Die Validierung ist bewusst billig (Größenlimit, ein ``json.loads``,
+Whitelist der Event-Typen, Kürzen/Klemmen der Felder); ungültige Events
+werden verworfen statt den ganzen Batch abzulehnen. IP-Anonymisierung
+passiert einmal pro Batch; geschrieben wird gesammelt über den
+Schreibpuffer des Workers (``deals.analytics_buffer``). Klicks und
+Scroll-Events sehr aktiver Dealrooms werden adaptiv gesampelt
+(``deals.sampling``).
+"""
+
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.crypto import salted_hmac
+
+from .sampling import event_sampler
+
+# Event-Typen, die von öffentlichen Seiten gemeldet werden dürfen
+INGEST_EVENT_TYPES = frozenset({
+    'page_view', 'click', 'scroll', 'download', 'form_submit', 'time_spent', 'bounce',
+})
+
+MAX_ELEMENT_ID_LENGTH = 100
+MAX_SESSION_ID_LENGTH = 50
+MAX_REFERRER_LENGTH = 200
+MAX_USER_AGENT_LENGTH = 500
+MAX_POSITION = 100000
+# Obergrenze für gemeldete Verweildauer (ein Tag)
+MAX_TIME_SPENT_MS = 24 * 60 * 60 * 1000
+
+
+class BeaconError(ValueError):
+    """Der Beacon-Body ist als Ganzes ungültig"""
+
+
+def anonymize_ip_address(ip_address):
+    """
+    Anonymisiert eine IP-Adresse für DSGVO-Compliance
+
+    IPv4 wird auf die ersten beiden Oktette gekürzt (wie
+    ``DealAnalyticsEvent.anonymize_ip``), andere Adressen bleiben unverändert.
+
+    Args:
+        ip_address: IP-Adresse oder None
+
+    Returns:
+        str oder None: Anonymisierte Adresse
+    """
+    if ip_address:
+        ip_parts = str(ip_address).split('.')
+        if len(ip_parts) == 4:
+            return f"{ip_parts[0]}.{ip_parts[1]}.*.*"
+    return ip_address
+
+
+def get_visitor_hash(ip_address, user_agent):
+    """
+    Gibt einen gesalzenen, pseudonymen Besucher-Identifikator zurück
+
+    HMAC aus vollständiger IP und User-Agent mit
+    ``DEALROOM_VISITOR_SALT`` (Standard: SECRET_KEY). Der Hash ist über Tage
+    und Dealrooms stabil, damit die HyperLogLog-Sketches eindeutige Besucher
+    über beliebige Zeiträume vereinigen können; die IP selbst wird nur
+    anonymisiert gespeichert.
+
+    Args:
+        ip_address: IP-Adresse des Clients
+        user_agent: User-Agent-Header
+
+    Returns:
+        str: 16 Hex-Zeichen oder '' ohne IP
+    """
+    if not ip_address:
+        return ''
+    secret = settings.DEALROOM_VISITOR_SALT or settings.SECRET_KEY
+    return salted_hmac('deals.visitor-id', f'{ip_address}|{user_agent}', secret=secret).hexdigest()[:16]
+
+
+def parse_beacon(body):
+    """
+    Liest einen Beacon-Body
+
+    Erwartet ``{"session": "...", "referrer": "...", "events": [...]}``
+    oder direkt eine Liste von Events.
+
+    Args:
+        body: Request-Body (bytes)
+
+    Returns:
+        tuple: (Kopfdaten als dict, Liste roher Events)
+
+    Raises:
+        BeaconError: Body zu groß, kein JSON oder falsche Struktur
+    """
+    if len(body) > settings.DEALROOM_ANALYTICS_MAX_BEACON_BYTES:
+        raise BeaconError('Beacon zu groß')
+    try:
+        payload = json.loads(body)
+    except (UnicodeDecodeError, ValueError):
+        raise BeaconError('Kein gültiges JSON')
+
+    if isinstance(payload, list):
+        payload = {'events': payload}
+    if not isinstance(payload, dict) or not isinstance(payload.get('events'), list):
+        raise BeaconError('Keine Event-Liste')
+
+    events = payload['events']
+    if len(events) > settings.DEALROOM_ANALYTICS_MAX_BATCH_EVENTS:
+        raise BeaconError('Zu viele Events im Batch')
+    return payload, events
+
+
+def _clean_str(value, max_length):
+    """Gibt einen gekürzten String zurück oder None"""
+    if isinstance(value, str) and value:
+        return value[:max_length]
+    return None
+
+
+def _clean_int(value, limit):
+    """Gibt eine auf [0, limit] geklemmte Ganzzahl zurück oder None"""
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    return max(0, min(int(value), limit))
+
+
+def clean_event(raw, defaults):
+    """
+    Validiert ein einzelnes Event
+
+    Args:
+        raw: Rohes Event aus dem Beacon
+        defaults: Kopfdaten des Batches (session, referrer, consent)
+
+    Returns:
+        dict oder None: Felder für DealAnalyticsEvent, None wenn ungültig
+    """
+    if not isinstance(raw, dict):
+        return None
+    event_type = raw.get('type')
+    if event_type not in INGEST_EVENT_TYPES:
+        return None
+
+    fields = {
+        'event_type': event_type,
+        'element_id': _clean_str(raw.get('element'), MAX_ELEMENT_ID_LENGTH),
+        'position_x': _clean_int(raw.get('x'), MAX_POSITION),
+        'position_y': _clean_int(raw.get('y'), MAX_POSITION),
+        'session_id': _clean_str(raw.get('session') or defaults.get('session'), MAX_SESSION_ID_LENGTH),
+    }
+
+    if event_type == 'time_spent':
+        duration_ms = _clean_int(raw.get('ms'), MAX_TIME_SPENT_MS)
+        if duration_ms is None:
+            return None
+        fields['time_spent'] = timedelta(milliseconds=duration_ms)
+
+    meta = {}
+    depth = _clean_int(raw.get('depth'), 100)
+    if depth is not None:
+        meta['depth'] = depth
+    viewport = _clean_str(raw.get('viewport'), 20)
+    if viewport:
+        meta['viewport'] = viewport
+    if meta:
+        fields['meta'] = meta
+    return fields
+
+
+def build_events(deal_id, raw_events, defaults=None, ip_address=None, user_agent='', sampler=None):
+    """
+    Baut ungespeicherte DealAnalyticsEvent-Objekte für einen Batch
+
+    Besucher-Hash, Anonymisierung, Referrer und User-Agent werden einmal pro
+    Batch berechnet und für alle Events übernommen.
+
+    Args:
+        deal_id: ID des Dealrooms
+        raw_events: Rohe Events aus dem Beacon
+        defaults: Kopfdaten des Batches
+        ip_address: IP-Adresse des Clients
+        user_agent: User-Agent-Header
+        sampler: AdaptiveSampler (Standard: der des Workers)
+
+    Returns:
+        list: DealAnalyticsEvent-Objekte (gültige, nicht weggesampelte Events)
+    """
+    from .models import DealAnalyticsEvent
+
+    defaults = defaults or {}
+    visitor_hash = get_visitor_hash(ip_address, user_agent or '')
+    visitor_ip = anonymize_ip_address(ip_address)
+    referrer = _clean_str(defaults.get('referrer'), MAX_REFERRER_LENGTH)
+    if referrer and not referrer.startswith(('http://', 'https://')):
+        referrer = None
+    user_agent = (user_agent or '')[:MAX_USER_AGENT_LENGTH]
+    consent_given = defaults.get('consent') is True
+    timestamp = timezone.now()
+    sampler = sampler or event_sampler
+
+    events = []
+    for raw in raw_events:
+        fields = clean_event(raw, defaults)
+        if fields is None:
+            continue
+        weight = sampler.sample(deal_id, fields['event_type'])
+        if not weight:
+            continue
+        events.append(DealAnalyticsEvent(
+            deal_id=deal_id,
+            timestamp=timestamp,
+            visitor_ip=visitor_ip,
+            visitor_hash=visitor_hash,
+            referrer=referrer,
+            user_agent=user_agent,
+            consent_given=consent_given,
+            anonymized=True,
+            sample_weight=weight,
+            **fields
+        ))
+    return events
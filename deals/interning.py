@@ -0,0 +1,199 @@
+"""
+Dictionary-Tabellen für User-Agents und Referrer
+================================================
+
+User-Agent-Strings und Referrer wiederholen sich auf fast jeder Zeile von
+``DealAnalyticsEvent`` und machen den Großteil ihrer Größe aus. Die Events
+speichern deshalb nur Fremdschlüssel auf ``AnalyticsUserAgent`` (mit
+Geräteklasse) und ``AnalyticsReferrer`` (nur der Host).
+
+Aufgelöst wird beim Schreiben (``bulk_create`` bzw. ``save``), nicht im
+Collect-Endpunkt: Ein LRU-Cache pro Prozess bildet häufige Werte direkt auf
+IDs ab. Fehlende Werte werden je Batch mit einer Abfrage gesucht und per
+``bulk_create(ignore_conflicts=True)`` angelegt. Der Cache übernimmt IDs
+erst nach dem Commit, damit ein Rollback keine ungültigen IDs hinterlässt.
+"""
+
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from urllib.parse import urlsplit
+
+from django.db import transaction
+
+CACHE_SIZE = 4096
+
+# Länge von AnalyticsUserAgent.value
+MAX_USER_AGENT_LENGTH = 500
+
+# Werte pro IN-Abfrage (SQLite begrenzt die Anzahl der Parameter)
+_LOOKUP_BATCH_SIZE = 500
+
+# Frühere Textfelder der Events -> Lookup über die Dictionary-Tabellen
+EVENT_STRING_LOOKUPS = {
+    'user_agent': 'user_agent_entry__value',
+    'referrer': 'referrer_entry__host',
+}
+
+_BOT_MARKERS = ('bot', 'crawler', 'spider', 'slurp', 'headless', 'curl/', 'wget/', 'python-requests')
+
+
+class _LRUCache:
+    """Threadsicherer LRU-Cache Wert -> ID"""
+
+    def __init__(self, size=CACHE_SIZE):
+        self._size = size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, values):
+        """Gibt die bekannten IDs zu den Werten zurück"""
+        found = {}
+        with self._lock:
+            for value in values:
+                entry_id = self._entries.get(value)
+                if entry_id is not None:
+                    self._entries.move_to_end(value)
+                    found[value] = entry_id
+        return found
+
+    def set_many(self, mapping):
+        with self._lock:
+            for value, entry_id in mapping.items():
+                self._entries[value] = entry_id
+                self._entries.move_to_end(value)
+            while len(self._entries) > self._size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_user_agent_ids = _LRUCache()
+_referrer_ids = _LRUCache()
+
+
+def clear_intern_cache() -> None:
+    """Leert die LRU-Caches (z.B. in Tests nach einem Rollback)"""
+    _user_agent_ids.clear()
+    _referrer_ids.clear()
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def parse_device_class(user_agent):
+    """
+    Leitet die Geräteklasse aus einem User-Agent ab (gecacht)
+
+    Args:
+        user_agent: User-Agent-String
+
+    Returns:
+        str: 'bot', 'tablet', 'mobile', 'desktop' oder 'unknown'
+    """
+    agent = (user_agent or '').lower()
+    if not agent:
+        return 'unknown'
+    if any(marker in agent for marker in _BOT_MARKERS):
+        return 'bot'
+    if 'ipad' in agent or 'tablet' in agent or ('android' in agent and 'mobile' not in agent):
+        return 'tablet'
+    if 'mobi' in agent or 'iphone' in agent or 'ipod' in agent or 'windows phone' in agent:
+        return 'mobile'
+    return 'desktop'
+
+
+def referrer_host(referrer):
+    """
+    Gibt den Host eines Referrers zurück (klein geschrieben, ohne Port)
+
+    Args:
+        referrer: URL oder None
+
+    Returns:
+        str oder None: Host
+    """
+    if not referrer:
+        return None
+    try:
+        host = urlsplit(referrer).hostname
+    except ValueError:
+        return None
+    return host[:255] if host else None
+
+
+def _resolve(model, field, values, cache, defaults=None):
+    """
+    Bildet Werte auf IDs einer Dictionary-Tabelle ab und legt fehlende an
+
+    Args:
+        model: AnalyticsUserAgent oder AnalyticsReferrer
+        field: Feld mit dem Wert ('value' bzw. 'host')
+        values: Menge von Werten
+        cache: LRU-Cache der Tabelle
+        defaults: Funktion Wert -> weitere Felder neuer Einträge
+
+    Returns:
+        dict: Wert -> ID
+    """
+    ids = cache.get_many(values)
+    missing = sorted(set(values) - set(ids))
+    if not missing:
+        return ids
+
+    def lookup(candidates):
+        found = {}
+        for offset in range(0, len(candidates), _LOOKUP_BATCH_SIZE):
+            batch = candidates[offset:offset + _LOOKUP_BATCH_SIZE]
+            found.update(model.objects.filter(**{f'{field}__in': batch}).values_list(field, 'id'))
+        return found
+
+    found = lookup(missing)
+    new_values = [value for value in missing if value not in found]
+    if new_values:
+        # ignore_conflicts: ein anderer Worker kann denselben Wert gleichzeitig anlegen
+        model.objects.bulk_create(
+            [model(**{field: value}, **(defaults(value) if defaults else {})) for value in new_values],
+            ignore_conflicts=True,
+        )
+        found.update(lookup(new_values))
+
+    transaction.on_commit(lambda: cache.set_many(found))
+    ids.update(found)
+    return ids
+
+
+def intern_event_strings(events):
+    """
+    Setzt die Dictionary-Fremdschlüssel ungespeicherter Events
+
+    Liest die per ``user_agent``/``referrer`` gesetzten Rohwerte und löst sie
+    gesammelt auf - ohne Abfrage, wenn alle Werte im Cache liegen.
+
+    Args:
+        events: Liste von DealAnalyticsEvent-Objekten
+    """
+    from .models import AnalyticsReferrer, AnalyticsUserAgent
+
+    events = [event for event in events if event._user_agent is not None or event._referrer is not None]
+    if not events:
+        return
+    agents = {event._user_agent[:MAX_USER_AGENT_LENGTH] for event in events if event._user_agent}
+    hosts = {referrer_host(event._referrer) for event in events if event._referrer} - {None}
+
+    agent_ids = _resolve(
+        AnalyticsUserAgent, 'value', agents, _user_agent_ids,
+        defaults=lambda value: {'device_class': parse_device_class(value)},
+    ) if agents else {}
+    host_ids = _resolve(AnalyticsReferrer, 'host', hosts, _referrer_ids) if hosts else {}
+
+    for event in events:
+        if event._user_agent is not None:
+            event.user_agent_entry_id = agent_ids.get(event._user_agent[:MAX_USER_AGENT_LENGTH])
+        if event._referrer is not None:
+            event.referrer_entry_id = host_ids.get(referrer_host(event._referrer))
+
+
+def event_value_fields(fields):
+    """Übersetzt Event-Feldnamen für ``values_list`` (Text über die Dictionary-Tabellen)"""
+    return [EVENT_STRING_LOOKUPS.get(field, field) for field in fields]
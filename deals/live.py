@@ -0,0 +1,233 @@
+"""
+Live-Zähler für das Analytics-Dashboard
+=======================================
+
+Der Schreibpuffer meldet jeden angenommenen Beacon an ``live_hub``
+(``publish``), bevor er geschrieben wird. Der Hub führt pro Dealroom
+gleitende Zähler im Speicher (Besucher, Seitenaufrufe und Downloads der
+letzten ``LIVE_WINDOW_SECONDS``) und weckt die SSE-Streams dieses
+Dealrooms. Beliebig viele Betrachter lesen denselben, höchstens einmal pro
+Sekunde berechneten Zählerstand - ohne Datenbankabfrage.
+
+Abgelaufene Zähler werden schon in ``publish`` entfernt, der Speicher pro
+Dealroom bleibt also auch ohne Betrachter auf ein Fenster begrenzt. Einmal
+pro Fenster werden zusätzlich Dealrooms ohne neue Events aufgeräumt.
+
+Pub/Sub ist prozesslokal: Bei mehreren Workern sieht ein Stream nur die
+Beacons, die sein Worker angenommen hat.
+"""
+
+import asyncio
+import json
+import threading
+import time
+from collections import OrderedDict, deque
+
+LIVE_WINDOW_SECONDS = 300
+
+# Mindestabstand zweier Nachrichten eines Streams (Sekunden)
+PUSH_INTERVAL = 1.0
+
+# Ohne neue Events wird spätestens nach so vielen Sekunden ein Stand gesendet
+HEARTBEAT_SECONDS = 15
+
+# Streams enden nach dieser Dauer; EventSource verbindet sich selbst neu
+STREAM_MAX_SECONDS = 600
+
+# Wartezeit des Browsers vor dem Neuverbinden (ms)
+RETRY_MS = 3000
+
+
+class _DealCounters:
+    """Gleitende Zähler eines Dealrooms"""
+
+    __slots__ = ('buckets', 'visitors')
+
+    def __init__(self):
+        # [Sekunde, Seitenaufrufe, Downloads], älteste zuerst
+        self.buckets = deque()
+        # Besucher-Hash -> Sekunde des letzten Events, zuletzt gesehene zuletzt
+        self.visitors = OrderedDict()
+
+
+class LiveHub:
+    """
+    Prozesslokales Pub/Sub für Live-Zähler pro Dealroom
+    """
+
+    def __init__(self, window_seconds=LIVE_WINDOW_SECONDS, clock=time.time):
+        self._window_seconds = window_seconds
+        self._clock = clock
+        self._counters = {}
+        self._snapshots = {}
+        self._subscribers = {}
+        self._next_sweep = int(clock()) + window_seconds
+        self._lock = threading.Lock()
+
+    def publish(self, events):
+        """
+        Zählt neue Events und weckt die Streams der betroffenen Dealrooms
+
+        Hot Path des Collect-Endpunkts: nur Speicher, keine DB.
+
+        Args:
+            events: Liste ungespeicherter DealAnalyticsEvent-Objekte
+        """
+        if not events:
+            return
+
+        second = int(self._clock())
+        touched = set()
+        with self._lock:
+            for event in events:
+                counters = self._counters.get(event.deal_id)
+                if counters is None:
+                    counters = self._counters[event.deal_id] = _DealCounters()
+                if not counters.buckets or counters.buckets[-1][0] != second:
+                    counters.buckets.append([second, 0, 0])
+                if event.event_type == 'page_view':
+                    counters.buckets[-1][1] += event.sample_weight
+                elif event.event_type == 'download':
+                    counters.buckets[-1][2] += event.sample_weight
+                if event.visitor_hash:
+                    counters.visitors[event.visitor_hash] = second
+                    counters.visitors.move_to_end(event.visitor_hash)
+                touched.add(event.deal_id)
+
+            oldest = second - self._window_seconds
+            if second >= self._next_sweep:
+                # Auch Dealrooms ohne neue Events und ohne Betrachter aufräumen
+                self._next_sweep = second + self._window_seconds
+                self._snapshots.clear()
+                for deal_id in list(self._counters):
+                    self._prune(deal_id, oldest)
+            else:
+                for deal_id in touched:
+                    self._snapshots.pop(deal_id, None)
+                    self._prune(deal_id, oldest)
+            waiters = [waiter for deal_id in touched for waiter in self._subscribers.get(deal_id, ())]
+
+        for loop, wakeup in waiters:
+            try:
+                loop.call_soon_threadsafe(wakeup.set)
+            except RuntimeError:
+                # Event-Loop des Streams ist bereits beendet
+                pass
+
+    def snapshot(self, deal_id):
+        """
+        Gibt den aktuellen Zählerstand eines Dealrooms zurück
+
+        Returns:
+            dict: visitors, page_views, downloads, window (Sekunden)
+        """
+        second = int(self._clock())
+        with self._lock:
+            cached = self._snapshots.get(deal_id)
+            if cached is not None and cached[0] == second:
+                return cached[1]
+
+            snapshot = {'visitors': 0, 'page_views': 0, 'downloads': 0, 'window': self._window_seconds}
+            counters = self._prune(deal_id, second - self._window_seconds)
+            if counters is not None:
+                snapshot['visitors'] = len(counters.visitors)
+                snapshot['page_views'] = sum(bucket[1] for bucket in counters.buckets)
+                snapshot['downloads'] = sum(bucket[2] for bucket in counters.buckets)
+            self._snapshots[deal_id] = (second, snapshot)
+            return snapshot
+
+    def _prune(self, deal_id, oldest):
+        """
+        Entfernt Buckets und Besucher bis einschließlich ``oldest`` (unter ``_lock``)
+
+        Returns:
+            _DealCounters oder None, wenn nichts mehr im Fenster liegt
+        """
+        counters = self._counters.get(deal_id)
+        if counters is None:
+            return None
+        while counters.buckets and counters.buckets[0][0] <= oldest:
+            counters.buckets.popleft()
+        while counters.visitors and next(iter(counters.visitors.values())) <= oldest:
+            counters.visitors.popitem(last=False)
+        if not counters.buckets and not counters.visitors:
+            del self._counters[deal_id]
+            return None
+        return counters
+
+    def subscribe(self, deal_id):
+        """
+        Meldet einen Stream im laufenden Event-Loop an
+
+        Returns:
+            asyncio.Event: wird bei neuen Events des Dealrooms gesetzt
+        """
+        wakeup = asyncio.Event()
+        with self._lock:
+            self._subscribers.setdefault(deal_id, set()).add((asyncio.get_running_loop(), wakeup))
+        return wakeup
+
+    def unsubscribe(self, deal_id, wakeup):
+        """Meldet einen Stream ab"""
+        with self._lock:
+            subscribers = self._subscribers.get(deal_id, set())
+            subscribers.difference_update({entry for entry in subscribers if entry[1] is wakeup})
+            if not subscribers:
+                self._subscribers.pop(deal_id, None)
+
+    def subscriber_count(self, deal_id):
+        """Gibt die Anzahl offener Streams eines Dealrooms zurück"""
+        with self._lock:
+            return len(self._subscribers.get(deal_id, ()))
+
+
+def format_sse(data, event=None, retry=None):
+    """Formatiert eine Server-Sent-Events-Nachricht"""
+    lines = []
+    if retry is not None:
+        lines.append(f'retry: {retry}')
+    if event:
+        lines.append(f'event: {event}')
+    lines.append(f'data: {json.dumps(data)}')
+    return '\n'.join(lines) + '\n\n'
+
+
+async def stream_live_counters(deal_id, hub=None, max_seconds=STREAM_MAX_SECONDS):
+    """
+    Liefert die Live-Zähler eines Dealrooms als Server-Sent Events
+
+    Sendet sofort den aktuellen Stand, danach bei neuen Events (höchstens
+    einmal pro ``PUSH_INTERVAL``) und ohne Events alle ``HEARTBEAT_SECONDS``,
+    damit auslaufende Zähler sichtbar werden.
+
+    Args:
+        deal_id: ID des Dealrooms
+        hub: LiveHub (Standard: der des Workers)
+        max_seconds: Laufzeit des Streams
+
+    Yields:
+        str: SSE-Nachrichten
+    """
+    hub = hub or live_hub
+    wakeup = hub.subscribe(deal_id)
+    deadline = time.monotonic() + max_seconds
+    try:
+        yield format_sse(hub.snapshot(deal_id), event='counters', retry=RETRY_MS)
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                await asyncio.wait_for(wakeup.wait(), timeout=min(HEARTBEAT_SECONDS, remaining))
+            except asyncio.TimeoutError:
+                pass
+            wakeup.clear()
+            yield format_sse(hub.snapshot(deal_id), event='counters')
+            # Bursts zusammenfassen
+            await asyncio.sleep(PUSH_INTERVAL)
+    finally:
+        hub.unsubscribe(deal_id, wakeup)
+
+
+# Hub dieses Worker-Prozesses
+live_hub = LiveHub()
@@ -0,0 +1 @@
+# Management-Kommandos für die Deals-App 
\ No newline at end of file
@@ -0,0 +1 @@
+# Management-Kommandos 
\ No newline at end of file
@@ -0,0 +1,40 @@
+from datetime import date
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Sum
+
+from deals.archive import archive_events, get_archive_dir
+from deals.models import AnalyticsArchive, DealAnalyticsEvent
+
+
+class Command(BaseCommand):
+    help = 'Verschiebt Analytics-Events vor dem Aufbewahrungsfenster in komprimierte Monatsarchive'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--before',
+            default=None,
+            help='Events vor diesem Datum (YYYY-MM-DD) archivieren (Standard: DEALROOM_ANALYTICS_RETENTION_DAYS)',
+        )
+
+    def handle(self, *args, **options):
+        before = None
+        if options['before']:
+            try:
+                before = date.fromisoformat(options['before'])
+            except ValueError:
+                raise CommandError('--before erwartet ein Datum im Format YYYY-MM-DD')
+        elif settings.DEALROOM_ANALYTICS_RETENTION_DAYS <= 0:
+            self.stdout.write("ℹ️ DEALROOM_ANALYTICS_RETENTION_DAYS ist 0 - keine Archivierung")
+            return
+
+        self.stdout.write(f"🗄️ Archiviere Analytics-Events nach {get_archive_dir()}...")
+        report = archive_events(before=before)
+
+        archived_bytes = AnalyticsArchive.objects.aggregate(total=Sum('size_bytes'))['total'] or 0
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {report['events']} Events in {report['files']} Dateien archiviert "
+            f"(Archiv gesamt: {archived_bytes / 1024 / 1024:.1f} MB, "
+            f"in der Datenbank: {DealAnalyticsEvent.objects.count()} Events)"
+        ))
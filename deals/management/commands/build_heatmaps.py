@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from deals.heatmaps import update_heatmaps
+from deals.models import DealAnalyticsEvent
+
+
+class Command(BaseCommand):
+    help = 'Rechnet neue Klicks in die Heatmaps der Dealrooms ein'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--deal',
+            type=int,
+            default=None,
+            help='Nur diesen Dealroom (ID) verarbeiten',
+        )
+
+    def handle(self, *args, **options):
+        if options['deal']:
+            deal_ids = [options['deal']]
+        else:
+            deal_ids = list(
+                DealAnalyticsEvent.objects.filter(event_type='click')
+                .values_list('deal_id', flat=True)
+                .distinct()
+                .order_by()
+            )
+
+        self.stdout.write(f"🔥 Aktualisiere Heatmaps für {len(deal_ids)} Dealrooms...")
+        started = time.monotonic()
+        total = 0
+        for deal_id in deal_ids:
+            total += update_heatmaps(deal_id)
+        duration = time.monotonic() - started
+
+        self.stdout.write(self.style.SUCCESS(f"✅ {total} neue Klicks in {duration:.2f}s eingerechnet"))
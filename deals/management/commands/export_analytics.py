@@ -0,0 +1,54 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from deals.export import EXPORT_FORMATS, ExportError, parse_export_date, stream_export, validate_event_types
+from deals.models import Deal
+
+
+class Command(BaseCommand):
+    help = 'Exportiert die Analytics-Events eines Dealrooms als CSV oder NDJSON (gestreamt)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('deal', type=int, help='ID des Dealrooms')
+        parser.add_argument('--format', choices=sorted(EXPORT_FORMATS), default='csv', help='Ausgabeformat')
+        parser.add_argument(
+            '--event-type',
+            action='append',
+            default=[],
+            help='Nur diesen Event-Typ exportieren (mehrfach möglich)',
+        )
+        parser.add_argument('--since', default=None, help='Erster Tag (YYYY-MM-DD, inklusive)')
+        parser.add_argument('--until', default=None, help='Letzter Tag (YYYY-MM-DD, inklusive)')
+        parser.add_argument('--output', '-o', default='-', help='Zieldatei (Standard: stdout)')
+
+    def handle(self, *args, **options):
+        if not Deal.objects.filter(pk=options['deal']).exists():
+            raise CommandError(f"Dealroom {options['deal']} nicht gefunden")
+        try:
+            filters = {
+                'event_types': validate_event_types(options['event_type']),
+                'since': parse_export_date(options['since'], '--since'),
+                'until': parse_export_date(options['until'], '--until'),
+            }
+        except ExportError as e:
+            raise CommandError(str(e))
+
+        started = time.monotonic()
+        chunks = stream_export(options['deal'], options['format'], **filters)
+        if options['output'] == '-':
+            for chunk in chunks:
+                sys.stdout.write(chunk)
+            sys.stdout.flush()
+            # Statusmeldung nicht in die Exportdaten schreiben
+            status = self.stderr
+        else:
+            with open(options['output'], 'w', encoding='utf-8', newline='') as output:
+                for chunk in chunks:
+                    output.write(chunk)
+            status = self.stdout
+
+        status.write(self.style.SUCCESS(
+            f"✅ Export von Dealroom {options['deal']} in {time.monotonic() - started:.2f}s abgeschlossen"
+        ))
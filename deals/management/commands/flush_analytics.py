@@ -0,0 +1,36 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from deals.analytics_buffer import replay_spill_files
+
+
+class Command(BaseCommand):
+    help = 'Trägt ausgelagerte Analytics-Events (Spill-Dateien beendeter Worker) in die Datenbank nach'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--spill-dir',
+            default=None,
+            help='Verzeichnis der Spill-Dateien (Standard: DEALROOM_ANALYTICS_SPILL_DIR)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Events pro INSERT',
+        )
+
+    def handle(self, *args, **options):
+        spill_dir = options['spill_dir'] or str(settings.DEALROOM_ANALYTICS_SPILL_DIR)
+        self.stdout.write(f"📥 Trage Analytics-Events aus {spill_dir} nach...")
+
+        started = time.monotonic()
+        replayed = replay_spill_files(spill_dir, batch_size=options['batch_size'])
+        duration = time.monotonic() - started
+
+        rate = round(replayed / duration, 1) if duration > 0 else replayed
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {replayed} Events in {duration:.3f}s nachgetragen ({rate} Events/s)"
+        ))
@@ -0,0 +1,44 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models.functions import TruncDate
+
+from deals.models import DealAnalyticsEvent
+from deals.rollups import get_day_start, rollup_days, update_rollups
+
+
+class Command(BaseCommand):
+    help = 'Aktualisiert Tages-Rollups und Sessions der Analytics-Events (inkrementell ab dem Wasserstand)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild-since',
+            default=None,
+            help='Rollups ab diesem Datum (YYYY-MM-DD) vollständig neu berechnen',
+        )
+
+    def handle(self, *args, **options):
+        if options['rebuild_since']:
+            try:
+                since = date.fromisoformat(options['rebuild_since'])
+            except ValueError:
+                raise CommandError('--rebuild-since erwartet ein Datum im Format YYYY-MM-DD')
+
+            self.stdout.write(f"🔄 Berechne Rollups ab {since:%d.%m.%Y} neu...")
+            pairs = set(
+                DealAnalyticsEvent.objects.filter(timestamp__gte=get_day_start(since))
+                .annotate(day=TruncDate('timestamp'))
+                .values_list('deal_id', 'day')
+                .distinct()
+                .order_by()
+            )
+            updated = rollup_days(pairs)
+            self.stdout.write(self.style.SUCCESS(f"✅ {updated} Tages-Rollups neu berechnet"))
+            return
+
+        self.stdout.write("📊 Aktualisiere Analytics-Rollups...")
+        report = update_rollups()
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {report['days']} Tages-Rollups aktualisiert (Wasserstand: Event {report['watermark']}), "
+            f"{report['sessions']} Sessions zusammengeführt"
+        ))
@@ -0,0 +1,156 @@
+import json
+import os
+import random
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models.signals import post_save
+
+from deals.models import Deal, DealFile, auto_generate_website, regenerate_website_on_file_change
+from deals.warmup import warm_dealrooms
+
+User = get_user_model()
+
+LOADTEST_SLUG_PREFIX = 'loadtest-'
+
+FILE_TYPES = [
+    ('document', 'pdf'),
+    ('contract', 'pdf'),
+    ('offer', 'pdf'),
+    ('presentation', 'pptx'),
+    ('specification', 'docx'),
+    ('gallery', 'jpg'),
+]
+
+
+@contextmanager
+def website_signals_disconnected():
+    """Unterdrückt die Website-Generierung pro Speichern während des Seedings"""
+    post_save.disconnect(auto_generate_website, sender=Deal)
+    post_save.disconnect(regenerate_website_on_file_change, sender=DealFile)
+    try:
+        yield
+    finally:
+        post_save.connect(auto_generate_website, sender=Deal)
+        post_save.connect(regenerate_website_on_file_change, sender=DealFile)
+
+
+class Command(BaseCommand):
+    help = 'Legt synthetische Dealrooms für Lasttests an und schreibt ein Manifest für loadtest.run'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--deals', type=int, default=100, help='Anzahl Dealrooms')
+        parser.add_argument('--files', type=int, default=8, help='Dateien pro Dealroom')
+        parser.add_argument('--file-size', type=int, default=256, help='Mittlere Dateigröße in KB')
+        parser.add_argument('--faq', type=int, default=12, help='FAQ-Einträge pro Dealroom')
+        parser.add_argument('--timeline', type=int, default=10, help='Timeline-Ereignisse pro Dealroom')
+        parser.add_argument('--protected', type=float, default=0.2, help='Anteil passwortgeschützter Dealrooms (0-1)')
+        parser.add_argument('--password', type=str, default='loadtest', help='Passwort der geschützten Dealrooms')
+        parser.add_argument('--seed', type=int, default=42, help='Zufalls-Seed für reproduzierbare Daten')
+        parser.add_argument(
+            '--manifest',
+            type=str,
+            default=os.path.join(settings.BASE_DIR, 'loadtest', 'manifest.json'),
+            help='Pfad des Manifests',
+        )
+        parser.add_argument('--clear', action='store_true', help='Vorherige Lasttest-Dealrooms löschen')
+        parser.add_argument('--no-render', action='store_true', help='Websites nicht vorab generieren')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+
+        self.stdout.write("🌱 Starte Seeding der Lasttest-Dealrooms...")
+
+        if options['clear']:
+            deleted, _ = Deal.objects.filter(slug__startswith=LOADTEST_SLUG_PREFIX).delete()
+            self.stdout.write(f"🗑️ Vorherige Lasttest-Daten gelöscht: {deleted} Objekte")
+
+        user, _ = User.objects.get_or_create(
+            username='loadtest',
+            defaults={'email': 'loadtest@example.com', 'analytics_opt_in': False}
+        )
+        # Einmal hashen statt pro Dealroom (PBKDF2 ist absichtlich langsam)
+        password_hash = make_password(options['password'])
+
+        start = Deal.objects.filter(slug__startswith=LOADTEST_SLUG_PREFIX).count()
+        public_ids = []
+        protected_ids = []
+        total_bytes = 0
+
+        with website_signals_disconnected():
+            for i in range(start, start + options['deals']):
+                protected = rng.random() < options['protected']
+                with transaction.atomic():
+                    deal = Deal.objects.create(
+                        title=f'Lasttest Dealroom {i:05d}',
+                        slug=f'{LOADTEST_SLUG_PREFIX}{i:05d}',
+                        recipient_name=f'Kunde {i}',
+                        recipient_email=f'kunde{i}@example.com',
+                        company_name=f'Lasttest GmbH {i}',
+                        description='Synthetischer Dealroom für Lasttests. ' * rng.randint(5, 40),
+                        status='active',
+                        created_by=user,
+                        faq_items=[
+                            {
+                                'question': f'Frage {n}: ' + 'Wie funktioniert das Angebot im Detail? ' * rng.randint(1, 3),
+                                'answer': 'Ausführliche Antwort mit Details zum Vorgehen. ' * rng.randint(3, 15),
+                            }
+                            for n in range(options['faq'])
+                        ],
+                        timeline_events=[
+                            {
+                                'date': f'2024-{(n % 12) + 1:02d}-{(n % 28) + 1:02d}',
+                                'title': f'Meilenstein {n}',
+                                'description': 'Beschreibung des Meilensteins. ' * rng.randint(1, 6),
+                            }
+                            for n in range(options['timeline'])
+                        ],
+                        password_protection_enabled=protected,
+                        password_protection_password=password_hash if protected else None,
+                        # Der Lasttest soll nicht in die Sperre laufen
+                        password_protection_max_attempts=1000000,
+                    )
+                    total_bytes += self._create_files(deal, user, rng, options)
+                (protected_ids if protected else public_ids).append(deal.id)
+
+        self.stdout.write(f"✅ {len(public_ids) + len(protected_ids)} Dealrooms angelegt "
+                          f"({len(protected_ids)} passwortgeschützt, {total_bytes / 1024 / 1024:.1f} MB Dateien)")
+
+        if not options['no_render']:
+            report = warm_dealrooms()
+            self.stdout.write(f"🔥 Websites generiert: {report['warmed']}/{report['total']} in {report['duration']}s")
+
+        manifest = {
+            'public_deal_ids': public_ids,
+            'protected_deal_ids': protected_ids,
+            'password': options['password'],
+            'seed': options['seed'],
+            'config': {key: options[key] for key in ('deals', 'files', 'file_size', 'faq', 'timeline', 'protected')},
+        }
+        os.makedirs(os.path.dirname(os.path.abspath(options['manifest'])), exist_ok=True)
+        with open(options['manifest'], 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+
+        self.stdout.write(self.style.SUCCESS(f"\n🎉 Manifest geschrieben: {options['manifest']}"))
+
+    def _create_files(self, deal, user, rng, options):
+        """Legt Dateien mit log-normal verteilten Größen an und gibt die Gesamtgröße zurück"""
+        total = 0
+        mean_bytes = options['file_size'] * 1024
+        for n in range(options['files']):
+            file_type, extension = rng.choice(FILE_TYPES)
+            size = max(1024, int(rng.lognormvariate(0, 0.8) * mean_bytes))
+            DealFile.objects.create(
+                deal=deal,
+                title=f'{file_type.title()} {n + 1}',
+                file=ContentFile(rng.randbytes(size), name=f'loadtest_{deal.id}_{n}.{extension}'),
+                file_type=file_type,
+                uploaded_by=user,
+            )
+            total += size
+        return total
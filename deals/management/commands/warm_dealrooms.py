@@ -0,0 +1,63 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from deals.warmup import has_shared_cache, warm_dealrooms
+
+
+class Command(BaseCommand):
+    help = (
+        'Wärmt Render-Cache und generierte Seiten aller aktiven Dealrooms vor (z.B. nach einem Deployment). '
+        'Den Render-Cache der Server-Worker erreicht das nur mit gemeinsamem CACHE_BACKEND (Redis, Memcached); '
+        'mit dem Standard-LocMemCache bleiben nur die neu geschriebenen generated_pages.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--budget',
+            type=float,
+            default=None,
+            help='Zeitbudget in Sekunden; danach werden keine weiteren Dealrooms begonnen',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=settings.DEALROOM_WARMUP_WORKERS,
+            help='Anzahl paralleler Threads (1 = sequentiell)',
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=None,
+            help='Nur die N meistgenutzten Dealrooms vorwärmen',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write("🔥 Starte Vorwärmen der Dealroom-Caches...")
+        if not has_shared_cache():
+            self.stdout.write(self.style.WARNING(
+                "⚠️ Prozesslokaler Cache: Der Render-Cache der Server-Worker wird nicht befüllt, "
+                "nur generated_pages wird aktualisiert"
+            ))
+
+        report = warm_dealrooms(
+            limit=options['limit'],
+            budget=options['budget'],
+            workers=options['workers']
+        )
+
+        for deal_id, error in report['errors'].items():
+            self.stdout.write(self.style.ERROR(f"❌ Dealroom {deal_id}: {error}"))
+
+        # Zusammenfassung
+        self.stdout.write("\n" + "="*50)
+        self.stdout.write("📊 Zusammenfassung:")
+        self.stdout.write(f"✅ Vorgewärmt: {report['warmed']} von {report['total']} Dealrooms")
+        self.stdout.write(f"🔄 Neu generiert: {report['regenerated']} Seiten")
+        self.stdout.write(f"❌ Fehlgeschlagen: {report['failed']}")
+        self.stdout.write(f"⏭️ Übersprungen (Zeitbudget): {report['skipped']}")
+        self.stdout.write(f"📈 Abdeckung: {report['coverage']}% der Dealrooms, {report['traffic_coverage']}% der Aufrufe")
+        self.stdout.write(f"⏱️ Dauer: {report['duration']}s")
+        self.stdout.write("="*50)
+
+        if report['failed'] == 0 and report['skipped'] == 0:
+            self.stdout.write(self.style.SUCCESS("\n🎉 Alle aktiven Dealrooms sind vorgewärmt!"))
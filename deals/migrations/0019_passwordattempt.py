@@ -0,0 +1,41 @@
+# Generated by Django 5.2.4 on 2026-10-19 01:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deals', '0018_abtest_dealanalyticsevent_anonymized_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PasswordAttempt',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('timestamp', models.DateTimeField(verbose_name='Zeitpunkt')),
+                ('success', models.BooleanField(verbose_name='Erfolgreich')),
+                ('ip_address', models.CharField(blank=True, default='', max_length=45, verbose_name='IP-Adresse')),
+                ('deal', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='password_attempts', to='deals.deal', verbose_name='Deal')),
+            ],
+            options={
+                'verbose_name': 'Passwortversuch',
+                'verbose_name_plural': 'Passwortversuche',
+                'ordering': ['-timestamp'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='passwordattempt',
+            index=models.Index(fields=['deal', 'timestamp'], name='deals_passw_deal_id_a878c2_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='passwordattempt',
+            index=models.Index(fields=['ip_address', 'timestamp'], name='deals_passw_ip_addr_6dbbac_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='passwordattempt',
+            index=models.Index(fields=['timestamp'], name='deals_passw_timesta_9b9beb_idx'),
+        ),
+    ]
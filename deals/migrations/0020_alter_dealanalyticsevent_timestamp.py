@@ -0,0 +1,19 @@
+# Generated by Django 5.2.4 on 2026-10-19 02:10
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deals', '0019_passwordattempt'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='dealanalyticsevent',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
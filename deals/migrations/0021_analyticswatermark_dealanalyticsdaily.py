@@ -0,0 +1,53 @@
+# Generated by Django 5.2.4 on 2026-10-19 01:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deals', '0020_alter_dealanalyticsevent_timestamp'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnalyticsWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True, verbose_name='Name')),
+                ('last_event_id', models.BigIntegerField(default=0, verbose_name='Letzte Event-ID')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Aktualisiert am')),
+            ],
+            options={
+                'verbose_name': 'Analytics-Wasserstand',
+                'verbose_name_plural': 'Analytics-Wasserstände',
+            },
+        ),
+        migrations.CreateModel(
+            name='DealAnalyticsDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='Tag')),
+                ('page_views', models.PositiveIntegerField(default=0, verbose_name='Seitenaufrufe')),
+                ('visitors', models.PositiveIntegerField(default=0, verbose_name='Besucher')),
+                ('clicks', models.PositiveIntegerField(default=0, verbose_name='Klicks')),
+                ('downloads', models.PositiveIntegerField(default=0, verbose_name='Downloads')),
+                ('conversions', models.PositiveIntegerField(default=0, verbose_name='Conversions')),
+                ('time_spent_total', models.FloatField(default=0, verbose_name='Verbrachte Zeit gesamt (s)')),
+                ('time_spent_count', models.PositiveIntegerField(default=0, verbose_name='Zeit-Events')),
+                ('top_elements', models.JSONField(blank=True, default=dict, verbose_name='Klicks pro Element')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Aktualisiert am')),
+                ('deal', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='analytics_daily', to='deals.deal', verbose_name='Deal')),
+            ],
+            options={
+                'verbose_name': 'Analytics-Tageswert',
+                'verbose_name_plural': 'Analytics-Tageswerte',
+                'ordering': ['deal', 'day'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dealanalyticsdaily',
+            constraint=models.UniqueConstraint(fields=('deal', 'day'), name='unique_deal_analytics_day'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-19 02:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deals', '0021_analyticswatermark_dealanalyticsdaily'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dealanalyticsevent',
+            name='visitor_hash',
+            field=models.CharField(blank=True, default='', help_text='Gesalzener Hash aus IP und User-Agent für eindeutige Besucher', max_length=16, verbose_name='Besucher-Hash'),
+        ),
+        migrations.AddField(
+            model_name='dealanalyticsdaily',
+            name='visitor_sketch',
+            field=models.BinaryField(blank=True, help_text='HyperLogLog-Sketch der Besucher-Hashes (siehe deals.hll)', null=True, verbose_name='Besucher-Sketch'),
+        ),
+    ]
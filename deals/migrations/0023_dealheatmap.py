@@ -0,0 +1,39 @@
+# Generated by Django 5.2.4 on 2026-10-19 03:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deals', '0022_visitor_hash_and_sketch'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DealHeatmap',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('viewport', models.CharField(max_length=20, verbose_name='Viewport')),
+                ('element_id', models.CharField(blank=True, default='', max_length=100, verbose_name='Element ID')),
+                ('x_bins', models.PositiveSmallIntegerField(verbose_name='Spalten')),
+                ('y_bins', models.PositiveIntegerField(default=0, verbose_name='Zeilen')),
+                ('bin_width', models.FloatField(verbose_name='Spaltenbreite (px)')),
+                ('bin_height', models.FloatField(verbose_name='Zeilenhöhe (px)')),
+                ('counts', models.BinaryField(verbose_name='Zählwerte')),
+                ('total_clicks', models.PositiveIntegerField(default=0, verbose_name='Klicks')),
+                ('last_event_id', models.BigIntegerField(default=0, verbose_name='Letzte Event-ID')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Aktualisiert am')),
+                ('deal', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='heatmaps', to='deals.deal', verbose_name='Deal')),
+            ],
+            options={
+                'verbose_name': 'Heatmap',
+                'verbose_name_plural': 'Heatmaps',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dealheatmap',
+            constraint=models.UniqueConstraint(fields=('deal', 'viewport', 'element_id'), name='unique_deal_heatmap'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.4 on 2026-10-19 09:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deals', '0023_dealheatmap'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnalyticsArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(help_text='Erster Tag des Monats', verbose_name='Monat')),
+                ('path', models.CharField(help_text='Relativ zum Archiv-Verzeichnis', max_length=255, unique=True, verbose_name='Datei')),
+                ('first_event_id', models.BigIntegerField(verbose_name='Erste Event-ID')),
+                ('last_event_id', models.BigIntegerField(verbose_name='Letzte Event-ID')),
+                ('event_count', models.PositiveIntegerField(verbose_name='Anzahl Events')),
+                ('size_bytes', models.PositiveBigIntegerField(verbose_name='Größe (Bytes)')),
+                ('archived_before', models.DateField(help_text='Stichtag der Archivierung: alle Events davor wurden verschoben', verbose_name='Archiviert vor')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Erstellt am')),
+            ],
+            options={
+                'verbose_name': 'Analytics-Archiv',
+                'verbose_name_plural': 'Analytics-Archive',
+                'ordering': ['month', 'first_event_id'],
+            },
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.2.4 on 2026-10-19 11:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deals', '0024_analyticsarchive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dealanalyticsdaily',
+            name='sessions',
+            field=models.PositiveIntegerField(default=0, verbose_name='Sessions'),
+        ),
+        migrations.AddField(
+            model_name='dealanalyticsdaily',
+            name='bounces',
+            field=models.PositiveIntegerField(default=0, verbose_name='Bounces'),
+        ),
+        migrations.AddField(
+            model_name='dealanalyticsdaily',
+            name='session_seconds_total',
+            field=models.FloatField(default=0, verbose_name='Session-Dauer gesamt (s)'),
+        ),
+        migrations.AddField(
+            model_name='dealanalyticsdaily',
+            name='scroll_depth_total',
+            field=models.PositiveIntegerField(default=0, verbose_name='Scrolltiefe gesamt (%)'),
+        ),
+        migrations.AddField(
+            model_name='dealanalyticsdaily',
+            name='scroll_sessions',
+            field=models.PositiveIntegerField(default=0, verbose_name='Sessions mit Scrolltiefe'),
+        ),
+        migrations.CreateModel(
+            name='DealAnalyticsSession',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('session_key', models.CharField(max_length=64, verbose_name='Session')),
+                ('day', models.DateField(help_text='Lokaler Tag des Session-Beginns', verbose_name='Tag')),
+                ('started_at', models.DateTimeField(verbose_name='Beginn')),
+                ('ended_at', models.DateTimeField(verbose_name='Letztes Event')),
+                ('events', models.PositiveIntegerField(default=0, verbose_name='Events')),
+                ('page_views', models.PositiveIntegerField(default=0, verbose_name='Seitenaufrufe')),
+                ('interactions', models.PositiveIntegerField(default=0, verbose_name='Interaktionen')),
+                ('reported_seconds', models.FloatField(default=0, help_text='Summe der time_spent-Events des Clients', verbose_name='Gemeldete Zeit (s)')),
+                ('duration_seconds', models.FloatField(default=0, verbose_name='Dauer (s)')),
+                ('max_scroll_depth', models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='Scrolltiefe (%)')),
+                ('is_bounce', models.BooleanField(default=True, verbose_name='Bounce')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Aktualisiert am')),
+                ('deal', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='analytics_sessions', to='deals.deal', verbose_name='Deal')),
+            ],
+            options={
+                'verbose_name': 'Analytics-Session',
+                'verbose_name_plural': 'Analytics-Sessions',
+                'ordering': ['deal', 'started_at'],
+                'indexes': [models.Index(fields=['deal', 'day'], name='deals_deala_deal_id_13cc5f_idx')],
+                'constraints': [models.UniqueConstraint(fields=('deal', 'session_key', 'started_at'), name='unique_deal_session_start')],
+            },
+        ),
+    ]
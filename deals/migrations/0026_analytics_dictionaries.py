@@ -0,0 +1,78 @@
+# Generated by Django 5.2.4 on 2026-10-19 14:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def intern_strings(apps, schema_editor):
+    """Überträgt vorhandene User-Agents und Referrer in die Dictionary-Tabellen"""
+    from deals.interning import parse_device_class, referrer_host
+
+    DealAnalyticsEvent = apps.get_model('deals', 'DealAnalyticsEvent')
+    AnalyticsUserAgent = apps.get_model('deals', 'AnalyticsUserAgent')
+    AnalyticsReferrer = apps.get_model('deals', 'AnalyticsReferrer')
+
+    events = DealAnalyticsEvent.objects.order_by()
+    for value in events.exclude(user_agent='').values_list('user_agent', flat=True).distinct():
+        agent, _ = AnalyticsUserAgent.objects.get_or_create(
+            value=value[:500], defaults={'device_class': parse_device_class(value[:500])}
+        )
+        events.filter(user_agent=value).update(user_agent_entry=agent)
+
+    for value in events.exclude(referrer__isnull=True).exclude(referrer='').values_list('referrer', flat=True).distinct():
+        host = referrer_host(value)
+        if host:
+            referrer, _ = AnalyticsReferrer.objects.get_or_create(host=host)
+            events.filter(referrer=value).update(referrer_entry=referrer)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deals', '0025_analytics_sessions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnalyticsReferrer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('host', models.CharField(max_length=255, unique=True, verbose_name='Host')),
+            ],
+            options={
+                'verbose_name': 'Analytics-Referrer',
+                'verbose_name_plural': 'Analytics-Referrer',
+            },
+        ),
+        migrations.CreateModel(
+            name='AnalyticsUserAgent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('value', models.CharField(max_length=500, unique=True, verbose_name='User Agent')),
+                ('device_class', models.CharField(choices=[('desktop', 'Desktop'), ('mobile', 'Mobil'), ('tablet', 'Tablet'), ('bot', 'Bot'), ('unknown', 'Unbekannt')], default='unknown', max_length=10, verbose_name='Geräteklasse')),
+            ],
+            options={
+                'verbose_name': 'Analytics-User-Agent',
+                'verbose_name_plural': 'Analytics-User-Agents',
+            },
+        ),
+        migrations.AddField(
+            model_name='dealanalyticsevent',
+            name='referrer_entry',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='deals.analyticsreferrer', verbose_name='Referrer'),
+        ),
+        migrations.AddField(
+            model_name='dealanalyticsevent',
+            name='user_agent_entry',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='deals.analyticsuseragent', verbose_name='User Agent'),
+        ),
+        migrations.RunPython(intern_strings, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='dealanalyticsevent',
+            name='referrer',
+        ),
+        migrations.RemoveField(
+            model_name='dealanalyticsevent',
+            name='user_agent',
+        ),
+    ]
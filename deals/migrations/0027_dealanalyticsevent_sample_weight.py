@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-19 15:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deals', '0026_analytics_dictionaries'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dealanalyticsevent',
+            name='sample_weight',
+            field=models.PositiveIntegerField(default=1, verbose_name='Gewicht'),
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.4 on 2026-10-19 03:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deals', '0027_dealanalyticsevent_sample_weight'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dealfile',
+            name='height',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Höhe (px)'),
+        ),
+        migrations.AddField(
+            model_name='dealfile',
+            name='mime_type',
+            field=models.CharField(blank=True, default='', editable=False, max_length=100, verbose_name='MIME-Typ'),
+        ),
+        migrations.AddField(
+            model_name='dealfile',
+            name='sha256',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=64, verbose_name='SHA-256'),
+        ),
+        migrations.AddField(
+            model_name='dealfile',
+            name='size_bytes',
+            field=models.PositiveBigIntegerField(blank=True, editable=False, null=True, verbose_name='Größe (Bytes)'),
+        ),
+        migrations.AddField(
+            model_name='dealfile',
+            name='width',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Breite (px)'),
+        ),
+        migrations.AddField(
+            model_name='medialibrary',
+            name='height',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Höhe (px)'),
+        ),
+        migrations.AddField(
+            model_name='medialibrary',
+            name='mime_type',
+            field=models.CharField(blank=True, default='', editable=False, max_length=100, verbose_name='MIME-Typ'),
+        ),
+        migrations.AddField(
+            model_name='medialibrary',
+            name='sha256',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=64, verbose_name='SHA-256'),
+        ),
+        migrations.AddField(
+            model_name='medialibrary',
+            name='size_bytes',
+            field=models.PositiveBigIntegerField(blank=True, editable=False, null=True, verbose_name='Größe (Bytes)'),
+        ),
+        migrations.AddField(
+            model_name='medialibrary',
+            name='width',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Breite (px)'),
+        ),
+    ]
@@ -0,0 +1,126 @@
+# Generated by Django 5.2.4 on 2026-10-19 03:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def dedup_media(apps, schema_editor):
+    """
+    Legt vorhandene Uploads in der inhaltsadressierten Ablage ab
+
+    Die ursprünglichen Dateien bleiben liegen: ihre absoluten /media/-URLs
+    stehen in GrapesJS-Seiten und eigenem HTML. Aufräumen erst per
+    ``manage.py purge_legacy_files``.
+    """
+    import hashlib
+    import os
+    from collections import Counter
+
+    from django.core.files.storage import default_storage
+    from django.db.models import F
+    from files.blobs import blob_path
+
+    Blob = apps.get_model('files', 'Blob')
+    blobs = {}  # bisheriger Speichername -> Blob (None, wenn die Datei fehlt)
+    references = Counter()
+    for model in _file_models(apps):
+        rows = model.objects.exclude(file='').exclude(file__isnull=True).order_by().values_list('pk', 'file')
+        for pk, name in rows.iterator():
+            if name not in blobs:
+                digest = hashlib.sha256()
+                size = 0
+                try:
+                    with default_storage.open(name, 'rb') as source:
+                        for chunk in source.chunks():
+                            digest.update(chunk)
+                            size += len(chunk)
+                except OSError:
+                    blobs[name] = None
+                    continue
+                sha256 = digest.hexdigest()
+                blob = Blob.objects.filter(sha256=sha256).first()
+                if blob is None:
+                    target = blob_path(sha256, name)
+                    if not default_storage.exists(target):
+                        with default_storage.open(name, 'rb') as source:
+                            target = default_storage.save(target, source)
+                    blob = Blob.objects.create(sha256=sha256, name=target, size_bytes=size)
+                blobs[name] = blob
+
+            blob = blobs[name]
+            if blob is None:
+                continue
+            model.objects.filter(pk=pk).update(
+                file=blob.name, blob=blob, original_name=os.path.basename(name)[:255],
+                legacy_name=name, sha256=blob.sha256, size_bytes=blob.size_bytes,
+            )
+            references[blob.pk] += 1
+
+    for blob_id, count in references.items():
+        Blob.objects.filter(pk=blob_id).update(ref_count=F('ref_count') + count)
+
+
+def restore_legacy_names(apps, schema_editor):
+    """Zeigt die Dateifelder wieder auf die ursprünglichen Pfade"""
+    from django.core.files.storage import default_storage
+
+    for model in _file_models(apps):
+        rows = model.objects.exclude(legacy_name='').order_by().values_list('pk', 'file', 'legacy_name')
+        for pk, name, legacy_name in rows.iterator():
+            if not default_storage.exists(legacy_name) and default_storage.exists(name):
+                # Von purge_legacy_files entfernt: aus der Ablage zurückkopieren
+                with default_storage.open(name, 'rb') as source:
+                    legacy_name = default_storage.save(legacy_name, source)
+            model.objects.filter(pk=pk).update(file=legacy_name)
+        # Neuere Uploads behalten ihren Pfad in der Ablage
+        model.objects.update(blob=None)
+
+
+def _file_models(apps):
+    return [
+        apps.get_model('files', 'GlobalFile'),
+        apps.get_model('deals', 'DealFile'),
+        apps.get_model('deals', 'MediaLibrary'),
+    ]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deals', '0028_file_metadata'),
+        ('files', '0005_blobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dealfile',
+            name='blob',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='files.blob', verbose_name='Blob'),
+        ),
+        migrations.AddField(
+            model_name='dealfile',
+            name='original_name',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255, verbose_name='Ursprünglicher Dateiname'),
+        ),
+        migrations.AddField(
+            model_name='dealfile',
+            name='legacy_name',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255, verbose_name='Früherer Speicherpfad'),
+        ),
+        migrations.AddField(
+            model_name='medialibrary',
+            name='blob',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='files.blob', verbose_name='Blob'),
+        ),
+        migrations.AddField(
+            model_name='medialibrary',
+            name='original_name',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255, verbose_name='Ursprünglicher Dateiname'),
+        ),
+        migrations.AddField(
+            model_name='medialibrary',
+            name='legacy_name',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255, verbose_name='Früherer Speicherpfad'),
+        ),
+        migrations.RunPython(dedup_media, restore_legacy_names),
+    ]
@@ -7,6 +7,10 @@ from django.utils.translation import gettext_lazy as _
 from django.urls import reverse
 import os
 from django.conf import settings
+from django.db.models import Sum
+
+from files.metadata import format_file_size
+from files.models import StoredFileMetadata, release_file_blob
 
 User = get_user_model()
 
@@ -559,16 +563,27 @@ class Deal(models.Model):
     
     def get_total_file_size(self):
         """Gibt die Gesamtgröße aller Dateien zurück"""
-        total_size = 0
-        for file_obj in self.files.all():
-            if file_obj.file:
-                total_size += file_obj.file.size
-        return total_size
+        return self.files.aggregate(total=Sum('size_bytes'))['total'] or 0
     
     def is_published(self):
         """Prüft ob die Landingpage veröffentlicht ist"""
         return self.status == self.DealStatus.ACTIVE
-    
+
+    def has_current_website(self):
+        """
+        Prüft ob die generierte Website (generated_pages) dem aktuellen Stand entspricht
+
+        Die Generierung läuft im post_save-Signal nach dem Speichern, daher ist
+        das Artefakt aktuell, solange last_generation nicht vor updated_at liegt.
+        """
+        return (
+            self.is_published()
+            and self.website_status == 'generated'
+            and self.last_generation is not None
+            and self.updated_at is not None
+            and self.last_generation >= self.updated_at
+        )
+
     def get_template_css_class(self):
         """Gibt CSS-Klasse für Template-Typ zurück"""
         return f"template-{self.template_type}"
@@ -759,6 +774,7 @@ class Deal(models.Model):
             self.password_protection_message = _('Diese Landingpage ist passwortgeschützt. Bitte geben Sie das Passwort ein.')
         
         self.save()
+        self.refresh_access_marker()
     
     def disable_password_protection(self):
         """Deaktiviert Passwortschutz für die Landingpage"""
@@ -768,11 +784,43 @@ class Deal(models.Model):
         self.password_protection_last_attempt = None
         self.password_protection_blocked_until = None
         self.save()
+        self.refresh_access_marker()
+        
+        from .ratelimit import reset_attempts
+        reset_attempts(self)
+    
+    def refresh_access_marker(self):
+        """
+        Schreibt die Zugriffsinformationen der generierten Website neu
+        
+        Unabhängig vom Status, denn die generated_pages-Route liest nur die
+        Datei. Gelingt das Schreiben nicht, wird sie gelöscht; die Route
+        prüft dann in der Datenbank.
+        """
+        from generator.utils import ACCESS_MARKER_FILENAME, VARIANTS_DIRNAME, get_website_dir, write_access_marker
+        
+        variants_dir = os.path.join(get_website_dir(self.pk), VARIANTS_DIRNAME)
+        if not os.path.isdir(variants_dir):
+            return
+        try:
+            write_access_marker(get_website_dir(self.pk), self.get_access_token_fingerprint())
+        except OSError as e:
+            print(f"❌ Fehler beim Schreiben der Zugriffsinformationen für '{self.title}': {e}")
+            try:
+                os.remove(os.path.join(variants_dir, ACCESS_MARKER_FILENAME))
+            except FileNotFoundError:
+                pass
     
     def check_password(self, password: str) -> bool:
-        """Überprüft das Passwort für die Landingpage"""
+        """
+        Überprüft das Passwort für die Landingpage
+        
+        Fehlversuche werden im Cache gezählt (siehe deals.ratelimit), der Deal
+        wird dabei nicht gespeichert. Während einer Sperre wird das Passwort
+        gar nicht erst gehasht.
+        """
         from django.contrib.auth.hashers import check_password
-        from django.utils import timezone
+        from .ratelimit import register_failed_attempt, reset_attempts
         
         # Prüfe ob gesperrt
         if self.is_blocked():
@@ -781,22 +829,33 @@ class Deal(models.Model):
         # Prüfe Passwort
         if check_password(password, self.password_protection_password):
             # Erfolgreich - Reset Versuche
-            self.password_protection_attempts = 0
-            self.password_protection_last_attempt = timezone.now()
-            self.save()
+            reset_attempts(self)
             return True
         else:
-            # Fehlgeschlagen - Erhöhe Versuche
-            self.password_protection_attempts += 1
-            self.password_protection_last_attempt = timezone.now()
-            
-            # Prüfe ob gesperrt werden soll
-            if self.password_protection_attempts >= self.password_protection_max_attempts:
-                from datetime import timedelta
-                self.password_protection_blocked_until = timezone.now() + timedelta(minutes=self.password_protection_block_duration)
-            
-            self.save()
+            # Fehlgeschlagen - Fehlversuch zählen, ggf. Sperre starten
+            register_failed_attempt(self)
             return False
+
+    async def acheck_password(self, password: str) -> bool:
+        """Asynchrone Variante von check_password (das Hashing läuft im Thread-Pool)"""
+        from asgiref.sync import sync_to_async
+        
+        if self.is_blocked():
+            return False
+        return await sync_to_async(self.check_password)(password)
+
+    def get_access_token_fingerprint(self) -> str:
+        """
+        Gibt den Fingerabdruck des Passwort-Hashes für Zugriffstoken zurück
+        
+        Ändert sich mit jedem Passwortwechsel und macht damit alle zuvor
+        ausgestellten Token ungültig (siehe deals.access_tokens).
+        """
+        import hashlib
+        
+        if not self.password_protection_enabled or not self.password_protection_password:
+            return ''
+        return hashlib.sha256(self.password_protection_password.encode()).hexdigest()[:16]
     
     def is_blocked(self) -> bool:
         """Prüft ob der Zugriff gesperrt ist"""
@@ -807,9 +866,24 @@ class Deal(models.Model):
         
         return timezone.now() < self.password_protection_blocked_until
     
+    def get_failed_attempts(self) -> int:
+        """Gibt die Fehlversuche im aktuellen Zeitfenster zurück"""
+        from .ratelimit import get_failed_attempts
+        return get_failed_attempts(self)
+    
     def get_remaining_attempts(self) -> int:
         """Gibt die verbleibenden Versuche zurück"""
-        return max(0, self.password_protection_max_attempts - self.password_protection_attempts)
+        if self.is_blocked():
+            return 0
+        return max(0, self.password_protection_max_attempts - self.get_failed_attempts())
+    
+    async def aget_remaining_attempts(self) -> int:
+        """Asynchrone Variante von get_remaining_attempts (liest den Cache per aget)"""
+        from .ratelimit import aget_failed_attempts
+        
+        if self.is_blocked():
+            return 0
+        return max(0, self.password_protection_max_attempts - await aget_failed_attempts(self))
     
     def get_block_remaining_time(self) -> int:
         """Gibt die verbleibende Sperrzeit in Minuten zurück"""
@@ -826,8 +900,9 @@ class Deal(models.Model):
         if not self.password_protection_log_attempts:
             return
         
-        # Hier könnte ein Log-Eintrag erstellt werden
-        print(f"Passwortversuch für Deal '{self.title}': {'Erfolgreich' if success else 'Fehlgeschlagen'} - IP: {ip_address}")
+        # Nur anhängen - geschrieben wird gesammelt per bulk_create
+        from .audit import log_password_attempt
+        log_password_attempt(self.id, success, ip_address)
     
     def generate_random_url_code(self):
         """Generiert einen zufälligen URL-Code"""
@@ -996,7 +1071,8 @@ class Deal(models.Model):
                     title=file.title,
                     description=file.description,
                     file_source=file.file_source,
-                    file=file.file,  # Referenz auf dieselbe Datei
+                    file=file.file,  # Referenz auf denselben Blob
+                    original_name=file.original_name,
                     global_file=file.global_file,
                     file_type=file.file_type,
                     uploaded_by=file.uploaded_by,
@@ -1278,8 +1354,40 @@ def regenerate_website_on_file_delete(sender, instance, **kwargs):
     except Exception as e:
         print(f"❌ Fehler beim Starten der Website-Regenerierung nach Datei-Löschung: {e}")
 
+@receiver(post_save, sender='deals.DealFile')
+@receiver(post_delete, sender='deals.DealFile')
+@receiver(post_save, sender='deals.DealFileAssignment')
+@receiver(post_delete, sender='deals.DealFileAssignment')
+def invalidate_render_cache_on_file_change(sender, instance, **kwargs):
+    """
+    Verwirft das gecachte HTML eines Dealrooms bei Datei-Änderungen
+    
+    Datei-Änderungen ändern ``Deal.updated_at`` nicht, daher muss der
+    Render-Cache hier explizit geleert werden.
+    """
+    from generator.cache import invalidate_render_cache
+    invalidate_render_cache(instance.deal_id)
+
+
+@receiver(post_save, sender=Deal)
+@receiver(post_delete, sender=Deal)
+def invalidate_admin_dashboard_on_change(sender, instance, **kwargs):
+    """
+    Verwirft die gecachten Kennzahlen des Admin-Dashboards
+    
+    Nur für Deals: Ein Receiver auf ``DealAnalyticsEvent`` würde das schnelle
+    Löschen (Archivierung, Kaskade) abschalten und pro Zeile feuern. Die
+    Event-Summen folgen nach ``DEALROOM_ADMIN_DASHBOARD_CACHE_TIMEOUT``.
+    """
+    if kwargs.get('created') is False:
+        # Bearbeitungen (z.B. Zugriffszähler) ändern die Kennzahlen nicht
+        # nennenswert, den Rest fängt die kurze Cache-Dauer ab
+        return
+    from .admin_dashboard import invalidate_admin_dashboard
+    invalidate_admin_dashboard()
+
 
-class DealFile(models.Model):
+class DealFile(StoredFileMetadata):
     """
     Datei-Modell für Deal-bezogene Dateien
     """
@@ -1423,15 +1531,7 @@ class DealFile(models.Model):
     def get_file_size(self):
         """Gibt die Dateigröße zurück"""
         if self.file_source == self.FileSource.UPLOADED and self.file:
-            try:
-                size = self.file.size
-                for unit in ['B', 'KB', 'MB', 'GB']:
-                    if size < 1024.0:
-                        return f"{size:.1f} {unit}"
-                    size /= 1024.0
-                return f"{size:.1f} TB"
-            except:
-                return "Unbekannt"
+            return format_file_size(self.size_bytes)
         elif self.file_source == self.FileSource.GLOBAL_ASSIGNED and self.global_file:
             return self.global_file.get_file_size()
         return "Unbekannt"
@@ -1721,10 +1821,15 @@ class ContentBlock(models.Model):
         self.save(update_fields=['usage_count'])
 
 
-class MediaLibrary(models.Model):
+class MediaLibrary(StoredFileMetadata):
     """
     Zentrale Medienbibliothek für Landingpages
+    
+    Medien-URLs werden absolut in GrapesJS-Seiten und eigenes HTML kopiert;
+    ihre Blobs bleiben daher auch nach dem Löschen oder Ersetzen erhalten.
     """
+    PIN_BLOBS = True
+    
     class MediaType(models.TextChoices):
         IMAGE = 'image', _('Bild')
         VIDEO = 'video', _('Video')
@@ -1823,6 +1928,11 @@ class MediaLibrary(models.Model):
         self.save(update_fields=['usage_count'])
 
 
+# Geteilte Blobs freigeben, wenn die letzte Datei darauf gelöscht wird
+# (nicht für die MediaLibrary, siehe PIN_BLOBS)
+post_delete.connect(release_file_blob, sender=DealFile)
+
+
 class LayoutTemplate(models.Model):
     """
     Layout-Vorlagen für Landingpages
@@ -2149,6 +2259,58 @@ class CMSElement(models.Model):
 
 
 # Erweitere das bestehende DealAnalyticsEvent Model
+class AnalyticsUserAgent(models.Model):
+    """
+    Dictionary-Eintrag für einen User-Agent-String (siehe deals.interning)
+    """
+    DEVICE_CLASS_CHOICES = [
+        ('desktop', 'Desktop'),
+        ('mobile', 'Mobil'),
+        ('tablet', 'Tablet'),
+        ('bot', 'Bot'),
+        ('unknown', 'Unbekannt'),
+    ]
+    value = models.CharField(max_length=500, unique=True, verbose_name=_('User Agent'))
+    device_class = models.CharField(
+        max_length=10,
+        choices=DEVICE_CLASS_CHOICES,
+        default='unknown',
+        verbose_name=_('Geräteklasse')
+    )
+
+    class Meta:
+        verbose_name = 'Analytics-User-Agent'
+        verbose_name_plural = 'Analytics-User-Agents'
+
+    def __str__(self):
+        return self.value
+
+
+class AnalyticsReferrer(models.Model):
+    """
+    Dictionary-Eintrag für einen Referrer-Host (siehe deals.interning)
+    """
+    host = models.CharField(max_length=255, unique=True, verbose_name=_('Host'))
+
+    class Meta:
+        verbose_name = 'Analytics-Referrer'
+        verbose_name_plural = 'Analytics-Referrer'
+
+    def __str__(self):
+        return self.host
+
+
+class DealAnalyticsEventQuerySet(models.QuerySet):
+    """Abfragen auf Analytics-Events"""
+    
+    def bulk_create(self, objs, *args, **kwargs):
+        """Löst User-Agents und Referrer vor dem INSERT gesammelt auf"""
+        from .interning import intern_event_strings
+        objs = list(objs)
+        intern_event_strings(objs)
+        return super().bulk_create(objs, *args, **kwargs)
+
+
 class DealAnalyticsEvent(models.Model):
     """
     DSGVO-konformes Analytics-Event für Deal-Aktivitäten
@@ -2168,7 +2330,8 @@ class DealAnalyticsEvent(models.Model):
     event_type = models.CharField(max_length=20, choices=EVENT_TYPE_CHOICES)
     deal = models.ForeignKey('Deal', on_delete=models.CASCADE, related_name='analytics_events')
     user = models.ForeignKey('users.CustomUser', on_delete=models.SET_NULL, null=True, blank=True)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # default statt auto_now_add: gepufferte Events behalten den Zeitpunkt des Ingests
+    timestamp = models.DateTimeField(default=timezone.now, editable=False)
     meta = models.JSONField(blank=True, null=True)
     
     # DSGVO-konforme Daten
@@ -2179,6 +2342,14 @@ class DealAnalyticsEvent(models.Model):
         help_text=_('Wird anonymisiert gespeichert')
     )
     
+    visitor_hash = models.CharField(
+        max_length=16,
+        blank=True,
+        default='',
+        verbose_name=_('Besucher-Hash'),
+        help_text=_('Gesalzener Hash aus IP und User-Agent für eindeutige Besucher')
+    )
+    
     page_views = models.PositiveIntegerField(
         default=1,
         verbose_name=_('Seitenaufrufe')
@@ -2190,14 +2361,24 @@ class DealAnalyticsEvent(models.Model):
         verbose_name=_('Verbrachte Zeit')
     )
     
-    referrer = models.URLField(
-        blank=True,
+    # Dictionary-codiert (deals.interning); ohne Index, Einträge werden nie gelöscht
+    referrer_entry = models.ForeignKey(
+        'AnalyticsReferrer',
+        on_delete=models.PROTECT,
         null=True,
+        blank=True,
+        db_index=False,
+        related_name='+',
         verbose_name=_('Referrer')
     )
     
-    user_agent = models.TextField(
+    user_agent_entry = models.ForeignKey(
+        'AnalyticsUserAgent',
+        on_delete=models.PROTECT,
+        null=True,
         blank=True,
+        db_index=False,
+        related_name='+',
         verbose_name=_('User Agent')
     )
     
@@ -2239,6 +2420,12 @@ class DealAnalyticsEvent(models.Model):
         null=True,
         verbose_name=_('Session ID')
     )
+    
+    # Adaptives Sampling (deals.sampling): Anzahl Events, für die diese Zeile steht
+    sample_weight = models.PositiveIntegerField(
+        default=1,
+        verbose_name=_('Gewicht')
+    )
 
     class Meta:
         verbose_name = 'Deal-Analytics-Event'
@@ -2249,19 +2436,344 @@ class DealAnalyticsEvent(models.Model):
             models.Index(fields=['visitor_ip', 'timestamp']),
         ]
 
+    objects = DealAnalyticsEventQuerySet.as_manager()
+
+    # Rohwerte bis zum Speichern (siehe user_agent/referrer)
+    _user_agent = None
+    _referrer = None
+
     def __str__(self):
         return f"{self.get_event_type_display()} ({self.deal.title}) am {self.timestamp:%d.%m.%Y %H:%M}"
     
+    @property
+    def user_agent(self):
+        """User-Agent-String (vor dem Speichern der Rohwert)"""
+        if self._user_agent is not None:
+            return self._user_agent
+        return self.user_agent_entry.value if self.user_agent_entry_id else ''
+    
+    @user_agent.setter
+    def user_agent(self, value):
+        self._user_agent = value or ''
+    
+    @property
+    def referrer(self):
+        """Referrer (vor dem Speichern die URL, danach nur der Host)"""
+        if self._referrer is not None:
+            return self._referrer
+        return self.referrer_entry.host if self.referrer_entry_id else None
+    
+    @referrer.setter
+    def referrer(self, value):
+        self._referrer = value or ''
+    
+    @property
+    def device_class(self):
+        """Geräteklasse aus dem User-Agent"""
+        from .interning import parse_device_class
+        return parse_device_class(self.user_agent)
+    
     def anonymize_ip(self):
         """Anonymisiert IP-Adresse für DSGVO-Compliance"""
-        if self.visitor_ip:
-            ip_parts = str(self.visitor_ip).split('.')
-            if len(ip_parts) == 4:
-                return f"{ip_parts[0]}.{ip_parts[1]}.*.*"
-        return self.visitor_ip
+        from .ingest import anonymize_ip_address
+        return anonymize_ip_address(self.visitor_ip)
     
     def save(self, *args, **kwargs):
         """Speichert mit anonymisierter IP"""
         if self.anonymized and self.visitor_ip:
             self.visitor_ip = self.anonymize_ip()
+        if self._user_agent is not None or self._referrer is not None:
+            from .interning import intern_event_strings
+            intern_event_strings([self])
+        super().save(*args, **kwargs)
+
+
+class DealAnalyticsDaily(models.Model):
+    """
+    Tages-Rollup der Analytics-Events eines Dealrooms
+    
+    Wird für abgeschlossene Tage aus den Events berechnet (siehe
+    deals.rollups); das Dashboard liest nur diese Zeilen plus die Events
+    des laufenden Tages.
+    """
+    
+    deal = models.ForeignKey(
+        Deal,
+        on_delete=models.CASCADE,
+        related_name='analytics_daily',
+        verbose_name=_('Deal')
+    )
+    
+    day = models.DateField(
+        verbose_name=_('Tag')
+    )
+    
+    page_views = models.PositiveIntegerField(default=0, verbose_name=_('Seitenaufrufe'))
+    visitors = models.PositiveIntegerField(default=0, verbose_name=_('Besucher'))  # eindeutig an diesem Tag
+    clicks = models.PositiveIntegerField(default=0, verbose_name=_('Klicks'))
+    downloads = models.PositiveIntegerField(default=0, verbose_name=_('Downloads'))
+    conversions = models.PositiveIntegerField(default=0, verbose_name=_('Conversions'))
+    
+    time_spent_total = models.FloatField(
+        default=0,
+        verbose_name=_('Verbrachte Zeit gesamt (s)')
+    )
+    
+    time_spent_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name=_('Zeit-Events')
+    )
+    
+    top_elements = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name=_('Klicks pro Element')
+    )
+    
+    visitor_sketch = models.BinaryField(
+        null=True,
+        blank=True,
+        verbose_name=_('Besucher-Sketch'),
+        help_text=_('HyperLogLog-Sketch der Besucher-Hashes (siehe deals.hll)')
+    )
+    
+    # Aus DealAnalyticsSession abgeleitet (siehe deals.sessions), inkl. laufendem Tag
+    sessions = models.PositiveIntegerField(default=0, verbose_name=_('Sessions'))
+    bounces = models.PositiveIntegerField(default=0, verbose_name=_('Bounces'))
+    session_seconds_total = models.FloatField(default=0, verbose_name=_('Session-Dauer gesamt (s)'))
+    scroll_depth_total = models.PositiveIntegerField(default=0, verbose_name=_('Scrolltiefe gesamt (%)'))
+    scroll_sessions = models.PositiveIntegerField(default=0, verbose_name=_('Sessions mit Scrolltiefe'))
+    
+    updated_at = models.DateTimeField(auto_now=True, verbose_name=_('Aktualisiert am'))
+    
+    class Meta:
+        verbose_name = _('Analytics-Tageswert')
+        verbose_name_plural = _('Analytics-Tageswerte')
+        ordering = ['deal', 'day']
+        constraints = [
+            models.UniqueConstraint(fields=['deal', 'day'], name='unique_deal_analytics_day'),
+        ]
+    
+    def __str__(self):
+        return f"{self.deal_id} am {self.day:%d.%m.%Y}: {self.page_views} Aufrufe"
+
+
+class DealAnalyticsSession(models.Model):
+    """
+    Zusammengeführte Session eines Besuchers (siehe deals.sessions)
+    
+    Entsteht serverseitig aus den Events einer ``session_id`` (bzw. des
+    Besucher-Hashes); eine Pause länger als das Session-Timeout beginnt eine
+    neue Session.
+    """
+    
+    deal = models.ForeignKey(
+        Deal,
+        on_delete=models.CASCADE,
+        related_name='analytics_sessions',
+        verbose_name=_('Deal')
+    )
+    session_key = models.CharField(max_length=64, verbose_name=_('Session'))
+    day = models.DateField(verbose_name=_('Tag'), help_text=_('Lokaler Tag des Session-Beginns'))
+    started_at = models.DateTimeField(verbose_name=_('Beginn'))
+    ended_at = models.DateTimeField(verbose_name=_('Letztes Event'))
+    events = models.PositiveIntegerField(default=0, verbose_name=_('Events'))
+    page_views = models.PositiveIntegerField(default=0, verbose_name=_('Seitenaufrufe'))
+    interactions = models.PositiveIntegerField(default=0, verbose_name=_('Interaktionen'))
+    reported_seconds = models.FloatField(
+        default=0,
+        verbose_name=_('Gemeldete Zeit (s)'),
+        help_text=_('Summe der time_spent-Events des Clients')
+    )
+    duration_seconds = models.FloatField(default=0, verbose_name=_('Dauer (s)'))
+    max_scroll_depth = models.PositiveSmallIntegerField(null=True, blank=True, verbose_name=_('Scrolltiefe (%)'))
+    is_bounce = models.BooleanField(default=True, verbose_name=_('Bounce'))
+    updated_at = models.DateTimeField(auto_now=True, verbose_name=_('Aktualisiert am'))
+    
+    class Meta:
+        verbose_name = _('Analytics-Session')
+        verbose_name_plural = _('Analytics-Sessions')
+        ordering = ['deal', 'started_at']
+        constraints = [
+            models.UniqueConstraint(fields=['deal', 'session_key', 'started_at'], name='unique_deal_session_start'),
+        ]
+        indexes = [
+            models.Index(fields=['deal', 'day']),
+        ]
+    
+    def __str__(self):
+        return f"{self.deal_id} {self.session_key}: {self.duration_seconds:.0f}s"
+
+
+class DealHeatmap(models.Model):
+    """
+    Klick-Heatmap eines Dealrooms pro Viewport und Element
+    
+    Die Zählwerte liegen als komprimiertes uint32-Raster vor (siehe
+    deals.heatmaps); ``element_id`` leer steht für die ganze Seite.
+    """
+    
+    deal = models.ForeignKey(
+        Deal,
+        on_delete=models.CASCADE,
+        related_name='heatmaps',
+        verbose_name=_('Deal')
+    )
+    
+    viewport = models.CharField(max_length=20, verbose_name=_('Viewport'))
+    
+    element_id = models.CharField(
+        max_length=100,
+        blank=True,
+        default='',
+        verbose_name=_('Element ID')
+    )
+    
+    x_bins = models.PositiveSmallIntegerField(verbose_name=_('Spalten'))
+    y_bins = models.PositiveIntegerField(default=0, verbose_name=_('Zeilen'))
+    bin_width = models.FloatField(verbose_name=_('Spaltenbreite (px)'))
+    bin_height = models.FloatField(verbose_name=_('Zeilenhöhe (px)'))
+    
+    counts = models.BinaryField(verbose_name=_('Zählwerte'))
+    total_clicks = models.PositiveIntegerField(default=0, verbose_name=_('Klicks'))
+    last_event_id = models.BigIntegerField(default=0, verbose_name=_('Letzte Event-ID'))
+    updated_at = models.DateTimeField(auto_now=True, verbose_name=_('Aktualisiert am'))
+    
+    class Meta:
+        verbose_name = _('Heatmap')
+        verbose_name_plural = _('Heatmaps')
+        constraints = [
+            models.UniqueConstraint(fields=['deal', 'viewport', 'element_id'], name='unique_deal_heatmap'),
+        ]
+    
+    def __str__(self):
+        return f"{self.deal_id} {self.viewport} {self.element_id or 'Seite'}: {self.total_clicks} Klicks"
+
+
+class AnalyticsWatermark(models.Model):
+    """
+    Fortschritt einer Analytics-Batch-Verarbeitung
+    
+    Alle Events mit ID <= last_event_id sind von der Verarbeitung
+    ``name`` (z.B. 'daily_rollup') bereits erfasst.
+    """
+    
+    name = models.CharField(max_length=50, unique=True, verbose_name=_('Name'))
+    last_event_id = models.BigIntegerField(default=0, verbose_name=_('Letzte Event-ID'))
+    updated_at = models.DateTimeField(auto_now=True, verbose_name=_('Aktualisiert am'))
+    
+    class Meta:
+        verbose_name = _('Analytics-Wasserstand')
+        verbose_name_plural = _('Analytics-Wasserstände')
+    
+    def __str__(self):
+        return f"{self.name}: {self.last_event_id}"
+
+
+class AnalyticsArchive(models.Model):
+    """
+    Archivdatei mit aus der Datenbank verschobenen Analytics-Events
+    
+    Jede Datei enthält Events eines Monats mit IDs von first_event_id bis
+    last_event_id (siehe ``deals.archive``). Nur hier eingetragene Dateien
+    gelten als archiviert.
+    """
+    
+    month = models.DateField(verbose_name=_('Monat'), help_text=_('Erster Tag des Monats'))
+    path = models.CharField(max_length=255, unique=True, verbose_name=_('Datei'), help_text=_('Relativ zum Archiv-Verzeichnis'))
+    first_event_id = models.BigIntegerField(verbose_name=_('Erste Event-ID'))
+    last_event_id = models.BigIntegerField(verbose_name=_('Letzte Event-ID'))
+    event_count = models.PositiveIntegerField(verbose_name=_('Anzahl Events'))
+    size_bytes = models.PositiveBigIntegerField(verbose_name=_('Größe (Bytes)'))
+    archived_before = models.DateField(
+        verbose_name=_('Archiviert vor'),
+        help_text=_('Stichtag der Archivierung: alle Events davor wurden verschoben')
+    )
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name=_('Erstellt am'))
+    
+    class Meta:
+        verbose_name = _('Analytics-Archiv')
+        verbose_name_plural = _('Analytics-Archive')
+        ordering = ['month', 'first_event_id']
+    
+    def __str__(self):
+        return f"{self.month:%Y-%m}: {self.event_count} Events ({self.path})"
+
+
+class PasswordAttemptQuerySet(models.QuerySet):
+    """Abfragen auf das Audit-Log der Passwortversuche"""
+    
+    def for_deal(self, deal):
+        """Versuche eines Dealrooms (Objekt oder ID)"""
+        return self.filter(deal_id=getattr(deal, 'pk', deal))
+    
+    def from_ip_prefix(self, prefix: str):
+        """Versuche aus einem IP-Bereich, z.B. '192.168.' oder '2001:db8:'"""
+        return self.filter(ip_address__startswith=prefix)
+    
+    def in_window(self, since=None, until=None):
+        """Versuche in einem Zeitfenster [since, until)"""
+        queryset = self
+        if since is not None:
+            queryset = queryset.filter(timestamp__gte=since)
+        if until is not None:
+            queryset = queryset.filter(timestamp__lt=until)
+        return queryset
+    
+    def failed(self):
+        """Nur fehlgeschlagene Versuche"""
+        return self.filter(success=False)
+
+
+class PasswordAttempt(models.Model):
+    """
+    Audit-Log der Passwortversuche für passwortgeschützte Landingpages
+    
+    Wird nur angehängt, nie geändert. Einträge werden im Prozess gepuffert
+    und gesammelt per bulk_create geschrieben (siehe deals.audit).
+    Die IP wird für Sicherheitsanalysen vollständig gespeichert.
+    """
+    
+    deal = models.ForeignKey(
+        Deal,
+        on_delete=models.CASCADE,
+        related_name='password_attempts',
+        verbose_name=_('Deal')
+    )
+    
+    timestamp = models.DateTimeField(
+        verbose_name=_('Zeitpunkt')
+    )
+    
+    success = models.BooleanField(
+        verbose_name=_('Erfolgreich')
+    )
+    
+    ip_address = models.CharField(
+        max_length=45,
+        blank=True,
+        default='',
+        verbose_name=_('IP-Adresse')
+    )
+    
+    objects = PasswordAttemptQuerySet.as_manager()
+    
+    class Meta:
+        verbose_name = _('Passwortversuch')
+        verbose_name_plural = _('Passwortversuche')
+        ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['deal', 'timestamp']),
+            models.Index(fields=['ip_address', 'timestamp']),
+            models.Index(fields=['timestamp']),
+        ]
+    
+    def __str__(self):
+        status = 'Erfolgreich' if self.success else 'Fehlgeschlagen'
+        return f"{status} ({self.ip_address or '-'}) am {self.timestamp:%d.%m.%Y %H:%M:%S}"
+    
+    def save(self, *args, **kwargs):
+        """Nur neue Einträge speichern (Audit-Log ist unveränderlich)"""
+        if self.pk is not None:
+            raise ValueError('Passwortversuche können nicht geändert werden.')
         super().save(*args, **kwargs)
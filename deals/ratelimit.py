@@ -0,0 +1,124 @@
+"""
+Rate-Limiting für Passwortversuche
+==================================
+
+Fehlversuche werden nicht mehr am Deal gespeichert, sondern mit einem
+Zähler im festen Zeitfenster im Cache gezählt (atomares ``incr``). Das
+Fenster beginnt mit dem ersten Fehlversuch und läuft nach
+``password_protection_block_duration`` Minuten ab; danach beginnt die
+Zählung von vorn.
+
+Erst wenn ``password_protection_max_attempts`` Fehlversuche im Fenster
+erreicht sind, wird die Sperre kompakt per ``UPDATE`` persistiert - ohne
+``Deal.save()``, also ohne ``auto_generate_website``.
+
+Async-Views lesen den Zähler über ``aget_failed_attempts`` (``cache.aget``).
+
+Für mehrere Worker-Prozesse muss ``CACHE_BACKEND`` auf einen gemeinsamen
+Cache zeigen (z.B. Redis oder Memcached); der Standard-LocMemCache zählt pro
+Prozess.
+"""
+
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.utils import timezone
+
+PASSWORD_ATTEMPTS_PREFIX = 'dealroom:pw-attempts'
+
+
+def get_attempts_cache_key(deal_id: int) -> str:
+    """
+    Gibt den Cache-Key für den Fehlversuchs-Zähler eines Dealrooms zurück
+
+    Args:
+        deal_id: ID des Dealrooms
+
+    Returns:
+        str: Cache-Key
+    """
+    return f'{PASSWORD_ATTEMPTS_PREFIX}:{deal_id}'
+
+
+def get_failed_attempts(deal) -> int:
+    """
+    Gibt die Fehlversuche im aktuellen Zeitfenster zurück
+
+    Args:
+        deal: Dealroom-Objekt
+
+    Returns:
+        int: Anzahl der Fehlversuche
+    """
+    return cache.get(get_attempts_cache_key(deal.id), 0)
+
+
+async def aget_failed_attempts(deal) -> int:
+    """Asynchrone Variante von get_failed_attempts"""
+    return await cache.aget(get_attempts_cache_key(deal.id), 0)
+
+
+def register_failed_attempt(deal) -> bool:
+    """
+    Zählt einen Fehlversuch; startet eine Sperre, wenn das Maximum erreicht ist
+
+    Args:
+        deal: Dealroom-Objekt
+
+    Returns:
+        bool: True wenn mit diesem Versuch eine Sperre begonnen hat
+    """
+    key = get_attempts_cache_key(deal.id)
+    window = deal.password_protection_block_duration * 60
+
+    # add() legt das Zeitfenster nur beim ersten Fehlversuch an
+    cache.add(key, 0, window)
+    try:
+        attempts = cache.incr(key)
+    except ValueError:
+        # Zeitfenster ist zwischen add() und incr() abgelaufen
+        cache.add(key, 1, window)
+        attempts = 1
+
+    if attempts < deal.password_protection_max_attempts:
+        return False
+
+    start_block(deal, attempts)
+    return True
+
+
+def start_block(deal, attempts: int) -> None:
+    """
+    Persistiert den Beginn einer Sperre
+
+    Schreibt nur die drei Sperr-Felder per UPDATE und löscht den Zähler,
+    damit nach Ablauf der Sperre wieder alle Versuche zur Verfügung stehen.
+
+    Args:
+        deal: Dealroom-Objekt
+        attempts: Anzahl der Fehlversuche, die zur Sperre geführt haben
+    """
+    from .models import Deal
+
+    now = timezone.now()
+    blocked_until = now + timedelta(minutes=deal.password_protection_block_duration)
+    Deal.objects.filter(pk=deal.pk).update(
+        password_protection_attempts=attempts,
+        password_protection_last_attempt=now,
+        password_protection_blocked_until=blocked_until
+    )
+    deal.password_protection_attempts = attempts
+    deal.password_protection_last_attempt = now
+    deal.password_protection_blocked_until = blocked_until
+
+    cache.delete(get_attempts_cache_key(deal.id))
+
+
+def reset_attempts(deal) -> None:
+    """
+    Setzt den Fehlversuchs-Zähler eines Dealrooms zurück (z.B. nach erfolgreichem Login)
+
+    Args:
+        deal: Dealroom-Objekt
+    """
+    cache.delete(get_attempts_cache_key(deal.id))
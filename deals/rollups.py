@@ -0,0 +1,426 @@
+"""
+Tages-Rollups der Analytics-Events
+==================================
+
+``DealAnalyticsDaily`` hält pro (Dealroom, Tag) die Kennzahlen des
+Analytics-Dashboards. Rollups werden nur für abgeschlossene Tage berechnet;
+der laufende Tag wird live aus den Events gelesen. Damit bleibt die
+Ladezeit des Dashboards unabhängig von der Gesamtzahl der Events.
+
+Aktualisiert wird inkrementell:
+
+- ``update_rollups`` (Command ``rollup_analytics``, täglich nach
+  Mitternacht per Cron) verarbeitet nur Events oberhalb des Wasserstands
+  ``AnalyticsWatermark('daily_rollup')``. Fehlt der Lauf, stößt der erste
+  Dashboard-Aufruf des Tages ihn in einem Hintergrund-Thread an; der
+  Request wartet nicht darauf.
+- Der Schreibpuffer ruft nach jedem Flush ``rollup_late_events`` auf, damit
+  verspätete Events (z.B. aus Spill-Dateien) vergangene Tage sofort
+  korrigieren.
+
+Ein Rollup wird immer vollständig aus den Events seines Tages neu berechnet
+und per Upsert geschrieben; mehrfaches Ausführen ist daher unschädlich.
+
+Tage, deren Events bereits archiviert sind (``deals.archive``), werden nicht
+mehr neu berechnet - ihre Rollups sind der einzige Stand in der Datenbank.
+
+Gesampelte Klicks (``deals.sampling``) zählen mit ihrem ``sample_weight``.
+
+Eindeutige Besucher werden pro Tag als HyperLogLog-Sketch gespeichert
+(``deals.hll``); ``get_visitor_sketch`` vereinigt sie für beliebige
+Zeiträume und Dealrooms.
+"""
+
+import threading
+from collections import Counter
+from datetime import datetime, time, timedelta
+
+from django.db import connection
+from django.db.models import Count, Max, Min, Q, Sum
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from .hll import HyperLogLog
+
+ROLLUP_WATERMARK = 'daily_rollup'
+
+# Anzahl der Elemente, deren Klicks pro Tag gespeichert werden
+TOP_ELEMENTS_LIMIT = 50
+
+_ROLLUP_FIELDS = [
+    'page_views', 'visitors', 'clicks', 'downloads', 'conversions',
+    'time_spent_total', 'time_spent_count', 'top_elements', 'visitor_sketch', 'updated_at',
+]
+
+
+def get_day_start(day):
+    """
+    Gibt den Beginn eines Tages in der aktuellen Zeitzone zurück
+
+    Args:
+        day: Datum
+
+    Returns:
+        datetime: Aware-Datetime um 00:00 Uhr
+    """
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _daily_aggregates():
+    """Aggregate für einen Tag, gemeinsam für Rollups und den Live-Anteil"""
+    return {
+        'page_views': Count('id', filter=Q(event_type='page_view')),
+        # Klicks können gesampelt sein (deals.sampling): Gewichte statt Zeilen
+        'clicks': Coalesce(Sum('sample_weight', filter=Q(event_type='click')), 0),
+        'downloads': Count('id', filter=Q(event_type='download')),
+        'conversions': Count('id', filter=Q(event_type='form_submit')),
+        'time_spent_sum': Sum('time_spent', filter=Q(event_type='time_spent')),
+        'time_spent_count': Count('time_spent', filter=Q(event_type='time_spent')),
+    }
+
+
+def _visitor_ids(events):
+    """
+    Liefert (deal_id, day, Besucher-ID) der Seitenaufrufe
+
+    Ältere Events ohne Besucher-Hash zählen über die anonymisierte IP.
+    """
+    rows = events.filter(event_type='page_view').values_list(
+        'deal_id', 'day', 'visitor_hash', 'visitor_ip'
+    ).order_by()
+    for deal_id, day, visitor_hash, visitor_ip in rows.iterator(chunk_size=2000):
+        visitor_id = visitor_hash or visitor_ip
+        if visitor_id:
+            yield deal_id, day, visitor_id
+
+
+def _build_sketch(visitor_ids):
+    """Baut einen Sketch aus einer Menge von Besucher-IDs"""
+    sketch = HyperLogLog()
+    sketch.update(visitor_ids)
+    return sketch
+
+
+def rollup_days(pairs):
+    """
+    Berechnet die Rollups für (Dealroom-ID, Tag)-Paare neu
+
+    Zwei gruppierte Abfragen und eine über die Besucher-IDs des betroffenen
+    Zeitraums, ein Upsert. Paare ohne Events und bereits archivierte Tage
+    werden übersprungen.
+
+    Args:
+        pairs: Iterable von (deal_id, date)
+
+    Returns:
+        int: Anzahl geschriebener Rollups
+    """
+    from .models import AnalyticsArchive, DealAnalyticsDaily, DealAnalyticsEvent
+
+    pairs = set(pairs)
+    if not pairs:
+        return 0
+
+    archived_before = AnalyticsArchive.objects.aggregate(day=Max('archived_before'))['day']
+    if archived_before is not None:
+        pairs = {(deal_id, day) for deal_id, day in pairs if day >= archived_before}
+        if not pairs:
+            return 0
+
+    days = {day for _, day in pairs}
+    events = DealAnalyticsEvent.objects.filter(
+        deal_id__in={deal_id for deal_id, _ in pairs},
+        timestamp__gte=get_day_start(min(days)),
+        timestamp__lt=get_day_start(max(days) + timedelta(days=1)),
+    ).annotate(day=TruncDate('timestamp'))
+
+    rows = {}
+    for values in events.values('deal_id', 'day').annotate(**_daily_aggregates()).order_by():
+        key = (values['deal_id'], values['day'])
+        if key not in pairs:
+            continue
+        time_spent_sum = values.pop('time_spent_sum')
+        rows[key] = DealAnalyticsDaily(
+            deal_id=values['deal_id'],
+            day=values['day'],
+            page_views=values['page_views'],
+            clicks=values['clicks'],
+            downloads=values['downloads'],
+            conversions=values['conversions'],
+            time_spent_total=time_spent_sum.total_seconds() if time_spent_sum else 0,
+            time_spent_count=values['time_spent_count'],
+            top_elements={},
+        )
+
+    clicks = events.filter(event_type='click').values('deal_id', 'day', 'element_id').annotate(
+        count=Sum('sample_weight')
+    ).order_by('-count')
+    for values in clicks:
+        row = rows.get((values['deal_id'], values['day']))
+        if row is not None and len(row.top_elements) < TOP_ELEMENTS_LIMIT:
+            row.top_elements[values['element_id'] or ''] = values['count']
+
+    visitors = {}
+    for deal_id, day, visitor_id in _visitor_ids(events):
+        if (deal_id, day) in rows:
+            visitors.setdefault((deal_id, day), set()).add(visitor_id)
+
+    now = timezone.now()
+    for key, row in rows.items():
+        day_visitors = visitors.get(key, ())
+        row.visitors = len(day_visitors)
+        row.visitor_sketch = _build_sketch(day_visitors).to_bytes() if day_visitors else None
+        row.updated_at = now
+
+    DealAnalyticsDaily.objects.bulk_create(
+        rows.values(),
+        update_conflicts=True,
+        unique_fields=['deal', 'day'],
+        update_fields=_ROLLUP_FIELDS,
+    )
+    return len(rows)
+
+
+def update_rollups():
+    """
+    Erstellt Rollups für alle abgeschlossenen Tage mit neuen Events
+
+    Der Wasserstand rückt bis vor das erste Event des laufenden Tages vor,
+    damit dessen Events nach Mitternacht mit erfasst werden. Anschließend
+    werden neue Events zu Sessions zusammengeführt (``deals.sessions``).
+
+    Returns:
+        dict: Anzahl aktualisierter Tage, neuer Wasserstand und geänderter Sessions
+    """
+    from .models import AnalyticsWatermark, DealAnalyticsEvent
+
+    watermark, _ = AnalyticsWatermark.objects.get_or_create(name=ROLLUP_WATERMARK)
+    today_start = get_day_start(timezone.localdate())
+    pending = DealAnalyticsEvent.objects.filter(id__gt=watermark.last_event_id)
+
+    pairs = set(
+        pending.filter(timestamp__lt=today_start)
+        .annotate(day=TruncDate('timestamp'))
+        .values_list('deal_id', 'day')
+        .distinct()
+        .order_by()
+    )
+    updated = rollup_days(pairs)
+
+    bounds = pending.aggregate(
+        first_open=Min('id', filter=Q(timestamp__gte=today_start)),
+        last=Max('id'),
+    )
+    if bounds['first_open'] is not None:
+        watermark.last_event_id = bounds['first_open'] - 1
+    elif bounds['last'] is not None:
+        watermark.last_event_id = bounds['last']
+    watermark.save()
+
+    from .sessions import update_sessions
+    sessions = update_sessions()
+
+    return {'days': updated, 'watermark': watermark.last_event_id, 'sessions': sessions['sessions']}
+
+
+_rollup_lock = threading.Lock()
+
+
+def ensure_rollups():
+    """
+    Stößt das Aktualisieren der Rollups an, wenn es heute noch nicht lief
+
+    Kostet eine Abfrage. Veraltete Rollups werden in einem Hintergrund-Thread
+    aktualisiert (höchstens einer pro Prozess); bis dahin fehlen im
+    Dashboard die Tage seit dem letzten Lauf.
+
+    Returns:
+        threading.Thread oder None: Der gestartete Thread
+    """
+    from .models import AnalyticsWatermark
+
+    watermark = AnalyticsWatermark.objects.filter(name=ROLLUP_WATERMARK).only('updated_at').first()
+    if watermark is not None and timezone.localdate(watermark.updated_at) >= timezone.localdate():
+        return None
+    if not _rollup_lock.acquire(blocking=False):
+        # Läuft bereits
+        return None
+
+    def run():
+        try:
+            update_rollups()
+        except Exception as e:
+            print(f"❌ Fehler beim Aktualisieren der Analytics-Rollups: {e}")
+        finally:
+            _rollup_lock.release()
+            connection.close()
+
+    thread = threading.Thread(target=run, name='analytics-rollups')
+    thread.daemon = True
+    thread.start()
+    return thread
+
+
+def rollup_late_events(events):
+    """
+    Aktualisiert die Rollups vergangener Tage für gerade geschriebene Events
+
+    Events des laufenden Tages werden ignoriert (sie werden live gelesen).
+
+    Args:
+        events: Gespeicherte DealAnalyticsEvent-Objekte
+
+    Returns:
+        int: Anzahl aktualisierter Rollups
+    """
+    today = timezone.localdate()
+    pairs = set()
+    for event in events:
+        day = timezone.localdate(event.timestamp)
+        if day < today:
+            pairs.add((event.deal_id, day))
+    return rollup_days(pairs)
+
+
+def get_visitor_sketch(deals=None, since=None, until=None):
+    """
+    Vereinigt die Besucher-Sketches beliebiger Dealrooms und Zeiträume
+
+    Abgeschlossene Tage kommen aus den Rollups; liegt der laufende Tag im
+    Zeitraum, werden dessen Seitenaufrufe live hinzugenommen.
+
+    Args:
+        deals: Dealroom-Objekte oder IDs (None = alle)
+        since: Erster Tag (inklusive, optional)
+        until: Letzter Tag (inklusive, optional)
+
+    Returns:
+        HyperLogLog: Vereinigter Sketch (``count()`` für die Schätzung,
+        ``relative_error`` für den Standardfehler)
+    """
+    from .models import DealAnalyticsDaily, DealAnalyticsEvent
+
+    ensure_rollups()
+
+    today = timezone.localdate()
+    deal_ids = None if deals is None else [getattr(deal, 'pk', deal) for deal in deals]
+
+    rollups = DealAnalyticsDaily.objects.filter(day__lt=today, visitor_sketch__isnull=False)
+    if deal_ids is not None:
+        rollups = rollups.filter(deal_id__in=deal_ids)
+    if since is not None:
+        rollups = rollups.filter(day__gte=since)
+    if until is not None:
+        rollups = rollups.filter(day__lte=until)
+
+    sketch = HyperLogLog.union(
+        HyperLogLog.from_bytes(data) for data in rollups.values_list('visitor_sketch', flat=True).iterator()
+    )
+
+    if (since is None or since <= today) and (until is None or until >= today):
+        live_events = DealAnalyticsEvent.objects.filter(timestamp__gte=get_day_start(today))
+        if deal_ids is not None:
+            live_events = live_events.filter(deal_id__in=deal_ids)
+        live_events = live_events.annotate(day=TruncDate('timestamp'))
+        sketch.update(visitor_id for _, _, visitor_id in _visitor_ids(live_events))
+    return sketch
+
+
+def count_unique_visitors(deals=None, since=None, until=None) -> int:
+    """
+    Schätzt die eindeutigen Besucher für Dealrooms und Zeitraum
+
+    Args:
+        deals: Dealroom-Objekte oder IDs (None = alle)
+        since: Erster Tag (inklusive, optional)
+        until: Letzter Tag (inklusive, optional)
+
+    Returns:
+        int: Geschätzte Anzahl eindeutiger Besucher
+    """
+    return get_visitor_sketch(deals, since, until).count()
+
+
+def get_dashboard_stats(deal):
+    """
+    Kennzahlen für das Analytics-Dashboard eines Dealrooms
+
+    Liest die Rollups abgeschlossener Tage und die Events des laufenden
+    Tages (fünf Abfragen, unabhängig von der Gesamtzahl der Events).
+
+    Args:
+        deal: Dealroom-Objekt
+
+    Returns:
+        dict: Kontext für deals/analytics_dashboard.html
+    """
+    from .models import DealAnalyticsDaily, DealAnalyticsEvent
+
+    ensure_rollups()
+
+    today = timezone.localdate()
+    all_rows = list(
+        DealAnalyticsDaily.objects.filter(deal=deal, day__lte=today).values(
+            'day', 'page_views', 'conversions', 'time_spent_total', 'time_spent_count', 'top_elements',
+            'visitor_sketch', 'sessions', 'bounces', 'session_seconds_total', 'scroll_depth_total', 'scroll_sessions'
+        ).order_by('day')
+    )
+    # Event-Kennzahlen des laufenden Tages kommen live aus den Events,
+    # Session-Kennzahlen auch heute aus den Tageswerten
+    rows = [row for row in all_rows if row['day'] < today]
+
+    live_events = DealAnalyticsEvent.objects.filter(deal=deal, timestamp__gte=get_day_start(today))
+    live = live_events.aggregate(**_daily_aggregates())
+    live_clicks = live_events.filter(event_type='click').values('element_id').annotate(
+        count=Sum('sample_weight')
+    ).order_by()
+
+    page_views = sum(row['page_views'] for row in rows) + live['page_views']
+    conversions = sum(row['conversions'] for row in rows) + live['conversions']
+    time_spent_total = sum(row['time_spent_total'] for row in rows)
+    if live['time_spent_sum']:
+        time_spent_total += live['time_spent_sum'].total_seconds()
+    time_spent_count = sum(row['time_spent_count'] for row in rows) + live['time_spent_count']
+
+    element_clicks = Counter()
+    for row in rows:
+        element_clicks.update(row['top_elements'])
+    for values in live_clicks:
+        element_clicks[values['element_id'] or ''] += values['count']
+
+    daily_views = [{'date': row['day'].isoformat(), 'views': row['page_views']} for row in rows if row['page_views']]
+    if live['page_views']:
+        daily_views.append({'date': today.isoformat(), 'views': live['page_views']})
+
+    visitor_sketch = HyperLogLog.union(
+        HyperLogLog.from_bytes(row['visitor_sketch']) for row in rows if row['visitor_sketch']
+    )
+    visitor_sketch.update(
+        visitor_id for _, _, visitor_id in _visitor_ids(live_events.annotate(day=TruncDate('timestamp')))
+    )
+
+    sessions = sum(row['sessions'] for row in all_rows)
+    scroll_sessions = sum(row['scroll_sessions'] for row in all_rows)
+    if sessions:
+        # Serverseitige Verweildauer aller Sessions statt einzelner Zeit-Events
+        avg_time_spent = sum(row['session_seconds_total'] for row in all_rows) / sessions
+    else:
+        avg_time_spent = time_spent_total / time_spent_count if time_spent_count else None
+
+    return {
+        # Eindeutige Besucher über alle Tage (HyperLogLog-Schätzung)
+        'total_visitors': visitor_sketch.count(),
+        'total_page_views': page_views,
+        'avg_time_spent': avg_time_spent,
+        'total_sessions': sessions,
+        'bounce_rate': (sum(row['bounces'] for row in all_rows) / sessions * 100) if sessions else None,
+        'avg_scroll_depth': (
+            sum(row['scroll_depth_total'] for row in all_rows) / scroll_sessions if scroll_sessions else None
+        ),
+        'conversion_rate': (conversions / page_views * 100) if page_views > 0 else 0,
+        'top_elements': [
+            {'element_id': element_id or None, 'click_count': count}
+            for element_id, count in element_clicks.most_common(10)
+        ],
+        'daily_views': daily_views,
+    }
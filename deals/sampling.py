@@ -0,0 +1,134 @@
+"""
+Adaptives Sampling von Analytics-Events
+=======================================
+
+Ein viraler Dealroom erzeugt Klicks und Scroll-Events schneller, als wir
+sie speichern wollen. Pro Dealroom und Event-Typ zählt der Sampler die
+eingehenden Events je Zeitfenster und speichert nur jedes N-te; die
+gespeicherte Zeile trägt ``sample_weight = N`` und steht für sich und die
+folgenden N - 1 verworfenen Events. Rollups, Sessions, Heatmaps
+und Funnels summieren Gewichte statt Zeilen und bleiben so erwartungstreu.
+
+- N ergibt sich zu Beginn jedes Fensters aus dem Volumen des vorherigen
+  (``ceil(gesehen / Budget)``) und verdoppelt sich innerhalb des Fensters,
+  sobald das Budget beim aktuellen N überschritten wird.
+- Nur ``SAMPLED_EVENT_TYPES`` werden gesampelt; Seitenaufrufe und
+  Conversions (Downloads, Formulare) immer vollständig gespeichert.
+- Budget: ``DEALROOM_ANALYTICS_SAMPLING_BUDGET`` Events pro Minute und
+  Worker (0 = kein Sampling).
+"""
+
+import math
+import threading
+import time
+
+from django.conf import settings
+
+SAMPLED_EVENT_TYPES = frozenset({'click', 'scroll'})
+
+WINDOW_SECONDS = 60
+
+# Ab so vielen Schlüsseln werden inaktive beim Fensterwechsel entfernt
+_MAX_KEYS = 10000
+
+
+class _SamplingState:
+    """Zählerstand eines (Dealroom, Event-Typ)-Schlüssels"""
+
+    __slots__ = ('window_start', 'seen', 'rate', 'skip')
+
+    def __init__(self, now):
+        self.window_start = now
+        self.seen = 0
+        self.rate = 1
+        self.skip = 0
+
+
+class AdaptiveSampler:
+    """
+    Systematisches Sampling mit adaptiver Rate pro Dealroom und Event-Typ
+    """
+
+    def __init__(self, budget=None, window_seconds=WINDOW_SECONDS, clock=time.monotonic):
+        """
+        Initialisiert den Sampler
+
+        Args:
+            budget: Gespeicherte Events pro Fenster und Schlüssel
+                (Standard: DEALROOM_ANALYTICS_SAMPLING_BUDGET, 0 = aus)
+            window_seconds: Länge eines Fensters in Sekunden
+            clock: Zeitquelle (für Tests)
+        """
+        self._budget = budget
+        self._window_seconds = window_seconds
+        self._clock = clock
+        self._states = {}
+        self._lock = threading.Lock()
+
+    @property
+    def budget(self):
+        return self._budget if self._budget is not None else settings.DEALROOM_ANALYTICS_SAMPLING_BUDGET
+
+    def sample(self, deal_id, event_type):
+        """
+        Entscheidet, ob ein Event gespeichert wird
+
+        Args:
+            deal_id: ID des Dealrooms
+            event_type: Event-Typ
+
+        Returns:
+            int: Gewicht der gespeicherten Zeile, 0 = verwerfen
+        """
+        budget = self.budget
+        if budget <= 0 or event_type not in SAMPLED_EVENT_TYPES:
+            return 1
+
+        now = self._clock()
+        with self._lock:
+            state = self._states.get((deal_id, event_type))
+            if state is None:
+                if len(self._states) >= _MAX_KEYS:
+                    self._prune(now)
+                state = self._states[(deal_id, event_type)] = _SamplingState(now)
+
+            elapsed = now - state.window_start
+            if elapsed >= self._window_seconds:
+                # Rate aus dem Volumen des letzten Fensters; nach einer Pause von vorn
+                if elapsed < 2 * self._window_seconds:
+                    state.rate = max(1, math.ceil(state.seen / budget))
+                else:
+                    state.rate, state.skip = 1, 0
+                state.window_start = now
+                state.seen = 0
+
+            state.seen += 1
+            if state.seen > budget * state.rate:
+                state.rate *= 2
+
+            # Eine gespeicherte Zeile steht für sich und die folgenden rate - 1 Events
+            if state.skip:
+                state.skip -= 1
+                return 0
+            state.skip = state.rate - 1
+            return state.rate
+
+    def rates(self):
+        """Gibt die aktuellen Raten (1 in N) je (Dealroom, Event-Typ) zurück"""
+        with self._lock:
+            return {key: state.rate for key, state in self._states.items()}
+
+    def reset(self):
+        """Vergisst alle Zählerstände"""
+        with self._lock:
+            self._states.clear()
+
+    def _prune(self, now):
+        """Entfernt Schlüssel ohne Events im letzten Fenster"""
+        for key, state in list(self._states.items()):
+            if now - state.window_start >= 2 * self._window_seconds:
+                del self._states[key]
+
+
+# Sampler dieses Worker-Prozesses
+event_sampler = AdaptiveSampler()
@@ -0,0 +1,268 @@
+"""
+Serverseitige Sessions aus Analytics-Events
+===========================================
+
+Führt die Events eines Besuchers zu Sessions zusammen und leitet daraus
+Verweildauer, Bounce und Scrolltiefe ab - ohne dass der Client eigene
+Zeit-Events schicken muss.
+
+- Session-Schlüssel ist die ``session_id`` des Beacons, ersatzweise der
+  Besucher-Hash. Eine Pause länger als ``SESSION_TIMEOUT`` beginnt eine
+  neue Session.
+- ``update_sessions`` liest nur Events oberhalb des Wasserstands
+  ``AnalyticsWatermark('session_stitching')`` in Blöcken nach ID, sortiert
+  jeden Block nach (Dealroom, Schlüssel, Zeit) und führt ihn mit der
+  jeweils letzten gespeicherten Session des Schlüssels zusammen
+  (Sort-Merge). Verspätete Events verlängern so bestehende Sessions.
+- Läufe dürfen sich überschneiden (Rollup-Thread jedes Workers, Cron): Ein
+  Block wird nur verarbeitet, wenn der Lauf den Wasserstand per bedingtem
+  UPDATE vom gelesenen auf den neuen Stand setzen kann. Sonst hat ein
+  anderer Lauf den Block übernommen und er wird ab dem neuen Stand neu
+  gelesen, damit kein Event doppelt zählt.
+- Dauer: Zeitspanne vom ersten bis zum letzten Event, mindestens aber die
+  vom Client gemeldete Zeit (``time_spent``-Events).
+- Bounce: höchstens ein Seitenaufruf, keine Interaktion und kürzer als
+  ``ENGAGED_SECONDS``.
+- Betroffene Tage werden danach in ``DealAnalyticsDaily`` (Felder
+  ``sessions``, ``bounces``, ...) neu summiert.
+"""
+
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, Max, Q, Sum
+from django.utils import timezone
+
+SESSION_WATERMARK = 'session_stitching'
+
+SESSION_TIMEOUT = timedelta(minutes=30)
+
+ENGAGED_SECONDS = 10
+
+INTERACTION_EVENT_TYPES = frozenset({'click', 'download', 'form_submit'})
+
+BATCH_SIZE = 50000
+
+# Schlüssel pro IN-Abfrage (SQLite begrenzt die Anzahl der Parameter)
+_LOOKUP_BATCH_SIZE = 500
+
+_SESSION_DAILY_FIELDS = [
+    'sessions', 'bounces', 'session_seconds_total', 'scroll_depth_total', 'scroll_sessions', 'updated_at',
+]
+
+
+def _finish(session):
+    """Berechnet Tag, Dauer und Bounce einer Session aus ihren Zählern"""
+    session.day = timezone.localdate(session.started_at)
+    span = (session.ended_at - session.started_at).total_seconds()
+    session.duration_seconds = max(span, session.reported_seconds)
+    session.is_bounce = (
+        session.page_views <= 1
+        and not session.interactions
+        and session.duration_seconds < ENGAGED_SECONDS
+    )
+
+
+def _add_event(session, timestamp, event_type, time_spent, meta, weight=1):
+    """Rechnet ein Event (mit seinem Sampling-Gewicht) in eine Session ein"""
+    session.started_at = min(session.started_at, timestamp)
+    session.ended_at = max(session.ended_at, timestamp)
+    session.events += weight
+    if event_type == 'page_view':
+        session.page_views += weight
+    elif event_type in INTERACTION_EVENT_TYPES:
+        session.interactions += weight
+    elif event_type == 'time_spent' and time_spent:
+        session.reported_seconds += time_spent.total_seconds()
+    elif event_type == 'scroll' and isinstance(meta, dict) and isinstance(meta.get('depth'), int):
+        session.max_scroll_depth = max(session.max_scroll_depth or 0, meta['depth'])
+
+
+def _latest_sessions(keys):
+    """
+    Lädt die jeweils letzte gespeicherte Session je (Dealroom, Schlüssel)
+
+    Args:
+        keys: Menge von (deal_id, session_key)
+
+    Returns:
+        dict: (deal_id, session_key) -> DealAnalyticsSession
+    """
+    from .models import DealAnalyticsSession
+
+    latest = {}
+    keys = sorted(keys)
+    for offset in range(0, len(keys), _LOOKUP_BATCH_SIZE):
+        batch = keys[offset:offset + _LOOKUP_BATCH_SIZE]
+        sessions = DealAnalyticsSession.objects.filter(
+            deal_id__in={deal_id for deal_id, _ in batch},
+            session_key__in={session_key for _, session_key in batch},
+        ).order_by('started_at')
+        for session in sessions:
+            latest[(session.deal_id, session.session_key)] = session
+    return latest
+
+
+def stitch_events(rows):
+    """
+    Führt Events per Sort-Merge mit den gespeicherten Sessions zusammen
+
+    Args:
+        rows: Tupel (deal_id, session_key, timestamp, event_type, time_spent, meta, sample_weight)
+
+    Returns:
+        tuple: (geänderte Sessions, betroffene (deal_id, Tag)-Paare)
+    """
+    from .models import DealAnalyticsSession
+
+    rows = sorted(rows, key=lambda row: (row[0], row[1], row[2]))
+    latest = _latest_sessions({(row[0], row[1]) for row in rows})
+
+    changed = {}
+    affected = set()
+    current = None
+    for deal_id, session_key, timestamp, event_type, time_spent, meta, weight in rows:
+        if current is None or (current.deal_id, current.session_key) != (deal_id, session_key):
+            current = latest.get((deal_id, session_key))
+        if current is not None and not (
+            current.started_at - SESSION_TIMEOUT <= timestamp <= current.ended_at + SESSION_TIMEOUT
+        ):
+            current = None
+
+        if current is None:
+            current = DealAnalyticsSession(
+                deal_id=deal_id, session_key=session_key, started_at=timestamp, ended_at=timestamp
+            )
+        elif current.pk is not None and id(current) not in changed:
+            # Tag vor der Änderung merken (ein früheres Event kann ihn verschieben)
+            affected.add((deal_id, current.day))
+        _add_event(current, timestamp, event_type, time_spent, meta, weight)
+        changed[id(current)] = current
+        latest[(deal_id, session_key)] = current
+
+    now = timezone.now()
+    for session in changed.values():
+        _finish(session)
+        # bulk_create setzt auto_now nicht für bestehende Objekte
+        session.updated_at = now
+        affected.add((session.deal_id, session.day))
+    return list(changed.values()), affected
+
+
+def rollup_session_days(pairs):
+    """
+    Summiert die Session-Kennzahlen für (Dealroom-ID, Tag)-Paare neu
+
+    Schreibt nur die Session-Felder von ``DealAnalyticsDaily``; fehlende
+    Zeilen werden angelegt, Event-Kennzahlen bleibt ``rollup_days``
+    überlassen. Bereits archivierte Tage werden übersprungen.
+
+    Args:
+        pairs: Iterable von (deal_id, date)
+
+    Returns:
+        int: Anzahl geschriebener Tageswerte
+    """
+    from .models import AnalyticsArchive, DealAnalyticsDaily, DealAnalyticsSession
+
+    pairs = set(pairs)
+    archived_before = AnalyticsArchive.objects.aggregate(day=Max('archived_before'))['day']
+    if archived_before is not None:
+        pairs = {(deal_id, day) for deal_id, day in pairs if day >= archived_before}
+    if not pairs:
+        return 0
+
+    totals = DealAnalyticsSession.objects.filter(
+        deal_id__in={deal_id for deal_id, _ in pairs},
+        day__gte=min(day for _, day in pairs),
+        day__lte=max(day for _, day in pairs),
+    ).values('deal_id', 'day').annotate(
+        session_count=Count('id'),
+        bounce_count=Count('id', filter=Q(is_bounce=True)),
+        seconds=Sum('duration_seconds'),
+        scroll_total=Sum('max_scroll_depth'),
+        scroll_count=Count('max_scroll_depth'),
+    ).order_by()
+    totals = {(values['deal_id'], values['day']): values for values in totals}
+
+    now = timezone.now()
+    rows = []
+    for deal_id, day in pairs:
+        values = totals.get((deal_id, day), {})
+        rows.append(DealAnalyticsDaily(
+            deal_id=deal_id,
+            day=day,
+            sessions=values.get('session_count', 0),
+            bounces=values.get('bounce_count', 0),
+            session_seconds_total=values.get('seconds') or 0,
+            scroll_depth_total=values.get('scroll_total') or 0,
+            scroll_sessions=values.get('scroll_count', 0),
+            updated_at=now,
+        ))
+    DealAnalyticsDaily.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=['deal', 'day'],
+        update_fields=_SESSION_DAILY_FIELDS,
+    )
+    return len(rows)
+
+
+def update_sessions(batch_size=BATCH_SIZE):
+    """
+    Führt alle neuen Events seit dem Wasserstand zu Sessions zusammen
+
+    Jeder Block (Sessions, Tageswerte, Wasserstand) wird in einer
+    Transaktion geschrieben; ein Abbruch verarbeitet ihn beim nächsten
+    Lauf erneut. Den Wasserstand setzt die Transaktion zuerst, und nur
+    wenn er noch auf dem gelesenen Stand steht (Compare-and-Swap); die
+    Zeilensperre des UPDATE hält parallele Läufe bis zum Commit an.
+
+    Args:
+        batch_size: Events pro Block
+
+    Returns:
+        dict: Anzahl verarbeiteter Events, geänderter Sessions und Wasserstand
+    """
+    from .models import AnalyticsWatermark, DealAnalyticsEvent, DealAnalyticsSession
+
+    watermark, _ = AnalyticsWatermark.objects.get_or_create(name=SESSION_WATERMARK)
+    report = {'events': 0, 'sessions': 0}
+    while True:
+        events = list(
+            DealAnalyticsEvent.objects.filter(id__gt=watermark.last_event_id).order_by('id').values_list(
+                'id', 'deal_id', 'session_id', 'visitor_hash', 'timestamp', 'event_type', 'time_spent', 'meta',
+                'sample_weight',
+            )[:batch_size]
+        )
+        if not events:
+            break
+
+        rows = [
+            (deal_id, session_id or visitor_hash, timestamp, event_type, time_spent, meta, weight)
+            for _, deal_id, session_id, visitor_hash, timestamp, event_type, time_spent, meta, weight in events
+            if session_id or visitor_hash
+        ]
+        with transaction.atomic():
+            claimed = AnalyticsWatermark.objects.filter(
+                pk=watermark.pk, last_event_id=watermark.last_event_id
+            ).update(last_event_id=events[-1][0], updated_at=timezone.now())
+            if not claimed:
+                # Ein anderer Lauf hat den Block bereits verarbeitet
+                watermark.refresh_from_db()
+                continue
+            sessions, affected = stitch_events(rows)
+            # Geänderte Sessions löschen und mit gleicher ID neu schreiben;
+            # bulk_update (CASE WHEN je Feld) ist bei vielen Zeilen um
+            # Größenordnungen langsamer
+            existing = [session.pk for session in sessions if session.pk is not None]
+            for offset in range(0, len(existing), _LOOKUP_BATCH_SIZE):
+                DealAnalyticsSession.objects.filter(pk__in=existing[offset:offset + _LOOKUP_BATCH_SIZE]).delete()
+            DealAnalyticsSession.objects.bulk_create(sessions, batch_size=500)
+            rollup_session_days(affected)
+            watermark.last_event_id = events[-1][0]
+
+        report['events'] += len(events)
+        report['sessions'] += len(sessions)
+    report['watermark'] = watermark.last_event_id
+    return report
@@ -1,9 +1,13 @@
 """
 Tests für DealShare - Umfassende Test-Suite
 """
+import importlib.util
+import io
 import json
 import tempfile
 import os
+import shutil
+import unittest
 from django.test import TestCase, Client
 from django.urls import reverse
 from django.contrib.auth import get_user_model
@@ -11,6 +15,7 @@ from django.core.files.uploadedfile import SimpleUploadedFile
 from django.utils import timezone
 from django.core.files.storage import default_storage
 from django.core.files.base import ContentFile
+from asgiref.sync import async_to_sync, sync_to_async
 
 from .models import Deal, DealFile, DealFileAssignment, DealChangeLog, ContentBlock, MediaLibrary, LayoutTemplate
 from files.models import GlobalFile
@@ -18,11 +23,29 @@ from files.models import GlobalFile
 User = get_user_model()
 
 
+def make_temp_dir(test_case):
+    """Temporäres Verzeichnis, das nach dem Test gelöscht wird"""
+    path = tempfile.mkdtemp()
+    test_case.addCleanup(shutil.rmtree, path, ignore_errors=True)
+    return path
+
+
+def read_stream(response):
+    """Liest den asynchronen Body einer gestreamten Antwort"""
+    async def collect():
+        return b''.join([chunk async for chunk in response.streaming_content])
+    return async_to_sync(collect)()
+
+
 class DealShareBaseTestCase(TestCase):
     """Basis-Test-Klasse mit Setup"""
     
     def setUp(self):
         """Test-Daten erstellen"""
+        from deals.interning import clear_intern_cache
+        # IDs der Dictionary-Tabellen überleben den Rollback nicht
+        self.addCleanup(clear_intern_cache)
+        
         # Test-User erstellen
         self.user = User.objects.create_user(
             username='testuser',
@@ -564,6 +587,1514 @@ class PasswordProtectionTests(DealShareBaseTestCase):
             self.assertContains(response, 'Test Dealroom')
 
 
+class PasswordRateLimitTests(DealShareBaseTestCase):
+    """Tests für das Rate-Limiting der Passwortversuche"""
+    
+    def setUp(self):
+        super().setUp()
+        from django.core.cache import cache
+        cache.clear()
+        self.deal.password_protection_max_attempts = 3
+        self.deal.set_password_protection('geheim123')
+        self.deal.refresh_from_db()
+    
+    def test_failed_attempts_do_not_save_deal(self):
+        """Test: Fehlversuche schreiben den Deal nicht (keine Regenerierung)"""
+        updated_at = self.deal.updated_at
+        last_generation = self.deal.last_generation
+        
+        self.assertFalse(self.deal.check_password('falsch'))
+        self.assertFalse(self.deal.check_password('falsch'))
+        self.assertEqual(self.deal.get_failed_attempts(), 2)
+        self.assertEqual(self.deal.get_remaining_attempts(), 1)
+        self.assertEqual(async_to_sync(self.deal.aget_remaining_attempts)(), 1)
+        
+        self.deal.refresh_from_db()
+        self.assertEqual(self.deal.updated_at, updated_at)
+        self.assertEqual(self.deal.last_generation, last_generation)
+        self.assertIsNone(self.deal.password_protection_blocked_until)
+    
+    def test_block_is_persisted_and_skips_hashing(self):
+        """Test: Sperre wird persistiert, danach wird nicht mehr gehasht"""
+        from unittest import mock
+        
+        for _ in range(3):
+            self.assertFalse(self.deal.check_password('falsch'))
+        
+        deal = Deal.objects.get(pk=self.deal.pk)
+        self.assertTrue(deal.is_blocked())
+        self.assertEqual(deal.password_protection_attempts, 3)
+        self.assertEqual(deal.get_remaining_attempts(), 0)
+        
+        with mock.patch('django.contrib.auth.hashers.check_password') as hasher:
+            self.assertFalse(deal.check_password('geheim123'))
+            hasher.assert_not_called()
+    
+    def test_success_resets_attempts(self):
+        """Test: Erfolgreicher Login setzt die Fehlversuche zurück"""
+        self.deal.check_password('falsch')
+        self.assertTrue(self.deal.check_password('geheim123'))
+        self.assertEqual(self.deal.get_failed_attempts(), 0)
+
+
+class AccessTokenTests(DealShareBaseTestCase):
+    """Tests für die signierten Zugriffstoken passwortgeschützter Dealrooms"""
+    
+    def setUp(self):
+        self.base_dir = make_temp_dir(self)
+        self.settings_override = self.settings(BASE_DIR=self.base_dir)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        super().setUp()
+        from django.core.cache import cache
+        cache.clear()
+        self.deal.set_password_protection('geheim123')
+        self.deal.refresh_from_db()
+        self.generated_url = f'/generated_pages/dealroom-{self.deal.id}/'
+    
+    def test_login_issues_token_cookie_without_session(self):
+        """Test: Erfolgreiche Passworteingabe setzt ein Token-Cookie statt einer Session"""
+        from deals.access_tokens import get_access_cookie_name
+        
+        response = self.client.post(reverse('deals:password_protection', args=[self.deal.pk]), {
+            'password': 'geheim123'
+        })
+        self.assertRedirects(
+            response, reverse('deals:landingpage', args=[self.deal.pk]),
+            fetch_redirect_response=False
+        )
+        self.assertIn(get_access_cookie_name(self.deal.id), response.cookies)
+        self.assertNotIn('sessionid', response.cookies)
+        
+        response = self.client.get(reverse('deals:landingpage', args=[self.deal.pk]))
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(self.generated_url)
+        self.assertEqual(response.status_code, 200)
+    
+    def test_generated_pages_require_token(self):
+        """Test: generated_pages eines geschützten Dealrooms verlangt ein gültiges Token"""
+        from deals.access_tokens import ACCESS_QUERY_PARAM, create_access_token
+        
+        response = self.client.get(self.generated_url)
+        self.assertRedirects(
+            response, reverse('deals:password_protection', args=[self.deal.pk]),
+            fetch_redirect_response=False
+        )
+        
+        token = create_access_token(self.deal)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.generated_url, {ACCESS_QUERY_PARAM: token})
+        self.assertEqual(response.status_code, 200)
+        
+        # Fremdes oder manipuliertes Token
+        response = self.client.get(f'/generated_pages/dealroom-{self.deal.id}/', {ACCESS_QUERY_PARAM: token + 'x'})
+        self.assertEqual(response.status_code, 302)
+    
+    def test_token_invalid_after_password_change_or_expiry(self):
+        """Test: Passwortwechsel und Ablauf machen Token ungültig"""
+        from deals.access_tokens import ACCESS_QUERY_PARAM, create_access_token
+        
+        token = create_access_token(self.deal)
+        url = reverse('deals:landingpage', args=[self.deal.pk])
+        
+        with self.settings(DEALROOM_ACCESS_TOKEN_MAX_AGE=-1):
+            response = self.client.get(url, {ACCESS_QUERY_PARAM: token})
+            self.assertEqual(response.status_code, 302)
+        
+        self.deal.set_password_protection('neues-passwort')
+        response = self.client.get(url, {ACCESS_QUERY_PARAM: token})
+        self.assertEqual(response.status_code, 302)
+
+    def test_enable_protection_on_inactive_deal_with_generated_pages(self):
+        """Test: Passwortschutz greift auf generated_pages auch ohne Regenerierung"""
+        from deals.access_tokens import ACCESS_QUERY_PARAM, create_access_token
+
+        # Seiten wurden ungeschützt generiert, danach wurde der Dealroom deaktiviert
+        self.deal.disable_password_protection()
+        self.assertEqual(self.client.get(self.generated_url).status_code, 200)
+        self.deal.status = 'draft'
+        self.deal.save()
+
+        self.deal.set_password_protection('geheim123')
+        response = self.client.get(self.generated_url)
+        self.assertRedirects(
+            response, reverse('deals:password_protection', args=[self.deal.pk]),
+            fetch_redirect_response=False
+        )
+        token = create_access_token(self.deal)
+        response = self.client.get(self.generated_url, {ACCESS_QUERY_PARAM: token})
+        self.assertEqual(response.status_code, 200)
+
+        # Passwortwechsel macht alte Token auch hier ungültig
+        self.deal.set_password_protection('neues-passwort')
+        response = self.client.get(self.generated_url, {ACCESS_QUERY_PARAM: token})
+        self.assertEqual(response.status_code, 302)
+
+        self.deal.disable_password_protection()
+        self.assertEqual(self.client.get(self.generated_url).status_code, 200)
+
+
+class PasswordAttemptAuditTests(DealShareBaseTestCase):
+    """Tests für das gepufferte Audit-Log der Passwortversuche"""
+    
+    def setUp(self):
+        super().setUp()
+        from deals.audit import PasswordAttemptBuffer
+        self.buffer = PasswordAttemptBuffer(max_size=3, flush_interval=0)
+    
+    def test_buffer_flushes_in_batches(self):
+        """Test: Versuche werden gepuffert und gesammelt per bulk_create geschrieben"""
+        from deals.models import PasswordAttempt
+        
+        with self.assertNumQueries(0):
+            self.buffer.append(self.deal.id, False, '10.0.0.1')
+            self.buffer.append(self.deal.id, False, '10.0.0.2')
+        self.assertEqual(self.buffer.pending(), 2)
+        self.assertEqual(PasswordAttempt.objects.count(), 0)
+        
+        # Der dritte Eintrag füllt den Puffer und schreibt alle drei in einem INSERT
+        with self.assertNumQueries(1):
+            self.buffer.append(self.deal.id, True, '10.0.0.3')
+        self.assertEqual(self.buffer.pending(), 0)
+        self.assertEqual(PasswordAttempt.objects.count(), 3)
+        self.assertEqual(self.buffer.flushed_count, 3)
+        self.assertEqual(self.buffer.flush(), 0)
+    
+    def test_failed_flush_keeps_entries(self):
+        """Test: Schlägt das Schreiben fehl, gehen die Einträge nicht verloren"""
+        from unittest import mock
+        from django.db import IntegrityError
+        from deals.models import PasswordAttempt
+        
+        real_bulk_create = PasswordAttempt.objects.bulk_create
+        buffer = type(self.buffer)(max_size=100, flush_interval=0)
+        buffer.append(self.deal.id, False, '10.0.0.1')
+        buffer.append(999999, False, '10.0.0.2')
+        
+        def bulk_create(attempts, **kwargs):
+            if any(attempt.deal_id == 999999 for attempt in attempts):
+                raise IntegrityError('FOREIGN KEY constraint failed')
+            return real_bulk_create(attempts, **kwargs)
+        
+        # Dealroom gelöscht: nur dessen Einträge werden verworfen
+        with mock.patch.object(PasswordAttempt.objects, 'bulk_create', side_effect=bulk_create):
+            self.assertEqual(buffer.flush(), 1)
+        self.assertEqual(list(PasswordAttempt.objects.values_list('ip_address', flat=True)), ['10.0.0.1'])
+        
+        # DB nicht erreichbar: alles bleibt im Puffer
+        buffer.append(self.deal.id, True, '10.0.0.3')
+        with mock.patch.object(PasswordAttempt.objects, 'bulk_create', side_effect=RuntimeError('database is locked')):
+            with self.assertRaises(RuntimeError):
+                buffer.flush()
+        self.assertEqual(buffer.pending(), 1)
+        self.assertEqual(buffer.flush(), 1)
+    
+    def test_query_by_deal_ip_prefix_and_window(self):
+        """Test: Abfrage nach Dealroom, IP-Bereich und Zeitfenster"""
+        from datetime import timedelta
+        from unittest import mock
+        from deals.audit import query_password_attempts
+        
+        other = Deal.objects.create(title='Anderer Dealroom', created_by=self.user)
+        now = timezone.now()
+        with mock.patch('deals.audit.timezone.now', return_value=now - timedelta(hours=2)):
+            self.buffer.append(self.deal.id, False, '192.168.1.10')
+        self.buffer.append(self.deal.id, False, '192.168.1.11')
+        self.buffer.append(self.deal.id, True, '10.1.1.1')
+        self.buffer.append(other.id, False, '192.168.1.12')
+        
+        with mock.patch('deals.audit.password_attempt_buffer', self.buffer):
+            attempts = query_password_attempts(deal=self.deal, ip_prefix='192.168.')
+            self.assertEqual(attempts.count(), 2)
+            self.assertEqual(self.buffer.pending(), 0)
+            
+            recent = query_password_attempts(deal=self.deal, since=now - timedelta(hours=1))
+            self.assertEqual(recent.count(), 2)
+            self.assertEqual(recent.failed().count(), 1)
+            
+            older = query_password_attempts(ip_prefix='192.168.', until=now - timedelta(hours=1))
+            self.assertEqual([a.ip_address for a in older], ['192.168.1.10'])
+    
+    def test_password_view_logs_attempts_and_entries_are_immutable(self):
+        """Test: Die Passwortseite protokolliert Versuche, Einträge sind unveränderlich"""
+        from unittest import mock
+        from deals.models import PasswordAttempt
+        
+        self.deal.set_password_protection('geheim123')
+        url = reverse('deals:password_protection', args=[self.deal.pk])
+        with mock.patch('deals.audit.password_attempt_buffer', self.buffer):
+            self.client.post(url, {'password': 'falsch'}, REMOTE_ADDR='203.0.113.5')
+            self.client.post(url, {'password': 'geheim123'}, REMOTE_ADDR='203.0.113.5')
+            self.assertEqual(self.buffer.pending(), 2)
+            self.buffer.flush()
+        
+        attempts = list(PasswordAttempt.objects.for_deal(self.deal).order_by('timestamp'))
+        self.assertEqual([a.success for a in attempts], [False, True])
+        self.assertEqual(attempts[0].ip_address, '203.0.113.5')
+        
+        attempts[0].success = True
+        with self.assertRaises(ValueError):
+            attempts[0].save()
+
+
+class AnalyticsIngestTests(DealShareBaseTestCase):
+    """Tests für den gebündelten Analytics-Ingest der generierten Seiten"""
+    
+    def setUp(self):
+        super().setUp()
+        from unittest import mock
+        from deals.analytics_buffer import AnalyticsEventBuffer
+        self.spill_dir = make_temp_dir(self)
+        self.buffer = AnalyticsEventBuffer(
+            flush_size=1000, flush_interval_ms=0, capacity=1000, spill_dir=self.spill_dir
+        )
+        patcher = mock.patch('deals.views.analytics_buffer', self.buffer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.url = reverse('deals:analytics_collect', args=[self.deal.pk])
+    
+    def _post(self, payload, **extra):
+        body = payload if isinstance(payload, (bytes, str)) else json.dumps(payload)
+        return self.client.post(self.url, body, content_type='text/plain', **extra)
+    
+    def test_batch_is_written_with_one_insert(self):
+        """Test: Ein Beacon kostet einen Existenz-Check, der Flush ein INSERT"""
+        from deals.models import DealAnalyticsEvent
+        
+        payload = {
+            'session': 'abc123',
+            'referrer': 'https://example.com/start',
+            'events': [
+                {'type': 'page_view', 'viewport': 'desktop'},
+                {'type': 'click', 'element': 'cta', 'x': 120, 'y': -5},
+                {'type': 'download', 'element': '/media/deal_files/a.pdf'},
+                {'type': 'time_spent', 'ms': 4500},
+                {'type': 'scroll', 'depth': 250},
+                {'type': 'deleted'},
+                'kein-event',
+            ]
+        }
+        with self.assertNumQueries(1):
+            response = self._post(payload, REMOTE_ADDR='203.0.113.42', HTTP_USER_AGENT='TestBrowser/1.0')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.buffer.pending(), 5)
+        # Neuer User-Agent und Referrer: je Suchen, Anlegen, Nachladen
+        with self.assertNumQueries(7), self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.buffer.flush(), 5)
+        
+        # Bekannte Werte kommen aus dem LRU-Cache
+        self._post(payload, REMOTE_ADDR='203.0.113.42', HTTP_USER_AGENT='TestBrowser/1.0')
+        with self.assertNumQueries(1):
+            self.assertEqual(self.buffer.flush(), 5)
+        
+        events = DealAnalyticsEvent.objects.filter(deal=self.deal)
+        self.assertEqual(events.count(), 10)
+        self.assertFalse(events.filter(event_type='deleted').exists())
+        self.assertEqual(set(events.values_list('visitor_ip', flat=True)), {'203.0.*.*'})
+        self.assertEqual(set(events.values_list('session_id', flat=True)), {'abc123'})
+        
+        click = events.filter(event_type='click').first()
+        self.assertEqual((click.element_id, click.position_x, click.position_y), ('cta', 120, 0))
+        self.assertEqual(click.referrer, 'example.com')
+        self.assertEqual(click.user_agent, 'TestBrowser/1.0')
+        self.assertEqual(events.filter(event_type='time_spent').first().time_spent.total_seconds(), 4.5)
+        self.assertEqual(events.filter(event_type='scroll').first().meta, {'depth': 100})
+    
+    def test_invalid_beacons_are_rejected(self):
+        """Test: Kaputte, zu große oder verwaiste Beacons werden abgelehnt"""
+        from deals.models import DealAnalyticsEvent
+        
+        self.assertEqual(self._post(b'{kein json').status_code, 400)
+        self.assertEqual(self._post({'events': 'page_view'}).status_code, 400)
+        with self.settings(DEALROOM_ANALYTICS_MAX_BATCH_EVENTS=2):
+            self.assertEqual(self._post([{'type': 'click'}] * 3).status_code, 400)
+        with self.settings(DEALROOM_ANALYTICS_MAX_BEACON_BYTES=10):
+            self.assertEqual(self._post([{'type': 'page_view'}]).status_code, 400)
+        
+        Deal.objects.filter(pk=self.deal.pk).update(status='draft')
+        self.assertEqual(self._post([{'type': 'page_view'}]).status_code, 404)
+        self.assertEqual(self.client.get(self.url).status_code, 405)
+        self.assertEqual(DealAnalyticsEvent.objects.filter(deal=self.deal).count(), 0)
+    
+    def test_generated_page_batches_events(self):
+        """Test: Die generierte Seite sendet Events gebündelt statt per console.log"""
+        from generator.renderer import DealroomGenerator
+        
+        html = DealroomGenerator(self.deal).generate_website()
+        self.assertIn(json.dumps(self.url), html)
+        self.assertIn('navigator.sendBeacon', html)
+        self.assertNotIn('console.log', html)
+
+
+class AnalyticsBufferTests(DealShareBaseTestCase):
+    """Tests für den Schreibpuffer der Analytics-Events"""
+    
+    def setUp(self):
+        super().setUp()
+        from deals.analytics_buffer import AnalyticsEventBuffer
+        self.spill_dir = make_temp_dir(self)
+        self.buffer = AnalyticsEventBuffer(
+            flush_size=3, flush_interval_ms=0, capacity=4, spill_dir=self.spill_dir
+        )
+    
+    def _events(self, count):
+        from deals.ingest import build_events
+        return build_events(self.deal.id, [{'type': 'click', 'x': i} for i in range(count)], ip_address='10.0.0.1')
+    
+    def test_flushes_when_flush_size_is_reached(self):
+        """Test: Der Puffer schreibt erst ab N Events, dann gesammelt in einem INSERT"""
+        from deals.models import DealAnalyticsEvent
+        
+        with self.assertNumQueries(0):
+            self.buffer.extend(self._events(2))
+        self.assertEqual(self.buffer.pending(), 2)
+        
+        with self.assertNumQueries(1):
+            self.buffer.extend(self._events(1))
+        self.assertEqual(self.buffer.pending(), 0)
+        self.assertEqual(DealAnalyticsEvent.objects.filter(deal=self.deal).count(), 3)
+        
+        stats = self.buffer.stats()
+        self.assertEqual((stats['ingested'], stats['flushed'], stats['flushes']), (3, 3, 1))
+        self.assertGreater(stats['flush_ms_max'], 0)
+    
+    def test_overflow_spills_to_file_and_is_replayed(self):
+        """Test: Events über der Kapazität landen in einer Spill-Datei und werden nachgetragen"""
+        from io import StringIO
+        from django.core.management import call_command
+        from deals.analytics_buffer import AnalyticsEventBuffer
+        from deals.models import DealAnalyticsEvent
+        
+        buffer = AnalyticsEventBuffer(flush_size=100, flush_interval_ms=0, capacity=4, spill_dir=self.spill_dir)
+        events = self._events(6)
+        original_timestamp = events[0].timestamp
+        buffer.extend(events)
+        self.assertEqual(buffer.pending(), 4)
+        self.assertEqual(buffer.stats()['spilled'], 2)
+        self.assertEqual(len(os.listdir(self.spill_dir)), 1)
+        
+        # Spill-Dateien werden auch per Management-Command nachgetragen
+        call_command('flush_analytics', spill_dir=self.spill_dir, stdout=StringIO())
+        self.assertEqual(os.listdir(self.spill_dir), [])
+        self.assertEqual(DealAnalyticsEvent.objects.filter(deal=self.deal).count(), 2)
+        
+        self.assertEqual(buffer.flush(), 4)
+        events = DealAnalyticsEvent.objects.filter(deal=self.deal)
+        self.assertEqual(events.count(), 6)
+        self.assertEqual(set(events.values_list('timestamp', flat=True)), {original_timestamp})
+    
+    def test_failed_flush_keeps_events_in_spill_file(self):
+        """Test: Schlägt der Flush fehl, gehen die Events nicht verloren"""
+        from unittest import mock
+        from deals.models import DealAnalyticsEvent
+        
+        self.buffer.extend(self._events(2))
+        with mock.patch.object(DealAnalyticsEvent.objects, 'bulk_create', side_effect=RuntimeError('database is locked')):
+            with self.assertRaises(RuntimeError):
+                self.buffer.flush()
+        self.assertEqual(self.buffer.pending(), 0)
+        self.assertEqual(self.buffer.stats()['failed_flushes'], 1)
+        
+        self.assertEqual(self.buffer.flush(), 2)
+        self.assertEqual(self.buffer.stats()['replayed'], 2)
+        self.assertEqual(DealAnalyticsEvent.objects.filter(deal=self.deal).count(), 2)
+
+    def test_replay_skips_live_workers_and_quarantines_corrupt_lines(self):
+        """Test: Spill-Dateien laufender Worker bleiben liegen, kaputte Zeilen werden aussortiert"""
+        import json
+        from unittest import mock
+        from deals.analytics_buffer import event_to_dict, replay_spill_files
+        from deals.models import DealAnalyticsEvent
+
+        line = json.dumps(event_to_dict(self._events(1)[0])) + '\n'
+        live = os.path.join(self.spill_dir, f'spill-{os.getppid()}-aaaa.jsonl')
+        dead = os.path.join(self.spill_dir, 'spill-999999-bbbb.jsonl')
+        with open(live, 'w') as spill_file:
+            spill_file.write(line)
+        with open(dead, 'w') as spill_file:
+            spill_file.write(line + '{"deal_id": \n' + line)
+
+        def kill(pid, sig):
+            if pid != os.getppid():
+                raise ProcessLookupError
+
+        with mock.patch('deals.analytics_buffer.os.kill', side_effect=kill):
+            self.assertEqual(replay_spill_files(self.spill_dir), 2)
+        self.assertEqual(DealAnalyticsEvent.objects.filter(deal=self.deal).count(), 2)
+        self.assertEqual(
+            set(os.listdir(self.spill_dir)),
+            {'spill-999999-bbbb.jsonl.corrupt', f'spill-{os.getppid()}-aaaa.jsonl'},
+        )
+        with open(dead + '.corrupt') as corrupt_file:
+            self.assertEqual(corrupt_file.read(), '{"deal_id": \n')
+
+    def test_deleted_deal_does_not_block_spill_files(self):
+        """Test: Events gelöschter Dealrooms blockieren weder Flush noch Spill-Dateien"""
+        import json
+        from unittest import mock
+        from django.db import IntegrityError
+        from deals.analytics_buffer import event_to_dict, replay_spill_files
+        from deals.ingest import build_events
+        from deals.models import DealAnalyticsEvent
+
+        real_bulk_create = DealAnalyticsEvent.objects.bulk_create
+        other = Deal.objects.create(title='Gelöschter Dealroom', created_by=self.user)
+        other_id = other.id
+        orphaned = build_events(other_id, [{'type': 'click', 'x': 1}], ip_address='10.0.0.2')
+        other.delete()
+
+        def bulk_create(events, **kwargs):
+            if any(event.deal_id == other_id for event in events):
+                raise IntegrityError('FOREIGN KEY constraint failed')
+            return real_bulk_create(events, **kwargs)
+
+        # Flush: nur die Events des gelöschten Dealrooms werden verworfen
+        self.buffer.extend(self._events(1) + orphaned)
+        with mock.patch.object(DealAnalyticsEvent.objects, 'bulk_create', side_effect=bulk_create):
+            self.assertEqual(self.buffer.flush(replay=False), 1)
+        self.assertEqual(os.listdir(self.spill_dir), [])
+
+        # Nachtragen: gemischte Datei wird geschrieben, die folgende ebenfalls
+        lines = [json.dumps(event_to_dict(event)) + '\n' for event in self._events(2) + orphaned]
+        for name in ('spill-999998-aaaa.jsonl', 'spill-999999-bbbb.jsonl'):
+            with open(os.path.join(self.spill_dir, name), 'w') as spill_file:
+                spill_file.writelines(lines)
+        with mock.patch('deals.analytics_buffer.os.kill', side_effect=ProcessLookupError), \
+                mock.patch.object(DealAnalyticsEvent.objects, 'bulk_create', side_effect=bulk_create):
+            self.assertEqual(replay_spill_files(self.spill_dir), 4)
+        self.assertEqual(os.listdir(self.spill_dir), [])
+        self.assertEqual(DealAnalyticsEvent.objects.filter(deal=self.deal).count(), 5)
+
+        # Bleibt der Integritätsfehler, wandert die Datei nach .corrupt
+        blocked = os.path.join(self.spill_dir, 'spill-999998-cccc.jsonl')
+        with open(blocked, 'w') as spill_file:
+            spill_file.writelines(lines[:1])
+        with open(os.path.join(self.spill_dir, 'spill-999999-dddd.jsonl'), 'w') as spill_file:
+            spill_file.writelines(lines[1:2])
+        calls = []
+
+        def failing_first(events, **kwargs):
+            calls.append(len(events))
+            if len(calls) == 1:
+                raise IntegrityError('UNIQUE constraint failed')
+            return real_bulk_create(events, **kwargs)
+
+        with mock.patch('deals.analytics_buffer.os.kill', side_effect=ProcessLookupError), \
+                mock.patch.object(DealAnalyticsEvent.objects, 'bulk_create', side_effect=failing_first):
+            self.assertEqual(replay_spill_files(self.spill_dir), 1)
+        self.assertEqual(os.listdir(self.spill_dir), ['spill-999998-cccc.jsonl.corrupt'])
+        with open(blocked + '.corrupt') as corrupt_file:
+            self.assertEqual(corrupt_file.read(), lines[0])
+
+
+class AnalyticsRollupTests(DealShareBaseTestCase):
+    """Tests für die Tages-Rollups und das Analytics-Dashboard"""
+    
+    def setUp(self):
+        super().setUp()
+        from datetime import timedelta
+        self.today = timezone.localdate()
+        self.yesterday = self.today - timedelta(days=1)
+        self.two_days_ago = self.today - timedelta(days=2)
+    
+    def _at(self, day, hour=12):
+        from deals.rollups import get_day_start
+        from datetime import timedelta
+        return get_day_start(day) + timedelta(hours=hour)
+    
+    def _create_events(self, day, page_views=0, clicks=(), time_spent=(), conversions=0, ip='10.0.0.1'):
+        from datetime import timedelta
+        from deals.models import DealAnalyticsEvent
+        timestamp = self._at(day)
+        events = [DealAnalyticsEvent(deal=self.deal, event_type='page_view', visitor_ip=ip, timestamp=timestamp)
+                  for _ in range(page_views)]
+        events += [DealAnalyticsEvent(deal=self.deal, event_type='click', element_id=element, timestamp=timestamp)
+                   for element in clicks]
+        events += [DealAnalyticsEvent(deal=self.deal, event_type='time_spent', time_spent=timedelta(seconds=seconds),
+                                      timestamp=timestamp) for seconds in time_spent]
+        events += [DealAnalyticsEvent(deal=self.deal, event_type='form_submit', timestamp=timestamp)
+                   for _ in range(conversions)]
+        return DealAnalyticsEvent.objects.bulk_create(events)
+    
+    def test_update_rollups_is_incremental(self):
+        """Test: Nur abgeschlossene Tage mit neuen Events werden berechnet"""
+        from deals.models import AnalyticsWatermark, DealAnalyticsDaily
+        from deals.rollups import ROLLUP_WATERMARK, update_rollups
+        
+        self._create_events(self.two_days_ago, page_views=3, clicks=['cta', 'cta', 'faq'], time_spent=[10, 20])
+        self._create_events(self.yesterday, page_views=2, conversions=1, ip='10.0.0.2')
+        today_events = self._create_events(self.today, page_views=5)
+        
+        self.assertEqual(update_rollups()['days'], 2)
+        rollup = DealAnalyticsDaily.objects.get(deal=self.deal, day=self.two_days_ago)
+        self.assertEqual((rollup.page_views, rollup.visitors, rollup.clicks), (3, 1, 3))
+        self.assertEqual(rollup.top_elements, {'cta': 2, 'faq': 1})
+        self.assertEqual((rollup.time_spent_total, rollup.time_spent_count), (30.0, 2))
+        self.assertFalse(DealAnalyticsDaily.objects.filter(day=self.today).exists())
+        
+        # Der Wasserstand steht vor dem ersten Event des laufenden Tages
+        watermark = AnalyticsWatermark.objects.get(name=ROLLUP_WATERMARK)
+        self.assertEqual(watermark.last_event_id, today_events[0].id - 1)
+        self.assertEqual(update_rollups()['days'], 0)
+    
+    def test_late_events_update_past_rollups_on_flush(self):
+        """Test: Verspätete Events korrigieren den Rollup ihres Tages beim Flush"""
+        from deals.analytics_buffer import AnalyticsEventBuffer
+        from deals.models import DealAnalyticsDaily, DealAnalyticsEvent
+        from deals.rollups import update_rollups
+        
+        self._create_events(self.yesterday, page_views=2)
+        update_rollups()
+        
+        buffer = AnalyticsEventBuffer(flush_size=100, flush_interval_ms=0, spill_dir=make_temp_dir(self))
+        buffer.extend([DealAnalyticsEvent(deal_id=self.deal.id, event_type='page_view', timestamp=self._at(self.yesterday, 23))])
+        buffer.flush()
+        self.assertEqual(DealAnalyticsDaily.objects.get(deal=self.deal, day=self.yesterday).page_views, 3)
+    
+    def test_dashboard_reads_rollups_plus_live_tail(self):
+        """Test: Das Dashboard kombiniert Rollups und heutige Events mit konstanter Abfragezahl"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        
+        self._create_events(self.two_days_ago, page_views=4, clicks=['cta'], time_spent=[30])
+        self._create_events(self.yesterday, page_views=4, conversions=1, time_spent=[10])
+        self._create_events(self.today, page_views=2, clicks=['cta', 'faq'], time_spent=[20])
+        
+        from deals.rollups import get_dashboard_stats, update_rollups
+        
+        update_rollups()
+        context = get_dashboard_stats(self.deal)
+        self.assertEqual(context['total_page_views'], 10)
+        # Derselbe Besucher an drei Tagen zählt einmal
+        self.assertEqual(context['total_visitors'], 1)
+        self.assertEqual(context['avg_time_spent'], 20.0)
+        self.assertEqual(context['conversion_rate'], 10.0)
+        self.assertEqual(context['top_elements'][0], {'element_id': 'cta', 'click_count': 2})
+        self.assertEqual([day['views'] for day in context['daily_views']], [4, 4, 2])
+        
+        with CaptureQueriesContext(connection) as before:
+            get_dashboard_stats(self.deal)
+        self._create_events(self.two_days_ago, page_views=200, clicks=['cta'] * 50)
+        update_rollups()
+        with CaptureQueriesContext(connection) as after:
+            context = get_dashboard_stats(self.deal)
+        self.assertEqual(len(after), len(before))
+        self.assertEqual(context['total_page_views'], 210)
+    
+    def test_stale_rollups_update_in_background(self):
+        """Test: Veraltete Rollups werden im Hintergrund aktualisiert, nicht im Request"""
+        from unittest import mock
+        from deals.rollups import ensure_rollups, update_rollups
+        
+        with mock.patch('deals.rollups.update_rollups') as background_update:
+            thread = ensure_rollups()
+            self.assertIsNotNone(thread)
+            thread.join()
+        background_update.assert_called_once_with()
+        
+        update_rollups()
+        self.assertIsNone(ensure_rollups())
+
+
+class VisitorSketchTests(DealShareBaseTestCase):
+    """Tests für die HyperLogLog-Sketches eindeutiger Besucher"""
+    
+    def test_hyperloglog_estimate_merge_and_serialization(self):
+        """Test: Schätzung innerhalb des Fehlers, Vereinigung und kompakte Serialisierung"""
+        from deals.hll import HyperLogLog
+        
+        first, second = HyperLogLog(), HyperLogLog()
+        first.update(f'besucher-{i}' for i in range(20000))
+        second.update(f'besucher-{i}' for i in range(10000, 30000))
+        
+        self.assertAlmostEqual(first.count(), 20000, delta=20000 * first.relative_error * 3)
+        union = HyperLogLog.union([first, second])
+        self.assertAlmostEqual(union.count(), 30000, delta=30000 * union.relative_error * 3)
+        
+        # Kleine Mengen sind nahezu exakt, Duplikate zählen nicht
+        small = HyperLogLog()
+        small.update(['a', 'b', 'c', 'a'])
+        self.assertEqual(small.count(), 3)
+        
+        restored = HyperLogLog.from_bytes(small.to_bytes())
+        self.assertEqual(restored.registers, small.registers)
+        self.assertLess(len(small.to_bytes()), 100)
+    
+    def test_unique_visitors_across_days_and_deals(self):
+        """Test: Eindeutige Besucher über beliebige Zeiträume und Dealrooms aus den Sketches"""
+        from datetime import timedelta
+        from deals.ingest import build_events
+        from deals.models import DealAnalyticsDaily, DealAnalyticsEvent
+        from deals.rollups import count_unique_visitors, get_day_start, update_rollups
+        
+        other = Deal.objects.create(title='Zweiter Dealroom', created_by=self.user, status='active')
+        today = timezone.localdate()
+        
+        def visit(deal, day, ip, user_agent='Browser/1.0'):
+            events = build_events(deal.id, [{'type': 'page_view'}], ip_address=ip, user_agent=user_agent)
+            for event in events:
+                event.timestamp = get_day_start(day) + timedelta(hours=10)
+            DealAnalyticsEvent.objects.bulk_create(events)
+        
+        # Gleiche /16 nach Anonymisierung, aber verschiedene Besucher
+        visit(self.deal, today - timedelta(days=2), '192.168.1.1')
+        visit(self.deal, today - timedelta(days=2), '192.168.1.2')
+        visit(self.deal, today - timedelta(days=1), '192.168.1.1')
+        visit(other, today - timedelta(days=1), '192.168.1.1')
+        visit(other, today - timedelta(days=1), '192.168.1.1', user_agent='Anderer/2.0')
+        visit(other, today, '10.9.8.7')
+        update_rollups()
+        
+        self.assertEqual(DealAnalyticsDaily.objects.get(deal=self.deal, day=today - timedelta(days=2)).visitors, 2)
+        self.assertEqual(count_unique_visitors([self.deal]), 2)
+        self.assertEqual(count_unique_visitors([self.deal], since=today - timedelta(days=1)), 1)
+        self.assertEqual(count_unique_visitors([other]), 3)
+        self.assertEqual(count_unique_visitors([other], until=today - timedelta(days=1)), 2)
+        self.assertEqual(count_unique_visitors([self.deal, other]), 4)
+        
+        # Keine Event-Scans für abgeschlossene Zeiträume
+        with self.assertNumQueries(2):
+            count_unique_visitors(until=today - timedelta(days=1))
+
+
+@unittest.skipUnless(importlib.util.find_spec('numpy'), 'NumPy nicht installiert')
+class HeatmapTests(DealShareBaseTestCase):
+    """Tests für die Klick-Heatmaps"""
+    
+    def _clicks(self, positions, viewport='desktop', element=None):
+        from deals.models import DealAnalyticsEvent
+        DealAnalyticsEvent.objects.bulk_create([
+            DealAnalyticsEvent(deal=self.deal, event_type='click', position_x=x, position_y=y,
+                               element_id=element, meta={'viewport': viewport})
+            for x, y in positions
+        ])
+    
+    def test_clicks_are_binned_incrementally(self):
+        """Test: Klicks landen im richtigen Feld, neue Klicks werden aufaddiert"""
+        from deals.heatmaps import BIN_HEIGHT, decode_counts, update_heatmaps
+        from deals.models import DealHeatmap
+        
+        self._clicks([(10, 10), (20, 30)], element='cta')
+        self._clicks([(2000, 1000)])
+        self._clicks([(100, 100)], viewport='mobile')
+        self.assertEqual(update_heatmaps(self.deal), 4)
+        
+        page = DealHeatmap.objects.get(deal=self.deal, viewport='desktop', element_id='')
+        grid = decode_counts(page)
+        self.assertEqual(page.total_clicks, 3)
+        self.assertEqual(grid[0, 0], 2)
+        self.assertEqual(grid[1000 // BIN_HEIGHT, int(2000 // page.bin_width)], 1)
+        # Leere Zeilen nach dem letzten Klick werden nicht gespeichert
+        self.assertEqual(page.y_bins, 1000 // BIN_HEIGHT + 1)
+        
+        cta = DealHeatmap.objects.get(deal=self.deal, viewport='desktop', element_id='cta')
+        self.assertEqual(cta.total_clicks, 2)
+        self.assertEqual(DealHeatmap.objects.get(deal=self.deal, viewport='mobile').total_clicks, 1)
+        
+        self.assertEqual(update_heatmaps(self.deal), 0)
+        self._clicks([(15, 5), (99999, 99999)], element='cta')
+        self.assertEqual(update_heatmaps(self.deal), 2)
+        cta.refresh_from_db()
+        self.assertEqual(cta.total_clicks, 4)
+        self.assertEqual(decode_counts(cta)[0, 0], 3)
+
+    def test_late_element_grid_is_backfilled(self):
+        """Test: Ein später aufgenommenes Element erhält auch seine früheren Klicks"""
+        from unittest import mock
+        from deals.heatmaps import update_heatmaps
+        from deals.models import DealHeatmap
+
+        self._clicks([(10, 10), (10, 10)], element='cta')
+        self._clicks([(500, 400)], element='faq')
+        with mock.patch('deals.heatmaps.MAX_ELEMENTS', 1):
+            update_heatmaps(self.deal)
+        self.assertFalse(DealHeatmap.objects.filter(deal=self.deal, element_id='faq').exists())
+
+        self._clicks([(500, 400)], element='faq')
+        self.assertEqual(update_heatmaps(self.deal), 1)
+        self.assertEqual(DealHeatmap.objects.get(deal=self.deal, element_id='faq').total_clicks, 2)
+        self.assertEqual(DealHeatmap.objects.get(deal=self.deal, element_id='').total_clicks, 4)
+
+    def test_heatmap_json_endpoint(self):
+        """Test: Das Overlay erhält die Heatmap als dünnes JSON-Raster"""
+        self._clicks([(10, 10), (10, 12), (500, 400)], element='faq')
+        url = reverse('deals:dealroom_heatmap', args=[self.deal.pk])
+        
+        self.assertEqual(self.client.get(url).status_code, 302)
+        self.client.login(username='testuser', password='testpass123')
+        response = self.client.get(url, {'viewport': 'desktop'})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual((data['total'], data['max']), (3, 2))
+        self.assertIn([0, 0, 2], data['cells'])
+        self.assertEqual(data['elements'], ['faq'])
+        
+        self.assertEqual(self.client.get(url, {'viewport': 'tv'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'viewport': 'mobile'}).status_code, 404)
+        
+        # Frische Heatmaps werden im Request nicht neu berechnet
+        self._clicks([(10, 10)], element='faq')
+        self.assertEqual(self.client.get(url, {'viewport': 'desktop'}).json()['total'], 3)
+        with self.settings(DEALROOM_HEATMAP_REFRESH_INTERVAL=-1):
+            self.assertEqual(self.client.get(url, {'viewport': 'desktop'}).json()['total'], 4)
+
+
+class AdminAnalyticsDashboardTests(DealShareBaseTestCase):
+    """Tests für das gecachte Analytics-Dashboard im Admin"""
+    
+    def setUp(self):
+        super().setUp()
+        from django.core.cache import cache
+        cache.clear()
+        self.client.login(username='admin', password='admin123')
+        self.url = reverse('admin:deals_dealanalyticsevent_changelist')
+    
+    def _create_deals(self, days):
+        """Legt je Tag einen Deal an (ohne Signale)"""
+        today = timezone.now()
+        Deal.objects.bulk_create([
+            Deal(
+                title=f'Deal {offset}',
+                slug=f'admin-dashboard-{offset}',
+                recipient_name='Empfänger',
+                recipient_email='empfaenger@test.com',
+                created_by=self.user,
+            )
+            for offset in range(days)
+        ])
+        # created_at ist auto_now_add und muss nachträglich gesetzt werden
+        for offset in range(days):
+            Deal.objects.filter(slug=f'admin-dashboard-{offset}').update(
+                created_at=today - timezone.timedelta(days=offset)
+            )
+    
+    def _count_queries(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response
+    
+    def test_chart_is_built_from_grouped_counts(self):
+        """Test: Deals pro Tag werden lückenlos für 30 Tage gezählt"""
+        from deals.admin_dashboard import build_admin_dashboard_context
+        
+        self._create_deals(3)
+        context = build_admin_dashboard_context()
+        self.assertEqual(len(context['deals_per_day']), 30)
+        self.assertEqual(context['deals_per_day'][0][0], timezone.localdate() - timezone.timedelta(days=29))
+        # Heute: Test-Dealroom, Willkommens-Dealrooms und der erste Bulk-Deal
+        self.assertEqual(context['deals_per_day'][-1][1], Deal.objects.filter(created_at__date=timezone.localdate()).count())
+        self.assertEqual([count for _, count in context['deals_per_day'][-3:-1]], [1, 1])
+        self.assertEqual(context['total_deals'], Deal.objects.count())
+
+    def test_sampled_events_count_with_weight(self):
+        """Test: Gesampelte Events zählen mit ihrem Gewicht"""
+        from deals.admin_dashboard import build_admin_dashboard_context
+        from .models import DealAnalyticsEvent
+
+        DealAnalyticsEvent.objects.bulk_create([
+            DealAnalyticsEvent(deal=self.deal, event_type='click', sample_weight=10),
+            DealAnalyticsEvent(deal=self.deal, event_type='page_view'),
+        ])
+        context = build_admin_dashboard_context()
+        self.assertEqual(context['total_events'], 11)
+        self.assertEqual(
+            [(row['event_type'], row['count']) for row in context['events_by_type']],
+            [('click', 10), ('page_view', 1)],
+        )
+    
+    def test_query_count_is_constant(self):
+        """Test: Die Seite braucht unabhängig von der Datenmenge gleich viele Queries"""
+        from django.core.cache import cache
+        from .models import DealAnalyticsEvent
+        
+        before, _ = self._count_queries()
+        
+        self._create_deals(30)
+        DealAnalyticsEvent.objects.bulk_create([
+            DealAnalyticsEvent(deal=self.deal, event_type=event_type)
+            for event_type in ('page_view', 'click', 'download') * 10
+        ])
+        cache.clear()
+        after, response = self._count_queries()
+        self.assertEqual(after, before)
+        self.assertEqual(response.context['total_events'], 30)
+        
+        # Aus dem Cache entfallen die Kennzahlen-Queries
+        cached, _ = self._count_queries()
+        self.assertLess(cached, after)
+    
+    def test_new_deal_invalidates_cache(self):
+        """Test: Neue Deals verwerfen die gecachten Kennzahlen"""
+        from deals.admin_dashboard import get_admin_dashboard_context
+        
+        total = get_admin_dashboard_context()['total_deals']
+        Deal.objects.create(
+            title='Neuer Deal',
+            slug='neuer-deal',
+            recipient_name='Empfänger',
+            recipient_email='empfaenger@test.com',
+            created_by=self.user,
+        )
+        self.assertEqual(get_admin_dashboard_context()['total_deals'], total + 1)
+    
+    def test_events_follow_cache_timeout(self):
+        """Test: Events leeren den Cache nicht und lassen sich ohne Signale löschen"""
+        from django.core.cache import cache
+        from deals.admin_dashboard import ADMIN_DASHBOARD_CACHE_KEY, get_admin_dashboard_context
+        from deals.analytics_buffer import AnalyticsEventBuffer
+        from .models import DealAnalyticsEvent
+        
+        self.assertEqual(get_admin_dashboard_context()['total_events'], 0)
+        buffer = AnalyticsEventBuffer(flush_size=100, flush_interval_ms=0, spill_dir=make_temp_dir(self))
+        buffer.extend([DealAnalyticsEvent(deal_id=self.deal.id, event_type='page_view') for _ in range(3)])
+        buffer.flush()
+        self.assertEqual(get_admin_dashboard_context()['total_events'], 0)
+        
+        # Nach Ablauf der Cache-Dauer
+        cache.delete(ADMIN_DASHBOARD_CACHE_KEY)
+        self.assertEqual(get_admin_dashboard_context()['total_events'], 3)
+        
+        # Schnelles Löschen: ein DELETE statt Laden und Signal pro Zeile
+        with self.assertNumQueries(1):
+            DealAnalyticsEvent.objects.filter(deal=self.deal).delete()
+
+
+@unittest.skipUnless(importlib.util.find_spec('numpy'), 'NumPy nicht installiert')
+class AnalyticsArchiveTests(DealShareBaseTestCase):
+    """Tests für das Archivieren alter Analytics-Events"""
+    
+    def setUp(self):
+        super().setUp()
+        from datetime import timedelta
+        from django.test import override_settings
+        
+        archive_dir = make_temp_dir(self)
+        settings_override = override_settings(DEALROOM_ANALYTICS_ARCHIVE_DIR=archive_dir, DEALROOM_ANALYTICS_RETENTION_DAYS=30)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        
+        self.today = timezone.localdate()
+        self.old_day = self.today - timedelta(days=60)
+        self.older_day = self.today - timedelta(days=120)
+        self.recent_day = self.today - timedelta(days=5)
+    
+    def _create_events(self, day, count, **fields):
+        from datetime import timedelta
+        from deals.models import DealAnalyticsEvent
+        from deals.rollups import get_day_start
+        
+        timestamp = get_day_start(day) + timedelta(hours=12)
+        return DealAnalyticsEvent.objects.bulk_create([
+            DealAnalyticsEvent(deal=self.deal, timestamp=timestamp, **fields) for _ in range(count)
+        ])
+    
+    def test_old_events_move_to_monthly_archives(self):
+        """Test: Events vor dem Aufbewahrungsfenster landen pro Monat im Archiv"""
+        from deals.archive import archive_events
+        from deals.models import AnalyticsArchive, DealAnalyticsDaily, DealAnalyticsEvent
+        
+        self._create_events(self.older_day, 3, event_type='page_view', visitor_ip='10.0.0.1')
+        self._create_events(self.old_day, 2, event_type='click', element_id='cta', position_x=10, position_y=20,
+                            meta={'viewport': 'desktop'})
+        self._create_events(self.recent_day, 4, event_type='page_view')
+        
+        report = archive_events()
+        self.assertEqual(report['events'], 5)
+        self.assertEqual(AnalyticsArchive.objects.count(), 2)
+        self.assertEqual(DealAnalyticsEvent.objects.count(), 4)
+        self.assertEqual(
+            sorted(AnalyticsArchive.objects.values_list('month', flat=True)),
+            sorted({self.older_day.replace(day=1), self.old_day.replace(day=1)})
+        )
+        
+        # Rollups der archivierten Tage bleiben erhalten
+        self.assertEqual(DealAnalyticsDaily.objects.get(deal=self.deal, day=self.older_day).page_views, 3)
+        self.assertEqual(DealAnalyticsDaily.objects.get(deal=self.deal, day=self.old_day).clicks, 2)
+        
+        # Zweiter Lauf hat nichts mehr zu tun
+        self.assertEqual(archive_events()['events'], 0)
+    
+    def test_archived_events_round_trip(self):
+        """Test: Archivierte Events lassen sich vollständig wieder lesen"""
+        from datetime import timedelta
+        from deals.archive import archive_events, iter_archived_events
+        
+        created = self._create_events(self.old_day, 1, event_type='click', element_id='cta', position_x=10,
+                                      position_y=20, meta={'viewport': 'desktop'}, user_agent='Mozilla/5.0',
+                                      time_spent=timedelta(seconds=12))
+        self._create_events(self.older_day, 1, event_type='page_view')
+        archive_events()
+        
+        events = list(iter_archived_events(since=self.old_day, until=self.old_day, deal_id=self.deal.id))
+        self.assertEqual(len(events), 1)
+        event = events[0]
+        self.assertEqual(event['id'], created[0].id)
+        self.assertEqual((event['event_type'], event['element_id']), ('click', 'cta'))
+        self.assertEqual((event['position_x'], event['position_y']), (10, 20))
+        self.assertEqual(event['meta'], {'viewport': 'desktop'})
+        self.assertEqual(event['user_agent'], 'Mozilla/5.0')
+        self.assertEqual(event['time_spent'], timedelta(seconds=12))
+        self.assertIsNone(event['referrer'])
+        self.assertIsNone(event['user_id'])
+        self.assertEqual(event['timestamp'], created[0].timestamp)
+        self.assertEqual(len(list(iter_archived_events())), 2)
+    
+    def test_late_events_do_not_overwrite_archived_rollups(self):
+        """Test: Verspätete Events für archivierte Tage überschreiben die Rollups nicht"""
+        from deals.archive import archive_events
+        from deals.models import DealAnalyticsDaily
+        from deals.rollups import rollup_days
+        
+        self._create_events(self.old_day, 5, event_type='page_view')
+        archive_events()
+        self._create_events(self.old_day, 1, event_type='page_view')
+        
+        self.assertEqual(rollup_days({(self.deal.id, self.old_day)}), 0)
+        self.assertEqual(DealAnalyticsDaily.objects.get(deal=self.deal, day=self.old_day).page_views, 5)
+
+
+class AnalyticsExportTests(DealShareBaseTestCase):
+    """Tests für den gestreamten Export der Analytics-Events"""
+    
+    def setUp(self):
+        super().setUp()
+        from datetime import timedelta
+        from deals.models import DealAnalyticsEvent
+        
+        now = timezone.now()
+        DealAnalyticsEvent.objects.bulk_create(
+            [DealAnalyticsEvent(deal=self.deal, event_type='page_view', timestamp=now - timedelta(days=3))
+             for _ in range(3)]
+            + [DealAnalyticsEvent(deal=self.deal, event_type='click', element_id='cta', position_x=5, position_y=7,
+                                  meta={'viewport': 'mobile'}, timestamp=now) for _ in range(2)]
+        )
+        self.url = reverse('deals:dealroom_analytics_export', kwargs={'pk': self.deal.pk})
+    
+    def test_csv_export_streams_all_events(self):
+        """Test: Der CSV-Export streamt alle Events mit Kopfzeile"""
+        import csv as csv_module
+        from deals.export import EXPORT_FIELDS
+        
+        self.client.login(username='testuser', password='testpass123')
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertIn('attachment', response['Content-Disposition'])
+        
+        rows = list(csv_module.DictReader(read_stream(response).decode().splitlines()))
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(list(rows[0]), list(EXPORT_FIELDS))
+        self.assertEqual(json.loads(rows[-1]['meta']), {'viewport': 'mobile'})
+    
+    def test_ndjson_export_with_filters(self):
+        """Test: NDJSON-Export mit Event-Typ- und Zeitraumfilter"""
+        self.client.login(username='testuser', password='testpass123')
+        today = timezone.localdate().isoformat()
+        response = self.client.get(self.url, {'format': 'ndjson', 'event_type': 'click', 'since': today})
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        
+        lines = read_stream(response).decode().splitlines()
+        events = [json.loads(line) for line in lines]
+        self.assertEqual(len(events), 2)
+        self.assertEqual({event['event_type'] for event in events}, {'click'})
+        self.assertEqual((events[0]['position_x'], events[0]['element_id']), (5, 'cta'))
+        
+        response = self.client.get(self.url, {'format': 'ndjson', 'until': today, 'event_type': 'page_view'})
+        self.assertEqual(len(read_stream(response).splitlines()), 3)
+    
+    def test_invalid_parameters_and_permissions(self):
+        """Test: Ungültige Parameter liefern 400, fremde Nutzer keinen Zugriff"""
+        self.client.login(username='testuser', password='testpass123')
+        self.assertEqual(self.client.get(self.url, {'format': 'xml'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'event_type': 'unknown'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'since': '31.12.2025'}).status_code, 400)
+        
+        User.objects.create_user(username='fremd', email='fremd@example.com', password='fremd123')
+        self.client.login(username='fremd', password='fremd123')
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+    
+    def test_export_command_writes_file(self):
+        """Test: Der Command exportiert in eine Datei"""
+        from django.core.management import call_command
+        
+        output = os.path.join(make_temp_dir(self), 'export.ndjson')
+        call_command('export_analytics', self.deal.pk, format='ndjson', event_type=['page_view'], output=output,
+                     stdout=io.StringIO())
+        with open(output, encoding='utf-8') as export_file:
+            self.assertEqual(len(export_file.read().splitlines()), 3)
+
+
+@unittest.skipUnless(importlib.util.find_spec('numpy'), 'NumPy nicht installiert')
+class FunnelTests(DealShareBaseTestCase):
+    """Tests für die Session-basierte Funnel-Analyse"""
+    
+    def setUp(self):
+        super().setUp()
+        from django.core.cache import cache
+        cache.clear()
+        self.start = timezone.now() - timezone.timedelta(hours=5)
+    
+    def _session(self, session_id, *steps):
+        """Legt Events einer Session an: (Event-Typ, Sekunden ab Start[, Element])"""
+        from deals.models import DealAnalyticsEvent
+        DealAnalyticsEvent.objects.bulk_create([
+            DealAnalyticsEvent(
+                deal=self.deal, session_id=session_id, event_type=step[0],
+                element_id=step[2] if len(step) > 2 else None,
+                timestamp=self.start + timezone.timedelta(seconds=step[1]),
+            )
+            for step in steps
+        ])
+    
+    def test_steps_are_counted_in_order_per_session(self):
+        """Test: Schritte zählen nur in der richtigen Reihenfolge derselben Session"""
+        from deals.funnels import get_funnel
+        
+        self._session('a', ('page_view', 0), ('download', 10), ('form_submit', 20))
+        self._session('b', ('page_view', 0), ('download', 30))
+        # Formular vor dem Download zählt nicht als dritter Schritt
+        self._session('c', ('form_submit', 0), ('page_view', 5), ('download', 10))
+        self._session('d', ('page_view', 0))
+        # Download ohne Seitenaufruf beginnt keinen Funnel
+        self._session('e', ('download', 0), ('form_submit', 1))
+        
+        funnel = get_funnel(self.deal)
+        self.assertEqual([step['sessions'] for step in funnel['steps']], [4, 3, 1])
+        self.assertEqual(funnel['steps'][1]['rate_from_previous'], 75.0)
+        self.assertEqual(funnel['conversion_rate'], 25.0)
+        self.assertEqual(funnel['steps'][1]['median_seconds'], 10.0)
+    
+    def test_window_and_element_steps(self):
+        """Test: Zeitfenster und Element-Schritte (click:cta) werden beachtet"""
+        from deals.funnels import get_funnel
+        
+        self._session('a', ('page_view', 0), ('click', 30, 'cta'))
+        self._session('b', ('page_view', 0), ('click', 7200, 'cta'))
+        self._session('c', ('page_view', 0), ('click', 10, 'faq'))
+        # Wiederholte Schritte brauchen zwei Events
+        self._session('d', ('page_view', 0), ('page_view', 0))
+        
+        funnel = get_funnel(self.deal, steps=['page_view', 'click:cta'], window=3600)
+        self.assertEqual([step['sessions'] for step in funnel['steps']], [4, 1])
+        funnel = get_funnel(self.deal, steps=['page_view', 'page_view'], window=3600)
+        self.assertEqual([step['sessions'] for step in funnel['steps']], [4, 1])
+    
+    def test_results_are_cached(self):
+        """Test: Wiederholte Abfragen kommen aus dem Cache"""
+        from deals.funnels import get_funnel
+        
+        self._session('a', ('page_view', 0), ('download', 10))
+        first = get_funnel(self.deal, steps=['page_view', 'download'])
+        with self.assertNumQueries(0):
+            self.assertEqual(get_funnel(self.deal, steps=['page_view', 'download']), first)
+
+    def test_range_is_clamped_to_archive(self):
+        """Test: Archivierte Tage werden nicht als leere Tage gezählt"""
+        from datetime import timedelta
+        from deals.funnels import FunnelError, get_funnel
+        from deals.models import AnalyticsArchive
+
+        today = timezone.localdate()
+        archived_before = today - timedelta(days=10)
+        AnalyticsArchive.objects.create(
+            month=archived_before.replace(day=1), path='archiv.npz', first_event_id=1, last_event_id=1,
+            event_count=1, size_bytes=1, archived_before=archived_before,
+        )
+        self._session('a', ('page_view', 0), ('download', 10))
+
+        funnel = get_funnel(self.deal, since=today - timedelta(days=30), until=today)
+        self.assertEqual(funnel['since'], archived_before.isoformat())
+        self.assertEqual(funnel['archived_before'], archived_before.isoformat())
+        self.assertEqual(funnel['steps'][0]['sessions'], 1)
+        self.assertEqual(get_funnel(self.deal)['since'], archived_before.isoformat())
+
+        with self.assertRaises(FunnelError):
+            get_funnel(self.deal, since=today - timedelta(days=30), until=archived_before - timedelta(days=1))
+
+    def test_funnel_endpoint(self):
+        """Test: JSON-Endpunkt mit Validierung"""
+        self._session('a', ('page_view', 0), ('download', 10))
+        url = reverse('deals:dealroom_funnel', kwargs={'pk': self.deal.pk})
+        self.client.login(username='testuser', password='testpass123')
+        
+        response = self.client.get(url, {'steps': 'page_view,download', 'window': '60'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([step['step'] for step in response.json()['steps']], ['page_view', 'download'])
+        self.assertEqual(response.json()['conversion_rate'], 100.0)
+        
+        self.assertEqual(self.client.get(url, {'steps': 'page_view'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'steps': 'page_view,unknown'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'window': 'lang'}).status_code, 400)
+
+
+class SessionStitchingTests(DealShareBaseTestCase):
+    """Tests für das serverseitige Zusammenführen von Sessions"""
+    
+    def setUp(self):
+        super().setUp()
+        from datetime import timedelta
+        from deals.rollups import get_day_start
+        self.yesterday = timezone.localdate() - timedelta(days=1)
+        self.start = get_day_start(self.yesterday) + timedelta(hours=10)
+    
+    def _events(self, session_id, *events):
+        """Legt Events an: (Event-Typ, Sekunden ab Start[, Feld-Dict])"""
+        from datetime import timedelta
+        from deals.models import DealAnalyticsEvent
+        return DealAnalyticsEvent.objects.bulk_create([
+            DealAnalyticsEvent(
+                deal=self.deal, session_id=session_id, event_type=event[0],
+                timestamp=self.start + timedelta(seconds=event[1]), **(event[2] if len(event) > 2 else {})
+            )
+            for event in events
+        ])
+    
+    def test_sessions_derive_dwell_bounce_and_scroll(self):
+        """Test: Dauer, Bounce und Scrolltiefe werden aus den Events abgeleitet"""
+        from datetime import timedelta
+        from deals.models import DealAnalyticsDaily, DealAnalyticsSession
+        from deals.sessions import update_sessions
+        
+        self._events('a', ('page_view', 0), ('scroll', 40, {'meta': {'depth': 80}}), ('click', 90))
+        self._events('b', ('page_view', 0))
+        # Vom Client gemeldete Zeit zählt, wenn sie länger ist als die Event-Spanne
+        self._events('c', ('page_view', 0), ('time_spent', 2, {'time_spent': timedelta(seconds=30)}))
+        
+        report = update_sessions()
+        self.assertEqual(report['sessions'], 3)
+        
+        sessions = {session.session_key: session for session in DealAnalyticsSession.objects.all()}
+        self.assertEqual(sessions['a'].duration_seconds, 90)
+        self.assertEqual(sessions['a'].max_scroll_depth, 80)
+        self.assertFalse(sessions['a'].is_bounce)
+        self.assertTrue(sessions['b'].is_bounce)
+        self.assertEqual(sessions['c'].duration_seconds, 30)
+        self.assertFalse(sessions['c'].is_bounce)
+        
+        daily = DealAnalyticsDaily.objects.get(deal=self.deal, day=self.yesterday)
+        self.assertEqual((daily.sessions, daily.bounces), (3, 1))
+        self.assertEqual(daily.session_seconds_total, 120)
+        self.assertEqual((daily.scroll_depth_total, daily.scroll_sessions), (80, 1))
+    
+    def test_stitching_is_incremental_and_splits_on_timeout(self):
+        """Test: Neue Events verlängern Sessions, lange Pausen beginnen neue"""
+        from deals.models import DealAnalyticsDaily, DealAnalyticsSession
+        from deals.sessions import SESSION_TIMEOUT, update_sessions
+        
+        self._events('a', ('page_view', 0))
+        update_sessions()
+        self.assertTrue(DealAnalyticsSession.objects.get().is_bounce)
+        
+        self._events('a', ('download', 60))
+        self._events('a', ('page_view', 60 + SESSION_TIMEOUT.total_seconds() + 1))
+        report = update_sessions()
+        self.assertEqual(report['events'], 2)
+        
+        first, second = DealAnalyticsSession.objects.order_by('started_at')
+        self.assertEqual((first.events, first.duration_seconds, first.is_bounce), (2, 60, False))
+        self.assertEqual(second.events, 1)
+        daily = DealAnalyticsDaily.objects.get(deal=self.deal, day=self.yesterday)
+        self.assertEqual((daily.sessions, daily.bounces), (2, 1))
+        
+        # Ohne neue Events ändert sich nichts
+        self.assertEqual(update_sessions()['events'], 0)
+
+    def test_concurrent_run_does_not_count_batch_twice(self):
+        """Test: Hat ein anderer Lauf den Wasserstand verschoben, wird der Block übersprungen"""
+        from unittest import mock
+        from deals.models import AnalyticsWatermark, DealAnalyticsSession
+        from deals.sessions import SESSION_WATERMARK, update_sessions
+
+        self._events('a', ('page_view', 0), ('click', 30))
+        update_sessions()
+        stored = AnalyticsWatermark.objects.get(name=SESSION_WATERMARK)
+
+        # Zweiter Lauf hat den Wasserstand vor dem ersten Commit gelesen
+        stale = AnalyticsWatermark(pk=stored.pk, name=SESSION_WATERMARK, last_event_id=0)
+        with mock.patch.object(AnalyticsWatermark.objects, 'get_or_create', return_value=(stale, False)):
+            report = update_sessions()
+        self.assertEqual(report, {'events': 0, 'sessions': 0, 'watermark': stored.last_event_id})
+        self.assertEqual(DealAnalyticsSession.objects.get().events, 2)
+
+    def test_dashboard_uses_session_metrics(self):
+        """Test: Das Dashboard nutzt Verweildauer und Bounce-Rate der Sessions"""
+        from deals.rollups import get_dashboard_stats, update_rollups
+        
+        self._events('a', ('page_view', 0), ('page_view', 40))
+        self._events('b', ('page_view', 0))
+        
+        update_rollups()
+        stats = get_dashboard_stats(self.deal)
+        self.assertEqual(stats['total_sessions'], 2)
+        self.assertEqual(stats['avg_time_spent'], 20.0)
+        self.assertEqual(stats['bounce_rate'], 50.0)
+        self.assertIsNone(stats['avg_scroll_depth'])
+    
+    def test_rollups_keep_session_fields(self):
+        """Test: Neu berechnete Event-Rollups überschreiben die Session-Felder nicht"""
+        from deals.models import DealAnalyticsDaily
+        from deals.rollups import rollup_days
+        from deals.sessions import update_sessions
+        
+        self._events('a', ('page_view', 0), ('page_view', 40))
+        update_sessions()
+        rollup_days({(self.deal.id, self.yesterday)})
+        daily = DealAnalyticsDaily.objects.get(deal=self.deal, day=self.yesterday)
+        self.assertEqual((daily.page_views, daily.sessions), (2, 1))
+
+
+class AnalyticsInterningTests(DealShareBaseTestCase):
+    """Tests für die Dictionary-Tabellen von User-Agents und Referrern"""
+    
+    IPHONE = 'Mozilla/5.0 (iPhone; CPU iPhone OS 17_0 like Mac OS X) Mobile/15E148'
+    
+    def test_device_class_is_derived_from_user_agent(self):
+        """Test: Geräteklassen für typische User-Agents"""
+        from deals.interning import parse_device_class
+        
+        self.assertEqual(parse_device_class(self.IPHONE), 'mobile')
+        self.assertEqual(parse_device_class('Mozilla/5.0 (iPad; CPU OS 17_0 like Mac OS X)'), 'tablet')
+        self.assertEqual(parse_device_class('Mozilla/5.0 (Linux; Android 14; SM-X710)'), 'tablet')
+        self.assertEqual(parse_device_class('Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/126.0'), 'desktop')
+        self.assertEqual(parse_device_class('Googlebot/2.1 (+http://www.google.com/bot.html)'), 'bot')
+        self.assertEqual(parse_device_class(''), 'unknown')
+    
+    def test_repeated_strings_share_one_entry(self):
+        """Test: Events speichern nur Fremdschlüssel auf einen Eintrag je Wert"""
+        from deals.models import AnalyticsReferrer, AnalyticsUserAgent, DealAnalyticsEvent
+        
+        DealAnalyticsEvent.objects.bulk_create([
+            DealAnalyticsEvent(deal=self.deal, event_type='page_view', user_agent=self.IPHONE,
+                               referrer=f'https://Example.com:8080/seite-{number}')
+            for number in range(20)
+        ])
+        DealAnalyticsEvent.objects.create(deal=self.deal, event_type='click', user_agent=self.IPHONE)
+        
+        agent = AnalyticsUserAgent.objects.get()
+        self.assertEqual((agent.value, agent.device_class), (self.IPHONE, 'mobile'))
+        self.assertEqual(list(AnalyticsReferrer.objects.values_list('host', flat=True)), ['example.com'])
+        self.assertEqual(DealAnalyticsEvent.objects.filter(user_agent_entry=agent).count(), 21)
+        
+        event = DealAnalyticsEvent.objects.filter(event_type='page_view').first()
+        self.assertEqual((event.user_agent, event.referrer, event.device_class), (self.IPHONE, 'example.com', 'mobile'))
+        click = DealAnalyticsEvent.objects.get(event_type='click')
+        self.assertIsNone(click.referrer)
+    
+    def test_export_and_spill_keep_strings(self):
+        """Test: Export und Spill-Dateien liefern weiterhin die Texte"""
+        from deals.analytics_buffer import event_from_dict, event_to_dict
+        from deals.export import iter_events
+        from deals.models import DealAnalyticsEvent
+        
+        pending = DealAnalyticsEvent(deal=self.deal, event_type='page_view', user_agent=self.IPHONE,
+                                     referrer='https://example.com/start')
+        restored = event_from_dict(json.loads(json.dumps(event_to_dict(pending))))
+        DealAnalyticsEvent.objects.bulk_create([restored])
+        
+        exported = list(iter_events(self.deal.id))
+        self.assertEqual(len(exported), 1)
+        self.assertEqual((exported[0]['user_agent'], exported[0]['referrer']), (self.IPHONE, 'example.com'))
+
+
+class AdaptiveSamplingTests(DealShareBaseTestCase):
+    """Tests für das adaptive Sampling von Klicks und Scroll-Events"""
+    
+    def _sampler(self, budget=10):
+        from deals.sampling import AdaptiveSampler
+        self.now = 0.0
+        return AdaptiveSampler(budget=budget, window_seconds=60, clock=lambda: self.now)
+    
+    def test_rate_adapts_to_budget_and_weights_stay_unbiased(self):
+        """Test: Über dem Budget wird ausgedünnt, die Gewichte summieren sich zum Volumen"""
+        sampler = self._sampler()
+        
+        weights = [sampler.sample(self.deal.id, 'click') for _ in range(1000)]
+        stored = [weight for weight in weights if weight]
+        self.assertLess(len(stored), 250)
+        self.assertAlmostEqual(sum(stored), 1000, delta=100)
+        
+        # Seitenaufrufe und Conversions werden nie gesampelt
+        for event_type in ('page_view', 'form_submit', 'download'):
+            self.assertEqual({sampler.sample(self.deal.id, event_type) for _ in range(1000)}, {1})
+        
+        # Nächstes Fenster startet mit der Rate aus dem Volumen des letzten
+        self.now = 61
+        sampler.sample(self.deal.id, 'click')
+        self.assertEqual(sampler.rates()[(self.deal.id, 'click')], 100)
+        # Nach einer Pause wird wieder alles gespeichert
+        self.now = 300
+        self.assertEqual(sampler.sample(self.deal.id, 'click'), 1)
+    
+    def test_build_events_carry_sample_weight(self):
+        """Test: Gesampelte Events tragen ihr Gewicht, ungesampelte Gewicht 1"""
+        from deals.ingest import build_events
+        
+        sampler = self._sampler(budget=2)
+        events = build_events(
+            self.deal.id, [{'type': 'click', 'element': 'cta'}] * 6 + [{'type': 'page_view'}] * 6,
+            ip_address='10.0.0.1', sampler=sampler
+        )
+        clicks = [event.sample_weight for event in events if event.event_type == 'click']
+        self.assertEqual(clicks, [1, 1, 2, 4])
+        self.assertEqual([event.sample_weight for event in events if event.event_type == 'page_view'], [1] * 6)
+    
+    def test_rollups_heatmaps_and_funnels_use_weights(self):
+        """Test: Abgeleitete Kennzahlen rechnen mit Gewichten statt Zeilen"""
+        from deals.funnels import get_funnel
+        from deals.heatmaps import update_heatmaps
+        from deals.models import DealAnalyticsDaily, DealAnalyticsEvent, DealHeatmap
+        from deals.rollups import get_day_start, rollup_days
+        
+        yesterday = timezone.localdate() - timezone.timedelta(days=1)
+        moment = get_day_start(yesterday) + timezone.timedelta(hours=12)
+        events = [
+            DealAnalyticsEvent(deal=self.deal, event_type='page_view', session_id=f's{number}', timestamp=moment)
+            for number in range(8)
+        ]
+        events += [
+            DealAnalyticsEvent(deal=self.deal, event_type='click', session_id=f's{number}', element_id='cta',
+                               position_x=10, position_y=10, meta={'viewport': 'desktop'}, sample_weight=4,
+                               timestamp=moment + timezone.timedelta(seconds=5))
+            for number in range(2)
+        ]
+        DealAnalyticsEvent.objects.bulk_create(events)
+        
+        rollup_days({(self.deal.id, yesterday)})
+        daily = DealAnalyticsDaily.objects.get(deal=self.deal, day=yesterday)
+        self.assertEqual((daily.page_views, daily.clicks, daily.top_elements), (8, 8, {'cta': 8}))
+        
+        update_heatmaps(self.deal)
+        self.assertEqual(DealHeatmap.objects.get(deal=self.deal, element_id='').total_clicks, 8)
+        
+        funnel = get_funnel(self.deal, steps=['page_view', 'click:cta'])
+        self.assertEqual([step['sessions'] for step in funnel['steps']], [8, 8])
+
+
+class LiveCountersTests(DealShareBaseTestCase):
+    """Tests für die Live-Zähler per Server-Sent Events"""
+    
+    def _events(self, *specs):
+        from deals.models import DealAnalyticsEvent
+        return [
+            DealAnalyticsEvent(deal_id=self.deal.id, event_type=event_type, visitor_hash=visitor)
+            for event_type, visitor in specs
+        ]
+    
+    def test_hub_counts_sliding_window_without_queries(self):
+        """Test: Zähler laufen nach dem Fenster aus, ohne Datenbankzugriff"""
+        from deals.live import LiveHub
+        
+        self.now = 1000.0
+        hub = LiveHub(window_seconds=60, clock=lambda: self.now)
+        with self.assertNumQueries(0):
+            hub.publish(self._events(('page_view', 'a'), ('page_view', 'b'), ('click', 'a')))
+            self.now += 30
+            hub.publish(self._events(('download', 'c')))
+            self.assertEqual(
+                hub.snapshot(self.deal.id), {'visitors': 3, 'page_views': 2, 'downloads': 1, 'window': 60}
+            )
+            self.now += 40
+            self.assertEqual(
+                hub.snapshot(self.deal.id), {'visitors': 1, 'page_views': 0, 'downloads': 1, 'window': 60}
+            )
+            self.assertEqual(hub.snapshot(self.deal.id + 1)['visitors'], 0)
+
+    def test_hub_prunes_without_snapshots(self):
+        """Test: Ohne Betrachter bleibt der Speicher auf ein Fenster begrenzt"""
+        from deals.live import LiveHub
+        from deals.models import DealAnalyticsEvent
+
+        self.now = 1000.0
+        hub = LiveHub(window_seconds=60, clock=lambda: self.now)
+        for second in range(5000):
+            self.now = 1000.0 + second
+            hub.publish(self._events(('page_view', f'v{second}')))
+        counters = hub._counters[self.deal.id]
+        self.assertEqual((len(counters.buckets), len(counters.visitors)), (60, 60))
+
+        # Dealrooms ohne neue Events verschwinden beim nächsten Aufräumen
+        self.now += 120
+        hub.publish([DealAnalyticsEvent(deal_id=self.deal.id + 1, event_type='page_view', visitor_hash='x')])
+        self.assertNotIn(self.deal.id, hub._counters)
+
+    async def test_stream_pushes_counters_from_buffer(self):
+        """Test: Angenommene Beacons erscheinen im Stream des Dealrooms"""
+        from unittest import mock
+        from django.test import AsyncClient
+        from deals.analytics_buffer import AnalyticsEventBuffer
+        from deals.live import LiveHub, stream_live_counters
+        
+        hub = LiveHub()
+        buffer = AnalyticsEventBuffer(flush_size=1000, flush_interval_ms=0, capacity=1000)
+        client = AsyncClient()
+        await client.aforce_login(self.user)
+        with mock.patch('deals.live.live_hub', hub), mock.patch('deals.analytics_buffer.live_hub', hub), \
+                mock.patch('deals.live.PUSH_INTERVAL', 0):
+            buffer.extend(self._events(('page_view', 'a')))
+            response = await client.get(reverse('deals:dealroom_live', args=[self.deal.pk]))
+            self.assertEqual(response['Content-Type'], 'text/event-stream')
+            stream = aiter(response.streaming_content)
+            
+            first = (await anext(stream)).decode()
+            self.assertIn('event: counters', first)
+            self.assertIn('"visitors": 1', first)
+            self.assertEqual(hub.subscriber_count(self.deal.id), 1)
+            
+            buffer.extend(self._events(('page_view', 'b'), ('download', 'b')))
+            second = (await anext(stream)).decode()
+            self.assertIn('"page_views": 2', second)
+            self.assertIn('"downloads": 1', second)
+        
+        # Schließen des Streams meldet ihn ab
+        other_hub = LiveHub()
+        stream = stream_live_counters(self.deal.id, hub=other_hub)
+        await anext(stream)
+        self.assertEqual(other_hub.subscriber_count(self.deal.id), 1)
+        await stream.aclose()
+        self.assertEqual(other_hub.subscriber_count(self.deal.id), 0)
+    
+    def test_stream_requires_owner(self):
+        """Test: Nur Ersteller und Staff dürfen den Stream öffnen"""
+        url = reverse('deals:dealroom_live', args=[self.deal.pk])
+        self.assertEqual(self.client.get(url).status_code, 302)
+        
+        other = User.objects.create_user(username='fremd', email='fremd@example.com', password='pass12345')
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+
+class DealFileDownloadTests(DealShareBaseTestCase):
+    """Tests für den gestreamten Download von Dealroom-Dateien"""
+    
+    def test_download_supports_ranges(self):
+        """Test: Dealroom-Dateien werden gestreamt und setzen Downloads fort"""
+        from django.test import override_settings
+        
+        media_root = make_temp_dir(self)
+        with override_settings(MEDIA_ROOT=media_root):
+            deal_file = DealFile.objects.create(
+                deal=self.deal, title='Exposé', uploaded_by=self.user,
+                file=SimpleUploadedFile('expose.pdf', b'0123456789' * 100)
+            )
+            url = reverse('deals:dealroom_file_download', args=[deal_file.pk])
+            self.client.force_login(self.user)
+            
+            response = self.client.get(url)
+            self.assertTrue(response.streaming)
+            self.assertEqual(response['Content-Length'], '1000')
+            self.assertEqual(response['Content-Disposition'], 'attachment; filename="expose.pdf"')
+            
+            response = self.client.get(url, HTTP_RANGE='bytes=995-')
+            self.assertEqual(response.status_code, 206)
+            self.assertEqual(response['Content-Type'], 'application/pdf')
+            
+            self.assertEqual(read_stream(response), b'56789')
+
+
 class URLGenerationTests(DealShareBaseTestCase):
     """Tests für URL-Generierung"""
     
@@ -769,5 +2300,290 @@ class SecurityTests(DealShareBaseTestCase):
         self.assertEqual(self.deal.custom_html_content, malicious_html)
 
 
+class AsyncPublicViewsTests(DealShareBaseTestCase):
+    """Tests für die asynchronen öffentlichen Views (Landingpage, generated_pages)"""
+    
+    def setUp(self):
+        # Generierte Seiten in ein temporäres Verzeichnis schreiben
+        self.base_dir = make_temp_dir(self)
+        self.settings_override = self.settings(BASE_DIR=self.base_dir)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        super().setUp()
+    
+    def test_landingpage_served_from_generated_artifact(self):
+        """Test: Aktuelle generierte Website wird von der Platte gelesen"""
+        self.deal.refresh_from_db()
+        self.assertTrue(self.deal.has_current_website())
+        
+        index_path = os.path.join(self.base_dir, 'generated_pages', f'dealroom-{self.deal.id}', 'index.html')
+        with open(index_path, 'w', encoding='utf-8') as f:
+            f.write('<html><body>Artefakt-Marker</body></html>')
+        
+        response = self.client.get(reverse('deals:landingpage', args=[self.deal.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Artefakt-Marker')
+    
+    def test_landingpage_tracking_does_not_regenerate(self):
+        """Test: Zugriffs-Tracking speichert nicht den ganzen Deal"""
+        self.deal.refresh_from_db()
+        last_generation = self.deal.last_generation
+        
+        self.client.get(reverse('deals:landingpage', args=[self.deal.pk]))
+        self.client.get(reverse('deals:landingpage', args=[self.deal.pk]))
+        
+        self.deal.refresh_from_db()
+        self.assertEqual(self.deal.access_count, 2)
+        self.assertIsNotNone(self.deal.last_accessed)
+        self.assertEqual(self.deal.last_generation, last_generation)
+    
+    def test_generated_page_view(self):
+        """Test: generated_pages wird asynchron ausgeliefert"""
+        response = self.client.get(f'/generated_pages/dealroom-{self.deal.id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/html')
+        self.assertIn(b'Test Dealroom', response.content)
+        
+        response = self.client.get('/generated_pages/../manage.py')
+        self.assertEqual(response.status_code, 404)
+        
+        response = self.client.get('/generated_pages/dealroom-99999/index.html')
+        self.assertEqual(response.status_code, 404)
+    
+    async def test_password_flow_async(self):
+        """Test: Passwortabfrage über den asynchronen Client"""
+        from django.test import AsyncClient
+        
+        await sync_to_async(self.deal.set_password_protection)('geheim123')
+        client = AsyncClient()
+        
+        response = await client.get(reverse('deals:landingpage', args=[self.deal.pk]))
+        self.assertRedirects(
+            response, reverse('deals:password_protection', args=[self.deal.pk]),
+            fetch_redirect_response=False
+        )
+        
+        response = await client.post(reverse('deals:password_protection', args=[self.deal.pk]), {
+            'password': 'geheim123'
+        })
+        self.assertRedirects(
+            response, reverse('deals:landingpage', args=[self.deal.pk]),
+            fetch_redirect_response=False
+        )
+        
+        response = await client.get(reverse('deals:landingpage', args=[self.deal.pk]))
+        self.assertEqual(response.status_code, 200)
+
+
+
+class WarmDealroomsTests(DealShareBaseTestCase):
+    """Tests für das Vorwärmen der Dealroom-Caches"""
+    
+    def setUp(self):
+        self.base_dir = make_temp_dir(self)
+        self.settings_override = self.settings(BASE_DIR=self.base_dir)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        super().setUp()
+        from django.core.cache import cache
+        cache.clear()
+    
+    def test_warmup_regenerates_stale_pages_and_fills_cache(self):
+        """Test: Veraltete Seiten werden neu geschrieben, Render-Cache befüllt"""
+        from generator.cache import get_cached_variants
+        from deals.warmup import warm_dealrooms
+        
+        Deal.objects.filter(pk=self.deal.pk).update(website_status='not_generated', last_generation=None)
+        Deal.objects.create(title='Entwurf', status='draft', created_by=self.user)
+        active_count = Deal.objects.filter(status='active').count()
+        
+        report = warm_dealrooms(workers=1)
+        
+        self.assertEqual(report['total'], active_count)
+        self.assertEqual(report['warmed'], active_count)
+        self.assertEqual(report['regenerated'], 1)
+        self.assertEqual(report['coverage'], 100.0)
+        
+        self.deal.refresh_from_db()
+        self.assertTrue(self.deal.has_current_website())
+        self.assertIsNotNone(get_cached_variants(self.deal))
+        self.assertTrue(os.path.exists(
+            os.path.join(self.base_dir, 'generated_pages', f'dealroom-{self.deal.id}', 'index.html')
+        ))
+        
+        # Zweiter Lauf: Seite ist aktuell
+        report = warm_dealrooms(workers=1)
+        self.assertEqual(report['regenerated'], 0)
+    
+    def test_warmup_respects_budget(self):
+        """Test: Bei erschöpftem Zeitbudget werden Dealrooms übersprungen"""
+        from deals.warmup import warm_dealrooms
+        
+        report = warm_dealrooms(workers=1, budget=-1)
+        self.assertEqual(report['warmed'], 0)
+        self.assertEqual(report['skipped'], Deal.objects.filter(status='active').count())
+        self.assertEqual(report['coverage'], 0.0)
+    
+    def test_file_change_invalidates_render_cache(self):
+        """Test: Datei-Änderungen verwerfen das gecachte HTML"""
+        from generator.cache import get_cached_variants, render_website
+        
+        render_website(self.deal)
+        self.assertIsNotNone(get_cached_variants(self.deal))
+        
+        DealFile.objects.create(
+            deal=self.deal,
+            title='Neue Datei',
+            file=SimpleUploadedFile('neu.txt', b'inhalt'),
+            uploaded_by=self.user
+        )
+        self.assertIsNone(get_cached_variants(self.deal))
+    
+    def test_warm_dealrooms_command(self):
+        """Test: Management-Kommando gibt eine Zusammenfassung aus"""
+        from io import StringIO
+        from django.core.management import call_command
+        
+        active_count = Deal.objects.filter(status='active').count()
+        out = StringIO()
+        call_command('warm_dealrooms', workers=1, stdout=out)
+        self.assertIn(f'Vorgewärmt: {active_count} von {active_count}', out.getvalue())
+        # Standard-LocMemCache erreicht die Server-Worker nicht
+        self.assertIn('Prozesslokaler Cache', out.getvalue())
+
+
+class AccessLevelVariantsTests(DealShareBaseTestCase):
+    """Tests für die vorgerenderten Varianten je Zugriffsebene"""
+    
+    def setUp(self):
+        self.base_dir = make_temp_dir(self)
+        self.settings_override = self.settings(BASE_DIR=self.base_dir, MEDIA_ROOT=self.base_dir)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        super().setUp()
+        from django.core.cache import cache
+        cache.clear()
+        
+        for level in ('public', 'customer', 'internal', 'confidential'):
+            DealFile.objects.create(
+                deal=self.deal,
+                title=f'Dokument-{level}',
+                file=SimpleUploadedFile(f'{level}.pdf', b'%PDF-1.4'),
+                file_type='document',
+                document_access_level=level,
+                uploaded_by=self.user
+            )
+        
+        from generator.utils import get_variant_path
+        from deals.warmup import warm_dealroom
+        Deal.objects.filter(pk=self.deal.pk).update(website_status='not_generated', last_generation=None)
+        self.deal.refresh_from_db()
+        warm_dealroom(self.deal)
+        self.get_variant_path = get_variant_path
+    
+    def test_variants_contain_only_permitted_documents(self):
+        """Test: Jede Variante enthält nur Dokumente bis zur eigenen Zugriffsebene"""
+        with open(self.get_variant_path(self.deal.id, 'public'), encoding='utf-8') as f:
+            public_html = f.read()
+        with open(self.get_variant_path(self.deal.id, 'customer'), encoding='utf-8') as f:
+            customer_html = f.read()
+        with open(self.get_variant_path(self.deal.id, 'confidential'), encoding='utf-8') as f:
+            confidential_html = f.read()
+        
+        self.assertIn('Dokument-public', public_html)
+        self.assertNotIn('Dokument-customer', public_html)
+        self.assertIn('Dokument-customer', customer_html)
+        self.assertNotIn('Dokument-internal', customer_html)
+        for level in ('public', 'customer', 'internal', 'confidential'):
+            self.assertIn(f'Dokument-{level}', confidential_html)
+    
+    def test_landingpage_picks_variant_from_session(self):
+        """Test: LandingpageView wählt die Variante nach Session-Status"""
+        url = reverse('deals:landingpage', args=[self.deal.pk])
+        
+        response = self.client.get(url)
+        self.assertNotContains(response, 'Dokument-customer')
+        
+        from deals.access_tokens import ACCESS_QUERY_PARAM, create_access_token
+        self.deal.set_password_protection('geheim123')
+        response = self.client.get(url, {ACCESS_QUERY_PARAM: create_access_token(self.deal)})
+        self.assertContains(response, 'Dokument-customer')
+        self.assertNotContains(response, 'Dokument-internal')
+        
+        self.login_user(self.user)
+        response = self.client.get(url)
+        self.assertContains(response, 'Dokument-confidential')
+    
+    def test_variants_not_served_as_generated_pages(self):
+        """Test: Nicht-öffentliche Varianten sind über generated_pages nicht abrufbar"""
+        response = self.client.get(f'/generated_pages/dealroom-{self.deal.id}/_variants/confidential.html')
+        self.assertEqual(response.status_code, 404)
+        
+        response = self.client.get(f'/generated_pages/dealroom-{self.deal.id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, 'Dokument-confidential')
+
+
+class LoadtestHarnessTests(DealShareBaseTestCase):
+    """Tests für den Lasttest-Harness (Seeder, Auswertung, Query-Zählung)"""
+    
+    def setUp(self):
+        self.base_dir = make_temp_dir(self)
+        self.settings_override = self.settings(BASE_DIR=self.base_dir, MEDIA_ROOT=self.base_dir)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        super().setUp()
+    
+    def test_seed_loadtest_writes_manifest(self):
+        """Test: Seeder legt Dealrooms mit Dateien, FAQs und Timeline an"""
+        from io import StringIO
+        from django.core.management import call_command
+        
+        manifest_path = os.path.join(self.base_dir, 'manifest.json')
+        call_command(
+            'seed_loadtest', deals=3, files=2, file_size=4, faq=5, timeline=4,
+            protected=1.0, manifest=manifest_path, no_render=True, stdout=StringIO()
+        )
+        
+        with open(manifest_path, encoding='utf-8') as f:
+            manifest = json.load(f)
+        self.assertEqual(len(manifest['protected_deal_ids']), 3)
+        self.assertEqual(manifest['public_deal_ids'], [])
+        
+        deal = Deal.objects.get(pk=manifest['protected_deal_ids'][0])
+        self.assertEqual(len(deal.faq_items), 5)
+        self.assertEqual(len(deal.timeline_events), 4)
+        self.assertEqual(deal.files.count(), 2)
+        self.assertTrue(deal.check_password('loadtest'))
+    
+    def test_summarize_percentiles(self):
+        """Test: Perzentile und Durchsatz werden korrekt berechnet"""
+        from loadtest.run import percentile, summarize
+        
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50.5)
+        self.assertAlmostEqual(percentile(values, 99), 99.01)
+        self.assertIsNone(percentile([], 50))
+        
+        samples = [('landingpage', 0.01 * i, 200, 2) for i in range(1, 11)]
+        samples.append(('landingpage', 0.5, 500, 3))
+        summary = summarize(samples, duration=2)
+        self.assertEqual(summary['landingpage']['requests'], 11)
+        self.assertEqual(summary['landingpage']['errors'], 1)
+        self.assertEqual(summary['landingpage']['throughput_rps'], 5.5)
+        self.assertEqual(summary['landingpage']['db_queries']['max'], 3)
+    
+    def test_query_count_header(self):
+        """Test: Middleware gibt die DB-Queries pro Anfrage zurück"""
+        from django.conf import settings
+        
+        middleware = ['loadtest.middleware.query_count_middleware'] + list(settings.MIDDLEWARE)
+        with self.settings(MIDDLEWARE=middleware):
+            response = self.client.get(f'/generated_pages/dealroom-{self.deal.id}/')
+            self.assertEqual(response['X-DB-Queries'], '0')
+            
+            response = self.client.get(reverse('deals:landingpage', args=[self.deal.pk]))
+            self.assertGreater(int(response['X-DB-Queries']), 0)
+
 print("✅ Alle Tests erfolgreich erstellt!")
 
@@ -31,6 +31,11 @@ urlpatterns = [
     
     # Analytics & A/B Testing
     path('<int:pk>/analytics/', views.DealAnalyticsView.as_view(), name='dealroom_analytics'),
+    path('<int:pk>/analytics/heatmap/', views.DealHeatmapView.as_view(), name='dealroom_heatmap'),
+    path('<int:pk>/analytics/export/', views.DealAnalyticsExportView.as_view(), name='dealroom_analytics_export'),
+    path('<int:pk>/analytics/funnel/', views.DealFunnelView.as_view(), name='dealroom_funnel'),
+    path('<int:pk>/analytics/live/', views.DealLiveStreamView.as_view(), name='dealroom_live'),
+    path('<int:deal_id>/collect/', views.AnalyticsCollectView.as_view(), name='analytics_collect'),
     
     # Datei-Management
     path('<int:pk>/files/', views.DealFileListView.as_view(), name='dealroom_file_list'),
@@ -3,20 +3,40 @@ Views für die Dealrooms-App
 """
 import csv
 import io
+import mimetypes
+import os
+import re
+from asgiref.sync import sync_to_async
 from django.views.generic import (
     ListView, DetailView, CreateView, UpdateView, DeleteView, View, TemplateView
 )
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
+from django.contrib.auth.views import redirect_to_login
 from django.urls import reverse_lazy, reverse
 from django.shortcuts import get_object_or_404, redirect
 from django.contrib import messages
-from django.http import HttpResponse, Http404, HttpResponseRedirect, JsonResponse
+from django.http import HttpResponse, Http404, HttpResponseRedirect, HttpResponseNotModified, JsonResponse, StreamingHttpResponse
 from django.utils.translation import gettext_lazy as _
-from django.db.models import Q, Avg, Count
+from django.db.models import Q, F
 from django.db import transaction
-from django.core.exceptions import ValidationError
-from .models import Deal, DealFile, DealFileAssignment, DealAnalyticsEvent, ABTest, ContentBlock, MediaLibrary, CMSElement, LayoutTemplate
+from django.core.exceptions import PermissionDenied, ValidationError, SuspiciousFileOperation
+from django.conf import settings
+from django.template.response import TemplateResponse
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+from .models import Deal, DealFile, DealFileAssignment, ContentBlock, MediaLibrary, CMSElement, LayoutTemplate
 from .forms import DealForm, DealFileForm, ModernDealForm
+from .access_tokens import (
+    ACCESS_QUERY_PARAM, create_access_token, get_request_token,
+    has_valid_access_token, set_access_cookie, verify_access_token
+)
+from .analytics_buffer import analytics_buffer
+from .export import EXPORT_FORMATS, ExportError, astream_export, parse_export_date, parse_export_params
+from .ingest import BeaconError, build_events, parse_beacon
+from .live import stream_live_counters
+from .rollups import get_dashboard_stats
+from files.downloads import serve_file
 from files.models import GlobalFile
 from .utils import (
     log_deal_creation, log_deal_update, log_status_change,
@@ -24,7 +44,7 @@ from .utils import (
     log_website_generation, log_website_deletion
 )
 from django.utils import timezone
-from django.shortcuts import render, get_object_or_404, redirect
+from django.shortcuts import render, get_object_or_404, aget_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.http import JsonResponse, HttpResponse
@@ -555,9 +575,9 @@ class DealFileDownloadView(LoginRequiredMixin, DetailView):
         if not file_obj.file:
             raise Http404(_('Datei nicht gefunden.'))
         
-        response = HttpResponse(file_obj.file, content_type='application/octet-stream')
-        response['Content-Disposition'] = f'attachment; filename="{file_obj.file.name}"'
-        return response
+        return serve_file(
+            request, file_obj.file, filename=file_obj.get_file_name(), content_type=file_obj.mime_type
+        )
 
 
 class WebsitePreviewView(LoginRequiredMixin, View):
@@ -825,36 +845,43 @@ class DealFileAssignmentListView(LoginRequiredMixin, UserPassesTestMixin, Templa
 
 
 class PasswordProtectionView(View):
-    """Passwortschutz-View für Landingpages"""
+    """
+    Passwortschutz-View für Landingpages
+
+    Asynchron implementiert, damit öffentliche Anfragen unter ASGI keinen
+    Worker-Thread blockieren. Das Passwort-Hashing läuft im Thread-Pool.
+    Nach erfolgreicher Eingabe wird ein signiertes Zugriffstoken als Cookie
+    gesetzt (siehe deals.access_tokens), die Session wird nicht benötigt.
+    """
     
-    def get(self, request, deal_id):
+    async def get(self, request, deal_id):
         """Zeigt die Passwortabfrage"""
-        deal = get_object_or_404(Deal, id=deal_id)
+        deal = await aget_object_or_404(Deal, id=deal_id)
         
         # Prüfe ob Passwortschutz aktiviert ist
         if not deal.password_protection_enabled:
             return redirect('deals:landingpage', deal_id=deal.id)
         
         # Prüfe ob bereits authentifiziert
-        if request.session.get(f'deal_{deal.id}_authenticated'):
+        if has_valid_access_token(request, deal):
             return redirect('deals:landingpage', deal_id=deal.id)
         
         # Prüfe ob gesperrt
         if deal.is_blocked():
             remaining_time = deal.get_block_remaining_time()
-            return render(request, 'deals/password_protection_blocked.html', {
+            return TemplateResponse(request, 'deals/password_protection_blocked.html', {
                 'deal': deal,
                 'remaining_time': remaining_time
             })
         
-        return render(request, 'deals/password_protection.html', {
+        return TemplateResponse(request, 'deals/password_protection.html', {
             'deal': deal,
-            'remaining_attempts': deal.get_remaining_attempts()
+            'remaining_attempts': await deal.aget_remaining_attempts()
         })
     
-    def post(self, request, deal_id):
+    async def post(self, request, deal_id):
         """Verarbeitet die Passwortabfrage"""
-        deal = get_object_or_404(Deal, id=deal_id)
+        deal = await aget_object_or_404(Deal, id=deal_id)
         
         # Prüfe ob Passwortschutz aktiviert ist
         if not deal.password_protection_enabled:
@@ -864,15 +891,13 @@ class PasswordProtectionView(View):
         ip_address = self._get_client_ip(request)
         
         # Prüfe Passwort
-        if deal.check_password(password):
-            # Erfolgreich - Session setzen
-            request.session[f'deal_{deal.id}_authenticated'] = True
-            request.session[f'deal_{deal.id}_authenticated_at'] = timezone.now().isoformat()
-            
+        if await deal.acheck_password(password):
             # Log erfolgreichen Versuch
             deal.log_password_attempt(True, ip_address)
             
-            return redirect('deals:landingpage', deal_id=deal.id)
+            # Erfolgreich - Zugriffstoken ausstellen
+            response = redirect('deals:landingpage', deal_id=deal.id)
+            return set_access_cookie(response, deal.id, create_access_token(deal))
         else:
             # Fehlgeschlagen
             deal.log_password_attempt(False, ip_address)
@@ -890,37 +915,169 @@ class PasswordProtectionView(View):
         return ip
 
 
+def _read_generated_file(fullpath, if_modified_since=None):
+    """
+    Liest eine generierte Datei (läuft im Thread-Pool, nicht im Event-Loop)
+
+    Returns:
+        tuple: (stat, content) - content ist None, wenn die Datei seit
+        if_modified_since nicht verändert wurde
+    """
+    statobj = os.stat(fullpath)
+    if not was_modified_since(if_modified_since, statobj.st_mtime):
+        return statobj, None
+    with open(fullpath, 'rb') as f:
+        return statobj, f.read()
+
+
 class LandingpageView(View):
-    """Landingpage-View mit Passwortschutz"""
+    """
+    Landingpage-View mit Passwortschutz
+
+    Ist die generierte Website aktuell, wird die zur Zugriffsebene des
+    Besuchers passende Variante direkt von der Platte gelesen
+    (nicht-blockierend), sonst wird die Seite gerendert.
+    """
     
-    def get(self, request, deal_id):
+    async def get(self, request, deal_id):
         """Zeigt die Landingpage"""
-        deal = get_object_or_404(Deal, id=deal_id)
+        deal = await aget_object_or_404(Deal, id=deal_id)
         
-        # Prüfe Passwortschutz
-        if deal.password_protection_enabled:
-            if not request.session.get(f'deal_{deal.id}_authenticated'):
-                return redirect('deals:password_protection', deal_id=deal.id)
+        # Prüfe Passwortschutz (signiertes Token, ohne Session)
+        authenticated = has_valid_access_token(request, deal)
+        if deal.password_protection_enabled and not authenticated:
+            return redirect('deals:password_protection', deal_id=deal.id)
         
         # Generiere HTML
         try:
-            from generator.renderer import DealroomGenerator
-            generator = DealroomGenerator(deal)
-            html_content = generator.generate_website()
+            access_level = await self._aget_access_level(request, deal, authenticated)
+            html_content = await self._aget_html(deal, access_level)
             
-            # Tracking
-            deal.last_accessed = timezone.now()
-            deal.access_count += 1
-            deal.save()
+            # Tracking ohne Deal.save(), damit keine Regenerierung ausgelöst wird
+            await Deal.objects.filter(pk=deal.pk).aupdate(
+                last_accessed=timezone.now(),
+                access_count=F('access_count') + 1
+            )
             
-            return HttpResponse(html_content, content_type='text/html')
+            response = HttpResponse(html_content, content_type='text/html')
+            
+            # Token aus dem URL-Parameter für Folgeaufrufe als Cookie übernehmen
+            if authenticated and request.GET.get(ACCESS_QUERY_PARAM):
+                set_access_cookie(response, deal.id, request.GET[ACCESS_QUERY_PARAM])
+            
+            return response
             
         except Exception as e:
             return HttpResponse(f'<html><body><h1>Fehler</h1><p>{str(e)}</p></body></html>')
     
-    def post(self, request, deal_id):
+    async def post(self, request, deal_id):
         """POST-Anfragen werden zu GET weitergeleitet"""
-        return self.get(request, deal_id)
+        return await self.get(request, deal_id)
+    
+    async def _aget_access_level(self, request, deal, authenticated):
+        """
+        Ermittelt die Zugriffsebene des Besuchers
+        
+        - confidential: Ersteller des Dealrooms oder Superuser
+        - internal: Staff-User
+        - customer: per Passwort angemeldeter Kunde
+        - public: alle anderen
+        """
+        user = await request.auser()
+        if user.is_authenticated:
+            if user.is_superuser or user.pk == deal.created_by_id:
+                return 'confidential'
+            if user.is_staff:
+                return 'internal'
+        if authenticated:
+            return 'customer'
+        return 'public'
+    
+    async def _aget_html(self, deal, access_level='public'):
+        """Liest die generierte Variante oder rendert sie bei Bedarf"""
+        if deal.has_current_website():
+            from generator.utils import get_variant_path
+            try:
+                _, content = await sync_to_async(_read_generated_file, thread_sensitive=False)(
+                    get_variant_path(deal.id, access_level)
+                )
+                return content
+            except OSError:
+                pass
+        
+        from generator.cache import render_website
+        return await sync_to_async(render_website)(deal, access_level)
+
+
+class GeneratedPageView(View):
+    """
+    Liefert die statisch generierten Websites (generated_pages) asynchron aus
+
+    Ersetzt django.views.static.serve, das die Datei synchron im
+    Worker-Thread liest. Passwortgeschützte Dealrooms verlangen ein gültiges
+    Zugriffstoken; geprüft wird gegen die beim Generieren geschriebenen
+    Zugriffsinformationen, ohne Datenbank.
+    """
+    
+    async def get(self, request, path):
+        document_root = os.path.join(settings.BASE_DIR, 'generated_pages')
+        try:
+            fullpath = safe_join(document_root, path)
+        except SuspiciousFileOperation:
+            raise Http404(_('Datei nicht gefunden.'))
+        
+        # Nicht-öffentliche Varianten nur über LandingpageView ausliefern
+        from generator.utils import VARIANTS_DIRNAME
+        parts = os.path.relpath(fullpath, document_root).split(os.sep)
+        if VARIANTS_DIRNAME in parts:
+            raise Http404(_('Datei nicht gefunden.'))
+        
+        # Passwortschutz prüfen
+        match = re.fullmatch(r'dealroom-(\d+)', parts[0])
+        token = None
+        if match:
+            deal_id = int(match.group(1))
+            token = get_request_token(request, deal_id)
+            if not await self._ahas_access(token, deal_id, os.path.join(document_root, parts[0])):
+                return redirect('deals:password_protection', deal_id=deal_id)
+        
+        if not path or path.endswith('/') or os.path.isdir(fullpath):
+            fullpath = os.path.join(fullpath, 'index.html')
+        
+        try:
+            statobj, content = await sync_to_async(_read_generated_file, thread_sensitive=False)(
+                fullpath, request.META.get('HTTP_IF_MODIFIED_SINCE')
+            )
+        except OSError:
+            raise Http404(_('Datei nicht gefunden.'))
+        
+        if content is None:
+            return HttpResponseNotModified()
+        
+        content_type, encoding = mimetypes.guess_type(fullpath)
+        response = HttpResponse(content, content_type=content_type or 'application/octet-stream')
+        response.headers['Last-Modified'] = http_date(statobj.st_mtime)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        if match and request.GET.get(ACCESS_QUERY_PARAM):
+            set_access_cookie(response, deal_id, token)
+        return response
+    
+    async def _ahas_access(self, token, deal_id, website_dir):
+        """Prüft den Zugriff auf die generierte Website eines Dealrooms"""
+        from generator.utils import read_access_marker
+        
+        marker = await sync_to_async(read_access_marker, thread_sensitive=False)(website_dir)
+        if marker is None:
+            # Ältere Artefakte ohne Zugriffsinformationen: einmalig in der DB nachsehen
+            deal = await Deal.objects.filter(pk=deal_id).afirst()
+            fingerprint = deal.get_access_token_fingerprint() if deal else ''
+        else:
+            fingerprint = marker.get('fingerprint') if marker.get('protected') else ''
+        
+        if not fingerprint:
+            return True
+        return verify_access_token(token, deal_id, fingerprint)
 
 
 class PasswordProtectionAdminView(View):
@@ -1749,55 +1906,178 @@ class DealAnalyticsView(LoginRequiredMixin, UserPassesTestMixin, DetailView):
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        deal = self.get_object()
         
-        # Analytics-Daten sammeln
-        analytics = DealAnalyticsEvent.objects.filter(deal=deal)
+        # Kennzahlen aus Tages-Rollups plus Live-Anteil des laufenden Tages
+        context.update(get_dashboard_stats(self.object))
         
-        # Besucher-Statistiken
-        context['total_visitors'] = analytics.filter(
-            event_type='page_view'
-        ).values('visitor_ip').distinct().count()
+        return context
+
+
+class DealHeatmapView(LoginRequiredMixin, UserPassesTestMixin, View):
+    """
+    Klick-Heatmap eines Dealrooms als JSON für das Overlay
+    
+    Parameter: ``viewport`` (mobile, tablet, desktop) und optional ``element``.
+    Neue Klicks rechnet ``build_heatmaps`` (Cron) ein; im Request nur, wenn
+    die Heatmaps älter als ``DEALROOM_HEATMAP_REFRESH_INTERVAL`` Sekunden sind.
+    """
+    
+    def test_func(self):
+        self.deal = get_object_or_404(Deal, pk=self.kwargs['pk'])
+        return self.request.user == self.deal.created_by or self.request.user.is_staff
+    
+    def get(self, request, pk):
+        # NumPy wird nur für Heatmaps benötigt
+        from .heatmaps import VIEWPORT_WIDTHS, heatmap_to_dict, update_heatmaps
+        from .models import DealHeatmap
+        
+        viewport = request.GET.get('viewport', 'desktop')
+        if viewport not in VIEWPORT_WIDTHS:
+            return JsonResponse({'error': 'Unbekannter Viewport'}, status=400)
+        element_id = request.GET.get('element', '')
+        
+        last_update = (
+            DealHeatmap.objects.filter(deal=self.deal)
+            .order_by('-updated_at').values_list('updated_at', flat=True).first()
+        )
+        max_age = timezone.timedelta(seconds=settings.DEALROOM_HEATMAP_REFRESH_INTERVAL)
+        if last_update is None or timezone.now() - last_update > max_age:
+            update_heatmaps(self.deal)
+        heatmap = DealHeatmap.objects.filter(deal=self.deal, viewport=viewport, element_id=element_id).first()
+        if heatmap is None:
+            return JsonResponse({'error': 'Keine Klicks für diese Auswahl'}, status=404)
+        
+        data = heatmap_to_dict(heatmap)
+        data['elements'] = list(
+            DealHeatmap.objects.filter(deal=self.deal, viewport=viewport)
+            .exclude(element_id='')
+            .order_by('-total_clicks')
+            .values_list('element_id', flat=True)
+        )
+        return JsonResponse(data)
+
+
+class DealAnalyticsExportView(LoginRequiredMixin, UserPassesTestMixin, View):
+    """
+    Rohdaten-Export der Analytics-Events eines Dealrooms (gestreamt)
+    
+    Parameter: ``format`` (csv, ndjson), ``event_type`` (mehrfach oder
+    kommagetrennt), ``since`` und ``until`` (YYYY-MM-DD, inklusive).
+    """
+    
+    def test_func(self):
+        self.deal = get_object_or_404(Deal, pk=self.kwargs['pk'])
+        return self.request.user == self.deal.created_by or self.request.user.is_staff
+    
+    def get(self, request, pk):
+        try:
+            export_format, filters = parse_export_params(request.GET)
+        except ExportError as e:
+            return JsonResponse({'error': str(e)}, status=400)
         
-        context['total_page_views'] = analytics.filter(
-            event_type='page_view'
-        ).count()
+        response = StreamingHttpResponse(
+            astream_export(self.deal.pk, export_format, **filters),
+            content_type=EXPORT_FORMATS[export_format]
+        )
+        filename = f"{self.deal.slug or self.deal.pk}-analytics.{export_format}"
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+
+class DealFunnelView(LoginRequiredMixin, UserPassesTestMixin, View):
+    """
+    Session-basierter Funnel eines Dealrooms als JSON
+    
+    Parameter: ``steps`` (kommagetrennt, z.B. ``page_view,download,form_submit``
+    oder ``click:cta``), ``window`` (Sekunden), ``since`` und ``until``
+    (YYYY-MM-DD, inklusive).
+    """
+    
+    def test_func(self):
+        self.deal = get_object_or_404(Deal, pk=self.kwargs['pk'])
+        return self.request.user == self.deal.created_by or self.request.user.is_staff
+    
+    def get(self, request, pk):
+        # NumPy wird nur für Funnels benötigt
+        from .funnels import DEFAULT_STEPS, DEFAULT_WINDOW, FunnelError, get_funnel
         
-        # Zeit-Statistiken
-        time_spent_events = analytics.filter(
-            event_type='time_spent'
-        ).exclude(time_spent__isnull=True)
+        steps = [step.strip() for step in request.GET.get('steps', '').split(',') if step.strip()]
+        try:
+            window = int(request.GET.get('window', DEFAULT_WINDOW))
+        except ValueError:
+            return JsonResponse({'error': 'window erwartet eine Dauer in Sekunden'}, status=400)
         
-        if time_spent_events.exists():
-            avg_time = time_spent_events.aggregate(
-                avg_time=Avg('time_spent')
-            )['avg_time']
-            context['avg_time_spent'] = avg_time
-        else:
-            context['avg_time_spent'] = None
-        
-        # Conversion-Rate
-        page_views = analytics.filter(event_type='page_view').count()
-        conversions = analytics.filter(event_type='form_submit').count()
-        context['conversion_rate'] = (conversions / page_views * 100) if page_views > 0 else 0
-        
-        # Top-Elemente (Klicks)
-        context['top_elements'] = analytics.filter(
-            event_type='click'
-        ).values('element_id').annotate(
-            click_count=Count('id')
-        ).order_by('-click_count')[:10]
-        
-        # Zeitliche Entwicklung
-        context['daily_views'] = analytics.filter(
-            event_type='page_view'
-        ).extra(
-            select={'date': 'date(timestamp)'}
-        ).values('date').annotate(
-            views=Count('id')
-        ).order_by('date')
+        try:
+            funnel = get_funnel(
+                self.deal,
+                steps=steps or DEFAULT_STEPS,
+                window=window,
+                since=parse_export_date(request.GET.get('since'), 'since'),
+                until=parse_export_date(request.GET.get('until'), 'until'),
+            )
+        except (FunnelError, ExportError) as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        return JsonResponse(funnel)
+
+
+class DealLiveStreamView(View):
+    """
+    Live-Zähler eines Dealrooms als Server-Sent Events
+    
+    Gespeist aus dem Pub/Sub des Schreibpuffers (``deals.live``); außer der
+    Berechtigungsprüfung beim Verbindungsaufbau keine Datenbankzugriffe.
+    """
+    
+    async def get(self, request, pk):
+        user = await request.auser()
+        if not user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        deal = await aget_object_or_404(Deal, pk=pk)
+        if not (user.is_staff or user.pk == deal.created_by_id):
+            raise PermissionDenied
         
-        return context
+        response = StreamingHttpResponse(stream_live_counters(deal.pk), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        # Kein Puffern durch Reverse-Proxies (nginx)
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class AnalyticsCollectView(View):
+    """
+    Öffentlicher Endpunkt für gebündelte Analytics-Events (navigator.sendBeacon)
+    
+    Ein Request pro Seitenbesuch; die Events landen im Schreibpuffer des
+    Workers. Antwortet ohne Body, da sendBeacon die Antwort ohnehin verwirft.
+    """
+    http_method_names = ['post', 'options']
+    
+    async def post(self, request, deal_id):
+        try:
+            payload, raw_events = parse_beacon(request.body)
+        except BeaconError:
+            return HttpResponse(status=400)
+        
+        if not await Deal.objects.filter(pk=deal_id, status='active').aexists():
+            return HttpResponse(status=404)
+        
+        events = build_events(
+            deal_id, raw_events, defaults=payload,
+            ip_address=_get_client_ip(request),
+            user_agent=request.META.get('HTTP_USER_AGENT', '')
+        )
+        # Kein INSERT im Request - der Puffer schreibt gesammelt per bulk_create
+        analytics_buffer.extend(events)
+        return HttpResponse(status=204)
+
+
+def _get_client_ip(request):
+    """Ermittelt die IP-Adresse des Clients"""
+    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+    if x_forwarded_for:
+        return x_forwarded_for.split(',')[0].strip()
+    return request.META.get('REMOTE_ADDR')
 
 
 class DealroomWizardView(LoginRequiredMixin, View):
@@ -1895,7 +2175,7 @@ class SmartFileManagerView(LoginRequiredMixin, UserPassesTestMixin, View):
             'images': deal.files.filter(file_type='hero_image').count() + deal.files.filter(file_type='gallery').count(),
             'documents': deal.files.filter(file_type='document').count(),
             'videos': deal.files.filter(file_type='video').count(),
-            'total_size': sum(file.file.size for file in deal.files.all() if file.file)
+            'total_size': deal.get_total_file_size()
         }
         
         context = {
@@ -0,0 +1,216 @@
+"""
+Vorwärmen der Dealroom-Caches
+=============================
+
+Rendert die Landingpages aller aktiven Dealrooms vor, damit nach einem
+Deployment nicht der erste Besucher die komplette Generierung bezahlt.
+Befüllt dabei den Render-Cache (``generator.cache``) und schreibt veraltete
+Seiten nach ``generated_pages/`` neu.
+
+Die Dealrooms werden nach Nutzung sortiert abgearbeitet (zuletzt aufgerufen,
+dann Aufrufe), damit bei knappem Zeitbudget die meistbesuchten zuerst warm
+sind.
+
+Der Render-Cache liegt im Cache-Backend (``CACHE_BACKEND``). Mit dem
+Standard-LocMemCache ist er prozesslokal: ``manage.py warm_dealrooms``
+befüllt dann nur den Cache seines eigenen, kurzlebigen Prozesses, und
+bestehen bleiben nur die neu geschriebenen ``generated_pages``. Für die
+Render-Caches der Server-Worker muss ``CACHE_BACKEND`` auf einen
+gemeinsamen Cache zeigen (z.B. Redis oder Memcached), oder jeder Worker
+wärmt beim Start selbst vor (``DEALROOM_WARMUP_ON_STARTUP``).
+"""
+
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Deal
+
+
+def get_warmup_queryset(limit=None):
+    """
+    Gibt die aktiven Dealrooms in Aufwärm-Reihenfolge zurück
+
+    Args:
+        limit: Maximale Anzahl Dealrooms (optional)
+
+    Returns:
+        QuerySet: Dealrooms, meistgenutzte zuerst
+    """
+    queryset = Deal.objects.filter(status='active').order_by(
+        F('last_accessed').desc(nulls_last=True),
+        '-access_count',
+        'pk'
+    )
+    if limit:
+        queryset = queryset[:limit]
+    return queryset
+
+
+def has_shared_cache() -> bool:
+    """Prüft, ob das Cache-Backend von allen Prozessen geteilt wird"""
+    backend = settings.CACHES['default']['BACKEND']
+    return not backend.endswith(('LocMemCache', 'DummyCache'))
+
+
+def warm_dealroom(deal):
+    """
+    Wärmt Render-Cache und generierte Seite eines Dealrooms vor
+
+    Args:
+        deal: Dealroom-Objekt
+
+    Returns:
+        bool: True wenn die Seite neu geschrieben wurde, False wenn sie aktuell war
+    """
+    from generator.cache import render_variants
+    from generator.renderer import DealroomGenerator
+    from generator.utils import get_variant_path
+
+    variants = render_variants(deal)
+
+    if deal.has_current_website():
+        return False
+
+    output_path = get_variant_path(deal.id, 'public')
+    if not DealroomGenerator(deal).save_website(output_path, variants=variants):
+        raise OSError(f'Website für Dealroom {deal.id} konnte nicht gespeichert werden')
+
+    # update() statt save(), damit auto_generate_website nicht erneut rendert
+    Deal.objects.filter(pk=deal.pk).update(
+        local_website_url=f'/generated_pages/dealroom-{deal.id}/index.html',
+        website_status='generated',
+        last_generation=timezone.now(),
+        generation_error=None
+    )
+    return True
+
+
+def _warm_in_thread(deal):
+    """Wärmt einen Dealroom in einem Pool-Thread und gibt die DB-Verbindung frei"""
+    close_old_connections()
+    try:
+        return warm_dealroom(deal)
+    finally:
+        connection.close()
+
+
+def warm_dealrooms(limit=None, budget=None, workers=None):
+    """
+    Wärmt alle aktiven Dealrooms innerhalb eines Zeitbudgets vor
+
+    Args:
+        limit: Maximale Anzahl Dealrooms (optional)
+        budget: Zeitbudget in Sekunden; danach werden keine neuen Dealrooms
+            mehr begonnen (optional)
+        workers: Anzahl paralleler Threads, 1 rendert im aufrufenden Thread
+
+    Returns:
+        dict: Bericht mit Anzahl, Dauer und Abdeckung
+    """
+    if workers is None:
+        workers = settings.DEALROOM_WARMUP_WORKERS
+
+    deals = list(get_warmup_queryset(limit))
+    started = time.monotonic()
+    deadline = started + budget if budget else None
+
+    report = {
+        'total': len(deals),
+        'warmed': 0,
+        'regenerated': 0,
+        'failed': 0,
+        'skipped': 0,
+        'errors': {},
+    }
+    warmed_access = 0
+
+    def record(deal, result=None, error=None):
+        nonlocal warmed_access
+        if error is not None:
+            report['failed'] += 1
+            report['errors'][deal.id] = str(error)
+            return
+        report['warmed'] += 1
+        warmed_access += deal.access_count or 0
+        if result:
+            report['regenerated'] += 1
+
+    def budget_exhausted():
+        return deadline is not None and time.monotonic() >= deadline
+
+    if workers <= 1:
+        for index, deal in enumerate(deals):
+            if budget_exhausted():
+                report['skipped'] = len(deals) - index
+                break
+            try:
+                record(deal, warm_dealroom(deal))
+            except Exception as e:
+                record(deal, error=e)
+    else:
+        pending = {}
+        remaining = iter(deals)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='dealroom-warmup') as executor:
+            for deal in remaining:
+                if budget_exhausted():
+                    report['skipped'] = 1 + sum(1 for _ in remaining)
+                    break
+                pending[executor.submit(_warm_in_thread, deal)] = deal
+                # Nicht mehr Arbeit einreihen als Threads frei sind,
+                # damit das Budget vor jedem Dealroom geprüft wird
+                if len(pending) >= workers:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        deal_done = pending.pop(future)
+                        try:
+                            record(deal_done, future.result())
+                        except Exception as e:
+                            record(deal_done, error=e)
+            for future in list(pending):
+                deal_done = pending.pop(future)
+                try:
+                    record(deal_done, future.result())
+                except Exception as e:
+                    record(deal_done, error=e)
+
+    total_access = sum(deal.access_count or 0 for deal in deals)
+    report['duration'] = round(time.monotonic() - started, 3)
+    report['coverage'] = round(report['warmed'] / report['total'] * 100, 1) if report['total'] else 100.0
+    report['traffic_coverage'] = round(warmed_access / total_access * 100, 1) if total_access else report['coverage']
+    return report
+
+
+def start_background_warmup(budget=None, workers=None):
+    """
+    Startet das Vorwärmen in einem Hintergrund-Thread (nicht blockierend)
+
+    Args:
+        budget: Zeitbudget in Sekunden (Standard: DEALROOM_WARMUP_BUDGET)
+        workers: Anzahl paralleler Threads (Standard: DEALROOM_WARMUP_WORKERS)
+
+    Returns:
+        threading.Thread: Der gestartete Thread
+    """
+    if budget is None:
+        budget = settings.DEALROOM_WARMUP_BUDGET
+
+    def run():
+        try:
+            report = warm_dealrooms(budget=budget, workers=workers)
+            print(f"🔥 Dealroom-Cache vorgewärmt: {report['warmed']}/{report['total']} "
+                  f"({report['coverage']}%) in {report['duration']}s")
+        except Exception as e:
+            print(f"❌ Fehler beim Vorwärmen der Dealroom-Caches: {e}")
+        finally:
+            connection.close()
+
+    thread = threading.Thread(target=run, name='dealroom-warmup')
+    thread.daemon = True
+    thread.start()
+    return thread
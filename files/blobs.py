@@ -0,0 +1,140 @@
+"""
+Inhaltsadressierte Ablage
+=========================
+
+Hochgeladene Dateien liegen einmal pro Inhalt unter
+``blobs/<sha[:2]>/<sha[2:4]>/<sha><endung>``. ``GlobalFile``, ``DealFile``
+und ``MediaLibrary`` zeigen mit ihrem Dateifeld auf diesen Pfad und
+referenzieren den ``Blob``; derselbe Logo-Upload von zehn Nutzern belegt den
+Speicher also nur einmal. Der ursprüngliche Dateiname bleibt in
+``original_name`` der jeweiligen Zeile.
+
+``ref_count`` zählt die referenzierenden Zeilen. Fällt er auf 0, werden
+Blob und Datei gelöscht. Ablegen und Freigeben sperren die Blob-Zeile
+(``select_for_update``) bzw. den eindeutigen SHA-256-Index; die Datei wird
+nur innerhalb dieser Sperre geschrieben oder gelöscht, damit ein paralleler
+Upload desselben Inhalts nie auf eine gerade gelöschte Datei zeigt.
+
+Medien der ``MediaLibrary`` werden per absoluter URL in Seiten eingebettet
+und geben ihren Blob daher nie frei (``PIN_BLOBS``).
+"""
+
+import hashlib
+import os
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, ProtectedError
+
+BLOB_ROOT = 'blobs'
+
+
+def blob_path(sha256, filename):
+    """Speicherpfad eines Inhalts (die Endung bleibt für Webserver und MIME-Erkennung)"""
+    extension = os.path.splitext(filename)[1].lower()
+    return f'{BLOB_ROOT}/{sha256[:2]}/{sha256[2:4]}/{sha256}{extension}'
+
+
+def _matches(storage, name, sha256, size_bytes):
+    """Prüft, ob eine vorhandene Datei den erwarteten Inhalt hat"""
+    try:
+        if storage.size(name) != size_bytes:
+            return False
+        digest = hashlib.sha256()
+        with storage.open(name, 'rb') as existing:
+            for chunk in existing.chunks():
+                digest.update(chunk)
+    except OSError:
+        return False
+    return digest.hexdigest() == sha256
+
+
+def store_blob(field_file, sha256, size_bytes):
+    """
+    Legt einen Upload als Blob ab oder referenziert den vorhandenen
+
+    Args:
+        field_file: noch nicht gespeichertes FieldFile
+        sha256: Prüfsumme des Inhalts
+        size_bytes: Größe in Bytes
+
+    Returns:
+        Blob: mit bereits erhöhtem ref_count
+    """
+    from .models import Blob
+
+    storage = field_file.storage
+    while True:
+        try:
+            with transaction.atomic():
+                blob = Blob.objects.select_for_update().filter(sha256=sha256).first()
+                if blob is not None:
+                    Blob.objects.filter(pk=blob.pk).update(ref_count=F('ref_count') + 1)
+                    blob.ref_count += 1
+                    return blob
+
+                # Zeile zuerst anlegen: der eindeutige Index hält parallele
+                # Uploads desselben Inhalts bis zum Commit auf
+                canonical = blob_path(sha256, field_file.name)
+                blob = Blob.objects.create(sha256=sha256, name=canonical, size_bytes=size_bytes, ref_count=1)
+                if storage.exists(canonical) and not _matches(storage, canonical, sha256, size_bytes):
+                    # Reste eines abgebrochenen Uploads nicht wiederverwenden
+                    storage.delete(canonical)
+                if not storage.exists(canonical):
+                    field_file.seek(0)
+                    name = storage.save(canonical, field_file.file)
+                    if name != canonical:
+                        blob.name = name
+                        blob.save(update_fields=['name'])
+                return blob
+        except IntegrityError:
+            # Derselbe Inhalt wurde parallel abgelegt: diesen referenzieren
+            continue
+
+
+def acquire_blob(name):
+    """
+    Referenziert den Blob unter einem Speicherpfad (z.B. beim Duplizieren)
+
+    Returns:
+        Blob oder None, wenn die Datei nicht in der Ablage liegt
+    """
+    from .models import Blob
+
+    with transaction.atomic():
+        blob = Blob.objects.select_for_update().filter(name=name).first()
+        if blob is None:
+            return None
+        Blob.objects.filter(pk=blob.pk).update(ref_count=F('ref_count') + 1)
+        blob.ref_count += 1
+        return blob
+
+
+def release_blob(blob_id, storage=None):
+    """
+    Gibt eine Referenz frei und löscht den Blob samt Datei beim letzten Verweis
+
+    Args:
+        blob_id: ID des Blobs
+        storage: Speicher der Datei (Standard: default_storage)
+    """
+    from .models import Blob
+
+    with transaction.atomic():
+        blob = Blob.objects.select_for_update().filter(pk=blob_id).first()
+        if blob is None:
+            return
+        if blob.ref_count > 1:
+            Blob.objects.filter(pk=blob_id).update(ref_count=F('ref_count') - 1)
+            return
+        try:
+            with transaction.atomic():
+                blob.delete()
+        except ProtectedError:
+            # Zähler weicht ab, es gibt noch Verweise: Datei behalten
+            Blob.objects.filter(pk=blob_id).update(ref_count=0)
+            return
+        if storage is None:
+            from django.core.files.storage import default_storage as storage
+        # Noch unter der Sperre löschen: ein paralleles store_blob wartet und
+        # legt die Datei danach neu ab
+        storage.delete(blob.name)
@@ -0,0 +1,192 @@
+"""
+Downloads mit Range-Unterstützung
+=================================
+
+``serve_file`` liefert eine gespeicherte Datei gestreamt in Blöcken fester
+Größe aus - der Speicherbedarf hängt nicht von der Dateigröße ab. Die
+Antwort trägt ``Content-Length``, ``Accept-Ranges``, ``Last-Modified`` und
+ein ``ETag``; ein einzelner Byte-Bereich (``Range: bytes=start-end``,
+``start-`` oder ``-suffix``) wird als 206 beantwortet, damit abgebrochene
+Downloads fortgesetzt werden können. Mehrere Bereiche werden wie eine
+Anfrage ohne Range behandelt (komplette Datei, erlaubt laut RFC 9110).
+
+Optional übernimmt der Webserver die Übertragung
+(``DEALROOM_DOWNLOAD_OFFLOAD``), der Worker ist dann nach den Headern frei:
+
+- ``nginx``: ``X-Accel-Redirect`` auf ``DEALROOM_DOWNLOAD_ACCEL_PREFIX`` +
+  Speichername (eine ``internal``-Location auf ``MEDIA_ROOT``)
+- ``sendfile``: ``X-Sendfile`` mit absolutem Pfad (Apache, lighttpd)
+
+Range-Anfragen beantwortet dann der Webserver. Speicher ohne lokalen Pfad
+werden immer selbst gestreamt.
+
+Der Body ist ein asynchroner Generator, der jeden Block per
+``sync_to_async`` liest: Unter ASGI würde Django einen synchronen Iterator
+vorab komplett in eine Liste lesen.
+"""
+
+import re
+from urllib.parse import quote
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.http import content_disposition_header, http_date, parse_http_date_safe
+
+from .metadata import DEFAULT_MIME_TYPE
+
+CHUNK_SIZE = 64 * 1024
+
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def parse_range(header, size):
+    """
+    Liest einen einzelnen Byte-Bereich aus dem Range-Header
+
+    Args:
+        header: Wert von ``Range`` oder None
+        size: Dateigröße in Bytes
+
+    Returns:
+        tuple oder None: (start, end) inklusive; None für die ganze Datei
+
+    Raises:
+        ValueError: Bereich liegt außerhalb der Datei (416)
+    """
+    if not header:
+        return None
+    match = _RANGE_RE.match(header.strip())
+    if not match or match.group(1) == match.group(2) == '':
+        # Unbekannte Syntax oder mehrere Bereiche: ganze Datei
+        return None
+
+    first, last = match.groups()
+    if first == '':
+        # Suffix: die letzten N Bytes
+        length = int(last)
+        if not length or not size:
+            raise ValueError('Leerer Bereich')
+        return max(0, size - length), size - 1
+
+    start = int(first)
+    if last and int(last) < start:
+        # Syntaktisch ungültig: ignorieren
+        return None
+    if start >= size:
+        raise ValueError('Bereich außerhalb der Datei')
+    end = int(last) if last else size - 1
+    return start, min(end, size - 1)
+
+
+def _file_etag(size, modified):
+    """ETag aus Größe und Änderungszeit (wie nginx; If-Range verlangt ein starkes ETag)"""
+    return f'"{size:x}-{int(modified or 0):x}"'
+
+
+def _if_range_matches(request, etag, modified):
+    """Prüft ``If-Range``: Range nur, wenn die Datei unverändert ist"""
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith('"'):
+        return if_range == etag
+    since = parse_http_date_safe(if_range)
+    return since is not None and modified is not None and int(modified) <= since
+
+
+async def _iter_range(storage, name, start, length, chunk_size=CHUNK_SIZE):
+    """Liest ``length`` Bytes ab ``start`` in Blöcken (Datei erst beim ersten Block öffnen)"""
+    file = await sync_to_async(storage.open)(name, 'rb')
+    try:
+        await sync_to_async(file.seek)(start)
+        while length > 0:
+            chunk = await sync_to_async(file.read)(min(chunk_size, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        await sync_to_async(file.close)()
+
+
+def _local_path(field_file):
+    """Absoluter Pfad im lokalen Speicher oder None"""
+    try:
+        return field_file.path
+    except NotImplementedError:
+        return None
+
+
+def _offload_response(field_file, content_type, disposition):
+    """Antwort ohne Body, die Übertragung übernimmt der Webserver"""
+    backend = settings.DEALROOM_DOWNLOAD_OFFLOAD
+    path = _local_path(field_file)
+    if backend not in ('nginx', 'sendfile') or path is None:
+        return None
+
+    response = HttpResponse(content_type=content_type)
+    response['Content-Disposition'] = disposition
+    if backend == 'nginx':
+        response['X-Accel-Redirect'] = settings.DEALROOM_DOWNLOAD_ACCEL_PREFIX + quote(field_file.name)
+    else:
+        response['X-Sendfile'] = path
+    return response
+
+
+def serve_file(request, field_file, filename=None, content_type=None):
+    """
+    Liefert eine gespeicherte Datei als Download aus
+
+    Args:
+        request: HttpRequest (für Range und If-Range)
+        field_file: FieldFile des Modells
+        filename: Dateiname für den Download (Standard: Name der Datei)
+        content_type: MIME-Typ der Antwort (Standard: application/octet-stream)
+
+    Returns:
+        HttpResponse: 200, 206, 416 oder eine Offload-Antwort
+    """
+    filename = filename or field_file.name.rsplit('/', 1)[-1]
+    content_type = content_type or DEFAULT_MIME_TYPE
+    disposition = content_disposition_header(True, filename)
+
+    response = _offload_response(field_file, content_type, disposition)
+    if response is not None:
+        return response
+
+    storage = field_file.storage
+    size = field_file.size
+    try:
+        modified = storage.get_modified_time(field_file.name).timestamp()
+    except (NotImplementedError, OSError):
+        modified = None
+    etag = _file_etag(size, modified)
+
+    try:
+        byte_range = parse_range(request.META.get('HTTP_RANGE'), size)
+    except ValueError:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        response['Accept-Ranges'] = 'bytes'
+        return response
+    if byte_range is not None and not _if_range_matches(request, etag, modified):
+        byte_range = None
+
+    if byte_range is None:
+        response = StreamingHttpResponse(_iter_range(storage, field_file.name, 0, size), content_type=content_type)
+        response['Content-Length'] = size
+    else:
+        start, end = byte_range
+        response = StreamingHttpResponse(
+            _iter_range(storage, field_file.name, start, end - start + 1), status=206, content_type=content_type
+        )
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = end - start + 1
+
+    response['Content-Disposition'] = disposition
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    if modified is not None:
+        response['Last-Modified'] = http_date(modified)
+    return response
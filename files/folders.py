@@ -0,0 +1,167 @@
+"""
+Ordnerbaum
+==========
+
+Ordner speichern ihren Platz im Baum als Materialized Path: ``path`` enthält
+die IDs aller Vorfahren und des Ordners selbst (z.B. ``3/17/42/``). Daraus
+folgen ohne Rekursion
+
+- die Vorfahren (IDs direkt aus dem Pfad, Breadcrumbs in einer Abfrage),
+- der Teilbaum (``path__startswith``, eine indizierte Abfrage).
+
+Dazu pflegt jeder Ordner Zähler: ``file_count`` und ``subfolder_count``
+(direkter Inhalt) sowie ``subtree_file_count`` und ``subtree_size_bytes``
+(ganzer Teilbaum). Dateien und Ordner passen die Zähler beim Speichern,
+Verschieben und Löschen per ``F()``-Update an; ``rebuild_folder_tree``
+berechnet alles neu (Migration, ``manage.py rebuild_folder_tree``).
+"""
+
+from collections import Counter
+
+from django.db.models import Count, F, Sum, Value
+from django.db.models.functions import Concat, Substr
+
+
+def path_ids(path):
+    """IDs der Ordner eines Pfads, von der Wurzel bis zum Ordner selbst"""
+    return [int(part) for part in path.split('/') if part]
+
+
+def _get_models():
+    from .models import Folder, GlobalFile
+    return Folder, GlobalFile
+
+
+def _stored_path(folder_id):
+    Folder, _ = _get_models()
+    return Folder.objects.filter(pk=folder_id).values_list('path', flat=True).first()
+
+
+def adjust_folder_totals(folder_id, files, size_bytes):
+    """
+    Verändert die Datei- und Byte-Zähler eines Ordners und seiner Vorfahren
+
+    Args:
+        folder_id: Ordner, in dem die Dateien liegen
+        files: Änderung der Dateianzahl (z.B. +1, -1)
+        size_bytes: Änderung der Größe in Bytes
+    """
+    Folder, _ = _get_models()
+    path = _stored_path(folder_id)
+    if not path:
+        return
+    Folder.objects.filter(pk__in=path_ids(path)).update(
+        subtree_file_count=F('subtree_file_count') + files,
+        subtree_size_bytes=F('subtree_size_bytes') + size_bytes,
+    )
+    Folder.objects.filter(pk=folder_id).update(file_count=F('file_count') + files)
+
+
+def place_folder(folder):
+    """Setzt Pfad und Tiefe eines neu angelegten Ordners"""
+    Folder, _ = _get_models()
+    parent_path = (_stored_path(folder.parent_id) or '') if folder.parent_id else ''
+    folder.path = f'{parent_path}{folder.pk}/'
+    folder.depth = parent_path.count('/')
+    Folder.objects.filter(pk=folder.pk).update(path=folder.path, depth=folder.depth)
+    if folder.parent_id:
+        Folder.objects.filter(pk=folder.parent_id).update(subfolder_count=F('subfolder_count') + 1)
+
+
+def is_in_subtree(folder, parent_id):
+    """Prüft, ob ``parent_id`` der Ordner selbst oder einer seiner Unterordner ist"""
+    path = _stored_path(folder.pk)
+    parent_path = _stored_path(parent_id)
+    return bool(path and parent_path and parent_path.startswith(path))
+
+
+def move_folder(folder, old_parent_id):
+    """
+    Verschiebt einen Ordner samt Teilbaum unter seinen neuen ``parent``
+
+    Pfade und Tiefen des Teilbaums werden in einem UPDATE umgeschrieben, die
+    Zähler der alten und neuen Vorfahren um die Summen des Teilbaums angepasst.
+    Läuft innerhalb der Transaktion von ``Folder.save()``.
+    """
+    Folder, _ = _get_models()
+    old_path, files, size_bytes = Folder.objects.filter(pk=folder.pk).values_list(
+        'path', 'subtree_file_count', 'subtree_size_bytes'
+    ).get()
+    new_parent_path = (_stored_path(folder.parent_id) or '') if folder.parent_id else ''
+    new_path = f'{new_parent_path}{folder.pk}/'
+    depth_delta = new_path.count('/') - old_path.count('/')
+
+    Folder.objects.filter(pk__in=path_ids(old_path)[:-1]).update(
+        subtree_file_count=F('subtree_file_count') - files,
+        subtree_size_bytes=F('subtree_size_bytes') - size_bytes,
+    )
+    Folder.objects.filter(pk__in=path_ids(new_parent_path)).update(
+        subtree_file_count=F('subtree_file_count') + files,
+        subtree_size_bytes=F('subtree_size_bytes') + size_bytes,
+    )
+    Folder.objects.filter(path__startswith=old_path).update(
+        path=Concat(Value(new_path), Substr('path', len(old_path) + 1)),
+        depth=F('depth') + depth_delta,
+    )
+    if old_parent_id:
+        Folder.objects.filter(pk=old_parent_id).update(subfolder_count=F('subfolder_count') - 1)
+    if folder.parent_id:
+        Folder.objects.filter(pk=folder.parent_id).update(subfolder_count=F('subfolder_count') + 1)
+
+    folder.path = new_path
+    folder.depth += depth_delta
+
+
+def rebuild_folder_tree(folder_model=None, file_model=None, batch_size=500):
+    """
+    Berechnet Pfade und Zähler aller Ordner neu
+
+    Args:
+        folder_model, file_model: Modelle (in Migrationen die historischen)
+        batch_size: Zeilen pro bulk_update
+
+    Returns:
+        int: Anzahl der Ordner
+    """
+    if folder_model is None:
+        folder_model, file_model = _get_models()
+
+    parents = dict(folder_model.objects.values_list('pk', 'parent_id'))
+    paths = {}
+    for pk in parents:
+        chain = []
+        current = pk
+        # Bis zu einem bekannten Pfad oder zur Wurzel hochlaufen (Zyklen als Wurzel behandeln)
+        while current is not None and current not in paths and current not in chain:
+            chain.append(current)
+            current = parents.get(current)
+        prefix = paths.get(current, '')
+        for node in reversed(chain):
+            prefix = f'{prefix}{node}/'
+            paths[node] = prefix
+
+    direct = {
+        row['folder']: (row['files'], row['size'] or 0)
+        for row in file_model.objects.filter(folder__isnull=False).order_by()
+        .values('folder').annotate(files=Count('pk'), size=Sum('size_bytes'))
+    }
+    subfolders = Counter(parent for parent in parents.values() if parent is not None)
+    subtree = {pk: [0, 0] for pk in parents}
+    for folder_id, (files, size_bytes) in direct.items():
+        for ancestor in path_ids(paths.get(folder_id, '')):
+            subtree[ancestor][0] += files
+            subtree[ancestor][1] += size_bytes
+
+    folders = list(folder_model.objects.only('pk'))
+    for folder in folders:
+        folder.path = paths[folder.pk]
+        folder.depth = folder.path.count('/') - 1
+        folder.file_count = direct.get(folder.pk, (0, 0))[0]
+        folder.subfolder_count = subfolders[folder.pk]
+        folder.subtree_file_count, folder.subtree_size_bytes = subtree[folder.pk]
+    folder_model.objects.bulk_update(
+        folders,
+        ['path', 'depth', 'file_count', 'subfolder_count', 'subtree_file_count', 'subtree_size_bytes'],
+        batch_size=batch_size,
+    )
+    return len(folders)
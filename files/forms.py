@@ -2,6 +2,19 @@ from django import forms
 from django.utils.translation import gettext_lazy as _
 from .models import GlobalFile
 
+# Erlaubte Dateitypen für Uploads (Formular und Chunked Upload)
+ALLOWED_CONTENT_TYPES = [
+    'image/jpeg', 'image/png', 'image/gif', 'image/webp', 'image/svg+xml',
+    'application/pdf', 'application/msword',
+    'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+    'application/vnd.ms-excel',
+    'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'application/vnd.ms-powerpoint',
+    'application/vnd.openxmlformats-officedocument.presentationml.presentation',
+    'text/plain', 'text/csv',
+    'video/mp4', 'video/avi', 'video/mov', 'video/wmv', 'video/flv', 'video/webm'
+]
+
 
 class GlobalFileForm(forms.ModelForm):
     """
@@ -41,19 +54,7 @@ class GlobalFileForm(forms.ModelForm):
                 raise forms.ValidationError(_('Datei ist zu groß. Maximale Größe: 10MB'))
             
             # Dateityp prüfen
-            allowed_types = [
-                'image/jpeg', 'image/png', 'image/gif', 'image/webp', 'image/svg+xml',
-                'application/pdf', 'application/msword',
-                'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
-                'application/vnd.ms-excel',
-                'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-                'application/vnd.ms-powerpoint',
-                'application/vnd.openxmlformats-officedocument.presentationml.presentation',
-                'text/plain', 'text/csv',
-                'video/mp4', 'video/avi', 'video/mov', 'video/wmv', 'video/flv', 'video/webm'
-            ]
-            
-            if hasattr(file, 'content_type') and file.content_type not in allowed_types:
+            if hasattr(file, 'content_type') and file.content_type not in ALLOWED_CONTENT_TYPES:
                 raise forms.ValidationError(_('Dateityp nicht unterstützt. Erlaubte Formate: Bilder, Dokumente, Videos'))
         
         return file 
\ No newline at end of file
@@ -0,0 +1,58 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from deals.models import DealFile, MediaLibrary
+from files.folders import rebuild_folder_tree
+from files.models import GlobalFile, StoredFileMetadata
+
+MODELS = (GlobalFile, DealFile, MediaLibrary)
+
+
+class Command(BaseCommand):
+    help = 'Füllt Größe, MIME-Typ, SHA-256 und Bildmaße bestehender Dateien nach'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Auch Dateien mit vorhandenen Metadaten neu einlesen',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=200,
+            help='Zeilen pro bulk_update (Standard: 200)',
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        total = missing = 0
+        for model in MODELS:
+            queryset = model.objects.exclude(file='').exclude(file__isnull=True)
+            if not options['all']:
+                queryset = queryset.filter(size_bytes__isnull=True)
+
+            batch = []
+            for obj in queryset.only('pk', 'file').iterator(chunk_size=options['batch_size']):
+                try:
+                    obj.refresh_file_metadata()
+                except OSError:
+                    missing += 1
+                    continue
+                batch.append(obj)
+                if len(batch) >= options['batch_size']:
+                    model.objects.bulk_update(batch, StoredFileMetadata.METADATA_FIELDS)
+                    total += len(batch)
+                    batch = []
+            if batch:
+                model.objects.bulk_update(batch, StoredFileMetadata.METADATA_FIELDS)
+                total += len(batch)
+            self.stdout.write(f"📁 {model._meta.verbose_name_plural}: Metadaten aktualisiert")
+
+        # bulk_update umgeht die Ordnerzähler: Größen neu aufsummieren
+        rebuild_folder_tree()
+        duration = time.monotonic() - started
+        if missing:
+            self.stdout.write(self.style.WARNING(f"⚠️ {missing} Dateien fehlen im Speicher"))
+        self.stdout.write(self.style.SUCCESS(f"✅ {total} Dateien in {duration:.2f}s nachgetragen"))
@@ -0,0 +1,50 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from deals.models import DealFile, MediaLibrary
+from files.models import GlobalFile
+
+
+class Command(BaseCommand):
+    help = 'Löscht die vor der Blob-Ablage hochgeladenen Originaldateien (Kopie liegt in der Ablage)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--include-media',
+            action='store_true',
+            help='Auch Dateien der Medienbibliothek löschen (bricht in Seiten eingebettete URLs)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Nur auflisten, nichts löschen',
+        )
+
+    def handle(self, *args, **options):
+        models = [GlobalFile, DealFile]
+        if options['include_media']:
+            models.append(MediaLibrary)
+
+        candidates = set()
+        for model in models:
+            candidates.update(
+                model.objects.exclude(legacy_name='').values_list('legacy_name', flat=True)
+            )
+        # Pfade, auf die noch ein Dateifeld oder eine geschützte Medien-URL zeigt, bleiben
+        for model in (GlobalFile, DealFile, MediaLibrary):
+            candidates.difference_update(model.objects.values_list('file', flat=True))
+        if not options['include_media']:
+            candidates.difference_update(MediaLibrary.objects.values_list('legacy_name', flat=True))
+
+        deleted = 0
+        for name in sorted(candidates):
+            if not default_storage.exists(name):
+                continue
+            if options['dry_run']:
+                self.stdout.write(f"  {name}")
+            else:
+                default_storage.delete(name)
+            deleted += 1
+
+        verb = 'würden gelöscht' if options['dry_run'] else 'gelöscht'
+        self.stdout.write(self.style.SUCCESS(f"✅ {deleted} Originaldateien {verb}"))
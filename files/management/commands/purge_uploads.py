@@ -0,0 +1,14 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from files.uploads import purge_expired_uploads
+
+
+class Command(BaseCommand):
+    help = 'Verwirft nicht abgeschlossene Chunked Uploads nach DEALROOM_UPLOAD_EXPIRY_HOURS'
+
+    def handle(self, *args, **options):
+        purged = purge_expired_uploads()
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {purged} Uploads älter als {settings.DEALROOM_UPLOAD_EXPIRY_HOURS}h verworfen"
+        ))
@@ -0,0 +1,15 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from files.folders import rebuild_folder_tree
+
+
+class Command(BaseCommand):
+    help = 'Berechnet Pfade und Datei-/Größenzähler aller Ordner neu'
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        count = rebuild_folder_tree()
+        duration = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(f"✅ {count} Ordner in {duration:.2f}s neu berechnet"))
@@ -0,0 +1,98 @@
+"""
+Datei-Metadaten
+===============
+
+Größe, MIME-Typ, SHA-256 und (bei Bildern) Breite/Höhe werden beim Upload
+einmal ermittelt und in Spalten gespeichert (``StoredFileMetadata``).
+Größenanzeigen und Summen lesen danach nur noch die Datenbank - eine
+Ordner- oder Dealroom-Liste fasst den Speicher nicht mehr an.
+
+Bestehende Zeilen füllt ``manage.py backfill_file_metadata``.
+"""
+
+import hashlib
+import mimetypes
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow optional: dann ohne Bildmaße
+    Image = None
+
+DEFAULT_MIME_TYPE = 'application/octet-stream'
+
+# Für diese Typen lohnt sich das Öffnen mit Pillow (SVG ist kein Rasterbild)
+_RASTER_PREFIX = 'image/'
+_NON_RASTER = {'image/svg+xml'}
+
+
+def format_file_size(size):
+    """
+    Formatiert eine Byte-Anzahl für die Anzeige
+
+    Args:
+        size: Größe in Bytes oder None
+
+    Returns:
+        str: z.B. "1.5 MB"; "Unbekannt" ohne Größe
+    """
+    if size is None:
+        return "Unbekannt"
+    size = float(size)
+    for unit in ['B', 'KB', 'MB', 'GB']:
+        if size < 1024.0:
+            return f"{size:.1f} {unit}"
+        size /= 1024.0
+    return f"{size:.1f} TB"
+
+
+def _image_dimensions(file):
+    """Liest Breite und Höhe aus dem Bild-Header (Pillow dekodiert lazy)"""
+    if Image is None:
+        return None, None
+    try:
+        file.seek(0)
+        with Image.open(file) as image:
+            return image.size
+    except Exception:
+        return None, None
+
+
+def read_file_metadata(field_file):
+    """
+    Ermittelt Größe, MIME-Typ, Prüfsumme und Bildmaße einer Datei
+
+    Die Datei wird einmal in Blöcken gelesen. Ein noch nicht gespeicherter
+    Upload bleibt offen und steht danach wieder am Anfang, damit der Storage
+    ihn anschließend schreiben kann.
+
+    Args:
+        field_file: FieldFile des Modells
+
+    Returns:
+        dict: size_bytes, mime_type, sha256, width, height
+    """
+    committed = field_file._committed
+    field_file.open('rb')
+    try:
+        digest = hashlib.sha256()
+        size = 0
+        for chunk in field_file.chunks():
+            digest.update(chunk)
+            size += len(chunk)
+
+        mime_type = mimetypes.guess_type(field_file.name)[0] or DEFAULT_MIME_TYPE
+        width = height = None
+        if mime_type.startswith(_RASTER_PREFIX) and mime_type not in _NON_RASTER:
+            width, height = _image_dimensions(field_file)
+        field_file.seek(0)
+    finally:
+        if committed:
+            field_file.close()
+
+    return {
+        'size_bytes': size,
+        'mime_type': mime_type,
+        'sha256': digest.hexdigest(),
+        'width': width,
+        'height': height,
+    }
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.4 on 2026-10-19 03:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('files', '0004_globalfile_metadata'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Blob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64, unique=True, verbose_name='SHA-256')),
+                ('name', models.CharField(max_length=255, unique=True, verbose_name='Speicherpfad')),
+                ('size_bytes', models.PositiveBigIntegerField(verbose_name='Größe (Bytes)')),
+                ('ref_count', models.PositiveIntegerField(default=0, verbose_name='Verweise')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Erstellt am')),
+            ],
+            options={
+                'verbose_name': 'Blob',
+                'verbose_name_plural': 'Blobs',
+            },
+        ),
+        migrations.AddField(
+            model_name='globalfile',
+            name='original_name',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255, verbose_name='Ursprünglicher Dateiname'),
+        ),
+        migrations.AddField(
+            model_name='globalfile',
+            name='legacy_name',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255, verbose_name='Früherer Speicherpfad'),
+        ),
+        migrations.AddField(
+            model_name='globalfile',
+            name='blob',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='files.blob', verbose_name='Blob'),
+        ),
+    ]
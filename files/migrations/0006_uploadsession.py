@@ -0,0 +1,34 @@
+# Generated by Django 5.2.4 on 2026-10-19 04:04
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('files', '0005_blobs'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UploadSession',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('filename', models.CharField(max_length=255, verbose_name='Dateiname')),
+                ('total_size', models.PositiveBigIntegerField(verbose_name='Gesamtgröße (Bytes)')),
+                ('received_bytes', models.PositiveBigIntegerField(default=0, verbose_name='Empfangen (Bytes)')),
+                ('sha256', models.CharField(blank=True, default='', max_length=64, verbose_name='Erwartete SHA-256')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Erstellt am')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Aktualisiert am')),
+                ('created_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='upload_sessions', to=settings.AUTH_USER_MODEL, verbose_name='Erstellt von')),
+            ],
+            options={
+                'verbose_name': 'Upload-Sitzung',
+                'verbose_name_plural': 'Upload-Sitzungen',
+            },
+        ),
+    ]
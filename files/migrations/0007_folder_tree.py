@@ -0,0 +1,53 @@
+# Generated by Django 5.2.4 on 2026-10-19 04:10
+
+from django.db import migrations, models
+
+
+def build_tree(apps, schema_editor):
+    """Berechnet Pfade und Zähler der vorhandenen Ordner"""
+    from files.folders import rebuild_folder_tree
+
+    rebuild_folder_tree(apps.get_model('files', 'Folder'), apps.get_model('files', 'GlobalFile'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('files', '0006_uploadsession'),
+        # Größen der Dateien stammen aus der Blob-Migration
+        ('deals', '0029_file_blobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='folder',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, verbose_name='Tiefe'),
+        ),
+        migrations.AddField(
+            model_name='folder',
+            name='file_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Dateien'),
+        ),
+        migrations.AddField(
+            model_name='folder',
+            name='path',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=500, verbose_name='Pfad'),
+        ),
+        migrations.AddField(
+            model_name='folder',
+            name='subfolder_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Unterordner'),
+        ),
+        migrations.AddField(
+            model_name='folder',
+            name='subtree_file_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Dateien inkl. Unterordner'),
+        ),
+        migrations.AddField(
+            model_name='folder',
+            name='subtree_size_bytes',
+            field=models.PositiveBigIntegerField(default=0, editable=False, verbose_name='Größe inkl. Unterordner (Bytes)'),
+        ),
+        migrations.RunPython(build_tree, migrations.RunPython.noop),
+    ]
@@ -1,16 +1,208 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth import get_user_model
 from django.utils.translation import gettext_lazy as _
 from django.urls import reverse
+from django.db.models import F
+from django.db.models.signals import post_delete, pre_delete
 import os
+import uuid
+
+from .blobs import acquire_blob, release_blob, store_blob
+from .folders import adjust_folder_totals, is_in_subtree, move_folder, path_ids, place_folder
+from .metadata import format_file_size, read_file_metadata
 
 User = get_user_model()
 
 
+class Blob(models.Model):
+    """
+    Inhaltsadressierte Datei, die von mehreren Zeilen geteilt wird
+    """
+    sha256 = models.CharField(
+        max_length=64,
+        unique=True,
+        verbose_name=_('SHA-256')
+    )
+    
+    name = models.CharField(
+        max_length=255,
+        unique=True,
+        verbose_name=_('Speicherpfad')
+    )
+    
+    size_bytes = models.PositiveBigIntegerField(
+        verbose_name=_('Größe (Bytes)')
+    )
+    
+    ref_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name=_('Verweise')
+    )
+    
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name=_('Erstellt am')
+    )
+    
+    class Meta:
+        verbose_name = _('Blob')
+        verbose_name_plural = _('Blobs')
+    
+    def __str__(self):
+        return f"{self.sha256[:12]} ({self.ref_count}×)"
+
+
+class StoredFileMetadata(models.Model):
+    """
+    Beim Upload ermittelte Metadaten der Datei im Feld ``file``
+    
+    Größenanzeigen und Summen lesen diese Spalten statt den Speicher. Der
+    Inhalt selbst liegt als geteilter ``Blob`` in der Ablage (siehe
+    ``files.blobs``), ``file`` zeigt auf dessen Pfad.
+    """
+    METADATA_FIELDS = ('size_bytes', 'mime_type', 'sha256', 'width', 'height')
+    # Blobs nie freigeben (Dateien werden per URL eingebettet)
+    PIN_BLOBS = False
+    
+    size_bytes = models.PositiveBigIntegerField(
+        blank=True,
+        null=True,
+        editable=False,
+        verbose_name=_('Größe (Bytes)')
+    )
+    
+    mime_type = models.CharField(
+        max_length=100,
+        blank=True,
+        default='',
+        editable=False,
+        verbose_name=_('MIME-Typ')
+    )
+    
+    sha256 = models.CharField(
+        max_length=64,
+        blank=True,
+        default='',
+        editable=False,
+        db_index=True,
+        verbose_name=_('SHA-256')
+    )
+    
+    width = models.PositiveIntegerField(
+        blank=True,
+        null=True,
+        editable=False,
+        verbose_name=_('Breite (px)')
+    )
+    
+    height = models.PositiveIntegerField(
+        blank=True,
+        null=True,
+        editable=False,
+        verbose_name=_('Höhe (px)')
+    )
+    
+    original_name = models.CharField(
+        max_length=255,
+        blank=True,
+        default='',
+        editable=False,
+        verbose_name=_('Ursprünglicher Dateiname')
+    )
+    
+    legacy_name = models.CharField(
+        max_length=255,
+        blank=True,
+        default='',
+        editable=False,
+        verbose_name=_('Früherer Speicherpfad')
+    )
+    
+    blob = models.ForeignKey(
+        Blob,
+        on_delete=models.PROTECT,
+        blank=True,
+        null=True,
+        editable=False,
+        related_name='+',
+        verbose_name=_('Blob')
+    )
+    
+    class Meta:
+        abstract = True
+    
+    def refresh_file_metadata(self):
+        """Liest die Metadaten aus der Datei (öffnet den Speicher)"""
+        if self.file:
+            metadata = read_file_metadata(self.file)
+        else:
+            metadata = dict.fromkeys(self.METADATA_FIELDS)
+            metadata['mime_type'] = metadata['sha256'] = ''
+        for field, value in metadata.items():
+            setattr(self, field, value)
+    
+    def _attach_blob(self):
+        """Legt einen neuen Upload in der Ablage ab bzw. referenziert den Blob der Datei"""
+        if not self.file:
+            self.blob = None
+            self.original_name = ''
+            self.refresh_file_metadata()
+        elif not self.file._committed:
+            self.original_name = os.path.basename(self.file.name)
+            self.refresh_file_metadata()
+            self.blob = store_blob(self.file, self.sha256, self.size_bytes)
+            # Inhalt liegt bereits in der Ablage: Dateifeld nicht erneut speichern
+            self.file.name = self.blob.name
+            self.file._committed = True
+        else:
+            if self.blob_id is None or self.blob.name != self.file.name:
+                self.blob = acquire_blob(self.file.name)
+            if self.size_bytes is None:
+                try:
+                    self.refresh_file_metadata()
+                except OSError:
+                    # Datei fehlt im Speicher: Metadaten bleiben leer
+                    pass
+    
+    def save(self, *args, **kwargs):
+        """Ermittelt die Metadaten und den Blob bei neuer oder geänderter Datei"""
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'file' not in update_fields:
+            super().save(*args, **kwargs)
+            return
+        
+        previous_blob_id = self.blob_id
+        self._attach_blob()
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, *self.METADATA_FIELDS, 'original_name', 'blob'}
+        try:
+            super().save(*args, **kwargs)
+        except Exception:
+            if self.blob_id and self.blob_id != previous_blob_id:
+                release_blob(self.blob_id, self.file.storage)
+            raise
+        if previous_blob_id and previous_blob_id != self.blob_id and not self.PIN_BLOBS:
+            release_blob(previous_blob_id, self.file.storage)
+    
+    def get_file_name(self):
+        """Dateiname für Anzeige und Download"""
+        if self.original_name:
+            return self.original_name
+        return os.path.basename(self.file.name) if self.file else ''
+    
+    def get_file_size(self):
+        """Gibt die Dateigröße zurück"""
+        return format_file_size(self.size_bytes)
+
+
 class Folder(models.Model):
     """
     Ordner-Modell für die Dateiverwaltung
     """
+    # Werden nur per UPDATE gepflegt (files.folders), nie aus der Instanz geschrieben
+    TREE_FIELDS = ('path', 'depth', 'file_count', 'subfolder_count', 'subtree_file_count', 'subtree_size_bytes')
+    _loaded_parent_id = None
+    
     name = models.CharField(
         max_length=200,
         verbose_name=_('Name')
@@ -52,6 +244,46 @@ class Folder(models.Model):
         verbose_name=_('Öffentlich')
     )
     
+    # Materialized Path und gepflegte Zähler (siehe files.folders)
+    path = models.CharField(
+        max_length=500,
+        blank=True,
+        default='',
+        editable=False,
+        db_index=True,
+        verbose_name=_('Pfad')
+    )
+    
+    depth = models.PositiveSmallIntegerField(
+        default=0,
+        editable=False,
+        verbose_name=_('Tiefe')
+    )
+    
+    file_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name=_('Dateien')
+    )
+    
+    subfolder_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name=_('Unterordner')
+    )
+    
+    subtree_file_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name=_('Dateien inkl. Unterordner')
+    )
+    
+    subtree_size_bytes = models.PositiveBigIntegerField(
+        default=0,
+        editable=False,
+        verbose_name=_('Größe inkl. Unterordner (Bytes)')
+    )
+    
     class Meta:
         verbose_name = _('Ordner')
         verbose_name_plural = _('Ordner')
@@ -64,51 +296,88 @@ class Folder(models.Model):
         return self.name
     
     def get_absolute_url(self):
-        return reverse('files:folder_detail', kwargs={'pk': self.pk})
+        return f"{reverse('files:global_file_list')}?folder={self.pk}"
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_parent_id = instance.__dict__.get('parent_id')
+        return instance
+    
+    def save(self, *args, **kwargs):
+        """Pflegt Pfad und Zähler beim Anlegen und Verschieben"""
+        adding = self._state.adding
+        moved = not adding and self.parent_id != self._loaded_parent_id
+        if not adding:
+            # Veraltete Zähler der Instanz dürfen die gepflegten Werte nicht überschreiben
+            update_fields = kwargs.get('update_fields') or [
+                field.name for field in self._meta.concrete_fields if not field.primary_key
+            ]
+            kwargs['update_fields'] = [field for field in update_fields if field not in self.TREE_FIELDS]
+        # Zeile, Pfad und Zähler gemeinsam oder gar nicht schreiben
+        with transaction.atomic():
+            if moved and self.parent_id and is_in_subtree(self, self.parent_id):
+                raise ValueError('Ein Ordner kann nicht in sich selbst verschoben werden')
+            super().save(*args, **kwargs)
+            if adding:
+                place_folder(self)
+            elif moved:
+                move_folder(self, self._loaded_parent_id)
+        self._loaded_parent_id = self.parent_id
+    
+    def get_ancestors(self, include_self=False):
+        """Vorfahren von der Wurzel abwärts (eine Abfrage über die IDs im Pfad)"""
+        ids = path_ids(self.path)
+        if not include_self:
+            ids = ids[:-1]
+        folders = Folder.objects.in_bulk(ids)
+        return [folders[pk] for pk in ids if pk in folders]
+    
+    def get_descendants(self, include_self=False):
+        """Alle Unterordner des Teilbaums (eine indizierte Abfrage)"""
+        queryset = Folder.objects.filter(path__startswith=self.path)
+        if not include_self:
+            queryset = queryset.exclude(pk=self.pk)
+        return queryset
+    
+    def get_subtree_files(self):
+        """Alle Dateien im Ordner und seinen Unterordnern"""
+        return GlobalFile.objects.filter(folder__path__startswith=self.path)
     
     def get_full_path(self):
         """Gibt den vollständigen Pfad des Ordners zurück"""
-        path_parts = []
-        current = self
-        while current:
-            path_parts.insert(0, current.name)
-            current = current.parent
-        return ' / '.join(path_parts)
+        return ' / '.join(folder.name for folder in self.get_ancestors(include_self=True))
     
     def get_breadcrumbs(self):
         """Gibt Breadcrumbs für den Ordner zurück"""
-        breadcrumbs = []
-        current = self
-        while current:
-            breadcrumbs.insert(0, {
-                'name': current.name,
-                'url': current.get_absolute_url(),
-                'pk': current.pk
-            })
-            current = current.parent
-        return breadcrumbs
+        return [
+            {
+                'name': folder.name,
+                'url': folder.get_absolute_url(),
+                'pk': folder.pk
+            }
+            for folder in self.get_ancestors(include_self=True)
+        ]
     
     def get_file_count(self):
         """Gibt die Anzahl der Dateien im Ordner zurück"""
-        return self.files.count()
+        return self.file_count
     
     def get_subfolder_count(self):
         """Gibt die Anzahl der Unterordner zurück"""
-        return self.children.count()
+        return self.subfolder_count
     
     def get_total_size(self):
-        """Gibt die Gesamtgröße aller Dateien im Ordner zurück"""
-        total_size = 0
-        for file in self.files.all():
-            if file.file:
-                total_size += file.file.size
-        return total_size
+        """Gibt die Gesamtgröße aller Dateien im Ordner und seinen Unterordnern zurück"""
+        return self.subtree_size_bytes
 
 
-class GlobalFile(models.Model):
+class GlobalFile(StoredFileMetadata):
     """
     Globale Datei-Modell für die zentrale Dateiverwaltung
     """
+    # (Ordner, Größe), mit denen die Datei in den Ordnerzählern steht
+    _counted_in_folder = (None, 0)
     
     class FileType(models.TextChoices):
         HERO_IMAGE = 'hero_image', _('Hero-Bild')
@@ -195,21 +464,31 @@ class GlobalFile(models.Model):
             return f"{self.title} ({self.folder.name})"
         return self.title
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if 'folder_id' in instance.__dict__ and 'size_bytes' in instance.__dict__:
+            instance._counted_in_folder = (instance.folder_id, instance.size_bytes or 0)
+        else:
+            # Teilweise geladen: Ordnerzähler beim Speichern nicht anfassen
+            instance._counted_in_folder = None
+        return instance
+    
+    def save(self, *args, **kwargs):
+        """Speichert und passt die Zähler der Ordner an (Ordnerwechsel, neue Größe)"""
+        super().save(*args, **kwargs)
+        previous = self._counted_in_folder
+        counted = (self.folder_id, self.size_bytes or 0)
+        if previous is not None and previous != counted:
+            if previous[0]:
+                adjust_folder_totals(previous[0], -1, -previous[1])
+            if counted[0]:
+                adjust_folder_totals(counted[0], 1, counted[1])
+            self._counted_in_folder = counted
+    
     def get_absolute_url(self):
         return reverse('files:global_file_detail', kwargs={'pk': self.pk})
     
-    def get_file_size(self):
-        """Gibt die Dateigröße zurück"""
-        try:
-            size = self.file.size
-            for unit in ['B', 'KB', 'MB', 'GB']:
-                if size < 1024.0:
-                    return f"{size:.1f} {unit}"
-                size /= 1024.0
-            return f"{size:.1f} TB"
-        except:
-            return "Unbekannt"
-    
     def get_file_size_display(self):
         """Gibt die Dateigröße in einem benutzerfreundlichen Format zurück"""
         return self.get_file_size()
@@ -247,3 +526,91 @@ class GlobalFile(models.Model):
     def get_download_url(self):
         """Gibt die Download-URL zurück"""
         return reverse('files:global_file_download', kwargs={'pk': self.pk})
+
+
+class UploadSession(models.Model):
+    """
+    Unvollständiger Chunked Upload (siehe ``files.uploads``)
+    """
+    id = models.UUIDField(
+        primary_key=True,
+        default=uuid.uuid4,
+        editable=False
+    )
+    
+    created_by = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='upload_sessions',
+        verbose_name=_('Erstellt von')
+    )
+    
+    filename = models.CharField(
+        max_length=255,
+        verbose_name=_('Dateiname')
+    )
+    
+    total_size = models.PositiveBigIntegerField(
+        verbose_name=_('Gesamtgröße (Bytes)')
+    )
+    
+    received_bytes = models.PositiveBigIntegerField(
+        default=0,
+        verbose_name=_('Empfangen (Bytes)')
+    )
+    
+    sha256 = models.CharField(
+        max_length=64,
+        blank=True,
+        default='',
+        verbose_name=_('Erwartete SHA-256')
+    )
+    
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name=_('Erstellt am')
+    )
+    
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name=_('Aktualisiert am')
+    )
+    
+    class Meta:
+        verbose_name = _('Upload-Sitzung')
+        verbose_name_plural = _('Upload-Sitzungen')
+    
+    def __str__(self):
+        return f"{self.filename} ({self.received_bytes}/{self.total_size})"
+    
+    @property
+    def is_complete(self):
+        return self.received_bytes >= self.total_size
+
+
+def release_file_blob(sender, instance, **kwargs):
+    """post_delete: gibt den Blob einer gelöschten Datei frei"""
+    if instance.blob_id:
+        release_blob(instance.blob_id, instance.file.storage)
+
+
+def release_folder_totals(sender, instance, **kwargs):
+    """
+    pre_delete: nimmt eine Datei aus den Ordnerzählern
+    
+    Vor dem Löschen, da beim kaskadierenden Löschen eines Ordners die Ordner
+    (selbstreferenzierend, daher nicht sortierbar) vor den Dateien entfernt werden.
+    """
+    if instance.folder_id:
+        adjust_folder_totals(instance.folder_id, -1, -(instance.size_bytes or 0))
+
+
+def release_subfolder(sender, instance, **kwargs):
+    """post_delete: zählt einen gelöschten Ordner beim Elternordner ab"""
+    if instance.parent_id:
+        Folder.objects.filter(pk=instance.parent_id).update(subfolder_count=F('subfolder_count') - 1)
+
+
+post_delete.connect(release_file_blob, sender=GlobalFile)
+pre_delete.connect(release_folder_totals, sender=GlobalFile)
+post_delete.connect(release_subfolder, sender=Folder)
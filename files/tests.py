@@ -3,8 +3,21 @@ from django.contrib.auth import get_user_model
 from django.urls import reverse
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.utils import timezone
+from django.conf import settings
 from .models import GlobalFile
 import os
+import shutil
+import tempfile
+from asgiref.sync import async_to_sync
+from django.test import override_settings
+
+
+def read_stream(response):
+    """Liest den asynchronen Body einer gestreamten Antwort"""
+    async def collect():
+        return b''.join([chunk async for chunk in response.streaming_content])
+    return async_to_sync(collect)()
+
 
 User = get_user_model()
 
@@ -41,6 +54,23 @@ class FilesAppTestCase(TestCase):
         self.client.login(username=user.username, password='testpass123' if user == self.user else 'admin123')
 
 
+class TempMediaTestCase(FilesAppTestCase):
+    """Base Test Case mit temporärem MEDIA_ROOT (wird nach dem Test gelöscht)"""
+    
+    def setUp(self):
+        super().setUp()
+        self.override_temp_dirs('MEDIA_ROOT')
+    
+    def override_temp_dirs(self, *names, **values):
+        """Setzt die Settings ``names`` auf neue temporäre Verzeichnisse, ``values`` direkt"""
+        for name in names:
+            values[name] = tempfile.mkdtemp()
+            self.addCleanup(shutil.rmtree, values[name], ignore_errors=True)
+        settings_override = override_settings(**values)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+
 class GlobalFileModelTests(FilesAppTestCase):
     """Tests für das GlobalFile Model"""
     
@@ -356,3 +386,428 @@ class GlobalFileIntegrationTests(FilesAppTestCase):
         
         # 7. Prüfe Löschung
         self.assertFalse(GlobalFile.objects.filter(pk=file.pk).exists())
+
+
+class FileDownloadTests(TempMediaTestCase):
+    """Tests für gestreamte Downloads mit Range-Unterstützung"""
+    
+    def setUp(self):
+        super().setUp()
+        self.content = bytes(range(256)) * 1024
+        self.file = GlobalFile.objects.create(
+            title='Präsentation',
+            file=SimpleUploadedFile('praesentation.pdf', self.content),
+            uploaded_by=self.user,
+        )
+        self.url = reverse('files:global_file_download', args=[self.file.pk])
+        self.login_user()
+    
+    def test_full_download_is_streamed(self):
+        """Test: Ganze Datei gestreamt, mit Länge und Range-Ankündigung"""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Length'], str(len(self.content)))
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="praesentation.pdf"')
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertEqual(read_stream(response), self.content)
+    
+    def test_byte_ranges(self):
+        """Test: Einzelne Bereiche als 206, ungültige als 416"""
+        response = self.client.get(self.url, HTTP_RANGE='bytes=100-199')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 100-199/{len(self.content)}')
+        self.assertEqual(response['Content-Length'], '100')
+        self.assertEqual(read_stream(response), self.content[100:200])
+        
+        # Fortsetzen ab Byte N und die letzten N Bytes
+        response = self.client.get(self.url, HTTP_RANGE='bytes=262000-')
+        self.assertEqual(read_stream(response), self.content[262000:])
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-10')
+        self.assertEqual(read_stream(response), self.content[-10:])
+        
+        response = self.client.get(self.url, HTTP_RANGE=f'bytes={len(self.content)}-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(self.content)}')
+        
+        # Mehrere Bereiche: ganze Datei
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-1,5-6')
+        self.assertEqual(response.status_code, 200)
+    
+    def test_if_range_with_stale_etag_returns_full_file(self):
+        """Test: Geänderte Datei (If-Range passt nicht) wird komplett geliefert"""
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE=etag)
+        self.assertEqual(response.status_code, 206)
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"veraltet"')
+        self.assertEqual(response.status_code, 200)
+    
+    def test_offload_to_webserver(self):
+        """Test: Mit Offload liefert der Webserver die Datei aus"""
+        with override_settings(DEALROOM_DOWNLOAD_OFFLOAD='nginx', DEALROOM_DOWNLOAD_ACCEL_PREFIX='/protected/'):
+            response = self.client.get(self.url)
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected/{self.file.file.name}')
+        self.assertEqual(response.content, b'')
+        
+        with override_settings(DEALROOM_DOWNLOAD_OFFLOAD='sendfile'):
+            response = self.client.get(self.url)
+        self.assertEqual(response['X-Sendfile'], self.file.file.path)
+
+
+class FileMetadataTests(TempMediaTestCase):
+    """Tests für beim Upload gespeicherte Datei-Metadaten"""
+    
+    def test_metadata_stored_on_upload(self):
+        """Test: Größe, MIME-Typ, Prüfsumme und Bildmaße beim Upload"""
+        import hashlib
+        import io
+        from PIL import Image
+        
+        buffer = io.BytesIO()
+        Image.new('RGB', (40, 30)).save(buffer, format='PNG')
+        content = buffer.getvalue()
+        file = GlobalFile.objects.create(
+            title='Logo', file=SimpleUploadedFile('logo.png', content), uploaded_by=self.user
+        )
+        file.refresh_from_db()
+        
+        self.assertEqual(file.size_bytes, len(content))
+        self.assertEqual(file.mime_type, 'image/png')
+        self.assertEqual(file.sha256, hashlib.sha256(content).hexdigest())
+        self.assertEqual((file.width, file.height), (40, 30))
+        # Gespeicherte Datei ist vollständig
+        with file.file.open('rb') as stored:
+            self.assertEqual(stored.read(), content)
+    
+    def test_sizes_read_from_columns(self):
+        """Test: Größenanzeige und Ordnersumme ohne Zugriff auf den Speicher"""
+        from .models import Folder
+        
+        folder = Folder.objects.create(name='Decks', created_by=self.user)
+        for name in ('a.pdf', 'b.pdf'):
+            GlobalFile.objects.create(
+                title=name, file=SimpleUploadedFile(name, b'x' * 2048), folder=folder, uploaded_by=self.user
+            )
+        files = list(GlobalFile.objects.filter(folder=folder))
+        
+        folder.refresh_from_db()
+        with self.assertNumQueries(0):
+            self.assertEqual(folder.get_total_size(), 4096)
+        # Datei im Speicher löschen: Anzeige liest weiterhin die Spalte
+        files[0].file.storage.delete(files[0].file.name)
+        self.assertEqual(files[0].get_file_size(), '2.0 KB')
+    
+    def test_backfill_command(self):
+        """Test: backfill_file_metadata füllt bestehende Zeilen nach"""
+        from io import StringIO
+        from django.core.management import call_command
+        
+        file = GlobalFile.objects.create(
+            title='Alt', file=SimpleUploadedFile('alt.txt', b'hallo'), uploaded_by=self.user
+        )
+        GlobalFile.objects.filter(pk=file.pk).update(size_bytes=None, mime_type='', sha256='')
+        
+        call_command('backfill_file_metadata', stdout=StringIO())
+        file.refresh_from_db()
+        self.assertEqual(file.size_bytes, 5)
+        self.assertEqual(file.mime_type, 'text/plain')
+        self.assertEqual(len(file.sha256), 64)
+
+
+class FileBlobTests(TempMediaTestCase):
+    """Tests für die inhaltsadressierte, deduplizierte Ablage"""
+    
+    def upload(self, name, content):
+        return GlobalFile.objects.create(
+            title=name, file=SimpleUploadedFile(name, content), uploaded_by=self.user
+        )
+    
+    def test_identical_uploads_share_one_blob(self):
+        """Test: Gleicher Inhalt wird einmal gespeichert und gezählt"""
+        first = self.upload('logo.png', b'same-bytes')
+        second = self.upload('firmenlogo.png', b'same-bytes')
+        other = self.upload('deck.pdf', b'other-bytes')
+        
+        self.assertEqual(first.blob_id, second.blob_id)
+        self.assertEqual(first.file.name, second.file.name)
+        self.assertTrue(first.file.name.startswith(f'blobs/{first.sha256[:2]}/'))
+        self.assertNotEqual(first.blob_id, other.blob_id)
+        first.blob.refresh_from_db()
+        self.assertEqual(first.blob.ref_count, 2)
+        self.assertEqual((first.get_file_name(), second.get_file_name()), ('logo.png', 'firmenlogo.png'))
+        
+        # Ein gemeinsames Verzeichnis pro Blob, keine Kopie unter global_files/
+        storage = first.file.storage
+        self.assertFalse(storage.exists('global_files'))
+    
+    def test_blob_removed_with_last_reference(self):
+        """Test: Datei bleibt, solange sie referenziert wird"""
+        from .models import Blob
+        
+        first = self.upload('a.txt', b'inhalt')
+        second = self.upload('b.txt', b'inhalt')
+        storage, name = first.file.storage, first.file.name
+        
+        first.delete()
+        self.assertEqual(Blob.objects.get(pk=second.blob_id).ref_count, 1)
+        self.assertTrue(storage.exists(name))
+        
+        second.delete()
+        self.assertFalse(Blob.objects.exists())
+        self.assertFalse(storage.exists(name))
+    
+    def test_replacing_file_releases_previous_blob(self):
+        """Test: Neuer Upload gibt den alten Blob frei"""
+        from .models import Blob
+        
+        file = self.upload('v1.pdf', b'version 1')
+        old_name = file.file.name
+        file.file = SimpleUploadedFile('v2.pdf', b'version 2')
+        file.save()
+        
+        self.assertEqual(Blob.objects.count(), 1)
+        self.assertFalse(file.file.storage.exists(old_name))
+        self.assertEqual(file.get_file_name(), 'v2.pdf')
+
+    def test_damaged_blob_file_not_reused(self):
+        """Test: Eine liegengebliebene Datei mit falschem Inhalt wird ersetzt"""
+        import hashlib
+        from django.core.files.base import ContentFile
+        from django.core.files.storage import default_storage
+        from .blobs import blob_path
+
+        content = b'echter inhalt'
+        name = blob_path(hashlib.sha256(content).hexdigest(), 'a.txt')
+        default_storage.save(name, ContentFile(b'abgebrochen'))
+
+        file = self.upload('a.txt', content)
+        self.assertEqual(file.file.name, name)
+        with file.file.open('rb') as stored:
+            self.assertEqual(stored.read(), content)
+
+    def test_media_library_keeps_embedded_files(self):
+        """Test: Medien bleiben per URL erreichbar, auch nach dem Löschen"""
+        from deals.models import MediaLibrary
+
+        media = MediaLibrary.objects.create(
+            title='Logo', media_type='image', created_by=self.user,
+            file=SimpleUploadedFile('logo.png', b'logo-bytes'),
+        )
+        storage, name = media.file.storage, media.file.name
+        media.file = SimpleUploadedFile('logo2.png', b'neues-logo')
+        media.save()
+        self.assertTrue(storage.exists(name))
+
+        media.delete()
+        self.assertTrue(storage.exists(media.file.name))
+
+
+class ChunkedUploadTests(TempMediaTestCase):
+    """Tests für fortsetzbare Chunked Uploads"""
+    
+    def setUp(self):
+        super().setUp()
+        self.override_temp_dirs('DEALROOM_UPLOAD_DIR', DEALROOM_UPLOAD_CHUNK_SIZE=1024)
+        
+        self.content = os.urandom(2500)
+        self.login_user()
+    
+    def start(self, **payload):
+        import json
+        payload = {'filename': 'deck.pdf', 'size': len(self.content), **payload}
+        return self.client.post(
+            reverse('files:chunked_upload_start'), json.dumps(payload), content_type='application/json'
+        )
+    
+    def put_chunk(self, url, offset, data, checksum=None):
+        import hashlib
+        return self.client.put(
+            url, data, content_type='application/octet-stream',
+            HTTP_UPLOAD_OFFSET=str(offset),
+            HTTP_X_CHUNK_SHA256=checksum or hashlib.sha256(data).hexdigest(),
+        )
+    
+    def test_upload_resumes_and_completes(self):
+        """Test: Chunks nach Offset, Fortsetzen nach Abbruch, Übergabe an GlobalFile"""
+        import hashlib
+        import json
+        
+        response = self.start(sha256=hashlib.sha256(self.content).hexdigest())
+        self.assertEqual(response.status_code, 201)
+        url = response.json()['url']
+        
+        self.assertEqual(self.put_chunk(url, 0, self.content[:1024]).json()['offset'], 1024)
+        # Falsche Prüfsumme: Stand bleibt
+        response = self.put_chunk(url, 1024, self.content[1024:2048], checksum='0' * 64)
+        self.assertEqual(response.status_code, 400)
+        # Falscher Offset: Client erfährt den Stand und setzt dort fort
+        response = self.put_chunk(url, 2048, self.content[2048:])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['offset'], 1024)
+        self.assertEqual(self.client.get(url).json()['offset'], 1024)
+        
+        self.put_chunk(url, 1024, self.content[1024:2048])
+        self.put_chunk(url, 2048, self.content[2048:])
+        
+        response = self.client.post(
+            url + 'complete/', json.dumps({'title': 'Großes Deck', 'file_type': 'document'}),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 201)
+        file = GlobalFile.objects.get(pk=response.json()['id'])
+        self.assertEqual(file.get_file_name(), 'deck.pdf')
+        self.assertEqual(file.size_bytes, len(self.content))
+        with file.file.open('rb') as stored:
+            self.assertEqual(stored.read(), self.content)
+        self.assertEqual(os.listdir(settings.DEALROOM_UPLOAD_DIR), [])
+
+    def test_late_retry_keeps_received_bytes(self):
+        """Test: Eine späte Wiederholung überschreibt keine bereits gezählten Chunks"""
+        import hashlib
+        from io import BytesIO
+        from .models import UploadSession
+        from .uploads import OffsetMismatch, append_chunk, part_path
+
+        url = self.start().json()['url']
+        # Stand beim Eintreffen der Wiederholung von Chunk 0
+        stale = UploadSession.objects.get()
+        self.put_chunk(url, 0, self.content[:1024])
+        self.put_chunk(url, 1024, self.content[1024:2048])
+
+        chunk = self.content[:1024]
+        with self.assertRaises(OffsetMismatch) as raised:
+            append_chunk(stale, 0, BytesIO(chunk), len(chunk), hashlib.sha256(chunk).hexdigest())
+        self.assertEqual(raised.exception.offset, 2048)
+        with open(part_path(stale), 'rb') as part:
+            self.assertEqual(part.read(), self.content[:2048])
+
+    def test_invalid_uploads_rejected(self):
+        """Test: Unvollständige Uploads, zu große Chunks und fremde Uploads"""
+        import json
+        
+        self.assertEqual(self.start(filename='tool.exe').status_code, 400)
+        url = self.start().json()['url']
+        
+        self.assertEqual(self.put_chunk(url, 0, self.content[:2000]).status_code, 400)
+        response = self.client.post(url + 'complete/', json.dumps({}), content_type='application/json')
+        self.assertEqual(response.status_code, 409)
+        
+        self.login_user(self.admin_user)
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class FolderTreeTests(TempMediaTestCase):
+    """Tests für Materialized Path und Teilbaum-Zähler der Ordner"""
+    
+    def setUp(self):
+        super().setUp()
+        from .models import Folder
+        
+        self.root = Folder.objects.create(name='Kunden', created_by=self.user)
+        self.customer = Folder.objects.create(name='ACME', parent=self.root, created_by=self.user)
+        self.deals = Folder.objects.create(name='Angebote', parent=self.customer, created_by=self.user)
+    
+    def add_file(self, folder, size):
+        return GlobalFile.objects.create(
+            title='Datei', file=SimpleUploadedFile(f'{size}.pdf', os.urandom(size)),
+            folder=folder, uploaded_by=self.user
+        )
+    
+    def reload(self):
+        for folder in (self.root, self.customer, self.deals):
+            folder.refresh_from_db()
+    
+    def test_paths_and_breadcrumbs(self):
+        """Test: Pfad, Tiefe und Breadcrumbs in einer Abfrage"""
+        self.assertEqual(self.deals.path, f'{self.root.pk}/{self.customer.pk}/{self.deals.pk}/')
+        self.assertEqual(self.deals.depth, 2)
+        
+        with self.assertNumQueries(1):
+            breadcrumbs = self.deals.get_breadcrumbs()
+        self.assertEqual([crumb['name'] for crumb in breadcrumbs], ['Kunden', 'ACME', 'Angebote'])
+        self.assertEqual(self.deals.get_full_path(), 'Kunden / ACME / Angebote')
+        self.assertEqual(set(self.root.get_descendants()), {self.customer, self.deals})
+    
+    def test_counters_follow_files(self):
+        """Test: Anlegen, Verschieben und Löschen von Dateien pflegt die Zähler"""
+        first = self.add_file(self.deals, 100)
+        self.add_file(self.customer, 50)
+        self.reload()
+        
+        with self.assertNumQueries(0):
+            self.assertEqual(self.root.get_total_size(), 150)
+            self.assertEqual(self.root.subtree_file_count, 2)
+            self.assertEqual(self.customer.get_file_count(), 1)
+            self.assertEqual(self.root.get_subfolder_count(), 1)
+        self.assertEqual(self.deals.get_total_size(), 100)
+        
+        first.folder = self.root
+        first.save()
+        self.reload()
+        self.assertEqual((self.deals.subtree_file_count, self.deals.subtree_size_bytes), (0, 0))
+        self.assertEqual((self.root.file_count, self.root.subtree_size_bytes), (1, 150))
+        
+        first.delete()
+        self.reload()
+        self.assertEqual((self.root.subtree_file_count, self.root.subtree_size_bytes), (1, 50))
+    
+    def test_move_and_delete_subtree(self):
+        """Test: Verschieben schreibt Pfade des Teilbaums um, Löschen zählt ab"""
+        from .folders import rebuild_folder_tree
+        from .models import Folder
+        
+        self.add_file(self.deals, 70)
+        other = Folder.objects.create(name='Archiv', created_by=self.user)
+        
+        self.customer.parent = other
+        self.customer.save()
+        self.reload()
+        other.refresh_from_db()
+        self.assertEqual(self.deals.path, f'{other.pk}/{self.customer.pk}/{self.deals.pk}/')
+        self.assertEqual(self.deals.depth, 2)
+        self.assertEqual((other.subtree_size_bytes, other.subfolder_count), (70, 1))
+        self.assertEqual((self.root.subtree_size_bytes, self.root.subfolder_count), (0, 0))
+        
+        # Nicht in den eigenen Teilbaum
+        other.parent = self.deals
+        with self.assertRaises(ValueError):
+            other.save()
+        other.refresh_from_db()
+        
+        # Gepflegte Zähler entsprechen der Neuberechnung
+        expected = list(Folder.objects.order_by('pk').values_list(
+            'path', 'depth', 'file_count', 'subfolder_count', 'subtree_file_count', 'subtree_size_bytes'
+        ))
+        Folder.objects.update(path='', subtree_size_bytes=0, subtree_file_count=0)
+        rebuild_folder_tree()
+        self.assertEqual(list(Folder.objects.order_by('pk').values_list(
+            'path', 'depth', 'file_count', 'subfolder_count', 'subtree_file_count', 'subtree_size_bytes'
+        )), expected)
+        
+        self.customer.delete()
+        other.refresh_from_db()
+        self.assertEqual((other.subtree_file_count, other.subtree_size_bytes, other.subfolder_count), (0, 0, 0))
+
+    def test_failed_move_rolls_back_parent(self):
+        """Test: Scheitert das Umschreiben des Teilbaums, bleibt der alte Elternordner"""
+        from unittest import mock
+        from .models import Folder
+
+        other = Folder.objects.create(name='Archiv', created_by=self.user)
+        self.customer.parent = other
+        with mock.patch('files.models.move_folder', side_effect=RuntimeError('DB weg')):
+            with self.assertRaises(RuntimeError):
+                self.customer.save()
+
+        self.reload()
+        self.assertEqual(self.customer.parent_id, self.root.pk)
+        self.assertEqual(self.deals.path, f'{self.root.pk}/{self.customer.pk}/{self.deals.pk}/')
+
+    def test_subtree_files(self):
+        """Test: Dateien eines Ordners inkl. Unterordnern"""
+        inside = self.add_file(self.deals, 10)
+        self.add_file(None, 10)
+        
+        self.assertEqual(list(self.customer.get_subtree_files()), [inside])
+        self.assertEqual(list(self.deals.get_subtree_files()), [inside])
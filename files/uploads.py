@@ -0,0 +1,233 @@
+"""
+Chunked Uploads
+===============
+
+Große Dateien werden in Chunks hochgeladen statt in einem Multipart-POST,
+den Django komplett zwischenspeichert:
+
+1. ``start_upload`` legt eine ``UploadSession`` an (Dateiname, Größe,
+   optional SHA-256 der ganzen Datei).
+2. ``append_chunk`` schreibt einen Chunk an seinen Offset in die Teildatei
+   unter ``DEALROOM_UPLOAD_DIR``. Der Chunk wird in Blöcken vom Request in
+   die Datei gestreamt und gegen seine SHA-256 geprüft; der Offset muss dem
+   bisher empfangenen Stand entsprechen. Requests derselben Session laufen
+   nacheinander (exklusiver ``flock`` auf der Teildatei), damit eine späte
+   Wiederholung keine bereits gezählten Bytes überschreibt. Nach einem
+   Abbruch fragt der Client den Stand ab und setzt dort fort.
+3. ``complete_upload`` übergibt die fertige Teildatei an die Modelle. Da die
+   Chunks bereits an ihrer Stelle stehen, entfällt das Zusammenkopieren; der
+   Storage verschiebt die Datei (``temporary_file_path``) in die Blob-Ablage.
+
+Der Speicherbedarf pro Request ist unabhängig von Datei- und Chunkgröße.
+"""
+
+import fcntl
+import hashlib
+import mimetypes
+import os
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files import File
+from django.utils import timezone
+
+from .forms import ALLOWED_CONTENT_TYPES
+
+BLOCK_SIZE = 64 * 1024
+
+
+class UploadError(ValueError):
+    """Der Upload oder Chunk ist ungültig"""
+
+
+class OffsetMismatch(UploadError):
+    """Der Chunk passt nicht an den bisher empfangenen Stand"""
+
+    def __init__(self, offset):
+        super().__init__(f'Erwarteter Offset: {offset}')
+        self.offset = offset
+
+
+class AssembledUpload(File):
+    """Fertige Teildatei; der Storage verschiebt sie, statt sie zu kopieren"""
+
+    def temporary_file_path(self):
+        return self.file.name
+
+
+def get_upload_dir():
+    """Verzeichnis der Teildateien (wird bei Bedarf angelegt)"""
+    path = Path(settings.DEALROOM_UPLOAD_DIR)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def part_path(session):
+    """Pfad der Teildatei eines Uploads"""
+    return get_upload_dir() / f'{session.pk}.part'
+
+
+def start_upload(user, filename, size, sha256=''):
+    """
+    Legt einen Chunked Upload an
+
+    Args:
+        user: hochladender Benutzer
+        filename: ursprünglicher Dateiname
+        size: Gesamtgröße in Bytes
+        sha256: optionale Prüfsumme der ganzen Datei (hex)
+
+    Returns:
+        UploadSession
+
+    Raises:
+        UploadError: ungültige Angaben
+    """
+    from .models import UploadSession
+
+    filename = os.path.basename(str(filename or '')).strip()[:255]
+    if not filename:
+        raise UploadError('filename fehlt')
+    try:
+        size = int(size)
+    except (TypeError, ValueError):
+        raise UploadError('size erwartet die Dateigröße in Bytes')
+    if size <= 0 or size > settings.DEALROOM_UPLOAD_MAX_SIZE:
+        raise UploadError(f'Dateigröße muss zwischen 1 und {settings.DEALROOM_UPLOAD_MAX_SIZE} Bytes liegen')
+
+    # Wie im Formular; Videos in allen Container-Formaten
+    content_type = mimetypes.guess_type(filename)[0] or ''
+    if content_type not in ALLOWED_CONTENT_TYPES and not content_type.startswith('video/'):
+        raise UploadError('Dateityp nicht unterstützt. Erlaubte Formate: Bilder, Dokumente, Videos')
+
+    sha256 = str(sha256 or '').lower()
+    if sha256 and len(sha256) != 64:
+        raise UploadError('sha256 erwartet 64 Hex-Zeichen')
+
+    session = UploadSession.objects.create(created_by=user, filename=filename, total_size=size, sha256=sha256)
+    part_path(session).touch()
+    return session
+
+
+def append_chunk(session, offset, stream, length, checksum):
+    """
+    Schreibt einen Chunk an seinen Offset
+
+    Args:
+        session: UploadSession
+        offset: Position des Chunks in der Datei
+        stream: Datei-Objekt mit dem Chunk (z.B. der Request)
+        length: Länge des Chunks in Bytes
+        checksum: SHA-256 des Chunks (hex)
+
+    Returns:
+        int: neuer empfangener Stand
+
+    Raises:
+        OffsetMismatch: Offset weicht vom empfangenen Stand ab
+        UploadError: Länge oder Prüfsumme ungültig
+    """
+    from .models import UploadSession
+
+    if length <= 0 or length > settings.DEALROOM_UPLOAD_CHUNK_SIZE:
+        raise UploadError(f'Chunks müssen zwischen 1 und {settings.DEALROOM_UPLOAD_CHUNK_SIZE} Bytes groß sein')
+    if offset + length > session.total_size:
+        raise UploadError('Chunk reicht über das Dateiende hinaus')
+    if not checksum:
+        raise UploadError('Prüfsumme des Chunks fehlt')
+
+    digest = hashlib.sha256()
+    written = 0
+    with open(part_path(session), 'r+b') as part:
+        # Prüfen, Schreiben und Weiterzählen pro Session serialisieren;
+        # der Stand wird erst unter der Sperre gelesen
+        fcntl.flock(part, fcntl.LOCK_EX)
+        session.refresh_from_db(fields=['received_bytes'])
+        if offset != session.received_bytes:
+            raise OffsetMismatch(session.received_bytes)
+
+        part.seek(offset)
+        while written < length:
+            block = stream.read(min(BLOCK_SIZE, length - written))
+            if not block:
+                break
+            digest.update(block)
+            part.write(block)
+            written += len(block)
+        # Reste eines abgebrochenen Versuchs hinter dem Chunk verwerfen,
+        # nie aber bereits gezählte Bytes
+        part.truncate(max(offset + written, session.received_bytes))
+
+        if written != length:
+            raise UploadError(f'Chunk unvollständig: {written} von {length} Bytes')
+        if digest.hexdigest() != checksum.lower():
+            raise UploadError('Prüfsumme des Chunks stimmt nicht')
+
+        # Zusätzlich per Compare-and-Swap absichern (flock greift nicht auf jedem Netzlaufwerk)
+        advanced = UploadSession.objects.filter(pk=session.pk, received_bytes=offset).update(
+            received_bytes=offset + length, updated_at=timezone.now()
+        )
+        if not advanced:
+            session.refresh_from_db(fields=['received_bytes'])
+            raise OffsetMismatch(session.received_bytes)
+    session.received_bytes = offset + length
+    return session.received_bytes
+
+
+def complete_upload(session, create):
+    """
+    Übergibt einen vollständigen Upload an ein Modell
+
+    Args:
+        session: UploadSession
+        create: Funktion, die mit der fertigen Datei (``File``) die
+            Modellinstanz anlegt und zurückgibt
+
+    Returns:
+        Ergebnis von ``create``
+
+    Raises:
+        UploadError: Upload unvollständig oder Prüfsumme der Datei falsch
+    """
+    if not session.is_complete:
+        raise OffsetMismatch(session.received_bytes)
+
+    path = part_path(session)
+    if session.sha256:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as part:
+            for block in iter(lambda: part.read(BLOCK_SIZE), b''):
+                digest.update(block)
+        if digest.hexdigest() != session.sha256:
+            raise UploadError('Prüfsumme der Datei stimmt nicht')
+
+    with open(path, 'rb') as part:
+        result = create(AssembledUpload(part, name=session.filename))
+    discard_upload(session)
+    return result
+
+
+def discard_upload(session):
+    """Löscht Teildatei und Sitzung"""
+    path = part_path(session)
+    if path.exists():
+        # Bei bereits vorhandenem Blob wurde die Teildatei nicht verschoben
+        path.unlink()
+    session.delete()
+
+
+def purge_expired_uploads():
+    """
+    Verwirft Uploads, die länger als ``DEALROOM_UPLOAD_EXPIRY_HOURS`` ruhen
+
+    Returns:
+        int: Anzahl verworfener Uploads
+    """
+    from .models import UploadSession
+
+    cutoff = timezone.now() - timedelta(hours=settings.DEALROOM_UPLOAD_EXPIRY_HOURS)
+    expired = list(UploadSession.objects.filter(updated_at__lt=cutoff))
+    for session in expired:
+        discard_upload(session)
+    return len(expired)
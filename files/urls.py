@@ -14,4 +14,9 @@ urlpatterns = [
     path('<int:pk>/edit/', views.GlobalFileEditView.as_view(), name='global_file_edit'),
     path('<int:pk>/delete/', views.GlobalFileDeleteView.as_view(), name='global_file_delete'),
     path('<int:pk>/download/', views.GlobalFileDownloadView.as_view(), name='global_file_download'),
+    
+    # Chunked Uploads für große Dateien
+    path('api/uploads/', views.ChunkedUploadStartView.as_view(), name='chunked_upload_start'),
+    path('api/uploads/<uuid:upload_id>/', views.ChunkedUploadView.as_view(), name='chunked_upload'),
+    path('api/uploads/<uuid:upload_id>/complete/', views.ChunkedUploadCompleteView.as_view(), name='chunked_upload_complete'),
 ] 
\ No newline at end of file
@@ -5,11 +5,16 @@ from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.urls import reverse_lazy, reverse
 from django.shortcuts import get_object_or_404, redirect
 from django.contrib import messages
-from django.http import HttpResponse, Http404
+from django.http import HttpResponse, Http404, JsonResponse
 from django.utils.translation import gettext_lazy as _
 from django.db.models import Q
-from .models import GlobalFile
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+import json
+from .models import Folder, GlobalFile, UploadSession
 from .forms import GlobalFileForm
+from .downloads import serve_file
+from .uploads import OffsetMismatch, UploadError, append_chunk, complete_upload, discard_upload, start_upload
 
 
 class GlobalFileListView(LoginRequiredMixin, ListView):
@@ -22,7 +27,7 @@ class GlobalFileListView(LoginRequiredMixin, ListView):
     paginate_by = 20
     
     def get_queryset(self):
-        queryset = GlobalFile.objects.select_related('uploaded_by').order_by('-uploaded_at')
+        queryset = GlobalFile.objects.select_related('uploaded_by', 'folder').order_by('-uploaded_at')
         
         # Suchfunktion
         search = self.request.GET.get('search')
@@ -43,6 +48,13 @@ class GlobalFileListView(LoginRequiredMixin, ListView):
         if uploaded_by:
             queryset = queryset.filter(uploaded_by__username__icontains=uploaded_by)
         
+        # Filter nach Ordner (inkl. Unterordner, über den Materialized Path)
+        self.folder = None
+        folder = self.request.GET.get('folder')
+        if folder and folder.isdigit():
+            self.folder = get_object_or_404(Folder, pk=folder)
+            queryset = queryset.filter(folder__path__startswith=self.folder.path)
+        
         return queryset
     
     def get_context_data(self, **kwargs):
@@ -51,6 +63,10 @@ class GlobalFileListView(LoginRequiredMixin, ListView):
         context['file_type_filter'] = self.request.GET.get('file_type', '')
         context['uploaded_by_filter'] = self.request.GET.get('uploaded_by', '')
         context['file_type_choices'] = GlobalFile.FileType.choices
+        context['folders'] = Folder.objects.all()
+        context['current_folder'] = self.folder
+        if self.folder:
+            context['breadcrumbs'] = self.folder.get_breadcrumbs()
         return context
 
 
@@ -133,6 +149,143 @@ class GlobalFileDownloadView(LoginRequiredMixin, DetailView):
         if not file_obj.is_public and request.user != file_obj.uploaded_by:
             raise Http404(_('Keine Berechtigung für diese Datei.'))
         
-        response = HttpResponse(file_obj.file, content_type='application/octet-stream')
-        response['Content-Disposition'] = f'attachment; filename="{file_obj.file.name.split("/")[-1]}"'
-        return response
+        return serve_file(
+            request, file_obj.file, filename=file_obj.get_file_name(), content_type=file_obj.mime_type
+        )
+
+
+def _upload_state(session):
+    """Stand eines Chunked Uploads für den Client"""
+    return {
+        'upload_id': str(session.pk),
+        'filename': session.filename,
+        'size': session.total_size,
+        'offset': session.received_bytes,
+        'chunk_size': settings.DEALROOM_UPLOAD_CHUNK_SIZE,
+        'url': reverse('files:chunked_upload', kwargs={'upload_id': session.pk}),
+    }
+
+
+def _json_payload(request):
+    """Liest einen JSON-Body als dict"""
+    try:
+        payload = json.loads(request.body or b'{}')
+    except ValueError:
+        raise UploadError('Ungültiges JSON')
+    if not isinstance(payload, dict):
+        raise UploadError('JSON-Objekt erwartet')
+    return payload
+
+
+class ChunkedUploadStartView(LoginRequiredMixin, View):
+    """
+    Startet einen Chunked Upload
+    
+    JSON-Body: ``filename``, ``size`` (Bytes), optional ``sha256`` der Datei.
+    """
+    
+    def post(self, request):
+        try:
+            payload = _json_payload(request)
+            session = start_upload(request.user, payload.get('filename'), payload.get('size'), payload.get('sha256'))
+        except UploadError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        return JsonResponse(_upload_state(session), status=201)
+
+
+class ChunkedUploadView(LoginRequiredMixin, View):
+    """
+    Stand abfragen (GET), Chunk anhängen (PUT) oder Upload verwerfen (DELETE)
+    
+    PUT: Body = Chunk, Header ``Upload-Offset`` (Position) und
+    ``X-Chunk-SHA256`` (Prüfsumme des Chunks). Bei falschem Offset antwortet
+    der Endpunkt mit 409 und dem empfangenen Stand.
+    """
+    http_method_names = ['get', 'put', 'delete']
+    
+    def dispatch(self, request, *args, **kwargs):
+        if request.user.is_authenticated:
+            self.session = get_object_or_404(UploadSession, pk=kwargs['upload_id'], created_by=request.user)
+        return super().dispatch(request, *args, **kwargs)
+    
+    def get(self, request, upload_id):
+        return JsonResponse(_upload_state(self.session))
+    
+    def put(self, request, upload_id):
+        try:
+            offset = int(request.headers.get('Upload-Offset', ''))
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            return JsonResponse({'error': 'Upload-Offset erwartet eine Position in Bytes'}, status=400)
+        
+        try:
+            # Der Body wird blockweise aus dem Request gelesen, nicht über request.body
+            append_chunk(self.session, offset, request, length, request.headers.get('X-Chunk-SHA256', ''))
+        except OffsetMismatch as e:
+            return JsonResponse({'error': str(e), 'offset': e.offset}, status=409)
+        except UploadError as e:
+            return JsonResponse({'error': str(e), 'offset': self.session.received_bytes}, status=400)
+        return JsonResponse(_upload_state(self.session))
+    
+    def delete(self, request, upload_id):
+        discard_upload(self.session)
+        return HttpResponse(status=204)
+
+
+class ChunkedUploadCompleteView(LoginRequiredMixin, View):
+    """
+    Schließt einen Chunked Upload ab und legt die Datei an
+    
+    JSON-Body: ``title``, optional ``description``, ``file_type`` und
+    ``folder`` (globale Datei) bzw. ``deal`` (Datei eines Dealrooms).
+    """
+    
+    def post(self, request, upload_id):
+        session = get_object_or_404(UploadSession, pk=upload_id, created_by=request.user)
+        try:
+            payload = _json_payload(request)
+            create = self._get_factory(request, session, payload)
+            obj, url = complete_upload(session, create)
+        except OffsetMismatch as e:
+            return JsonResponse({'error': 'Upload ist unvollständig', 'offset': e.offset}, status=409)
+        except UploadError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        return JsonResponse({'id': obj.pk, 'url': url}, status=201)
+    
+    def _get_factory(self, request, session, payload):
+        """Funktion, die aus der fertigen Datei die Modellinstanz anlegt"""
+        from deals.models import Deal, DealFile
+        
+        title = str(payload.get('title') or session.filename)[:200]
+        description = payload.get('description') or None
+        
+        if payload.get('deal'):
+            deal = get_object_or_404(Deal, pk=payload['deal'])
+            if not (request.user == deal.created_by or request.user.is_staff):
+                raise PermissionDenied
+            file_type = payload.get('file_type') or DealFile.FileType.OTHER
+            if file_type not in DealFile.FileType.values:
+                raise UploadError('Unbekannter Dateityp')
+            
+            def create(file):
+                deal_file = DealFile.objects.create(
+                    deal=deal, title=title, description=description, file=file,
+                    file_type=file_type, uploaded_by=request.user
+                )
+                return deal_file, reverse('deals:dealroom_file_download', args=[deal_file.pk])
+            return create
+        
+        file_type = payload.get('file_type') or GlobalFile.FileType.OTHER
+        if file_type not in GlobalFile.FileType.values:
+            raise UploadError('Unbekannter Dateityp')
+        folder = None
+        if payload.get('folder'):
+            folder = get_object_or_404(Folder, pk=payload['folder'])
+        
+        def create(file):
+            global_file = GlobalFile.objects.create(
+                title=title, description=description, file=file, file_type=file_type,
+                folder=folder, uploaded_by=request.user
+            )
+            return global_file, global_file.get_absolute_url()
+        return create
@@ -39,7 +39,7 @@ __author__ = "Dealroom Dashboard Team"
 __description__ = "Automatischer Website-Generator für Dealrooms"
 
 # Verfügbare Komponenten exportieren
-from .renderer import DealroomGenerator
+from .renderer import DealroomGenerator, ACCESS_LEVELS
 from .css_generator import CSSGenerator
 from .video_processor import VideoProcessor
 from .image_processor import ImageProcessor
@@ -56,13 +56,18 @@ from .utils import (
     is_video_file,
     is_document_file,
     format_file_size,
-    ensure_unique_filename
+    ensure_unique_filename,
+    get_website_dir,
+    get_variant_path,
+    read_access_marker,
+    write_access_marker
 )
 
 # Alle wichtigen Klassen und Funktionen für einfachen Import
 __all__ = [
     # Hauptkomponenten
     'DealroomGenerator',
+    'ACCESS_LEVELS',
     'CSSGenerator', 
     'VideoProcessor',
     'ImageProcessor',
@@ -79,6 +84,10 @@ __all__ = [
     'is_document_file',
     'format_file_size',
     'ensure_unique_filename',
+    'get_website_dir',
+    'get_variant_path',
+    'read_access_marker',
+    'write_access_marker',
 ]
 
 # Konfiguration für das Generator-System
@@ -0,0 +1,105 @@
+"""
+Render-Cache für generierte Dealroom-Websites
+=============================================
+
+Hält das gerenderte HTML eines Dealrooms im Django-Cache, damit nicht jeder
+Besucher die komplette Generierung bezahlt. Gecacht werden alle Varianten je
+Zugriffsebene gemeinsam. Einträge sind an ``updated_at`` des Dealrooms
+gebunden und werden bei Datei-Änderungen explizit verworfen.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+
+RENDER_CACHE_PREFIX = 'dealroom:render'
+
+
+def get_render_cache_key(dealroom_id: int) -> str:
+    """
+    Gibt den Cache-Key für das gerenderte HTML eines Dealrooms zurück
+
+    Args:
+        dealroom_id: ID des Dealrooms
+
+    Returns:
+        str: Cache-Key
+    """
+    return f'{RENDER_CACHE_PREFIX}:{dealroom_id}'
+
+
+def _get_version(dealroom) -> str:
+    """Gibt die Version des Dealrooms zurück (Zeitpunkt der letzten Änderung)"""
+    return dealroom.updated_at.isoformat() if dealroom.updated_at else ''
+
+
+def get_cached_variants(dealroom):
+    """
+    Gibt die gecachten Varianten zurück, falls sie zum aktuellen Stand passen
+
+    Args:
+        dealroom: Dealroom-Objekt
+
+    Returns:
+        dict oder None: HTML je Zugriffsebene
+    """
+    entry = cache.get(get_render_cache_key(dealroom.id))
+    if entry and entry[0] == _get_version(dealroom):
+        return entry[1]
+    return None
+
+
+def set_cached_variants(dealroom, variants) -> None:
+    """
+    Legt die gerenderten Varianten im Cache ab
+
+    Args:
+        dealroom: Dealroom-Objekt
+        variants: HTML je Zugriffsebene
+    """
+    cache.set(
+        get_render_cache_key(dealroom.id),
+        (_get_version(dealroom), variants),
+        settings.DEALROOM_RENDER_CACHE_TIMEOUT
+    )
+
+
+def render_variants(dealroom):
+    """
+    Gibt alle Varianten eines Dealrooms zurück, aus dem Cache oder frisch gerendert
+
+    Args:
+        dealroom: Dealroom-Objekt
+
+    Returns:
+        dict: HTML je Zugriffsebene
+    """
+    variants = get_cached_variants(dealroom)
+    if variants is None:
+        from .renderer import DealroomGenerator
+        variants = DealroomGenerator(dealroom).generate_variants()
+        set_cached_variants(dealroom, variants)
+    return variants
+
+
+def render_website(dealroom, access_level: str = 'public') -> str:
+    """
+    Gibt das HTML eines Dealrooms für eine Zugriffsebene zurück
+
+    Args:
+        dealroom: Dealroom-Objekt
+        access_level: Zugriffsebene (public, customer, internal, confidential)
+
+    Returns:
+        str: HTML-Inhalt
+    """
+    return render_variants(dealroom)[access_level]
+
+
+def invalidate_render_cache(dealroom_id: int) -> None:
+    """
+    Verwirft das gecachte HTML eines Dealrooms
+
+    Args:
+        dealroom_id: ID des Dealrooms
+    """
+    cache.delete(get_render_cache_key(dealroom_id))
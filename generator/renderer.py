@@ -5,14 +5,21 @@ Website-Renderer für Dealroom-Generierung
 Hauptkomponente für die Generierung von Websites aus Dealroom-Daten.
 """
 
+import json
 import os
-from typing import Optional
+from typing import Dict, Optional
 from .css_generator import CSSGenerator
 from .video_processor import VideoProcessor
 from .image_processor import ImageProcessor
-from .utils import create_directory, sanitize_filename
+from .utils import create_directory, sanitize_filename, write_access_marker, VARIANTS_DIRNAME
 from django.conf import settings
 
+# Zugriffsebenen für Dokumente, aufsteigend nach Berechtigung
+ACCESS_LEVELS = ('public', 'customer', 'internal', 'confidential')
+
+# Platzhalter für die zugriffsabhängigen Bereiche beim Rendern der Varianten
+_ACCESS_PLACEHOLDER = '<!--dealroom-access:{}-->'
+
 
 class DealroomGenerator:
     """
@@ -31,6 +38,10 @@ class DealroomGenerator:
         self.video_processor = VideoProcessor()
         self.image_processor = ImageProcessor()
         
+        # None = alle Dokumente (Vorschau), sonst nur bis zu dieser Zugriffsebene
+        self.access_level = None
+        self._render_placeholders = False
+        
     def generate_website(self) -> str:
         """Generiert die komplette Website"""
         try:
@@ -46,6 +57,48 @@ class DealroomGenerator:
             print(f"❌ {error_msg}")
             return f"<html><body><h1>Generierungsfehler</h1><p>{error_msg}</p></body></html>"
     
+    def generate_variants(self) -> Dict[str, str]:
+        """
+        Generiert die Website je Zugriffsebene
+        
+        Die Seite wird nur einmal gerendert; Dokumente- und Download-Bereich
+        werden anschließend pro Zugriffsebene eingesetzt.
+        
+        Returns:
+            dict: HTML je Zugriffsebene (siehe ACCESS_LEVELS)
+        """
+        self._render_placeholders = True
+        try:
+            base_html = self.generate_website()
+        finally:
+            self._render_placeholders = False
+        
+        previous_level = self.access_level
+        variants = {}
+        try:
+            for level in ACCESS_LEVELS:
+                self.access_level = level
+                html = base_html
+                if _ACCESS_PLACEHOLDER.format('documents') in html:
+                    html = html.replace(_ACCESS_PLACEHOLDER.format('documents'), self._generate_documents_section())
+                if _ACCESS_PLACEHOLDER.format('downloads') in html:
+                    html = html.replace(_ACCESS_PLACEHOLDER.format('downloads'), self._generate_files_download_section())
+                variants[level] = html
+        finally:
+            self.access_level = previous_level
+        
+        return variants
+    
+    def _is_visible(self, file) -> bool:
+        """Prüft ob eine Datei für die aktuelle Zugriffsebene sichtbar ist"""
+        if self.access_level is None:
+            return True
+        level = getattr(file, 'document_access_level', None) or 'public'
+        # Unbekannte Ebenen wie 'vertraulich' behandeln
+        if level not in ACCESS_LEVELS:
+            level = ACCESS_LEVELS[-1]
+        return ACCESS_LEVELS.index(level) <= ACCESS_LEVELS.index(self.access_level)
+    
     def _generate_manual_html(self) -> str:
         """Generiert HTML nur aus manuellen Eingaben"""
         html_parts = []
@@ -399,6 +452,9 @@ class DealroomGenerator:
     
     def _generate_documents_section(self) -> str:
         """Generiert Wichtige Dokumente & Informationen"""
+        if self._render_placeholders:
+            return _ACCESS_PLACEHOLDER.format('documents')
+        
         # Erweiterte Dokumentenverwaltung mit Kategorien
         documents_html = '''
             <section class="section">
@@ -411,7 +467,7 @@ class DealroomGenerator:
         
         # Direkt hochgeladene Dateien
         for file in self.dealroom.files.all():
-            if file.file_type in ['document', 'contract', 'offer', 'invoice', 'presentation', 'specification']:
+            if file.file_type in ['document', 'contract', 'offer', 'invoice', 'presentation', 'specification'] and self._is_visible(file):
                 category = getattr(file, 'document_category', 'Allgemein')
                 if category not in documents_by_category:
                     documents_by_category[category] = []
@@ -419,7 +475,7 @@ class DealroomGenerator:
         
         # Globale zugeordnete Dateien
         for assignment in self.dealroom.file_assignments.all():
-            if assignment.role in ['document', 'contract', 'offer', 'invoice', 'presentation', 'specification']:
+            if assignment.role in ['document', 'contract', 'offer', 'invoice', 'presentation', 'specification'] and self._is_visible(assignment.global_file):
                 category = getattr(assignment.global_file, 'document_category', 'Allgemein')
                 if category not in documents_by_category:
                     documents_by_category[category] = []
@@ -688,9 +744,12 @@ class DealroomGenerator:
     
     def _generate_files_download_section(self) -> str:
         """Generiert Download-Sektion für Dateien"""
+        if self._render_placeholders:
+            return _ACCESS_PLACEHOLDER.format('downloads')
+        
         # Alle zugeordneten Dateien abrufen
-        assigned_files = self.dealroom.get_assigned_files()
-        uploaded_files = self.dealroom.files.all()
+        assigned_files = [a for a in self.dealroom.get_assigned_files() if self._is_visible(a.global_file)]
+        uploaded_files = [f for f in self.dealroom.files.all() if self._is_visible(f)]
         
         # Wenn keine Dateien vorhanden, nichts anzeigen
         if not assigned_files and not uploaded_files:
@@ -834,24 +893,127 @@ class DealroomGenerator:
                 
                 images.forEach(img => imageObserver.observe(img));
             }}
-            
-            // Download-Tracking
-            document.querySelectorAll('.btn-download').forEach(btn => {{
-                btn.addEventListener('click', function() {{
-                    console.log('Download gestartet:', this.href);
-                }});
-            }});
         }});
         </script>
+        {self._generate_analytics_script()}
         </body>
         </html>'''
     
-    def save_website(self, output_path: str) -> bool:
+    def _generate_analytics_script(self) -> str:
+        """
+        Generiert das Analytics-Script
+        
+        Events werden im Browser gesammelt und beim Verlassen der Seite
+        gebündelt per navigator.sendBeacon an den Collect-Endpunkt geschickt
+        (ein Request pro Besuch, siehe deals.ingest).
+        """
+        if not self.dealroom.pk:
+            return ''
+        
+        from django.urls import reverse
+        endpoint = json.dumps(reverse('deals:analytics_collect', args=[self.dealroom.pk]))
+        
+        return f'''<script>
+        // Analytics: Events sammeln und gebündelt per sendBeacon senden
+        (function() {{
+            const endpoint = {endpoint};
+            const maxQueue = 50;
+            const queue = [];
+            const viewport = window.innerWidth < 768 ? 'mobile' : (window.innerWidth < 1200 ? 'tablet' : 'desktop');
+            let session;
+            try {{
+                session = sessionStorage.getItem('dealroom_session');
+                if (!session) {{
+                    session = Date.now().toString(36) + Math.random().toString(36).slice(2, 10);
+                    sessionStorage.setItem('dealroom_session', session);
+                }}
+            }} catch (e) {{
+                session = Date.now().toString(36) + Math.random().toString(36).slice(2, 10);
+            }}
+            let visibleSince = Date.now();
+            let maxDepth = 0;
+            
+            function track(type, data) {{
+                queue.push(Object.assign({{type: type}}, data || {{}}));
+                if (queue.length >= maxQueue) {{
+                    flush();
+                }}
+            }}
+            
+            function flush() {{
+                if (!queue.length) {{
+                    return;
+                }}
+                const body = JSON.stringify({{
+                    session: session,
+                    referrer: document.referrer,
+                    events: queue.splice(0, queue.length)
+                }});
+                if (navigator.sendBeacon && navigator.sendBeacon(endpoint, new Blob([body], {{type: 'text/plain'}}))) {{
+                    return;
+                }}
+                fetch(endpoint, {{method: 'POST', body: body, keepalive: true, headers: {{'Content-Type': 'text/plain'}}}}).catch(function() {{}});
+            }}
+            
+            function leave() {{
+                track('time_spent', {{ms: Date.now() - visibleSince}});
+                if (maxDepth) {{
+                    track('scroll', {{depth: maxDepth}});
+                    maxDepth = 0;
+                }}
+                flush();
+            }}
+            
+            track('page_view', {{viewport: viewport}});
+            
+            window.addEventListener('scroll', function() {{
+                const scrollable = document.documentElement.scrollHeight - window.innerHeight;
+                if (scrollable > 0) {{
+                    maxDepth = Math.max(maxDepth, Math.round(window.scrollY / scrollable * 100));
+                }}
+            }}, {{passive: true}});
+            
+            document.addEventListener('click', function(e) {{
+                const download = e.target.closest('.btn-download');
+                if (download) {{
+                    track('download', {{element: download.getAttribute('href')}});
+                    return;
+                }}
+                const element = e.target.closest('[id], a, button');
+                track('click', {{
+                    element: element ? (element.id || element.getAttribute('href') || element.tagName.toLowerCase()) : null,
+                    x: Math.round(e.pageX),
+                    y: Math.round(e.pageY),
+                    viewport: viewport
+                }});
+            }});
+            
+            document.addEventListener('visibilitychange', function() {{
+                if (document.visibilityState === 'hidden') {{
+                    leave();
+                }} else {{
+                    visibleSince = Date.now();
+                }}
+            }});
+            window.addEventListener('pagehide', function() {{
+                if (document.visibilityState !== 'hidden') {{
+                    leave();
+                }}
+            }});
+        }})();
+        </script>'''
+    
+    def save_website(self, output_path: str, variants: Optional[Dict[str, str]] = None) -> bool:
         """
         Speichert die generierte Website
         
+        Die öffentliche Variante wird unter output_path abgelegt, die übrigen
+        Zugriffsebenen im Unterverzeichnis VARIANTS_DIRNAME, das nicht über
+        generated_pages ausgeliefert wird.
+        
         Args:
             output_path: Ausgabepfad
+            variants: Bereits gerenderte Varianten (optional, sonst wird generiert)
             
         Returns:
             bool: True wenn erfolgreich gespeichert
@@ -862,10 +1024,24 @@ class DealroomGenerator:
             create_directory(directory)
             
             # HTML generieren und speichern
-            html_content = self.generate_website()
+            if variants is None:
+                variants = self.generate_variants()
             
             with open(output_path, 'w', encoding='utf-8') as f:
-                f.write(html_content)
+                f.write(variants['public'])
+            
+            variants_dir = os.path.join(directory, VARIANTS_DIRNAME)
+            create_directory(variants_dir)
+            for level, html_content in variants.items():
+                if level == 'public':
+                    continue
+                with open(os.path.join(variants_dir, f'{level}.html'), 'w', encoding='utf-8') as f:
+                    f.write(html_content)
+            
+            # Passwortschutz für die generated_pages-Route (Prüfung ohne Datenbank)
+            get_fingerprint = getattr(self.dealroom, 'get_access_token_fingerprint', None)
+            fingerprint = get_fingerprint() if get_fingerprint else ''
+            write_access_marker(directory, fingerprint)
             
             return True
         except Exception as e:
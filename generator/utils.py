@@ -12,6 +12,12 @@ import re
 from pathlib import Path
 from typing import Optional, Union
 
+# Unterverzeichnis für die nicht-öffentlichen Varianten einer generierten Website
+VARIANTS_DIRNAME = '_variants'
+
+# Zugriffsinformationen (Passwortschutz) einer generierten Website in VARIANTS_DIRNAME
+ACCESS_MARKER_FILENAME = 'access.json'
+
 
 def create_directory(directory_path: str) -> bool:
     """
@@ -211,4 +217,73 @@ def ensure_unique_filename(file_path: str) -> str:
         file_path = os.path.join(directory, new_filename)
         counter += 1
         
-    return file_path 
\ No newline at end of file
+    return file_path 
+
+def get_website_dir(dealroom_id: int) -> str:
+    """
+    Gibt das Ausgabeverzeichnis der generierten Website eines Dealrooms zurück
+    
+    Args:
+        dealroom_id: ID des Dealrooms
+        
+    Returns:
+        str: Absoluter Pfad (generated_pages/dealroom-<id>)
+    """
+    from django.conf import settings
+    return os.path.join(settings.BASE_DIR, 'generated_pages', f'dealroom-{dealroom_id}')
+
+
+def get_variant_path(dealroom_id: int, access_level: str) -> str:
+    """
+    Gibt den Pfad der generierten Website-Variante für eine Zugriffsebene zurück
+    
+    Args:
+        dealroom_id: ID des Dealrooms
+        access_level: Zugriffsebene (public, customer, internal, confidential)
+        
+    Returns:
+        str: Absoluter Pfad (index.html für public, sonst _variants/<ebene>.html)
+    """
+    website_dir = get_website_dir(dealroom_id)
+    if access_level == 'public':
+        return os.path.join(website_dir, 'index.html')
+    return os.path.join(website_dir, VARIANTS_DIRNAME, f'{access_level}.html')
+
+
+def read_access_marker(website_dir: str) -> Optional[dict]:
+    """
+    Liest die beim Generieren geschriebenen Zugriffsinformationen
+    
+    Args:
+        website_dir: Verzeichnis der generierten Website
+        
+    Returns:
+        dict oder None: {'protected': bool, 'fingerprint': str}, None wenn nicht vorhanden
+    """
+    import json
+    
+    try:
+        with open(os.path.join(website_dir, VARIANTS_DIRNAME, ACCESS_MARKER_FILENAME), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_access_marker(website_dir: str, fingerprint: str) -> None:
+    """
+    Schreibt die Zugriffsinformationen einer generierten Website
+    
+    Die Datei wird atomar ersetzt, damit GeneratedPageView nie eine halb
+    geschriebene Markierung liest.
+    
+    Args:
+        website_dir: Verzeichnis der generierten Website
+        fingerprint: Fingerabdruck des Passworts, leer = nicht geschützt
+    """
+    import json
+    
+    path = os.path.join(website_dir, VARIANTS_DIRNAME, ACCESS_MARKER_FILENAME)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'protected': bool(fingerprint), 'fingerprint': fingerprint}, f)
+    os.replace(tmp_path, path)
@@ -0,0 +1,18 @@
+"""
+Lasttest-Harness für die öffentlichen Dealroom-Endpunkte
+========================================================
+
+Besteht aus drei Teilen:
+
+- ``manage.py seed_loadtest``: legt N synthetische Dealrooms mit realistischen
+  Dateien, FAQs und Timelines an und schreibt ein Manifest.
+- ``python -m loadtest.run``: startet lokal einen Server und feuert aus
+  mehreren Prozessen Anfragen auf Landingpage, Passwortabfrage und
+  generated_pages.
+- ``loadtest.middleware.query_count_middleware``: zählt DB-Queries pro Anfrage
+  (aktiv mit ``DEALROOM_LOADTEST=True``).
+
+Die Ergebnisse (Durchsatz, p50/p95/p99, Queries pro Anfrage) werden als JSON
+geschrieben, damit Läufe über Commits hinweg verglichen werden können.
+Alles läuft offline auf einem Rechner.
+"""
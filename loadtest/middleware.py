@@ -0,0 +1,69 @@
+"""
+Middleware zum Zählen der DB-Queries pro Anfrage
+
+Hängt an jede Antwort den Header ``X-DB-Queries`` an. Gezählt wird über einen
+Execute-Wrapper an jeder DB-Verbindung und eine ContextVar pro Anfrage, damit
+auch Queries aus ``sync_to_async``-Threads asynchroner Views erfasst werden.
+"""
+
+import contextvars
+
+from asgiref.sync import iscoroutinefunction
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.utils.decorators import sync_and_async_middleware
+
+QUERY_COUNT_HEADER = 'X-DB-Queries'
+
+_query_counter = contextvars.ContextVar('dealroom_query_counter', default=None)
+
+
+def _count_query(execute, sql, params, many, context):
+    """Execute-Wrapper: zählt die Query für die laufende Anfrage"""
+    counter = _query_counter.get()
+    if counter is not None:
+        counter[0] += 1
+    return execute(sql, params, many, context)
+
+
+def _install_query_counter(sender, connection, **kwargs):
+    """Registriert den Execute-Wrapper an einer (neuen) DB-Verbindung"""
+    if _count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_count_query)
+
+
+connection_created.connect(_install_query_counter)
+
+
+@sync_and_async_middleware
+def query_count_middleware(get_response):
+    """
+    Zählt die DB-Queries jeder Anfrage und gibt sie im Antwort-Header zurück
+
+    Aktiv nur mit ``DEALROOM_LOADTEST=True`` (siehe settings.py).
+    """
+    for connection in connections.all(initialized_only=True):
+        _install_query_counter(None, connection)
+
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            counter = [0]
+            token = _query_counter.set(counter)
+            try:
+                response = await get_response(request)
+            finally:
+                _query_counter.reset(token)
+            response[QUERY_COUNT_HEADER] = str(counter[0])
+            return response
+    else:
+        def middleware(request):
+            counter = [0]
+            token = _query_counter.set(counter)
+            try:
+                response = get_response(request)
+            finally:
+                _query_counter.reset(token)
+            response[QUERY_COUNT_HEADER] = str(counter[0])
+            return response
+
+    return middleware
@@ -0,0 +1,352 @@
+"""
+Lasttest-Client für die öffentlichen Dealroom-Endpunkte
+=======================================================
+
+Startet (optional) einen lokalen Server und schickt aus mehreren Prozessen
+Anfragen an Landingpage, Passwortabfrage und generated_pages. Die Dealrooms
+kommen aus dem Manifest von ``manage.py seed_loadtest``.
+
+Beispiel::
+
+    python manage.py seed_loadtest --deals 200
+    python -m loadtest.run --server uvicorn --processes 8 --duration 30
+
+Das Ergebnis wird als JSON nach ``loadtest/results/`` geschrieben.
+"""
+
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import platform
+import random
+import re
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from urllib.parse import urlencode, urlsplit
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCENARIOS = ('landingpage', 'password', 'generated')
+
+QUERY_COUNT_HEADER = 'X-DB-Queries'
+
+CSRF_TOKEN_RE = re.compile(r'name="csrfmiddlewaretoken" value="([^"]+)"')
+
+
+def percentile(values, q):
+    """
+    Berechnet ein Perzentil mit linearer Interpolation
+
+    Args:
+        values: Sortierte Liste von Werten
+        q: Perzentil zwischen 0 und 100
+
+    Returns:
+        float oder None: Perzentil (None bei leerer Liste)
+    """
+    if not values:
+        return None
+    position = (len(values) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def summarize(samples, duration):
+    """
+    Fasst Messpunkte pro Szenario zusammen
+
+    Args:
+        samples: Liste von (szenario, latenz_s, status, queries)
+        duration: Messdauer in Sekunden
+
+    Returns:
+        dict: Kennzahlen pro Szenario
+    """
+    grouped = {}
+    for scenario, latency, status, queries in samples:
+        grouped.setdefault(scenario, []).append((latency, status, queries))
+
+    summary = {}
+    for scenario, rows in sorted(grouped.items()):
+        latencies = sorted(latency * 1000 for latency, _, _ in rows)
+        queries = sorted(q for _, _, q in rows if q is not None)
+        errors = sum(1 for _, status, _ in rows if not status or status >= 400)
+        summary[scenario] = {
+            'requests': len(rows),
+            'errors': errors,
+            'throughput_rps': round(len(rows) / duration, 2) if duration else None,
+            'latency_ms': {
+                'mean': round(sum(latencies) / len(latencies), 3),
+                'p50': round(percentile(latencies, 50), 3),
+                'p95': round(percentile(latencies, 95), 3),
+                'p99': round(percentile(latencies, 99), 3),
+                'max': round(latencies[-1], 3),
+            },
+            'db_queries': {
+                'mean': round(sum(queries) / len(queries), 2),
+                'p95': percentile(queries, 95),
+                'max': queries[-1],
+            } if queries else None,
+        }
+    return summary
+
+
+class _Session:
+    """Minimale HTTP/1.1-Sitzung mit Keep-Alive und Cookies"""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.cookies = {}
+        self.connection = None
+
+    def request(self, method, path, body=None, headers=None):
+        headers = dict(headers or {})
+        if self.cookies:
+            headers['Cookie'] = '; '.join(f'{k}={v}' for k, v in self.cookies.items())
+        for attempt in range(2):
+            if self.connection is None:
+                self.connection = http.client.HTTPConnection(self.host, self.port, timeout=30)
+            try:
+                self.connection.request(method, path, body=body, headers=headers)
+                response = self.connection.getresponse()
+                content = response.read()
+                break
+            except (http.client.HTTPException, OSError):
+                self.connection.close()
+                self.connection = None
+                if attempt:
+                    raise
+        for cookie in response.msg.get_all('Set-Cookie') or []:
+            name, _, value = cookie.split(';', 1)[0].partition('=')
+            self.cookies[name.strip()] = value.strip()
+        if response.getheader('Connection', '').lower() == 'close':
+            self.connection.close()
+            self.connection = None
+        return response, content
+
+    def timed(self, samples, scenario, method, path, body=None, headers=None):
+        """Führt eine Anfrage aus und hängt den Messpunkt an"""
+        start = time.perf_counter()
+        try:
+            response, content = self.request(method, path, body=body, headers=headers)
+        except (http.client.HTTPException, OSError):
+            samples.append((scenario, time.perf_counter() - start, 0, None))
+            return None, b''
+        latency = time.perf_counter() - start
+        queries = response.getheader(QUERY_COUNT_HEADER)
+        samples.append((scenario, latency, response.status, int(queries) if queries is not None else None))
+        return response, content
+
+
+def _password_flow(session, samples, deal_id, password):
+    """Passwortseite laden, Passwort absenden, geschützte Landingpage abrufen"""
+    session.cookies.clear()
+    path = f'/deals/{deal_id}/password-protection/'
+    _, content = session.timed(samples, 'password_page', 'GET', path)
+    match = CSRF_TOKEN_RE.search(content.decode('utf-8', 'replace'))
+    if not match:
+        return
+    body = urlencode({'csrfmiddlewaretoken': match.group(1), 'password': password})
+    response, _ = session.timed(samples, 'password_submit', 'POST', path, body=body, headers={
+        'Content-Type': 'application/x-www-form-urlencoded',
+    })
+    if response is not None and response.status == 302:
+        session.timed(samples, 'landingpage_protected', 'GET', f'/deals/{deal_id}/landingpage/')
+
+
+def worker(job):
+    """
+    Lastprozess: schickt bis zum Ende der Messdauer Anfragen
+
+    Args:
+        job: dict mit url, manifest, scenarios, duration, seed
+
+    Returns:
+        list: Messpunkte (szenario, latenz_s, status, queries)
+    """
+    rng = random.Random(job['seed'])
+    target = urlsplit(job['url'])
+    session = _Session(target.hostname, target.port or 80)
+    manifest = job['manifest']
+    public_ids = manifest['public_deal_ids']
+    protected_ids = manifest['protected_deal_ids']
+    all_ids = public_ids + protected_ids
+
+    scenarios = [s for s in job['scenarios']
+                 if (s != 'password' or protected_ids) and (s != 'landingpage' or public_ids)]
+    samples = []
+    deadline = time.monotonic() + job['duration']
+    while time.monotonic() < deadline and scenarios:
+        scenario = rng.choice(scenarios)
+        if scenario == 'landingpage':
+            session.timed(samples, 'landingpage', 'GET', f'/deals/{rng.choice(public_ids)}/landingpage/')
+        elif scenario == 'generated':
+            session.timed(samples, 'generated', 'GET', f'/generated_pages/dealroom-{rng.choice(all_ids)}/index.html')
+        elif scenario == 'password':
+            _password_flow(session, samples, rng.choice(protected_ids), manifest['password'])
+    return samples
+
+
+def _wait_for_port(host, port, timeout):
+    """Wartet bis der Server Verbindungen annimmt"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=1):
+                return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+def start_server(kind, port, server_workers):
+    """
+    Startet einen lokalen Server mit Query-Zählung
+
+    Args:
+        kind: 'runserver' (WSGI, Entwicklung) oder 'uvicorn' (ASGI)
+        port: Port
+        server_workers: Anzahl uvicorn-Worker
+
+    Returns:
+        subprocess.Popen: Server-Prozess
+    """
+    env = dict(os.environ, DEALROOM_LOADTEST='True', DEBUG=os.environ.get('DEBUG', 'False'))
+    if kind == 'uvicorn':
+        command = [sys.executable, '-m', 'uvicorn', 'dealroom_dashboard.asgi:application',
+                   '--host', '127.0.0.1', '--port', str(port), '--workers', str(server_workers),
+                   '--log-level', 'warning']
+    else:
+        command = [sys.executable, 'manage.py', 'runserver', f'127.0.0.1:{port}', '--noreload']
+    process = subprocess.Popen(command, cwd=BASE_DIR, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    if not _wait_for_port('127.0.0.1', port, timeout=30):
+        process.terminate()
+        raise RuntimeError(f'Server ({kind}) auf Port {port} nicht erreichbar')
+    return process
+
+
+def _git_commit():
+    """Gibt den aktuellen Commit zurück (falls verfügbar)"""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(url, manifest, scenarios, processes, duration, seed=0):
+    """
+    Führt den Lasttest aus und gibt den Bericht zurück
+
+    Args:
+        url: Basis-URL des Servers
+        manifest: Manifest aus seed_loadtest
+        scenarios: Liste der Szenarien
+        processes: Anzahl Client-Prozesse
+        duration: Messdauer in Sekunden
+        seed: Zufalls-Seed
+
+    Returns:
+        dict: Bericht
+    """
+    jobs = [{
+        'url': url,
+        'manifest': manifest,
+        'scenarios': list(scenarios),
+        'duration': duration,
+        'seed': seed * 1000 + i,
+    } for i in range(processes)]
+
+    started = time.perf_counter()
+    with multiprocessing.Pool(processes) as pool:
+        results = pool.map(worker, jobs)
+    elapsed = time.perf_counter() - started
+
+    samples = [sample for result in results for sample in result]
+    return {
+        'meta': {
+            'commit': _git_commit(),
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'url': url,
+            'processes': processes,
+            'duration_s': round(elapsed, 3),
+            'scenarios': list(scenarios),
+            'deals': len(manifest['public_deal_ids']) + len(manifest['protected_deal_ids']),
+        },
+        'total': {
+            'requests': len(samples),
+            'throughput_rps': round(len(samples) / elapsed, 2) if elapsed else None,
+        },
+        'scenarios': summarize(samples, elapsed),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Lasttest für die öffentlichen Dealroom-Endpunkte')
+    parser.add_argument('--manifest', default=os.path.join(BASE_DIR, 'loadtest', 'manifest.json'))
+    parser.add_argument('--url', help='Bestehenden Server nutzen statt einen zu starten')
+    parser.add_argument('--server', choices=('runserver', 'uvicorn'), default='uvicorn')
+    parser.add_argument('--server-workers', type=int, default=2)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--processes', type=int, default=multiprocessing.cpu_count())
+    parser.add_argument('--duration', type=float, default=10.0, help='Messdauer in Sekunden')
+    parser.add_argument('--warmup', type=float, default=2.0, help='Aufwärmphase in Sekunden (nicht gemessen)')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Pfad der JSON-Ergebnisdatei')
+    args = parser.parse_args(argv)
+
+    with open(args.manifest, encoding='utf-8') as f:
+        manifest = json.load(f)
+    scenarios = [s.strip() for s in args.scenarios.split(',') if s.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f'Unbekannte Szenarien: {", ".join(sorted(unknown))}')
+
+    server = None
+    url = args.url
+    if not url:
+        print(f"🚀 Starte {args.server} auf Port {args.port}...")
+        server = start_server(args.server, args.port, args.server_workers)
+        url = f'http://127.0.0.1:{args.port}'
+
+    try:
+        if args.warmup > 0:
+            run(url, manifest, scenarios, args.processes, args.warmup, seed=args.seed + 1)
+        print(f"📊 Messe {args.duration}s mit {args.processes} Prozessen gegen {url}...")
+        report = run(url, manifest, scenarios, args.processes, args.duration, seed=args.seed)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=10)
+    report['meta']['server'] = args.server if server is not None else 'external'
+
+    output = args.output
+    if not output:
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        output = os.path.join(BASE_DIR, 'loadtest', 'results', f"{stamp}-{report['meta']['commit'] or 'nogit'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+
+    print(f"\n{'Szenario':<24}{'Anfr.':>8}{'Fehler':>8}{'rps':>10}{'p50':>10}{'p95':>10}{'p99':>10}{'Queries':>9}")
+    for scenario, stats in report['scenarios'].items():
+        latency = stats['latency_ms']
+        queries = stats['db_queries']['mean'] if stats['db_queries'] else '-'
+        print(f"{scenario:<24}{stats['requests']:>8}{stats['errors']:>8}{stats['throughput_rps']:>10}"
+              f"{latency['p50']:>10}{latency['p95']:>10}{latency['p99']:>10}{queries:>9}")
+    print(f"\n✅ Ergebnis geschrieben: {output}")
+    return report
+
+
+if __name__ == '__main__':
+    main()